@@ -3,21 +3,33 @@ FastAPI 主应用文件
 包含基本的 API 路由和健康检查
 """
 
+import asyncio
 import json
 import os
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
 
 from app import __version__, __description__
+from app.api.responses import FileRangeResponse
 from app.config.settings import get_settings
+from app.core.duplicate_index import DuplicateIndex, get_duplicate_index
 from app.core.exceptions import AgentHubException
 from app.core.logger import get_logger
+from app.core.text_chunker import strip_content_header
+from app.storage.compression import (
+    accepts_encoding, artifact_encoding, decompress_stream, iter_artifact_bytes, iter_stream_bytes, logical_path,
+    open_artifact, resolve_artifact
+)
+from app.storage.pack_archive import PackedTask, get_pack_archive
+from app.storage.retention import get_usage_index, temp_usage
+from app.storage.task_layout import get_task_layout, normalize_metadata, task_identity
 
 # 获取配置和日志
 settings = get_settings()
@@ -195,12 +207,15 @@ async def list_platforms() -> Dict[str, Any]:
 
 @app.get(f"{settings.app.api_prefix}/tasks")
 async def list_tasks() -> Dict[str, Any]:
-    """列出任务"""
-    # TODO: 实现任务列表获取
+    """列出任务执行器中排队、执行中和最近结束的任务"""
+    from app.core.task_executor import get_task_executor
+    
+    executor = get_task_executor()
+    executions = executor.list_executions()
     return {
-        "tasks": [],
-        "total": 0,
-        "message": "任务管理功能尚未实现"
+        "tasks": executions,
+        "total": len(executions),
+        "statistics": executor.get_statistics()
     }
 
 
@@ -249,6 +264,7 @@ async def system_info() -> Dict[str, Any]:
                     "percent": psutil.disk_usage('/').percent
                 }
             },
+            "storage": _storage_usage(),
             "application": {
                 "name": settings.app.name,
                 "version": __version__,
@@ -278,6 +294,12 @@ async def startup_event():
         debug=settings.app.debug,
         api_prefix=settings.app.api_prefix
     )
+    
+    from app.core.task_executor import get_task_executor
+    executor = get_task_executor()
+    await executor.start()
+    if settings.scheduler.resume_on_startup:
+        executor.recover_pending_tasks()
 
 
 # 关闭事件  
@@ -285,6 +307,15 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭事件"""
     logger.info("AgentHub API shutting down")
+    
+    from app.core.model_client import close_model_client
+    from app.core.summary_jobs import get_summary_job_manager
+    from app.core.task_executor import get_task_executor
+    from app.utils.process_pool import shutdown_process_pool
+    await get_task_executor().stop(wait=False)
+    await get_summary_job_manager().shutdown()
+    await close_model_client()
+    shutdown_process_pool()
 
 
 # 历史任务相关端点
@@ -297,82 +328,12 @@ async def list_history_tasks(
 ) -> Dict[str, Any]:
     """列出历史任务"""
     try:
-        history_tasks = []
         stats = {"total": 0, "successful": 0, "failed": 0, "file_count": 0}
         
-        # 扫描历史下载目录
-        base_download_dir = Path("data/history_downloads")
-        multi_platform_dir = Path("data/multi_platform_downloads")
+        history_tasks = await _collect_history_tasks(platform, status)
         
-        # 🔥 新增：扫描各平台特定的下载目录
-        platform_specific_dirs = {
-            "skywork": ["data/skywork_history", "data/skywork_downloads"],
-            "manus": ["data/manus_history", "data/manus_downloads"],
-            "coze_space": ["data/coze_space_history_downloads", "data/coze_downloads"]
-        }
-        
-        # 扫描多平台下载目录
-        if multi_platform_dir.exists():
-            for session_dir in multi_platform_dir.glob("multi_platform_history_*"):
-                for platform_dir in session_dir.iterdir():
-                    if platform_dir.is_dir():
-                        # 扫描平台目录下的所有任务目录
-                        for task_dir in platform_dir.glob("task_*"):
-                            if task_dir.is_dir():
-                                task_data = await _load_task_data(task_dir, platform_dir.name)
-                                if task_data:
-                                    # 应用状态过滤
-                                    if status and task_data.get("success") != (status == "success"):
-                                        continue
-                                    history_tasks.append(task_data)
-        
-        # 🔥 扫描各平台特定的下载目录
-        for platform_name, dirs in platform_specific_dirs.items():
-            # 如果指定了平台过滤，跳过其他平台
-            if platform and platform != platform_name:
-                continue
-                
-            for dir_path in dirs:
-                platform_dir = Path(dir_path)
-                if platform_dir.exists():
-                    # 扫描下载会话目录（如 quick_xxx, batch_xxx 等）
-                    for session_dir in platform_dir.iterdir():
-                        if session_dir.is_dir():
-                            # 检查是否是下载报告文件所在目录
-                            download_report = session_dir / "download_report.json"
-                            if download_report.exists():
-                                # 从下载报告中加载任务
-                                tasks_from_report = await _load_tasks_from_download_report(download_report, platform_name)
-                                for task_data in tasks_from_report:
-                                    if status and task_data.get("success") != (status == "success"):
-                                        continue
-                                    history_tasks.append(task_data)
-                            else:
-                                # 直接扫描任务目录
-                                for task_dir in session_dir.glob("task_*"):
-                                    if task_dir.is_dir():
-                                        task_data = await _load_task_data(task_dir, platform_name)
-                                        if task_data:
-                                            if status and task_data.get("success") != (status == "success"):
-                                                continue
-                                            history_tasks.append(task_data)
-        
-        # 单平台下载目录
-        if base_download_dir.exists():
-            for task_dir in base_download_dir.glob("task_*"):
-                if task_dir.is_dir():
-                    # 🔥 修复：从metadata中读取正确的平台信息
-                    detected_platform = await _detect_platform_from_metadata(task_dir)
-                    task_data = await _load_task_data(task_dir, detected_platform)
-                    if task_data:
-                        if platform and task_data.get("platform") != platform:
-                            continue
-                        if status and task_data.get("success") != (status == "success"):
-                            continue
-                        history_tasks.append(task_data)
-        
-        # 去重处理
-        history_tasks = _deduplicate_tasks(history_tasks)
+        # 去重处理（读取正文和计算签名在线程中执行，不阻塞事件循环）
+        history_tasks = await asyncio.to_thread(_deduplicate_tasks, history_tasks)
         
         # 更新统计信息
         for task in history_tasks:
@@ -410,6 +371,47 @@ async def list_history_tasks(
             "error": str(e)
         }
 
+@app.get(f"{settings.app.api_prefix}/history/duplicates")
+async def list_duplicate_tasks(platform: Optional[str] = None) -> Dict[str, Any]:
+    """列出近似重复的历史任务分组（每组标出列表中保留的版本）"""
+    try:
+        history_tasks = await _collect_history_tasks(platform)
+        
+        index = get_duplicate_index()
+        tasks_by_key, clusters = await asyncio.to_thread(_cluster_tasks, index, history_tasks)
+        
+        groups = []
+        for cluster in clusters:
+            kept_key = cluster[0]
+            for key in cluster[1:]:
+                if _choose_better_task(tasks_by_key[kept_key], tasks_by_key[key]) is not tasks_by_key[kept_key]:
+                    kept_key = key
+            similarity = dict(index.duplicates_of(kept_key))
+            groups.append({
+                "kept": tasks_by_key[kept_key].get("id"),
+                "tasks": [
+                    {
+                        "id": tasks_by_key[key].get("id"),
+                        "title": tasks_by_key[key].get("title"),
+                        "platform": tasks_by_key[key].get("platform"),
+                        "download_time": tasks_by_key[key].get("download_time"),
+                        "download_dir": tasks_by_key[key].get("download_dir"),
+                        "similarity": 1.0 if key == kept_key else round(similarity.get(key, 0.0), 3)
+                    }
+                    for key in cluster
+                ]
+            })
+        
+        return {
+            "groups": groups,
+            "total_tasks": len(tasks_by_key),
+            "duplicate_tasks": sum(len(group["tasks"]) - 1 for group in groups)
+        }
+        
+    except Exception as e:
+        logger.error(f"查找重复任务失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get(f"{settings.app.api_prefix}/history/{{task_id}}")
 async def get_history_task_detail(task_id: str) -> Dict[str, Any]:
     """获取历史任务详情"""
@@ -417,6 +419,10 @@ async def get_history_task_detail(task_id: str) -> Dict[str, Any]:
         # 查找任务目录
         task_dir = await _find_task_directory(task_id)
         if not task_dir:
+            # 已归档的任务直接从打包文件中读取
+            packed = _find_packed_task(task_id)
+            if packed:
+                return await _load_packed_task_detail(packed)
             return {"error": "任务不存在"}
         
         # 加载任务详情
@@ -428,25 +434,49 @@ async def get_history_task_detail(task_id: str) -> Dict[str, Any]:
         return {"error": str(e)}
 
 @app.get(f"{settings.app.api_prefix}/history/file/{{task_id}}/{{filename}}")
-async def download_history_file(task_id: str, filename: str):
-    """下载历史任务文件"""
+async def download_history_file(task_id: str, filename: str, request: Request):
+    """下载历史任务文件（压缩存储的文件：客户端支持该编码时直接返回压缩字节，否则流式解压）"""
     try:
-        from fastapi.responses import FileResponse
+        from urllib.parse import quote
+        from fastapi.responses import FileResponse, StreamingResponse
         
-        # 查找任务目录
+        # 查找任务目录（已归档的任务按偏移从打包文件中读取）
         task_dir = await _find_task_directory(task_id)
         if not task_dir:
-            raise HTTPException(status_code=404, detail="任务不存在")
-        
-        # 查找文件
-        file_path = task_dir / filename
-        if not file_path.exists():
+            packed = _find_packed_task(task_id)
+            if not packed:
+                raise HTTPException(status_code=404, detail="任务不存在")
+            return _packed_file_response(packed, filename, request)
+        
+        # 查找文件（按原文件名查找，兼容压缩存储）
+        file_path = resolve_artifact(task_dir / filename)
+        if file_path is None:
             raise HTTPException(status_code=404, detail="文件不存在")
         
-        return FileResponse(
-            path=str(file_path),
-            filename=filename,
-            media_type='application/octet-stream'
+        encoding = artifact_encoding(file_path)
+        filename = logical_path(file_path).name
+        if encoding is None:
+            return FileResponse(
+                path=str(file_path),
+                filename=filename,
+                media_type='application/octet-stream'
+            )
+        
+        if accepts_encoding(request.headers.get("accept-encoding"), encoding):
+            return FileResponse(
+                path=str(file_path),
+                filename=filename,
+                media_type='application/octet-stream',
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            )
+        
+        return StreamingResponse(
+            iter_artifact_bytes(file_path),
+            media_type='application/octet-stream',
+            headers={
+                "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+                "Vary": "Accept-Encoding"
+            }
         )
         
     except Exception as e:
@@ -458,29 +488,31 @@ async def download_task_archive(task_id: str):
     """下载任务打包文件"""
     try:
         import zipfile
-        import tempfile
         from fastapi.responses import FileResponse
         
         # 查找任务目录
         task_dir = await _find_task_directory(task_id)
-        if not task_dir:
+        packed = _find_packed_task(task_id) if not task_dir else None
+        if not task_dir and not packed:
             raise HTTPException(status_code=404, detail="任务不存在")
         
-        # 创建临时zip文件
-        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_file:
-            zip_path = tmp_file.name
+        # 创建临时zip文件（发送完成后删除；中断遗留的由保留策略清理）
+        zip_path = _create_temp_zip()
         
         # 打包任务文件
         with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in task_dir.rglob('*'):
-                if file_path.is_file():
-                    arcname = file_path.relative_to(task_dir)
-                    zipf.write(file_path, arcname)
+            if packed:
+                _write_packed_task_to_zip(zipf, packed)
+            else:
+                for file_path in task_dir.rglob('*'):
+                    if file_path.is_file():
+                        _write_artifact_to_zip(zipf, file_path, str(file_path.relative_to(task_dir)))
         
         return FileResponse(
             path=zip_path,
             filename=f"{task_id}.zip",
-            media_type='application/zip'
+            media_type='application/zip',
+            background=BackgroundTask(os.unlink, zip_path)
         )
         
     except Exception as e:
@@ -492,16 +524,14 @@ async def batch_download_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
     """批量下载任务"""
     try:
         import zipfile
-        import tempfile
         from fastapi.responses import FileResponse
         
         task_ids = request.get("task_ids", [])
         if not task_ids:
             raise HTTPException(status_code=400, detail="未指定任务ID")
         
-        # 创建临时zip文件
-        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_file:
-            zip_path = tmp_file.name
+        # 创建临时zip文件（发送完成后删除；中断遗留的由保留策略清理）
+        zip_path = _create_temp_zip()
         
         successful_tasks = []
         failed_tasks = []
@@ -510,12 +540,15 @@ async def batch_download_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
             for task_id in task_ids:
                 try:
                     task_dir = await _find_task_directory(task_id)
-                    if task_dir and task_dir.exists():
+                    packed = _find_packed_task(task_id) if not task_dir else None
+                    if packed:
+                        _write_packed_task_to_zip(zipf, packed, f"{task_id}/")
+                        successful_tasks.append(task_id)
+                    elif task_dir and task_dir.exists():
                         # 添加任务文件到zip
                         for file_path in task_dir.rglob('*'):
                             if file_path.is_file():
-                                arcname = f"{task_id}/{file_path.relative_to(task_dir)}"
-                                zipf.write(file_path, arcname)
+                                _write_artifact_to_zip(zipf, file_path, f"{task_id}/{file_path.relative_to(task_dir)}")
                         successful_tasks.append(task_id)
                     else:
                         failed_tasks.append(task_id)
@@ -525,7 +558,8 @@ async def batch_download_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
         return FileResponse(
             path=zip_path,
             filename=f"batch_download_{int(time.time())}.zip",
-            media_type='application/zip'
+            media_type='application/zip',
+            background=BackgroundTask(os.unlink, zip_path)
         )
         
     except Exception as e:
@@ -536,15 +570,17 @@ async def batch_download_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
 async def delete_history_task(task_id: str) -> Dict[str, Any]:
     """删除历史任务"""
     try:
-        import shutil
-        
         # 查找任务目录
         task_dir = await _find_task_directory(task_id)
-        if not task_dir:
+        packed = _find_packed_task(task_id) if not task_dir else None
+        if not task_dir and not packed:
             raise HTTPException(status_code=404, detail="任务不存在")
         
-        # 删除任务目录
-        shutil.rmtree(task_dir)
+        # 删除任务目录（已归档的任务删除其归档索引）
+        if packed:
+            _remove_packed_task(packed)
+        else:
+            _remove_task_directory(task_dir)
         
         return {"message": "任务删除成功"}
         
@@ -556,8 +592,6 @@ async def delete_history_task(task_id: str) -> Dict[str, Any]:
 async def batch_delete_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
     """批量删除任务"""
     try:
-        import shutil
-        
         task_ids = request.get("task_ids", [])
         if not task_ids:
             raise HTTPException(status_code=400, detail="未指定任务ID")
@@ -568,8 +602,12 @@ async def batch_delete_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
         for task_id in task_ids:
             try:
                 task_dir = await _find_task_directory(task_id)
-                if task_dir and task_dir.exists():
-                    shutil.rmtree(task_dir)
+                packed = _find_packed_task(task_id) if not task_dir else None
+                if packed:
+                    _remove_packed_task(packed)
+                    successful_deletes.append(task_id)
+                elif task_dir and task_dir.exists():
+                    _remove_task_directory(task_dir)
                     successful_deletes.append(task_id)
                 else:
                     failed_deletes.append(task_id)
@@ -587,50 +625,159 @@ async def batch_delete_tasks(request: Dict[str, List[str]]) -> Dict[str, Any]:
         return {"error": str(e)}
 
 
-@app.post(f"{settings.app.api_prefix}/history/{{task_id}}/ai-summary")
-async def generate_task_ai_summary(task_id: str) -> Dict[str, Any]:
-    """为指定任务生成AI智能总结"""
+@app.post(f"{settings.app.api_prefix}/history/{{task_id}}/rehydrate")
+async def rehydrate_history_task(task_id: str) -> Dict[str, Any]:
+    """将已归档的任务还原为任务目录"""
     try:
-        from app.core.task_summary_generator import generate_task_summary
-        
-        # 查找任务目录
         task_dir = await _find_task_directory(task_id)
-        if not task_dir or not task_dir.exists():
-            raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
+        if task_dir:
+            return {"message": "任务未归档", "task_dir": str(task_dir)}
         
-        logger.info(
-            "开始生成任务AI总结",
-            task_id=task_id,
-            task_dir=str(task_dir)
-        )
+        packed = _find_packed_task(task_id)
+        if not packed:
+            raise HTTPException(status_code=404, detail="任务不存在")
         
-        # 获取任务标题
-        task_data = await _load_task_detail(task_dir)
-        task_title = task_data.get("task", {}).get("title", "未知任务")
+        task_dir = await asyncio.to_thread(get_pack_archive().rehydrate, packed)
+        return {"message": "任务已还原", "task_dir": str(task_dir)}
         
-        # 使用任务总结生成器
-        result = await generate_task_summary(task_dir, task_title, force=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"还原任务失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post(f"{settings.app.api_prefix}/history/ai-summary/backfill")
+async def start_ai_summary_backfill(
+    workers: Optional[int] = None,
+    force: bool = False,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """启动（或恢复）AI总结批量补全作业，立即返回进度"""
+    from app.core.summary_backfill import get_summary_backfill
+    
+    backfill = get_summary_backfill()
+    progress = await backfill.start(
+        workers=workers or settings.model.summary_backfill_workers,
+        force=force,
+        limit=limit
+    )
+    logger.info("AI总结补全作业已启动", total=progress["total"], workers=progress["workers"])
+    return {"success": True, "progress": progress}
+
+
+@app.post(f"{settings.app.api_prefix}/history/ai-summary/backfill/pause")
+async def pause_ai_summary_backfill() -> Dict[str, Any]:
+    """暂停AI总结批量补全作业"""
+    from app.core.summary_backfill import get_summary_backfill
+    return {"success": True, "progress": get_summary_backfill().pause()}
+
+
+@app.get(f"{settings.app.api_prefix}/history/ai-summary/backfill")
+async def get_ai_summary_backfill_progress() -> Dict[str, Any]:
+    """获取AI总结批量补全进度"""
+    from app.core.summary_backfill import get_summary_backfill
+    return {"success": True, "progress": get_summary_backfill().get_progress()}
+
+
+@app.get(f"{settings.app.api_prefix}/history/ai-summary/jobs")
+async def list_ai_summary_jobs() -> Dict[str, Any]:
+    """列出进行中和最近结束的AI总结作业"""
+    from app.core.summary_jobs import get_summary_job_manager
+    return {"success": True, "jobs": get_summary_job_manager().list_jobs()}
+
+
+@app.get(f"{settings.app.api_prefix}/history/ai-summary/jobs/{{job_id}}")
+async def get_ai_summary_job(job_id: str) -> Dict[str, Any]:
+    """查询AI总结作业状态"""
+    from app.core.summary_jobs import get_summary_job_manager
+    
+    job = get_summary_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"总结作业 {job_id} 不存在")
+    return {"success": True, "job": job.to_dict()}
+
+
+@app.get(f"{settings.app.api_prefix}/history/ai-summary/jobs/{{job_id}}/events")
+async def stream_ai_summary_job(job_id: str):
+    """以SSE订阅AI总结作业进度（先回放已产生的事件）"""
+    from app.core.summary_jobs import get_summary_job_manager
+    
+    manager = get_summary_job_manager()
+    if manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"总结作业 {job_id} 不存在")
+    return _sse_response(manager.subscribe(job_id))
+
+
+def _sse_response(events):
+    """把事件迭代器包装为SSE响应"""
+    from fastapi.responses import StreamingResponse
+    
+    async def event_stream():
+        async for event in events:
+            payload = json.dumps(event["data"], ensure_ascii=False, default=str)
+            yield f"event: {event['event']}\ndata: {payload}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _submit_summary_job(task_id: str):
+    """为任务提交总结作业（同一任务进行中的作业会被复用）"""
+    from app.core.summary_jobs import get_summary_job_manager
+    
+    task_dir = await _find_task_directory(task_id)
+    if not task_dir:
+        # 已归档的任务先还原为目录再生成总结
+        packed = _find_packed_task(task_id)
+        if packed:
+            task_dir = await asyncio.to_thread(get_pack_archive().rehydrate, packed)
+    if not task_dir or not task_dir.exists():
+        raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
+    
+    manager = get_summary_job_manager()
+    existing = manager.get_active_job(task_id)
+    if existing is not None:
+        return existing, True
+    
+    task_data = await _load_task_detail(task_dir)
+    task_title = task_data.get("task", {}).get("title", "未知任务")
+    logger.info("提交任务AI总结作业", task_id=task_id, task_dir=str(task_dir))
+    return manager.submit(task_id, task_dir, task_title), False
+
+
+@app.post(f"{settings.app.api_prefix}/history/{{task_id}}/ai-summary")
+async def generate_task_ai_summary(
+    task_id: str,
+    run_async: bool = Query(False, alias="async")
+) -> Dict[str, Any]:
+    """为指定任务生成AI智能总结
+    
+    默认等待生成完成并直接返回总结（与原接口一致）；
+    async=true 时入队后立即返回作业ID，通过作业状态或事件接口获取进度。
+    """
+    try:
+        job, deduplicated = await _submit_summary_job(task_id)
         
-        if result["success"]:
-            logger.info(
-                "任务AI总结生成成功",
-                task_id=task_id,
-                analysis_type=result.get("analysis_type", "unknown")
-            )
-            
+        if run_async:
             return {
                 "success": True,
-                "summary": result["summary"],
-                "cached": False  # 新生成的总结
-            }
-        else:
-            logger.warning("AI总结生成失败", task_id=task_id, error=result.get("error"))
-            return {
-                "success": False,
-                "error": result.get("error", "总结生成失败"),
-                "summary": None
+                "job_id": job.job_id,
+                "status": job.status.value,
+                "deduplicated": deduplicated
             }
         
+        from app.core.summary_jobs import get_summary_job_manager
+        job = await get_summary_job_manager().wait(job.job_id)
+        if job.summary is not None:
+            return {"success": True, "summary": job.summary, "cached": False, "job_id": job.job_id}
+        
+        logger.warning("AI总结生成失败", task_id=task_id, error=job.error)
+        return {"success": False, "error": job.error or "总结生成失败", "summary": None, "job_id": job.job_id}
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -638,6 +785,20 @@ async def generate_task_ai_summary(task_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"生成AI总结失败: {str(e)}")
 
 
+@app.post(f"{settings.app.api_prefix}/history/{{task_id}}/ai-summary/stream")
+async def stream_task_ai_summary(task_id: str):
+    """以SSE流式生成任务AI总结
+    
+    提交（或复用进行中的）总结作业并订阅其进度，客户端断开不会中断生成。
+    会触发生成，因此只接受 POST；浏览器 EventSource 可先以 async=true 提交作业，再订阅作业事件接口。
+    事件: file（单个文件分析完成）、delta（总结增量文本）、done（完整总结）、error
+    """
+    from app.core.summary_jobs import get_summary_job_manager
+    
+    job, _ = await _submit_summary_job(task_id)
+    return _sse_response(get_summary_job_manager().subscribe(job.job_id))
+
+
 @app.get(f"{settings.app.api_prefix}/history/{{task_id}}/ai-summary")
 async def get_task_ai_summary(task_id: str) -> Dict[str, Any]:
     """获取任务的AI智能总结（缓存版本）"""
@@ -646,11 +807,14 @@ async def get_task_ai_summary(task_id: str) -> Dict[str, Any]:
         
         # 查找任务目录
         task_dir = await _find_task_directory(task_id)
-        if not task_dir or not task_dir.exists():
+        packed = _find_packed_task(task_id) if not task_dir else None
+        if packed:
+            summary_data = _read_packed_json(packed, "ai_summary.json")
+        elif not task_dir or not task_dir.exists():
             raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
-        
-        # 获取已有总结
-        summary_data = get_task_summary(task_dir)
+        else:
+            # 获取已有总结
+            summary_data = get_task_summary(task_dir)
         
         if summary_data:
             logger.info("返回缓存的AI总结", task_id=task_id)
@@ -675,6 +839,25 @@ async def get_task_ai_summary(task_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"获取AI总结失败: {str(e)}")
 
 # 辅助函数
+def _storage_usage() -> Dict[str, Any]:
+    """数据目录用量：按平台统计的任务产物（来自用量索引）、临时文件、blob 存储和归档打包文件"""
+    from app.storage.blob_store import get_blob_store
+    
+    usage = {}
+    sources = {
+        "tasks": lambda: get_usage_index().get_statistics(),
+        "temp": temp_usage,
+        "blobs": lambda: get_blob_store().get_statistics(),
+        "packs": lambda: get_pack_archive().get_statistics()
+    }
+    for name, source in sources.items():
+        try:
+            usage[name] = source()
+        except Exception as e:
+            logger.warning(f"获取存储用量失败: {name}: {e}")
+            usage[name] = {"error": str(e)}
+    return usage
+
 async def _detect_platform_from_metadata(task_dir: Path) -> str:
     """从任务元数据中检测平台信息"""
     try:
@@ -731,83 +914,244 @@ async def _load_task_data(task_dir: Path, platform: str) -> Optional[Dict[str, A
             return None
         
         with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+            metadata = normalize_metadata(json.load(f), platform=platform)
         
         # 统计文件数量
         file_count = len(list(task_dir.glob('*')))
         
         # 读取内容文件
-        content_file = task_dir / "content.txt"
-        content_preview = ""
-        if content_file.exists():
-            with open(content_file, 'r', encoding='utf-8') as f:
+        content_file = resolve_artifact(task_dir / "content.txt")
+        content = ""
+        if content_file:
+            with open_artifact(content_file, 'r', encoding='utf-8') as f:
                 content = f.read()
-                # 提取内容预览（跳过元数据行）
-                lines = content.split('\n')
-                content_start = 0
-                for i, line in enumerate(lines):
-                    if line.startswith('=='):
-                        content_start = i + 1
-                        break
-                if content_start < len(lines):
-                    content_preview = '\n'.join(lines[content_start:content_start+3])[:200]
-        
-        task_info = metadata.get("task", {})
-        download_info = metadata.get("download", {})
         
-        title = task_info.get("title", "未知任务")
+        return _build_task_data(metadata, platform, file_count, content, str(task_dir))
         
-        # 过滤无效的任务标题
-        if _is_invalid_task_title(title):
+    except Exception as e:
+        logger.error(f"加载任务数据失败: {e}")
+        return None
+
+async def _load_packed_task_data(packed: PackedTask) -> Optional[Dict[str, Any]]:
+    """加载已归档任务的数据（从打包文件中按偏移读取元数据和内容）"""
+    try:
+        metadata = _read_packed_json(packed, "metadata.json")
+        if metadata is None:
             return None
         
-        # 🔥 对扣子空间的标题进行智能清理
-        display_title = title
-        if platform == "coze_space":
-            display_title = _extract_coze_smart_core(title)
-            if not display_title or len(display_title) < 3:
-                display_title = _clean_coze_title_core(title)
-            if not display_title:
-                display_title = title  # 回退到原标题
+        content_member = packed.resolve("content.txt")
+        content = _read_packed_text(packed, content_member.name) if content_member else ""
+        file_count = sum(1 for name in packed.members if "/" not in name)
+        
+        task_data = _build_task_data(metadata, packed.platform, file_count, content, packed.task_dir)
+        if task_data:
+            task_data["packed"] = True
+        return task_data
+        
+    except Exception as e:
+        logger.error(f"加载归档任务数据失败: {e}")
+        return None
+
+def _build_task_data(
+    metadata: Dict[str, Any],
+    platform: str,
+    file_count: int,
+    content: str,
+    download_dir: str
+) -> Optional[Dict[str, Any]]:
+    """由元数据和内容构造历史任务列表项（标题无效时返回 None）"""
+    # 提取内容预览（跳过元数据行）
+    content_preview = ""
+    if content:
+        lines = content.split('\n')
+        content_start = 0
+        for i, line in enumerate(lines):
+            if line.startswith('=='):
+                content_start = i + 1
+                break
+        if content_start < len(lines):
+            content_preview = '\n'.join(lines[content_start:content_start+3])[:200]
+    
+    task_info = metadata.get("task", {})
+    download_info = metadata.get("download", {})
+    
+    title = task_info.get("title", "未知任务")
+    
+    # 过滤无效的任务标题
+    if _is_invalid_task_title(title):
+        return None
+    
+    # 🔥 对扣子空间的标题进行智能清理
+    display_title = title
+    if platform == "coze_space":
+        display_title = _extract_coze_smart_core(title)
+        if not display_title or len(display_title) < 3:
+            display_title = _clean_coze_title_core(title)
+        if not display_title:
+            display_title = title  # 回退到原标题
+    
+    return {
+        "id": task_info.get("id"),
+        "title": display_title,
+        "platform": platform,
+        "success": file_count > 1,  # 如果有多个文件说明下载成功
+        "files_count": file_count,
+        "content_preview": content_preview,
+        "download_time": download_info.get("timestamp"),
+        "download_dir": download_dir,
+        "task_date": task_info.get("date"),
+        "task_url": task_info.get("url"),
+        "page_url": download_info.get("page_url"),
+        "page_title": download_info.get("page_title"),
+        "content_length": download_info.get("content_length", 0)
+    }
+
+def _remove_task_directory(task_dir: Path) -> None:
+    """删除任务目录，并释放其在内容寻址存储中的引用、清理不再被引用的 blob"""
+    import shutil
+    from app.storage.blob_store import get_blob_store
+    
+    released = []
+    try:
+        released = get_blob_store().release_tree(task_dir)
+    except Exception as e:
+        logger.warning(f"释放任务 blob 引用失败: {e}")
+    
+    shutil.rmtree(task_dir)
+    get_duplicate_index().remove(str(task_dir))
+    try:
+        get_usage_index().forget(task_dir)
+    except Exception as e:
+        logger.warning(f"移除任务磁盘用量记录失败: {e}")
+    
+    if released:
+        try:
+            get_blob_store().gc(released)
+        except Exception as e:
+            logger.warning(f"清理 blob 失败: {e}")
+
+def _find_packed_task(task_id: str) -> Optional[PackedTask]:
+    """查找已归档的任务"""
+    try:
+        return get_pack_archive().find(task_id)
+    except Exception as e:
+        logger.error(f"查找归档任务失败: {e}")
+        return None
+
+def _read_packed_text(packed: PackedTask, name: str) -> str:
+    """读取归档任务中的文本文件（压缩存储的文件流式解压）"""
+    import io
+    stream = decompress_stream(get_pack_archive().open_member(packed, name), artifact_encoding(name))
+    with io.TextIOWrapper(stream, encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+def _read_packed_json(packed: PackedTask, name: str) -> Optional[Dict[str, Any]]:
+    """读取归档任务中的JSON文件，不存在或无法解析时返回 None"""
+    member = packed.resolve(name)
+    if member is None:
+        return None
+    try:
+        return json.loads(_read_packed_text(packed, member.name))
+    except ValueError as e:
+        logger.warning(f"读取归档任务文件失败 {packed.task_dir}/{name}: {e}")
+        return None
+
+def _remove_packed_task(packed: PackedTask) -> None:
+    """删除已归档的任务（删除归档索引，打包文件中的数据不再被引用）"""
+    get_pack_archive().remove(packed)
+    get_duplicate_index().remove(packed.task_dir)
+
+def _packed_file_response(packed: PackedTask, filename: str, request: Request):
+    """返回归档任务中的单个文件：按偏移直接发送，压缩存储且客户端不支持该编码时流式解压"""
+    from urllib.parse import quote
+    from fastapi.responses import StreamingResponse
+    
+    member = packed.resolve(filename)
+    if member is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    
+    encoding = artifact_encoding(member.name)
+    filename = logical_path(member.name).name
+    if encoding is None:
+        return FileRangeResponse(get_pack_archive().pack_path(packed.pack), member.offset, member.size, filename=filename)
+    
+    if accepts_encoding(request.headers.get("accept-encoding"), encoding):
+        return FileRangeResponse(
+            get_pack_archive().pack_path(packed.pack),
+            member.offset,
+            member.size,
+            filename=filename,
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        )
+    
+    stream = decompress_stream(get_pack_archive().open_member(packed, member.name), encoding)
+    return StreamingResponse(
+        iter_stream_bytes(stream),
+        media_type='application/octet-stream',
+        headers={
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+            "Vary": "Accept-Encoding"
+        }
+    )
+
+async def _load_packed_task_detail(packed: PackedTask) -> Dict[str, Any]:
+    """加载已归档任务的详细信息"""
+    try:
+        metadata = _read_packed_json(packed, "metadata.json") or {}
+        
+        files = []
+        for name, member in sorted(packed.members.items()):
+            if "/" in name:
+                continue
+            file_info = {
+                "name": logical_path(name).name,
+                "size": member.size,
+                "type": _get_file_type(logical_path(name)),
+                "compression": artifact_encoding(name),
+            }
+            
+            # 如果是文本文件，读取内容
+            if file_info["type"] in ["text", "json", "html"]:
+                try:
+                    file_info["content"] = _read_packed_text(packed, name)
+                except Exception:
+                    file_info["content"] = "无法读取文件内容"
+            
+            files.append(file_info)
         
         return {
-            "id": task_info.get("id"),
-            "title": display_title,
-            "platform": platform,
-            "success": file_count > 1,  # 如果有多个文件说明下载成功
-            "files_count": file_count,
-            "content_preview": content_preview,
-            "download_time": download_info.get("timestamp"),
-            "download_dir": str(task_dir),
-            "task_date": task_info.get("date"),
-            "task_url": task_info.get("url"),
-            "page_url": download_info.get("page_url"),
-            "page_title": download_info.get("page_title"),
-            "content_length": download_info.get("content_length", 0)
+            "task": metadata.get("task", {}),
+            "download": metadata.get("download", {}),
+            "files": files,
+            "task_dir": packed.task_dir,
+            "packed": True,
+            "pack": packed.pack
         }
         
     except Exception as e:
-        logger.error(f"加载任务数据失败: {e}")
-        return None
+        logger.error(f"加载归档任务详情失败: {e}")
+        return {"error": str(e)}
+
+def _write_packed_task_to_zip(zipf, packed: PackedTask, prefix: str = "") -> None:
+    """将归档任务的文件写入zip（压缩存储的文件解压后按原文件名写入）"""
+    import shutil
+    archive = get_pack_archive()
+    for name in sorted(packed.members):
+        source = decompress_stream(archive.open_member(packed, name), artifact_encoding(name))
+        with source, zipf.open(f"{prefix}{logical_path(name).as_posix()}", 'w') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
 
 async def _find_task_directory(task_id: str) -> Optional[Path]:
-    """查找任务目录"""
+    """查找任务目录：先按新布局计算路径，再在配置的旧版下载目录中查找"""
     try:
-        # 🔥 扩展搜索范围：包含各平台特定的下载目录
-        search_dirs = [
-            "data/history_downloads",
-            "data/multi_platform_downloads",
-            "data/skywork_history", 
-            "data/skywork_downloads",
-            "data/manus_history",
-            "data/manus_downloads", 
-            "data/coze_space_history_downloads",
-            "data/coze_downloads"
-        ]
+        layout = get_task_layout()
+        task_dir = layout.find(task_id)
+        if task_dir:
+            return task_dir
         
         # 在多平台下载目录中查找
         multi_platform_dir = Path("data/multi_platform_downloads")
-        if multi_platform_dir.exists():
+        if multi_platform_dir in layout.legacy_roots and multi_platform_dir.exists():
             for session_dir in multi_platform_dir.glob("multi_platform_history_*"):
                 for platform_dir in session_dir.iterdir():
                     if platform_dir.is_dir():
@@ -815,9 +1159,8 @@ async def _find_task_directory(task_id: str) -> Optional[Path]:
                         if task_dir.exists():
                             return task_dir
         
-        # 在各平台特定目录中查找
-        for dir_path in search_dirs:
-            base_dir = Path(dir_path)
+        # 在各平台旧版下载目录中查找
+        for base_dir in layout.legacy_roots:
             if base_dir.exists():
                 # 直接查找任务目录
                 task_dir = base_dir / f"task_{task_id}"
@@ -855,16 +1198,18 @@ async def _load_task_detail(task_dir: Path) -> Dict[str, Any]:
         files = []
         for file_path in task_dir.glob('*'):
             if file_path.is_file():
+                # 压缩存储的文件按原文件名展示
                 file_info = {
-                    "name": file_path.name,
+                    "name": logical_path(file_path).name,
                     "size": file_path.stat().st_size,
-                    "type": _get_file_type(file_path),
+                    "type": _get_file_type(logical_path(file_path)),
+                    "compression": artifact_encoding(file_path),
                 }
                 
                 # 如果是文本文件，读取内容
                 if file_info["type"] in ["text", "json", "html"]:
                     try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
+                        with open_artifact(file_path, 'r', encoding='utf-8') as f:
                             content = f.read()
                             file_info["content"] = content
                     except:
@@ -883,6 +1228,24 @@ async def _load_task_detail(task_dir: Path) -> Dict[str, Any]:
         logger.error(f"加载任务详情失败: {e}")
         return {"error": str(e)}
 
+def _create_temp_zip() -> str:
+    """在临时目录中创建空的zip文件，返回路径"""
+    import tempfile
+    temp_dir = Path(settings.storage.temp_dir)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(suffix='.zip', prefix='archive_', dir=temp_dir, delete=False) as tmp_file:
+        return tmp_file.name
+
+def _write_artifact_to_zip(zipf, file_path: Path, arcname: str) -> None:
+    """将任务文件写入zip（压缩存储的文件解压后按原文件名写入）"""
+    if artifact_encoding(file_path) is None:
+        zipf.write(file_path, arcname)
+        return
+    
+    import shutil
+    with open_artifact(file_path, 'rb') as source, zipf.open(str(logical_path(arcname)), 'w') as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
 def _get_file_type(file_path: Path) -> str:
     """根据文件扩展名确定文件类型"""
     suffix = file_path.suffix.lower()
@@ -915,30 +1278,12 @@ async def _load_tasks_from_download_report(report_path: Path, platform: str) ->
         results = report_data.get("results", [])
         download_time = report_data.get("download_time", "")
         
-        # 用于扣子空间智能去重的集合
-        seen_smart_cores = set()
-        
         for result in results:
             try:
                 # 基本任务信息
                 task_id = result.get("task_id", "")
                 title = result.get("title", "未知任务")
                 
-                # 🔥 扣子空间专用智能去重
-                if platform == "coze_space":
-                    smart_core = _extract_coze_smart_core(title)
-                    if smart_core in seen_smart_cores:
-                        logger.debug(f"跳过重复任务: {title[:60]}...")
-                        continue
-                    seen_smart_cores.add(smart_core)
-                else:
-                    # 其他平台的原有去重逻辑
-                    clean_title = _clean_task_title_for_dedup(title)
-                    if clean_title in seen_smart_cores:
-                        logger.debug(f"跳过重复任务: {title}")
-                        continue
-                    seen_smart_cores.add(clean_title)
-                
                 # 🔥 对扣子空间的标题进行智能清理
                 display_title = title
                 if platform == "coze_space":
@@ -968,30 +1313,17 @@ async def _load_tasks_from_download_report(report_path: Path, platform: str) ->
                         if metadata_file.exists():
                             try:
                                 with open(metadata_file, 'r', encoding='utf-8') as f:
-                                    metadata = json.load(f)
-                                    
-                                # 支持新的标准化格式
-                                if "task" in metadata:
-                                    task_info = metadata["task"]
-                                    download_info = metadata.get("download", {})
-                                    
-                                    task_data.update({
-                                        "task_url": task_info.get("url", ""),
-                                        "task_date": task_info.get("date", ""),
-                                        "page_title": task_info.get("title", task_data["title"]),
-                                        "page_url": task_info.get("url", ""),
-                                        "content_length": len(task_info.get("preview", "")),
-                                        "timestamp": download_info.get("timestamp", download_time)
-                                    })
-                                else:
-                                    # 兼容旧格式
-                                    task_data.update({
-                                        "task_url": metadata.get("url", ""),
-                                        "page_title": metadata.get("title", task_data["title"]),
-                                        "page_url": metadata.get("url", ""),
-                                        "content_length": len(metadata.get("preview", "")),
-                                        "timestamp": metadata.get("timestamp", download_time)
-                                    })
+                                    metadata = normalize_metadata(json.load(f), task_id, platform)
+                                
+                                task_info = metadata["task"]
+                                task_data.update({
+                                    "task_url": task_info.get("url", ""),
+                                    "task_date": task_info.get("date", ""),
+                                    "page_title": task_info.get("title") or task_data["title"],
+                                    "page_url": task_info.get("url", ""),
+                                    "content_length": len(task_info.get("preview", "")),
+                                    "timestamp": metadata["download"].get("timestamp") or download_time
+                                })
                                     
                             except Exception as e:
                                 logger.warning(f"读取metadata失败: {e}")
@@ -1004,102 +1336,187 @@ async def _load_tasks_from_download_report(report_path: Path, platform: str) ->
                 logger.warning(f"解析任务结果失败: {e}")
                 continue
         
-        logger.info(f"从下载报告加载了 {len(tasks)} 个有效任务（去重后）")
+        logger.info(f"从下载报告加载了 {len(tasks)} 个有效任务")
         return tasks
         
     except Exception as e:
         logger.error(f"读取下载报告失败: {e}")
         return []
 
+async def _collect_history_tasks(platform: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    """扫描各下载目录，收集历史任务（未去重）"""
+    history_tasks = []
+    layout = get_task_layout()
+    
+    # 新布局：按平台目录直接遍历任务目录
+    layout_task_ids = set()
+    for platform_name, task_dir in layout.iter_task_dirs(platform):
+        task_data = await _load_task_data(task_dir, platform_name)
+        if task_data:
+            layout_task_ids.add(task_data.get("id"))
+            if status and task_data.get("success") != (status == "success"):
+                continue
+            history_tasks.append(task_data)
+    
+    # 以下为旧版下载目录，只扫描仍在配置中的目录（迁移完成后可从配置中移除）
+    legacy_roots = set(layout.legacy_roots)
+    base_download_dir = Path("data/history_downloads")
+    multi_platform_dir = Path("data/multi_platform_downloads")
+    
+    # 🔥 新增：扫描各平台特定的下载目录
+    platform_specific_dirs = {
+        "skywork": ["data/skywork_history", "data/skywork_downloads"],
+        "manus": ["data/manus_history", "data/manus_downloads"],
+        "coze_space": ["data/coze_space_history_downloads", "data/coze_downloads"]
+    }
+    
+    # 扫描多平台下载目录
+    if multi_platform_dir in legacy_roots and multi_platform_dir.exists():
+        for session_dir in multi_platform_dir.glob("multi_platform_history_*"):
+            for platform_dir in session_dir.iterdir():
+                if platform_dir.is_dir():
+                    # 扫描平台目录下的所有任务目录
+                    for task_dir in platform_dir.glob("task_*"):
+                        if task_dir.is_dir():
+                            task_data = await _load_task_data(task_dir, platform_dir.name)
+                            if task_data:
+                                # 应用状态过滤
+                                if status and task_data.get("success") != (status == "success"):
+                                    continue
+                                history_tasks.append(task_data)
+    
+    # 🔥 扫描各平台特定的下载目录
+    for platform_name, dirs in platform_specific_dirs.items():
+        # 如果指定了平台过滤，跳过其他平台
+        if platform and platform != platform_name:
+            continue
+        
+        for dir_path in dirs:
+            platform_dir = Path(dir_path)
+            if platform_dir in legacy_roots and platform_dir.exists():
+                # 扫描下载会话目录（如 quick_xxx, batch_xxx 等）
+                for session_dir in platform_dir.iterdir():
+                    if session_dir.is_dir():
+                        # 检查是否是下载报告文件所在目录
+                        download_report = session_dir / "download_report.json"
+                        if download_report.exists():
+                            # 从下载报告中加载任务
+                            tasks_from_report = await _load_tasks_from_download_report(download_report, platform_name)
+                            for task_data in tasks_from_report:
+                                # 任务目录已在新布局中时以新布局为准
+                                if task_data.get("id") in layout_task_ids:
+                                    continue
+                                if status and task_data.get("success") != (status == "success"):
+                                    continue
+                                history_tasks.append(task_data)
+                        else:
+                            # 直接扫描任务目录
+                            for task_dir in session_dir.glob("task_*"):
+                                if task_dir.is_dir():
+                                    task_data = await _load_task_data(task_dir, platform_name)
+                                    if task_data:
+                                        if status and task_data.get("success") != (status == "success"):
+                                            continue
+                                        history_tasks.append(task_data)
+    
+    # 单平台下载目录
+    if base_download_dir in legacy_roots and base_download_dir.exists():
+        for task_dir in base_download_dir.glob("task_*"):
+            if task_dir.is_dir():
+                # 🔥 修复：从metadata中读取正确的平台信息
+                detected_platform = await _detect_platform_from_metadata(task_dir)
+                task_data = await _load_task_data(task_dir, detected_platform)
+                if task_data:
+                    if platform and task_data.get("platform") != platform:
+                        continue
+                    if status and task_data.get("success") != (status == "success"):
+                        continue
+                    history_tasks.append(task_data)
+    
+    # 已归档的任务（从归档索引和打包文件中读取，不扫描目录）
+    try:
+        packed_tasks = get_pack_archive().list_tasks(platform)
+    except Exception as e:
+        logger.error(f"读取归档任务失败: {e}")
+        packed_tasks = []
+    for packed in packed_tasks:
+        task_data = await _load_packed_task_data(packed)
+        if task_data:
+            if status and task_data.get("success") != (status == "success"):
+                continue
+            history_tasks.append(task_data)
+    
+    return history_tasks
+
 def _deduplicate_tasks(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """去除重复任务"""
+    """去除重复任务：先按任务ID/页面URL精确去重，再合并近似重复索引判定为重复的任务"""
     if not tasks:
         return tasks
     
-    # 用于跟踪已见过的任务
+    # 精确去重
     seen_tasks = {}
     deduplicated = []
     
     for task in tasks:
-        # 生成去重键
         dedup_key = _generate_dedup_key(task)
         
-        if dedup_key not in seen_tasks:
-            # 这是一个新任务
-            seen_tasks[dedup_key] = task
+        if dedup_key is None or dedup_key not in seen_tasks:
+            if dedup_key is not None:
+                seen_tasks[dedup_key] = len(deduplicated)
             deduplicated.append(task)
         else:
             # 这是重复任务，选择更好的版本
-            existing_task = seen_tasks[dedup_key]
-            better_task = _choose_better_task(existing_task, task)
-            
-            if better_task != existing_task:
-                # 替换为更好的任务
-                seen_tasks[dedup_key] = better_task
-                # 在列表中找到并替换
-                for i, t in enumerate(deduplicated):
-                    if t == existing_task:
-                        deduplicated[i] = better_task
-                        break
-    
-    return deduplicated
-
-def _generate_dedup_key(task: Dict[str, Any]) -> str:
-    """生成任务去重键（增强版）"""
-    platform = task.get("platform", "unknown")
-    task_id = task.get("id", "")
-    title = task.get("title", "").strip()
-    download_time = task.get("download_time", "")
-    
-    # 🔥 扣子空间专用的强化去重逻辑
-    if platform == "coze_space":
-        return _generate_coze_dedup_key(task)
-    
-    # 其他平台的原有逻辑
-    # 1. 基于任务ID进行去重（最精确的标识）
-    if task_id and task_id.strip() and not _is_auto_generated_id(task_id, platform):
-        return f"{platform}:id:{task_id}"
-    
-    # 2. 基于页面URL进行去重
-    page_url = task.get("page_url", "")
-    if page_url and page_url not in ["https://manus.im/app", "https://space.coze.cn/", ""]:
-        return f"{platform}:url:{page_url}"
-    
-    # 3. 基于标题进行去重
-    clean_title = _clean_title_for_dedup(title)
-    if clean_title and len(clean_title) >= 5:
-        time_part = download_time[:16] if download_time else "no_time"
-        return f"{platform}:title:{clean_title}:time:{time_part}"
-    
-    # 4. 最后备用方案
-    content_length = task.get("content_length", 0)
-    time_part = download_time[:16] if download_time else "no_time"
-    return f"{platform}:fallback:{title[:20]}:length:{content_length}:time:{time_part}"
-
-def _generate_coze_dedup_key(task: Dict[str, Any]) -> str:
-    """扣子空间专用去重键生成"""
-    title = task.get("title", "").strip()
-    task_id = task.get("id", "")
-    content_preview = task.get("content_preview", "")
-    
-    # 🔥 智能标题清理：处理超长标题和多任务合并的情况
-    clean_core = _extract_coze_smart_core(title)
-    
-    # 🔥 使用内容特征辅助去重
-    content_hash = ""
-    if content_preview and len(content_preview) > 20:
-        import hashlib
-        content_hash = hashlib.md5(content_preview.encode('utf-8')).hexdigest()[:8]
-    
-    # 🔥 组合去重键：核心标题 + 内容哈希
-    if clean_core and content_hash:
-        return f"coze_space:smart:{clean_core}:{content_hash}"
-    elif clean_core:
-        return f"coze_space:smart:{clean_core}"
-    else:
-        # 备用方案
-        session_id = _extract_session_id_from_task_id(task_id)
-        return f"coze_space:fallback:{title[:30]}:session:{session_id}"
+            position = seen_tasks[dedup_key]
+            deduplicated[position] = _choose_better_task(deduplicated[position], task)
+    
+    # 近似重复：标题与正文相近的任务归为一组，每组保留最好的版本
+    index = get_duplicate_index()
+    best_tasks: Dict[str, Dict[str, Any]] = {}
+    for task in deduplicated:
+        key = _index_task(index, task)
+        best_tasks[key] = _choose_better_task(best_tasks[key], task) if key in best_tasks else task
+    
+    cluster_of = {}
+    for cluster in index.clusters(best_tasks):
+        for key in cluster:
+            cluster_of[key] = cluster[0]
+    
+    result = {}
+    for key, task in best_tasks.items():
+        group = cluster_of.get(key, key)
+        result[group] = _choose_better_task(result[group], task) if group in result else task
+    
+    return list(result.values())
+
+def _generate_dedup_key(task: Dict[str, Any]) -> Optional[str]:
+    """生成任务精确去重键（任务ID或页面URL），没有可靠标识时返回 None"""
+    return task_identity(task.get("platform", "unknown"), task.get("id", ""), task.get("page_url", ""))
+
+def _cluster_tasks(
+    index: DuplicateIndex,
+    tasks: List[Dict[str, Any]]
+) -> Tuple[Dict[str, Dict[str, Any]], List[List[str]]]:
+    """将任务加入近似重复索引并分组，返回索引键到任务的映射和重复分组"""
+    tasks_by_key: Dict[str, Dict[str, Any]] = {}
+    for task in tasks:
+        tasks_by_key.setdefault(_index_task(index, task), task)
+    return tasks_by_key, index.clusters(tasks_by_key)
+
+def _index_task(index: DuplicateIndex, task: Dict[str, Any]) -> str:
+    """将任务加入近似重复索引（标题和正文未变化时复用已有签名），返回索引键"""
+    task_dir = task.get("download_dir") or ""
+    key = task_dir or f"{task.get('platform')}:{task.get('id')}:{task.get('title')}"
+    content_file = resolve_artifact(Path(task_dir) / "content.txt") if task_dir else None
+    content_mtime = content_file.stat().st_mtime_ns if content_file else 0
+    version = (task.get("title", ""), content_mtime)
+    
+    if not index.is_current(key, version):
+        content = ""
+        if content_mtime:
+            with open_artifact(content_file, 'r', encoding='utf-8', errors='ignore') as f:
+                content = strip_content_header(f.read(index.max_content_chars + 1000))
+        index.add(key, task.get("title", ""), content, group=task.get("platform", ""), version=version)
+    return key
 
 def _extract_coze_smart_core(title: str) -> str:
     """智能提取扣子空间标题核心"""
@@ -1261,34 +1678,6 @@ def _clean_coze_title_core(title: str) -> str:
     
     return clean
 
-def _is_auto_generated_id(task_id: str, platform: str) -> bool:
-    """检查任务ID是否是自动生成的索引"""
-    if platform == "coze_space":
-        # 扣子空间的ID格式: coze_space_history_N_timestamp
-        import re
-        pattern = r"coze_space_history_\d+_\d+"
-        return bool(re.match(pattern, task_id))
-    return False
-
-def _clean_task_title_for_dedup(title: str) -> str:
-    """清理任务标题用于去重比较"""
-    if not title:
-        return ""
-    
-    # 移除状态关键词
-    status_words = ["一轮任务完成", "任务已结束", "任务已完成", "下载失败"]
-    clean = title
-    for word in status_words:
-        clean = clean.replace(word, "")
-    
-    # 移除时间前缀
-    time_prefixes = ["过去7天", "过去30天", "过往", "新任务"]
-    for prefix in time_prefixes:
-        clean = clean.replace(prefix, "")
-    
-    # 清理空格并转换为小写
-    return " ".join(clean.split()).strip().lower()
-
 def _is_invalid_task_title(title: str) -> bool:
     """检查任务标题是否无效"""
     if not title or title.strip() == "":
@@ -1300,15 +1689,6 @@ def _is_invalid_task_title(title: str) -> bool:
     
     return any(pattern in clean_title for pattern in status_only_patterns)
 
-def _extract_session_id_from_task_id(task_id: str) -> str:
-    """从任务ID中提取会话ID"""
-    if "_" in task_id:
-        # 对于格式如 coze_space_history_0_1748783734，提取最后的时间戳部分
-        parts = task_id.split("_")
-        if len(parts) >= 2:
-            return parts[-1]  # 返回时间戳部分
-    return "unknown"
-
 def _extract_coze_core_content(title: str) -> str:
     """提取扣子空间标题的核心内容"""
     if not title:
@@ -1351,77 +1731,6 @@ def _extract_coze_core_content(title: str) -> str:
     # 如果找不到有意义的部分，返回前30个字符
     return content[:30].strip()
 
-def _clean_title_for_dedup(title: str) -> str:
-    """清理标题用于去重"""
-    if not title:
-        return ""
-    
-    # 检查是否是通用问候语或无意义标题
-    greeting_patterns = [
-        "你好，",
-        "您好，", 
-        "我能为你做什么",
-        "我能为您做什么",
-        "有什么可以帮助",
-        "请问需要什么帮助",
-        "感谢您使用"
-    ]
-    
-    for pattern in greeting_patterns:
-        if pattern in title:
-            return ""  # 返回空字符串，表示这是无效标题
-    
-    # 移除常见的AI回复前缀
-    prefixes_to_remove = [
-        "我已完成对",
-        "我已为您",
-        "感谢您的反馈！",
-        "你好，",
-        "您好，",
-        "我明白了，"
-    ]
-    
-    clean_title = title
-    for prefix in prefixes_to_remove:
-        if clean_title.startswith(prefix):
-            # 尝试提取真正的主题
-            remaining = clean_title[len(prefix):].strip()
-            
-            # 查找核心主题的结束点
-            end_patterns = [
-                "的全面分析",
-                "的详细分析", 
-                "的分析报告",
-                "的研究报告",
-                "分析报告",
-                "功能特点",
-                "最新版本",
-                "。",
-                "，"
-            ]
-            
-            for pattern in end_patterns:
-                if pattern in remaining:
-                    pattern_index = remaining.find(pattern)
-                    if 0 < pattern_index < 50:  # 合理的长度范围
-                        clean_title = remaining[:pattern_index].strip()
-                        break
-            else:
-                # 如果没找到结束模式，取前30个字符
-                clean_title = remaining[:30].strip()
-            break
-    
-    # 进一步清理标题
-    clean_title = clean_title.strip("，。！？、 ")
-    
-    # 移除版本号和时间信息的影响
-    import re
-    clean_title = re.sub(r'\s+R\d+.*$', '', clean_title)  # 移除 R1, R2 等版本号
-    clean_title = re.sub(r'\s+\d{4}年.*$', '', clean_title)  # 移除年份信息
-    clean_title = re.sub(r'\s+最新.*$', '', clean_title)  # 移除"最新"相关后缀
-    
-    return clean_title.strip()
-
 def _choose_better_task(task1: Dict[str, Any], task2: Dict[str, Any]) -> Dict[str, Any]:
     """在两个重复任务中选择更好的一个"""
     
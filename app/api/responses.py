@@ -0,0 +1,65 @@
+"""
+自定义响应
+"""
+
+from pathlib import Path
+from typing import Mapping, Optional, Union
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+
+class FileRangeResponse(Response):
+    """返回文件中的一段字节（如归档包内的单个文件）
+
+    ASGI 服务器支持 http.response.zerocopysend 扩展时交给服务器用 sendfile 零拷贝发送，
+    否则按偏移分块读取发送。
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        offset: int,
+        size: int,
+        filename: Optional[str] = None,
+        media_type: str = "application/octet-stream",
+        headers: Optional[Mapping[str, str]] = None
+    ):
+        self.path = Path(path)
+        self.offset = offset
+        self.size = size
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(size)
+        if filename is not None:
+            self.headers.setdefault("content-disposition", f"attachment; filename*=utf-8''{quote(filename)}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.size,
+                    "more_body": False
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.size
+            while True:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                more_body = remaining > 0 and len(chunk) > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    break
@@ -26,6 +26,9 @@ class SchedulerSettings(BaseSettings):
     """调度器配置"""
     timezone: str = Field(default="Asia/Shanghai", description="时区")
     max_workers: int = Field(default=5, description="最大工作线程数")
+    task_cache_size: int = Field(default=200, description="内存中保留的已完成任务数量")
+    resume_on_startup: bool = Field(default=True, description="启动时继续执行中断和未完成的任务")
+    task_lease_ttl: float = Field(default=300.0, description="任务租约有效期(秒)，执行进程异常退出后租约过期的任务才会被恢复")
     default_schedule: str = Field(default="0 9 * * *", description="默认调度表达式")
     job_defaults: Dict[str, Any] = Field(
         default={
@@ -85,11 +88,64 @@ class PlatformSettings(BaseSettings):
     default_timeout: int = Field(default=60, description="默认超时时间(秒)")
     max_retries: int = Field(default=3, description="最大重试次数")
     retry_delay: int = Field(default=5, description="重试延迟(秒)")
+    max_concurrent_tasks: int = Field(default=1, description="单个平台默认并发任务数(浏览器标签页数)")
+    status_poll_interval: int = Field(default=10, description="不支持页面事件时的状态轮询间隔(秒)")
+    status_fallback_interval: int = Field(default=60, description="页面事件监听时的兜底轮询间隔(秒)")
+    
+    # 平台路由与熔断
+    metrics_file: str = Field(default="data/capability_metrics.json", description="平台能力指标持久化文件")
+    circuit_error_threshold: float = Field(default=0.5, description="触发熔断的近期错误率")
+    circuit_min_samples: int = Field(default=5, description="熔断判定的最少样本数")
+    circuit_cooldown: int = Field(default=300, description="熔断冷却时间(秒)")
     
     # 平台配置文件路径
     config_file: str = Field(default="configs/platforms.yaml", description="平台配置文件")
 
 
+class StorageSettings(BaseSettings):
+    """任务产物存储配置"""
+    task_roots: List[str] = Field(
+        default=["data/tasks"],
+        description="任务目录根（data/tasks/<平台>/<分片>/<任务ID>，新任务写入第一个）"
+    )
+    legacy_task_roots: List[str] = Field(
+        default=[
+            "data/history_downloads",
+            "data/multi_platform_downloads",
+            "data/skywork_history",
+            "data/skywork_downloads",
+            "data/manus_history",
+            "data/manus_downloads",
+            "data/coze_space_history_downloads",
+            "data/coze_downloads"
+        ],
+        description="旧版下载目录（迁移前仍会扫描，迁移完成后可清空）"
+    )
+    blob_store_enabled: bool = Field(default=True, description="任务产物是否写入内容寻址存储(跨会话去重)")
+    blob_dir: str = Field(default="data/blobs", description="内容寻址存储目录")
+    blob_min_size: int = Field(default=1024, description="写入内容寻址存储的最小文件大小(字节)")
+    compression_enabled: bool = Field(default=False, description="是否压缩存储页面HTML和文本类产物")
+    compression_codec: str = Field(default="zstd", description="压缩算法(zstd/gzip，未安装 zstandard 时使用 gzip)")
+    compression_level: int = Field(default=3, description="压缩级别")
+    compression_min_size: int = Field(default=4096, description="压缩的最小文件大小(字节)")
+    archive_enabled: bool = Field(default=False, description="是否定期归档长期未修改的任务目录")
+    archive_dir: str = Field(default="data/packs", description="任务归档打包文件目录")
+    archive_after_days: int = Field(default=90, description="任务目录超过多少天未修改后归档")
+    archive_schedule: str = Field(default="30 3 * * *", description="归档作业的调度表达式")
+    archive_compact_ratio: float = Field(default=0.5, description="打包文件中仍被引用的数据低于该比例时重写压缩")
+    temp_dir: str = Field(default="data/temp", description="临时文件目录（截图、打包下载的 zip 等）")
+    retention_enabled: bool = Field(default=False, description="是否定时执行数据保留策略")
+    retention_schedule: str = Field(default="0 4 * * *", description="数据保留作业的调度表达式")
+    retention_dry_run: bool = Field(default=True, description="定时作业只生成清理报告，不删除文件")
+    retention_policies: List[Dict[str, Any]] = Field(
+        default=[
+            {"artifact_type": "temp", "max_age_days": 1}
+        ],
+        description="保留策略（artifact_type/platform/max_age_days/max_bytes/keep_latest），"
+                    "产物类型: temp/task/screenshot/html/download/summary"
+    )
+
+
 class ModelSettings(BaseSettings):
     """大模型配置"""
     
@@ -114,12 +170,65 @@ class ModelSettings(BaseSettings):
     # Anthropic 配置 (备用)
     anthropic_api_key: str = ""
     anthropic_model: str = "claude-3-5-sonnet-20241022"
+    anthropic_base_url: str = "https://api.anthropic.com"
     
     # 通用配置
     max_tokens: int = 4000
     temperature: float = 0.7
     timeout: int = 30
     
+    # HTTP 连接池配置（每个提供商一个长连接会话）
+    http_pool_limit: int = 20               # 连接池总连接数
+    http_pool_limit_per_host: int = 10      # 单主机连接数
+    http_dns_cache_ttl: int = 300           # DNS 缓存时间(秒)
+    http_keepalive_timeout: int = 60        # 空闲连接保活时间(秒)
+    http_connect_timeout: int = 10          # 建立连接超时(秒)
+    
+    # 响应缓存配置
+    cache_enabled: bool = True
+    cache_dir: str = "data/model_cache"
+    cache_ttl: int = 7 * 24 * 3600          # 缓存有效期(秒)
+    cache_memory_entries: int = 256         # 内存缓存条目数
+    cache_max_disk_mb: int = 200            # 磁盘缓存上限(MB)
+    
+    # 限流与重试配置（按提供商，未单独配置时使用通用值）
+    max_concurrent_requests: int = 4        # 每个提供商的并发请求数
+    tokens_per_minute: int = 0              # 每分钟 token 预算(0 表示不限制)
+    gemini_max_concurrency: int = 4
+    gemini_tokens_per_minute: int = 1000000
+    deepseek_max_concurrency: int = 8
+    deepseek_tokens_per_minute: int = 0
+    max_retries: int = 3
+    retry_base_delay: float = 1.0           # 退避基础时间(秒)
+    retry_max_delay: float = 30.0           # 退避最长时间(秒)
+    file_analysis_concurrency: int = 0      # 同时分析的任务文件数(0 表示与 max_concurrent_requests 相同)
+    
+    # 长文本分段总结配置
+    summary_chunk_tokens: int = 3000        # 单次请求的文本预算(token)
+    summary_chunk_output_tokens: int = 500  # 每个分段摘要的最大输出(token)
+    summary_token_budget: int = 16000       # 单个任务文件分析的token预算(0 表示不限制)
+    summary_backfill_workers: int = 2       # 批量补全总结时并发处理的任务数
+    summary_job_concurrency: int = 2        # 同时运行的总结生成作业数
+    
+    # 故障转移与对冲请求配置（未指定提供商的调用在已配置密钥的提供商间切换）
+    failover_enabled: bool = True
+    failover_providers: List[str] = ["gemini", "deepseek", "openai", "anthropic"]
+    hedge_enabled: bool = True
+    hedge_percentile: float = 0.95          # 对冲延迟取该分位数的历史延迟
+    hedge_min_delay: float = 2.0            # 对冲延迟下限(秒)
+    hedge_default_delay: float = 10.0       # 样本不足时的对冲延迟(秒)
+    hedge_min_samples: int = 20             # 使用历史延迟所需的最少样本数
+    
+    # 图片预处理配置（多模态分析前缩放、切片并重新编码）
+    image_preprocess_enabled: bool = True
+    image_format: str = "webp"              # 重新编码格式: webp / jpeg
+    image_quality: int = 80
+    image_max_tiles: int = 6                # 长截图最多切分的段数
+    image_cache_dir: str = "data/image_cache"
+    image_cache_max_mb: int = 500           # 图片缓存上限(MB)
+    image_cache_ttl: int = 30 * 24 * 3600   # 图片缓存未被使用的最长保留时间(秒)
+    image_process_workers: int = 2          # 图片处理进程数
+    
     class Config:
         env_prefix = "MODEL_"
 
@@ -135,6 +244,7 @@ class Settings(BaseSettings):
     security: SecuritySettings = Field(default_factory=SecuritySettings)
     notification: NotificationSettings = Field(default_factory=NotificationSettings)
     platform: PlatformSettings = Field(default_factory=PlatformSettings)
+    storage: StorageSettings = Field(default_factory=StorageSettings)
     
     class Config:
         env_file = ".env"
@@ -6,12 +6,17 @@ AI文件处理器
 import asyncio
 import json
 import time
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 
-from app.core.model_client import get_model_client, ModelResponse
+from app.core.file_analysis_cache import FileAnalysisCache
+from app.core.file_triage import FileTriage, HTML_PROMPT_CHARS
+from app.core.model_client import get_model_client, merge_usage, ModelResponse
+from app.core.text_chunker import strip_content_header
 from app.core.logger import get_logger
+from app.storage.compression import artifact_size, logical_path, open_artifact
+from app.utils.html_text import extract_text_from_file_async
 
 
 @dataclass
@@ -29,6 +34,7 @@ class FileAnalysisResult:
     raw_content: Optional[str] = None
     error: Optional[str] = None
     ai_usage: Optional[Dict[str, int]] = None
+    cached: bool = False
 
 
 @dataclass
@@ -45,6 +51,7 @@ class TaskAnalysisResult:
     ai_recommendations: List[str]
     total_ai_usage: Dict[str, int]
     processing_time: float
+    skipped_files: List[Dict[str, str]] = field(default_factory=list)
 
 
 class AIFileProcessor:
@@ -61,17 +68,35 @@ class AIFileProcessor:
         
     async def analyze_task_files(self, task_dir: Path, task_title: str = "") -> TaskAnalysisResult:
         """分析任务目录中的所有文件"""
+        result = None
+        async for event in self.stream_task_analysis(task_dir, task_title, stream_overall=False):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+    
+    async def stream_task_analysis(
+        self,
+        task_dir: Path,
+        task_title: str = "",
+        stream_overall: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """分析任务文件并逐步产出进度事件
+        
+        事件类型：
+            file: 单个文件分析完成
+            delta: 整体总结的增量文本（stream_overall=True 时）
+            result: 最终的 TaskAnalysisResult
+        """
         start_time = time.time()
         
         try:
             self.logger.info(f"开始AI分析任务文件: {task_dir}")
             
-            # 扫描文件
-            files = list(task_dir.glob('*'))
-            files = [f for f in files if f.is_file()]
+            # 扫描文件（压缩存储的文件按原文件名处理，读取时透明解压）
+            files = sorted({logical_path(f) for f in task_dir.glob('*') if f.is_file()})
             
             if not files:
-                return TaskAnalysisResult(
+                yield {"event": "result", "data": TaskAnalysisResult(
                     task_id=task_dir.name,
                     task_title=task_title,
                     analysis_success=False,
@@ -83,41 +108,86 @@ class AIFileProcessor:
                     ai_recommendations=["任务似乎未完成或数据丢失"],
                     total_ai_usage={"total_tokens": 0},
                     processing_time=time.time() - start_time
-                )
-            
-            # 分析每个文件
-            file_analyses = []
-            total_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                )}
+                return
+            
+            # 分诊：跳过系统生成与重复的文件，按信息量和token预算选择需要模型分析的文件
+            # （已有分析结果的文件不计入预算）
+            analysis_cache = FileAnalysisCache(task_dir, self._analysis_model())
+            triage = await asyncio.to_thread(self._create_triage().triage, files, analysis_cache.hashes())
+            for decision in triage.skipped:
+                self.logger.info(f"跳过文件 {decision.path.name}: {decision.reason}")
+            local_files = {decision.path for decision in triage.local}
+            content_hashes = {decision.path: decision.content_hash for decision in triage.analyze}
+            files = sorted((decision.path for decision in triage.analyze + triage.local), key=lambda f: f.name)
+            
+            # 并发分析各文件（实际模型调用另受各提供商限流器约束）
+            file_analyses: List[Optional[FileAnalysisResult]] = [None] * len(files)
+            semaphore = asyncio.Semaphore(self._file_concurrency())
+            
+            async def analyze(index: int, file_path: Path):
+                if file_path in local_files:
+                    return index, await self._analyze_locally(file_path)
+                
+                # 内容未变化的文件复用上次的分析结果
+                content_hash = content_hashes[file_path]
+                cached = analysis_cache.get(file_path.name, content_hash)
+                if cached is not None:
+                    analysis = FileAnalysisResult(**{**cached, "file_path": str(file_path), "cached": True})
+                else:
+                    async with semaphore:
+                        analysis = await self._analyze_file_safely(file_path)
+                
+                if analysis.analysis_success:
+                    analysis_cache.put(file_path.name, content_hash, {**asdict(analysis), "cached": False})
+                return index, analysis
+            
+            tasks = [asyncio.create_task(analyze(index, file_path)) for index, file_path in enumerate(files)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    index, analysis = await next_done
+                    file_analyses[index] = analysis
+                    yield {"event": "file", "data": {
+                        "filename": files[index].name,
+                        "file_type": analysis.file_type,
+                        "success": analysis.analysis_success,
+                        "summary": analysis.summary,
+                        "cached": analysis.cached
+                    }}
+            finally:
+                # 调用方中途放弃（如SSE断开）时取消未完成的分析
+                for task in tasks:
+                    task.cancel()
+            
+            await asyncio.to_thread(analysis_cache.save)
+            reused = sum(1 for analysis in file_analyses if analysis.cached)
+            if reused:
+                self.logger.info(f"复用 {reused} 个未变化文件的分析结果")
+            
+            # 按文件顺序累积本次实际消耗的AI使用统计，结果与完成顺序无关
+            total_usage = merge_usage(*(analysis.ai_usage for analysis in file_analyses if not analysis.cached))
             
-            for file_path in files:
+            # 生成整体分析
+            successful_analyses = [a for a in file_analyses if a.analysis_success]
+            if stream_overall and successful_analyses:
+                prompt = self._build_overall_prompt(task_title, successful_analyses)
+                parts = []
+                overall_usage: Dict[str, int] = {}
                 try:
-                    analysis = await self.analyze_single_file(file_path)
-                    file_analyses.append(analysis)
-                    
-                    # 累积AI使用统计
-                    if analysis.ai_usage:
-                        for key, value in analysis.ai_usage.items():
-                            if key in total_usage:
-                                total_usage[key] += value
-                    
+                    async for delta in self.model_client.stream_chat_completion([
+                        {"role": "user", "content": prompt}
+                    ], max_tokens=800, on_usage=overall_usage.update):
+                        parts.append(delta)
+                        yield {"event": "delta", "data": {"text": delta}}
+                    total_usage = merge_usage(total_usage, overall_usage)
+                    overall_analysis = self._parse_overall_analysis_response("".join(parts))
                 except Exception as e:
-                    self.logger.warning(f"分析文件失败 {file_path}: {e}")
-                    file_analyses.append(FileAnalysisResult(
-                        file_path=str(file_path),
-                        file_type=self._get_file_type(file_path),
-                        analysis_success=False,
-                        summary=f"文件分析失败: {e}",
-                        key_points=[],
-                        content_type="unknown",
-                        importance_score=0.0,
-                        ai_preview="分析失败",
-                        error=str(e)
-                    ))
-            
-            # 生成整体分析
-            overall_analysis = await self._generate_overall_analysis(
-                task_title, file_analyses, total_usage
-            )
+                    self.logger.error(f"生成整体分析失败: {e}")
+                    overall_analysis = self._overall_analysis_failure(e)
+            else:
+                overall_analysis = await self._generate_overall_analysis(
+                    task_title, file_analyses, total_usage
+                )
             
             processing_time = time.time() - start_time
             
@@ -125,7 +195,7 @@ class AIFileProcessor:
             result = TaskAnalysisResult(
                 task_id=task_dir.name,
                 task_title=task_title,
-                analysis_success=len([a for a in file_analyses if a.analysis_success]) > 0,
+                analysis_success=len(successful_analyses) > 0,
                 overall_summary=overall_analysis["summary"],
                 file_analyses=file_analyses,
                 key_insights=overall_analysis["insights"],
@@ -133,15 +203,16 @@ class AIFileProcessor:
                 content_quality_score=overall_analysis["quality_score"],
                 ai_recommendations=overall_analysis["recommendations"],
                 total_ai_usage=total_usage,
-                processing_time=processing_time
+                processing_time=processing_time,
+                skipped_files=triage.skipped_files()
             )
             
             self.logger.info(f"任务文件AI分析完成，耗时 {processing_time:.2f}秒")
-            return result
+            yield {"event": "result", "data": result}
             
         except Exception as e:
             self.logger.error(f"任务文件分析失败: {e}")
-            return TaskAnalysisResult(
+            yield {"event": "result", "data": TaskAnalysisResult(
                 task_id=task_dir.name,
                 task_title=task_title,
                 analysis_success=False,
@@ -153,6 +224,44 @@ class AIFileProcessor:
                 ai_recommendations=[],
                 total_ai_usage={"total_tokens": 0},
                 processing_time=time.time() - start_time
+            )}
+    
+    def _create_triage(self) -> FileTriage:
+        """创建文件分诊器"""
+        model_settings = self.model_client.settings.model
+        return FileTriage(
+            token_budget=model_settings.summary_token_budget,
+            chunk_tokens=model_settings.summary_chunk_tokens,
+            chunk_output_tokens=model_settings.summary_chunk_output_tokens,
+            get_file_type=self._get_file_type
+        )
+    
+    def _analysis_model(self) -> str:
+        """文件分析所用的提供商和模型（分析结果缓存按此区分）"""
+        provider = self.model_client.settings.model.default_provider
+        return f"{provider}/{self.model_client.model_name(provider)}"
+
+    def _file_concurrency(self) -> int:
+        """同时分析的文件数"""
+        model_settings = self.model_client.settings.model
+        return max(1, model_settings.file_analysis_concurrency or model_settings.max_concurrent_requests)
+    
+    async def _analyze_file_safely(self, file_path: Path) -> FileAnalysisResult:
+        """分析单个文件，异常时返回失败结果而不影响其他文件"""
+        try:
+            return await self.analyze_single_file(file_path)
+        except Exception as e:
+            self.logger.warning(f"分析文件失败 {file_path}: {e}")
+            return FileAnalysisResult(
+                file_path=str(file_path),
+                file_type=self._get_file_type(file_path),
+                analysis_success=False,
+                summary=f"文件分析失败: {e}",
+                key_points=[],
+                content_type="unknown",
+                importance_score=0.0,
+                ai_preview="分析失败",
+                error=str(e)
             )
     
     async def analyze_single_file(self, file_path: Path) -> FileAnalysisResult:
@@ -189,9 +298,12 @@ class AIFileProcessor:
         """分析文本文件"""
         try:
             # 读取文件内容
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            with open_artifact(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
             
+            # 去除下载时写入的元信息头部，只分析正文
+            content = strip_content_header(content)
+            
             if not content.strip():
                 return FileAnalysisResult(
                     file_path=str(file_path),
@@ -204,6 +316,10 @@ class AIFileProcessor:
                     ai_preview="文件无内容"
                 )
             
+            # 长文本先分段总结，保证全文都被覆盖
+            condensed = await self.model_client.condense_text(content)
+            content_label = "文件内容" if condensed.content is content else "文件内容（长文档的分段摘要）"
+            
             # 使用AI分析内容
             prompt = f"""
             请分析以下文本文件的内容，这是一个任务执行的结果文件。
@@ -218,13 +334,14 @@ class AIFileProcessor:
             4. 重要度评分（0-1，1为最重要）
             5. 简短预览（50字以内，吸引人的描述）
 
-            文件内容：
-            {content[:4000]}
+            {content_label}：
+            {condensed.content}
             """
             
             response = await self.model_client.chat_completion([
                 {"role": "user", "content": prompt}
             ], max_tokens=800)
+            response.usage = merge_usage(condensed.usage, response.usage)
             
             # 解析AI响应
             analysis_data = self._parse_analysis_response(response.content)
@@ -312,7 +429,7 @@ class AIFileProcessor:
     async def _analyze_json_file(self, file_path: Path) -> FileAnalysisResult:
         """分析JSON文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with open_artifact(file_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
             # 为JSON数据生成摘要
@@ -368,17 +485,14 @@ class AIFileProcessor:
     async def _analyze_html_file(self, file_path: Path) -> FileAnalysisResult:
         """分析HTML文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            # 清理HTML内容
-            cleaned_content = self._clean_html_content(content)
+            # 流式提取正文，只解析到提示词所需的长度
+            cleaned_content = await extract_text_from_file_async(file_path, max_chars=HTML_PROMPT_CHARS)
             
             prompt = f"""
             请分析以下HTML页面内容，这是任务执行过程中保存的网页。
 
             文件名: {file_path.name}
-            清理后内容长度: {len(cleaned_content)} 字符
+            文件大小: {artifact_size(file_path)} 字节
 
             请提供：
             1. 页面内容摘要（120字以内）
@@ -388,7 +502,7 @@ class AIFileProcessor:
             5. 预览描述（40字以内）
 
             页面内容：
-            {cleaned_content[:3000]}
+            {cleaned_content}
             """
             
             response = await self.model_client.chat_completion([
@@ -424,11 +538,44 @@ class AIFileProcessor:
                 error=str(e)
             )
     
+    async def _analyze_locally(self, file_path: Path) -> FileAnalysisResult:
+        """无需模型的文件在本地生成描述"""
+        if file_path.name == "metadata.json":
+            return await self._analyze_metadata_file(file_path)
+        return await self._analyze_generic_file(file_path)
+    
+    async def _analyze_metadata_file(self, file_path: Path) -> FileAnalysisResult:
+        """分析任务元数据文件（不调用模型）"""
+        try:
+            with open_artifact(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            task_info = data.get("task", data) if isinstance(data, dict) else {}
+            key_points = [
+                f"{key}: {value}" for key, value in task_info.items()
+                if isinstance(value, (str, int, float)) and str(value)
+            ][:5]
+            
+            return FileAnalysisResult(
+                file_path=str(file_path),
+                file_type="json",
+                analysis_success=True,
+                summary=f"任务元数据，{self._summarize_json_structure(data)}",
+                key_points=key_points,
+                content_type="元数据",
+                importance_score=0.2,
+                ai_preview="任务元数据",
+                raw_content=json.dumps(data, ensure_ascii=False, indent=2)[:1000]
+            )
+            
+        except Exception:
+            return await self._analyze_generic_file(file_path)
+    
     async def _analyze_generic_file(self, file_path: Path) -> FileAnalysisResult:
         """分析通用文件"""
         try:
             file_type = self._get_file_type(file_path)
-            file_size = file_path.stat().st_size
+            file_size = artifact_size(file_path)
             
             return FileAnalysisResult(
                 file_path=str(file_path),
@@ -474,36 +621,7 @@ class AIFileProcessor:
                     "recommendations": ["重新执行任务", "检查文件完整性"]
                 }
             
-            # 构建分析汇总
-            summaries = [a.summary for a in successful_analyses]
-            all_key_points = []
-            for a in successful_analyses:
-                all_key_points.extend(a.key_points)
-            
-            avg_importance = sum(a.importance_score for a in successful_analyses) / len(successful_analyses)
-            
-            # 生成整体总结
-            prompt = f"""
-            基于以下任务文件的分析结果，生成整体评估：
-
-            任务标题: {task_title}
-            分析的文件数量: {len(successful_analyses)}
-            
-            各文件摘要:
-            {chr(10).join(f"- {s}" for s in summaries[:5])}
-            
-            关键信息点:
-            {chr(10).join(f"• {p}" for p in all_key_points[:10])}
-            
-            平均重要度: {avg_importance:.2f}
-
-            请提供：
-            1. 整体任务完成情况摘要（150字以内）
-            2. 3-5个核心洞察
-            3. 任务完成度评估（完成/部分完成/未完成）
-            4. 内容质量评分（0-1）
-            5. 3个改进建议
-            """
+            prompt = self._build_overall_prompt(task_title, successful_analyses)
             
             response = await self.model_client.chat_completion([
                 {"role": "user", "content": prompt}
@@ -521,13 +639,51 @@ class AIFileProcessor:
             
         except Exception as e:
             self.logger.error(f"生成整体分析失败: {e}")
-            return {
-                "summary": f"整体分析失败: {e}",
-                "insights": ["分析过程出现错误"],
-                "completion": "分析失败",
-                "quality_score": 0.0,
-                "recommendations": ["重新尝试分析", "检查AI服务连接"]
-            }
+            return self._overall_analysis_failure(e)
+    
+    def _build_overall_prompt(self, task_title: str, successful_analyses: List[FileAnalysisResult]) -> str:
+        """构建整体分析提示词"""
+        # 构建分析汇总
+        summaries = [a.summary for a in successful_analyses]
+        all_key_points = []
+        for a in successful_analyses:
+            all_key_points.extend(a.key_points)
+        
+        avg_importance = sum(a.importance_score for a in successful_analyses) / len(successful_analyses)
+        
+        # 生成整体总结
+        return f"""
+        基于以下任务文件的分析结果，生成整体评估：
+
+        任务标题: {task_title}
+        分析的文件数量: {len(successful_analyses)}
+        
+        各文件摘要:
+        {chr(10).join(f"- {s}" for s in summaries[:5])}
+        
+        关键信息点:
+        {chr(10).join(f"• {p}" for p in all_key_points[:10])}
+        
+        平均重要度: {avg_importance:.2f}
+
+        请提供：
+        1. 整体任务完成情况摘要（150字以内）
+        2. 3-5个核心洞察
+        3. 任务完成度评估（完成/部分完成/未完成）
+        4. 内容质量评分（0-1）
+        5. 3个改进建议
+        """
+        
+    
+    def _overall_analysis_failure(self, error: Exception) -> Dict[str, Any]:
+        """整体分析失败时的默认结果"""
+        return {
+            "summary": f"整体分析失败: {error}",
+            "insights": ["分析过程出现错误"],
+            "completion": "分析失败",
+            "quality_score": 0.0,
+            "recommendations": ["重新尝试分析", "检查AI服务连接"]
+        }
     
     def _get_file_type(self, file_path: Path) -> str:
         """获取文件类型"""
@@ -711,22 +867,3 @@ class AIFileProcessor:
                 return f"简单值: {type(data).__name__}"
         except:
             return "复杂数据结构"
-    
-    def _clean_html_content(self, html: str) -> str:
-        """清理HTML内容"""
-        try:
-            import re
-            
-            # 移除script和style标签
-            html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-            html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
-            
-            # 移除HTML标签
-            html = re.sub(r'<[^>]+>', ' ', html)
-            
-            # 清理空白字符
-            html = re.sub(r'\s+', ' ', html)
-            
-            return html.strip()
-        except:
-            return html[:1000] 
\ No newline at end of file
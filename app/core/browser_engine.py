@@ -15,6 +15,12 @@ from playwright.async_api import Page, Locator
 
 from app.core.logger import get_logger
 from app.core.model_client import get_model_client, ModelResponse
+from app.core.readable_content import READABLE_CONTENT_SCRIPT, ReadableContent
+from app.utils.html_text import extract_text
+
+
+# 页面内容清理后的字符预算（总结时再截取前6000字符）
+AI_CONTENT_BUDGET = 20000
 
 
 @dataclass
@@ -561,9 +567,74 @@ class EnhancedBrowserEngine:
             self.operation_history.append(result)
             return result
     
-    async def smart_extract_content(self) -> OperationResult:
-        """智能提取内容"""
+    async def extract_readable_content(self, max_chars: int = 0) -> OperationResult:
+        """在页面内提取正文（一次往返，返回结构化内容块）
+        
+        Args:
+            max_chars: 正文字符预算（0 表示不限制）
+        """
+        try:
+            data = await self.page.evaluate(READABLE_CONTENT_SCRIPT, max_chars)
+            readable = ReadableContent.from_dict(data)
+            
+            if not readable.blocks:
+                result = OperationResult(
+                    success=False,
+                    operation_type="extract",
+                    target="readable",
+                    error="未找到可提取的正文"
+                )
+            else:
+                result = OperationResult(
+                    success=True,
+                    operation_type="extract",
+                    target="readable",
+                    result=readable
+                )
+                self.logger.info(
+                    f"正文提取完成: {len(readable.blocks)} 个内容块, {readable.text_length} 字符, 容器 {readable.root}"
+                )
+            
+            self.operation_history.append(result)
+            return result
+            
+        except Exception as e:
+            self.logger.warning(f"页面内正文提取失败: {e}")
+            result = OperationResult(
+                success=False,
+                operation_type="extract",
+                target="readable",
+                error=str(e)
+            )
+            self.operation_history.append(result)
+            return result
+    
+    async def smart_extract_content(self, readable: Optional[ReadableContent] = None) -> OperationResult:
+        """智能提取内容
+        
+        Args:
+            readable: 已提取的页面正文（传入时不再重复执行页面内提取）
+        """
         try:
+            # 优先使用页面内正文提取；正文容器只占页面文本一小部分时与逐个选择器提取的结果比较
+            if readable is None:
+                readable_result = await self.extract_readable_content()
+                readable = readable_result.result if readable_result.success else None
+            
+            readable_text = readable.to_markdown() if readable else ""
+            if len(readable_text) > 50:
+                if not readable.low_coverage:
+                    result = OperationResult(
+                        success=True,
+                        operation_type="extract",
+                        target="content",
+                        result=readable_text
+                    )
+                    self.operation_history.append(result)
+                    self.logger.info(f"成功提取内容，长度: {len(readable_text)}")
+                    return result
+                self.logger.info(f"正文容器只占页面文本的 {readable.coverage:.0%}，与选择器提取结果比较")
+            
             content_selectors = self.selector_strategies["content"]
             extracted_contents = []
             
@@ -582,6 +653,13 @@ class EnhancedBrowserEngine:
                 except:
                     continue
             
+            if len(readable_text) > 50:
+                extracted_contents.append({
+                    "selector": "readable",
+                    "text": readable_text,
+                    "length": len(readable_text)
+                })
+            
             if not extracted_contents:
                 # 尝试提取整个页面的文本内容
                 try:
@@ -851,20 +929,24 @@ class EnhancedBrowserEngine:
         try:
             self.logger.info("开始AI内容提取和总结...")
             
-            # 首先使用传统方法提取内容
-            extract_result = await self.smart_extract_content()
-            
-            if not extract_result.success:
-                return {"error": "无法提取页面内容"}
-            
-            content = extract_result.result
+            # 页面内提取的结构化正文可直接用于总结，否则回退到传统提取并清理
+            readable_result = await self.extract_readable_content(max_chars=AI_CONTENT_BUDGET)
+            if readable_result.success:
+                content = cleaned_content = readable_result.result.to_markdown()
+            else:
+                extract_result = await self.smart_extract_content()
+                
+                if not extract_result.success:
+                    return {"error": "无法提取页面内容"}
+                
+                content = extract_result.result
+                
+                # 清理内容，移除CSS和脚本等噪音
+                cleaned_content = self._clean_content_for_ai(content)
             
             # 使用AI进行总结
             model_client = get_model_client()
             
-            # 清理内容，移除CSS和脚本等噪音
-            cleaned_content = self._clean_content_for_ai(content)
-            
             summary_response = await model_client.summarize_text(
                 cleaned_content[:6000],  # 限制长度
                 "请对以下网页内容进行智能分析和总结，重点关注主要信息和关键内容："
@@ -892,7 +974,7 @@ class EnhancedBrowserEngine:
                 "content_length": len(content),
                 "ai_summary": summary_response.content,
                 "visual_analysis": visual_analysis,
-                "extraction_method": "smart_engine_with_ai",
+                "extraction_method": "readable_with_ai" if readable_result.success else "smart_engine_with_ai",
                 "ai_model_info": {
                     "model": summary_response.model,
                     "provider": summary_response.provider,
@@ -1034,7 +1116,8 @@ class EnhancedBrowserEngine:
     async def _take_temp_screenshot(self) -> Optional[Path]:
         """拍摄临时截图"""
         try:
-            temp_dir = Path("data/temp")
+            from app.config.settings import get_settings
+            temp_dir = Path(get_settings().storage.temp_dir)
             temp_dir.mkdir(parents=True, exist_ok=True)
             
             screenshot_path = temp_dir / f"ai_analysis_{int(time.time())}.png"
@@ -1201,23 +1284,8 @@ class EnhancedBrowserEngine:
     def _clean_content_for_ai(self, content: str) -> str:
         """清理内容用于AI分析"""
         try:
-            import re
-            
-            # 移除CSS样式
-            content = re.sub(r'<style[^>]*>.*?</style>', '', content, flags=re.DOTALL | re.IGNORECASE)
-            content = re.sub(r'<link[^>]*>', '', content, flags=re.IGNORECASE)
-            
-            # 移除JavaScript
-            content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
-            
-            # 移除HTML注释
-            content = re.sub(r'<!--.*?-->', '', content, flags=re.DOTALL)
-            
-            # 移除HTML标签但保留文本
-            content = re.sub(r'<[^>]+>', ' ', content)
-            
-            # 移除多余的空白字符
-            content = re.sub(r'\s+', ' ', content)
+            # 增量解析，丢弃样式、脚本和导航等样板内容，达到字符预算后停止
+            content = extract_text(content, max_chars=AI_CONTENT_BUDGET)
             
             # 移除CSS相关的行
             lines = content.split('\n')
@@ -1241,11 +1309,4 @@ class EnhancedBrowserEngine:
             
         except Exception as e:
             self.logger.warning(f"内容清理失败: {e}")
-            # 简单清理：只移除明显的HTML标签
-            try:
-                import re
-                cleaned = re.sub(r'<[^>]+>', ' ', content)
-                cleaned = re.sub(r'\s+', ' ', cleaned)
-                return cleaned[:3000]
-            except:
-                return content[:3000] 
\ No newline at end of file
+            return content[:3000] 
\ No newline at end of file
@@ -0,0 +1,342 @@
+"""
+近似重复任务索引
+对任务标题和正文做字符 n-gram 分片，计算 MinHash 签名并按 LSH 分带建桶。
+新增任务时增量更新索引，查找近似重复只需查询各分带的桶，无需两两比较；
+历史任务列表的去重和下载器重新定位任务都使用该索引。
+签名可保存到 SQLite，重启后直接加载，无需重新读取正文计算；
+安装了 numpy 时签名按矩阵一次计算。
+"""
+
+import json
+import random
+import re
+import struct
+import threading
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy
+except ImportError:  # 未安装 numpy 时逐个排列计算
+    numpy = None
+
+from app.storage.database import Database, get_database
+
+
+# 分片哈希为 32 位，取模 2^31-1 后 a*x+b 不超过 63 位，numpy 的 uint64 运算不会溢出
+MERSENNE_PRIME = (1 << 31) - 1
+NORMALIZE_PATTERN = re.compile(r"[\W_]+")
+# 分片或签名算法变化时递增，旧签名不再加载
+SIGNATURE_SCHEME = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS duplicate_signatures (
+    key TEXT PRIMARY KEY,
+    grp TEXT NOT NULL,
+    version TEXT,
+    scheme INTEGER NOT NULL,
+    title_signature BLOB,
+    content_signature BLOB
+);
+"""
+
+Signature = Tuple[int, ...]
+
+
+def shingles(text: str, size: int) -> Set[int]:
+    """文本的字符 n-gram 哈希集合（忽略大小写、空白和标点）"""
+    normalized = NORMALIZE_PATTERN.sub("", (text or "").lower())
+    if not normalized:
+        return set()
+    grams = [normalized] if len(normalized) <= size else (
+        normalized[i:i + size] for i in range(len(normalized) - size + 1)
+    )
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    """两个集合的 Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash 签名生成器（固定种子，签名在进程间稳定）"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+        if numpy is not None:
+            self._a = numpy.array([a for a, _ in self._perms], dtype=numpy.uint64)[:, None]
+            self._b = numpy.array([b for _, b in self._perms], dtype=numpy.uint64)[:, None]
+
+    def signature(self, hashes: Set[int]) -> Optional[Signature]:
+        """计算集合的 MinHash 签名（空集合返回 None）"""
+        if not hashes:
+            return None
+        if numpy is not None:
+            values = numpy.fromiter(hashes, dtype=numpy.uint64, count=len(hashes)) % MERSENNE_PRIME
+            return tuple(int(value) for value in ((self._a * values + self._b) % MERSENNE_PRIME).min(axis=1))
+        values = [value % MERSENNE_PRIME for value in hashes]
+        return tuple(min((a * x + b) % MERSENNE_PRIME for x in values) for a, b in self._perms)
+
+
+def pack_signature(signature: Optional[Signature]) -> Optional[bytes]:
+    """签名序列化为二进制（每个值 4 字节）"""
+    return struct.pack(f"<{len(signature)}I", *signature) if signature else None
+
+
+def unpack_signature(data: Optional[bytes]) -> Optional[Signature]:
+    """从二进制还原签名"""
+    return struct.unpack(f"<{len(data) // 4}I", data) if data else None
+
+
+def estimate_similarity(a: Signature, b: Signature) -> float:
+    """由签名估算 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class IndexedDocument:
+    """索引中的任务"""
+    key: str
+    group: str
+    version: Any
+    title_signature: Optional[Signature]
+    content_signature: Optional[Signature]
+
+
+class DuplicateIndex:
+    """MinHash LSH 近似重复索引
+
+    两个任务都有正文时按正文相似度判定，否则按标题相似度判定；只比较同一分组（平台）内的任务。
+    传入数据库时签名随增删写入 SQLite，首次使用时加载。
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        title_threshold: float = 0.7,
+        content_threshold: float = 0.8,
+        title_shingle_size: int = 3,
+        content_shingle_size: int = 5,
+        max_content_chars: int = 5000,
+        database: Optional[Database] = None
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.title_threshold = title_threshold
+        self.content_threshold = content_threshold
+        self.title_shingle_size = title_shingle_size
+        self.content_shingle_size = content_shingle_size
+        self.max_content_chars = max_content_chars
+        self.database = database
+        self._documents: Dict[str, IndexedDocument] = {}
+        self._buckets: Dict[Tuple[str, int, Signature], Set[str]] = defaultdict(set)
+        self._lock = threading.RLock()
+        self._loaded = database is None
+
+    def _load(self) -> None:
+        """首次使用时从数据库加载已保存的签名"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self.database.executescript(SCHEMA)
+            rows = self.database.fetchall(
+                "SELECT * FROM duplicate_signatures WHERE scheme = ?", (SIGNATURE_SCHEME,)
+            )
+            for row in rows:
+                document = IndexedDocument(
+                    key=row["key"],
+                    group=row["grp"],
+                    version=_decode_version(row["version"]),
+                    title_signature=unpack_signature(row["title_signature"]),
+                    content_signature=unpack_signature(row["content_signature"])
+                )
+                if any(signature and len(signature) != self.hasher.num_perm
+                       for signature in (document.title_signature, document.content_signature)):
+                    continue
+                self._insert(document)
+            self._loaded = True
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._documents)
+
+    def __contains__(self, key: str) -> bool:
+        self._load()
+        return key in self._documents
+
+    def is_current(self, key: str, version: Any) -> bool:
+        """索引中的任务是否为指定版本（版本未变时无需重新计算签名）"""
+        self._load()
+        document = self._documents.get(key)
+        return document is not None and document.version == version
+
+    def _make_document(self, key: str, title: str, content: str, group: str, version: Any) -> IndexedDocument:
+        return IndexedDocument(
+            key=key,
+            group=group,
+            version=version,
+            title_signature=self.hasher.signature(shingles(title, self.title_shingle_size)),
+            content_signature=self.hasher.signature(
+                shingles((content or "")[:self.max_content_chars], self.content_shingle_size)
+            )
+        )
+
+    def _band_keys(self, document: IndexedDocument) -> Iterable[Tuple[str, int, Signature]]:
+        """任务所在的 LSH 桶"""
+        for field_name, signature in (("title", document.title_signature), ("content", document.content_signature)):
+            if signature is None:
+                continue
+            for band in range(self.bands):
+                yield field_name, band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _insert(self, document: IndexedDocument) -> None:
+        """把任务放入内存索引"""
+        self._documents[document.key] = document
+        for bucket in self._band_keys(document):
+            self._buckets[bucket].add(document.key)
+
+    def _discard(self, key: str) -> bool:
+        """从内存索引移除任务"""
+        document = self._documents.pop(key, None)
+        if document is None:
+            return False
+        for bucket in self._band_keys(document):
+            members = self._buckets.get(bucket)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._buckets[bucket]
+        return True
+
+    def add(self, key: str, title: str, content: str = "", group: str = "", version: Any = None) -> IndexedDocument:
+        """加入或更新任务"""
+        self._load()
+        # 分片和签名计算不持锁，多个线程可以并行计算
+        document = self._make_document(key, title, content, group, version)
+        with self._lock:
+            self._discard(key)
+            self._insert(document)
+            if self.database is not None:
+                self.database.execute(
+                    """INSERT OR REPLACE INTO duplicate_signatures
+                       (key, grp, version, scheme, title_signature, content_signature)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (key, group, json.dumps(version, ensure_ascii=False), SIGNATURE_SCHEME,
+                     pack_signature(document.title_signature), pack_signature(document.content_signature))
+                )
+        return document
+
+    def remove(self, key: str) -> None:
+        """移除任务"""
+        self._load()
+        with self._lock:
+            if self._discard(key) and self.database is not None:
+                self.database.execute("DELETE FROM duplicate_signatures WHERE key = ?", (key,))
+
+    def _match(self, a: IndexedDocument, b: IndexedDocument, title_threshold: Optional[float] = None) -> Optional[float]:
+        """判定两个任务是否近似重复，是则返回相似度"""
+        if a.group != b.group:
+            return None
+        if a.content_signature and b.content_signature:
+            score = estimate_similarity(a.content_signature, b.content_signature)
+            return score if score >= self.content_threshold else None
+        if a.title_signature and b.title_signature:
+            score = estimate_similarity(a.title_signature, b.title_signature)
+            threshold = self.title_threshold if title_threshold is None else title_threshold
+            return score if score >= threshold else None
+        return None
+
+    def _search(self, document: IndexedDocument, title_threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        """按桶查找候选并逐个确认，按相似度降序返回"""
+        self._load()
+        with self._lock:
+            candidates: Set[str] = set()
+            for bucket in self._band_keys(document):
+                candidates.update(self._buckets.get(bucket, ()))
+            candidates.discard(document.key)
+
+            matches = []
+            for key in candidates:
+                score = self._match(document, self._documents[key], title_threshold)
+                if score is not None:
+                    matches.append((key, score))
+        return sorted(matches, key=lambda item: (-item[1], item[0]))
+
+    def query(
+        self,
+        title: str,
+        content: str = "",
+        group: str = "",
+        title_threshold: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """查找与给定标题/正文近似重复的任务"""
+        return self._search(self._make_document("", title, content, group, None), title_threshold)
+
+    def duplicates_of(self, key: str) -> List[Tuple[str, float]]:
+        """索引中某个任务的近似重复任务"""
+        self._load()
+        document = self._documents.get(key)
+        return self._search(document) if document is not None else []
+
+    def clusters(self, keys: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """近似重复任务分组（只返回包含多个任务的组）
+
+        Args:
+            keys: 只在这些任务之间分组（默认整个索引）
+        """
+        self._load()
+        with self._lock:
+            scope = set(self._documents) if keys is None else {key for key in keys if key in self._documents}
+            documents = {key: self._documents[key] for key in scope}
+        parent = {key: key for key in scope}
+
+        def find(key: str) -> str:
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key in scope:
+            for other, _ in self._search(documents[key]):
+                if other in scope:
+                    root_a, root_b = find(key), find(other)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for key in sorted(scope):
+            groups[find(key)].append(key)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def _decode_version(value: Optional[str]) -> Any:
+    """还原保存的版本（JSON 数组还原为元组，便于与调用方传入的版本比较）"""
+    if value is None:
+        return None
+    version = json.loads(value)
+    return tuple(version) if isinstance(version, list) else version
+
+
+# 全局索引实例
+_duplicate_index = None
+
+
+def get_duplicate_index() -> DuplicateIndex:
+    """获取全局近似重复任务索引（签名保存在应用数据库中）"""
+    global _duplicate_index
+    if _duplicate_index is None:
+        _duplicate_index = DuplicateIndex(database=get_database())
+    return _duplicate_index
@@ -0,0 +1,237 @@
+"""
+多平台并发执行编排
+将同一命题同时提交到多个平台，按完成顺序返回结果
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.logger import get_logger
+from app.core.task_processor import TaskProcessor, TaskRequest, TaskResult
+
+
+class FanoutMode(Enum):
+    """编排模式"""
+    ALL = "all"                    # 收集全部结果（每个平台单独截止时间）
+    FIRST_SUCCESS = "first"        # 第一个成功结果胜出，取消其余平台
+
+
+@dataclass
+class PlatformOutcome:
+    """单个平台的执行结果"""
+    platform: str
+    status: str  # completed / failed / timeout / cancelled
+    elapsed: float = 0.0
+    result: Optional[TaskResult] = None
+    error: str = ""
+
+    @property
+    def success(self) -> bool:
+        """是否成功"""
+        return self.status == "completed"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "platform": self.platform,
+            "status": self.status,
+            "success": self.success,
+            "elapsed": self.elapsed,
+            "error": self.error,
+            "task": self.result.to_dict() if self.result else None
+        }
+
+
+@dataclass
+class FanoutResult:
+    """编排结果"""
+    topic_id: str
+    mode: FanoutMode
+    outcomes: List[PlatformOutcome] = field(default_factory=list)
+    winner: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def successful(self) -> List[PlatformOutcome]:
+        """成功的平台结果"""
+        return [outcome for outcome in self.outcomes if outcome.success]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "topic_id": self.topic_id,
+            "mode": self.mode.value,
+            "winner": self.winner,
+            "elapsed": self.elapsed,
+            "outcomes": [outcome.to_dict() for outcome in self.outcomes]
+        }
+
+
+class FanoutOrchestrator:
+    """多平台并发编排器
+
+    每个平台分支使用独立的平台实例，实例在连接浏览器时租用各自的标签页，
+    因此同一平台也可以并行执行多个分支。绑定运行中的任务执行器时，
+    分支提交到执行器队列，受平台配额和全局并发上限约束。
+    """
+
+    def __init__(self, processor: Optional[TaskProcessor] = None, executor=None):
+        self.logger = get_logger("fanout_orchestrator")
+        self.executor = executor
+        self.processor = processor or (executor.processor if executor else TaskProcessor())
+
+    def _build_request(
+        self,
+        topic,
+        platform: str,
+        deadline: Optional[float],
+        download_root: Optional[Path],
+        **request_options
+    ) -> TaskRequest:
+        """构建单个平台的任务请求"""
+        if deadline:
+            request_options.setdefault("timeout", int(deadline))
+        if download_root:
+            request_options.setdefault("download_dir", Path(download_root) / platform)
+
+        return TaskRequest(
+            platform=platform,
+            topic=topic.content,
+            title=topic.title,
+            **request_options
+        )
+
+    async def _execute(self, request: TaskRequest, deadline: Optional[float], priority: int) -> TaskResult:
+        """通过执行器（或直接由处理器）执行任务，超时或分支取消时同时取消执行"""
+        if self.executor is None or not self.executor.running:
+            return await asyncio.wait_for(self.processor.process_task(request), deadline)
+
+        execution_id = self.executor.submit(request, priority=priority)
+        try:
+            return await self.executor.wait_for(execution_id, deadline)
+        finally:
+            # 已结束的执行项取消无效
+            self.executor.cancel(execution_id)
+
+    async def _run_platform(
+        self,
+        request: TaskRequest,
+        deadline: Optional[float],
+        priority: int = 1
+    ) -> PlatformOutcome:
+        """执行单个平台分支"""
+        start_time = time.monotonic()
+        outcome = PlatformOutcome(platform=request.platform, status="failed")
+
+        try:
+            result = await self._execute(request, deadline, priority)
+            outcome.result = result
+            outcome.status = "completed" if result.success else "failed"
+            outcome.error = result.error_message
+        except asyncio.TimeoutError:
+            outcome.status = "timeout"
+            outcome.error = f"超过截止时间 {deadline} 秒"
+        except Exception as e:
+            outcome.error = str(e)
+
+        outcome.elapsed = time.monotonic() - start_time
+        if outcome.status == "timeout":
+            # 超时的任务被取消，处理器不会记录，这里按失败计入能力指标
+            self.processor.capability_manager.record_metrics(
+                outcome.platform, "task_submission", False, outcome.elapsed
+            )
+        return outcome
+
+    async def stream(
+        self,
+        topic,
+        platforms: List[str],
+        deadline: Optional[float] = None,
+        download_root: Optional[Path] = None,
+        **request_options
+    ) -> AsyncIterator[PlatformOutcome]:
+        """同时提交到多个平台，按完成顺序产出结果
+
+        提前结束迭代时，未完成的平台分支会被取消。
+
+        Args:
+            topic: 命题（Topic）
+            platforms: 目标平台列表
+            deadline: 每个平台的截止时间（秒）
+            download_root: 下载根目录，每个平台写入其子目录
+        """
+        branches = [
+            asyncio.create_task(
+                self._run_platform(
+                    self._build_request(topic, platform, deadline, download_root, **dict(request_options)),
+                    deadline,
+                    topic.priority
+                ),
+                name=f"fanout-{platform}"
+            )
+            for platform in platforms
+        ]
+        self.logger.info(f"命题 {topic.id} 已分发到 {len(branches)} 个平台: {platforms}")
+
+        try:
+            for next_done in asyncio.as_completed(branches):
+                yield await next_done
+        finally:
+            pending = [branch for branch in branches if not branch.done()]
+            for branch in pending:
+                branch.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                self.logger.info(f"已取消 {len(pending)} 个未完成的平台分支")
+
+    async def run(
+        self,
+        topic,
+        platforms: List[str],
+        mode: FanoutMode = FanoutMode.ALL,
+        deadline: Optional[float] = None,
+        on_result: Optional[Callable[[PlatformOutcome], None]] = None,
+        download_root: Optional[Path] = None,
+        **request_options
+    ) -> FanoutResult:
+        """执行多平台编排
+
+        Args:
+            topic: 命题（Topic）
+            platforms: 目标平台列表
+            mode: 编排模式
+            deadline: 每个平台的截止时间（秒）
+            on_result: 每个平台完成时的回调
+            download_root: 下载根目录
+        """
+        start_time = time.monotonic()
+        fanout = FanoutResult(topic_id=topic.id, mode=mode)
+
+        outcomes = self.stream(topic, platforms, deadline=deadline, download_root=download_root, **request_options)
+        try:
+            async for outcome in outcomes:
+                fanout.outcomes.append(outcome)
+                if on_result:
+                    on_result(outcome)
+
+                if mode == FanoutMode.FIRST_SUCCESS and outcome.success:
+                    fanout.winner = outcome.platform
+                    break
+        finally:
+            await outcomes.aclose()
+
+        finished = {outcome.platform for outcome in fanout.outcomes}
+        for platform in platforms:
+            if platform not in finished:
+                fanout.outcomes.append(PlatformOutcome(platform=platform, status="cancelled", error="已有平台先完成"))
+
+        fanout.elapsed = time.monotonic() - start_time
+        self.logger.info(
+            f"命题 {topic.id} 执行完成: 成功 {len(fanout.successful)}/{len(platforms)}, "
+            f"胜出平台: {fanout.winner}, 耗时 {fanout.elapsed:.1f}秒"
+        )
+        return fanout
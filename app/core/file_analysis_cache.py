@@ -0,0 +1,87 @@
+"""
+任务文件分析结果缓存
+按文件内容哈希把单个文件的分析结果保存在任务目录的 ai_file_analyses.json 中，
+重新生成总结时只有新增或内容变化的文件需要再次调用模型；
+结果按生成它的提供商和模型区分，切换模型后重新分析
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from app.core.logger import get_logger
+
+
+CACHE_FILE_NAME = "ai_file_analyses.json"
+
+# 分析提示词或结果结构变化时递增，旧缓存随之失效
+ANALYSIS_VERSION = 2
+
+
+class FileAnalysisCache:
+    """单个任务目录的文件分析缓存"""
+
+    def __init__(self, task_dir: Path, model: str = ""):
+        """
+        Args:
+            task_dir: 任务目录
+            model: 分析所用的提供商和模型（如 "gemini/gemini-2.0-flash-exp"），只复用同一模型的结果
+        """
+        self.logger = get_logger("file_analysis_cache")
+        self.path = Path(task_dir) / CACHE_FILE_NAME
+        self.model = model
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._updated: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        """读取缓存文件，版本不符或损坏时视为空"""
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == ANALYSIS_VERSION:
+                self.entries = {
+                    filename: entry for filename, entry in data.get("files", {}).items()
+                    if entry.get("model") == self.model
+                }
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取文件分析缓存失败 {self.path}: {e}")
+
+    def hashes(self) -> Set[str]:
+        """已有分析结果的内容哈希"""
+        return {entry.get("sha256") for entry in self.entries.values()}
+
+    def get(self, filename: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        """获取内容哈希一致的分析结果（文件重命名后按内容匹配）"""
+        entry = self.entries.get(filename)
+        if entry and entry.get("sha256") == content_hash:
+            return entry["result"]
+        for entry in self.entries.values():
+            if entry.get("sha256") == content_hash:
+                return entry["result"]
+        return None
+
+    def put(self, filename: str, content_hash: str, result: Dict[str, Any]) -> None:
+        """记录本次分析结果"""
+        self._updated[filename] = {"sha256": content_hash, "model": self.model, "result": result}
+
+    def save(self) -> None:
+        """保存本次用到的分析结果（已删除文件的条目随之清除）"""
+        data = {"version": ANALYSIS_VERSION, "files": self._updated}
+        temp_path = None
+        try:
+            # 每次写入使用独立的临时文件，同一任务的并发生成不会互相覆盖半写的文件
+            fd, temp_path = tempfile.mkstemp(prefix=f".{CACHE_FILE_NAME}.", suffix=".tmp", dir=self.path.parent)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            temp_path = None
+            self.entries = dict(self._updated)
+        except OSError as e:
+            self.logger.warning(f"保存文件分析缓存失败 {self.path}: {e}")
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.unlink(temp_path)
@@ -0,0 +1,270 @@
+"""
+任务文件分诊
+在调用大模型分析任务文件之前对文件分类：跳过系统生成的文件和内容重复的文件，
+元数据等无需模型的文件在本地处理，其余文件按预期信息量排序并受单个任务的 token 预算约束
+"""
+
+import hashlib
+import math
+import re
+import struct
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from app.core.text_chunker import estimate_tokens, strip_content_header
+from app.storage.compression import artifact_size, open_artifact
+from app.utils.html_text import extract_text_from_file
+
+
+class TriageAction(Enum):
+    """分诊动作"""
+    ANALYZE = "analyze"  # 调用大模型分析
+    LOCAL = "local"      # 本地生成描述，不调用大模型
+    SKIP = "skip"        # 跳过
+
+
+# 系统生成的文件（总结结果、下载报告等），重新生成总结时不应再作为输入
+GENERATED_FILES = {"ai_summary.json", "ai_file_analyses.json"}
+GENERATED_SUFFIXES = ("download_report.json",)
+
+# 本地处理即可的文件
+LOCAL_FILES = {"metadata.json"}
+
+# 主要正文文件
+PRIMARY_TEXT_FILES = {"content.txt", "conversation.txt"}
+
+# 文件角色的预期信息量（越大越优先分析）
+ROLE_PRIORITY = {
+    "primary_text": 1.0,
+    "text": 0.8,
+    "html": 0.6,
+    "image": 0.5,
+    "json": 0.3
+}
+
+# 各类文件分析请求的最大输出 token（与 AIFileProcessor 中的 max_tokens 一致）
+OUTPUT_TOKENS = {"text": 800, "html": 700, "image": 600, "json": 500}
+
+IMAGE_TOKEN_ESTIMATE = 258
+HTML_PROMPT_CHARS = 3000
+SHINGLE_SIZE = 8
+MAX_COMPARE_CHARS = 200_000
+
+
+@dataclass
+class TriageDecision:
+    """单个文件的分诊结果"""
+    path: Path
+    file_type: str
+    action: TriageAction
+    reason: str = ""
+    priority: float = 0.0
+    estimated_tokens: int = 0
+    content_hash: str = ""
+
+
+@dataclass
+class TriageResult:
+    """任务目录的分诊结果"""
+    analyze: List[TriageDecision] = field(default_factory=list)
+    local: List[TriageDecision] = field(default_factory=list)
+    skipped: List[TriageDecision] = field(default_factory=list)
+
+    @property
+    def estimated_tokens(self) -> int:
+        """预计消耗的 token 数"""
+        return sum(decision.estimated_tokens for decision in self.analyze)
+
+    def skipped_files(self) -> List[Dict[str, str]]:
+        """跳过的文件及原因"""
+        return [{"filename": decision.path.name, "reason": decision.reason} for decision in self.skipped]
+
+
+def _shingles(text: str) -> Set[int]:
+    """文本的字符 n-gram 指纹集合（忽略空白与大小写）"""
+    normalized = re.sub(r"\s+", "", text[:MAX_COMPARE_CHARS]).lower()
+    if len(normalized) <= SHINGLE_SIZE:
+        return {hash(normalized)} if normalized else set()
+    return {hash(normalized[i:i + SHINGLE_SIZE]) for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def containment(part: Set[int], whole: Set[int]) -> float:
+    """part 中有多大比例包含在 whole 中"""
+    if not part:
+        return 1.0
+    return len(part & whole) / len(part)
+
+
+def _image_tiles(path: Path, max_dimension: int = 2048, max_tiles: int = 6) -> int:
+    """估算长截图切分后的段数（仅解析 PNG 头部，其余格式按 1 段计）"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(24)
+        if header[:8] != b"\x89PNG\r\n\x1a\n":
+            return 1
+        width, height = struct.unpack(">II", header[16:24])
+        scaled_height = height * min(1.0, max_dimension / width) if width else height
+        return max(1, min(max_tiles, math.ceil(scaled_height / max_dimension)))
+    except (OSError, struct.error):
+        return 1
+
+
+class FileTriage:
+    """任务文件分诊器"""
+
+    def __init__(
+        self,
+        token_budget: int = 0,
+        chunk_tokens: int = 3000,
+        chunk_output_tokens: int = 500,
+        redundancy_threshold: float = 0.8,
+        get_file_type: Optional[Callable[[Path], str]] = None
+    ):
+        """
+        Args:
+            token_budget: 单个任务的 token 预算（0 表示不限制），优先级最高的文件总会被分析
+            chunk_tokens: 长文本分段总结的单段预算（用于估算文本分析成本）
+            chunk_output_tokens: 每个分段摘要的最大输出
+            redundancy_threshold: 文本被已选文件包含的比例超过该值时视为重复
+            get_file_type: 文件类型判定函数（默认按扩展名）
+        """
+        self.token_budget = token_budget
+        self.chunk_tokens = chunk_tokens
+        self.chunk_output_tokens = chunk_output_tokens
+        self.redundancy_threshold = redundancy_threshold
+        self._get_file_type = get_file_type or self._file_type
+
+    def triage(self, files: List[Path], known_hashes: Optional[Set[str]] = None) -> TriageResult:
+        """对任务目录中的文件分诊
+
+        Args:
+            files: 任务目录中的文件
+            known_hashes: 已有分析结果的内容哈希，这些文件不计入 token 预算
+        """
+        result = TriageResult()
+        candidates: List[TriageDecision] = []
+        texts: Dict[Path, str] = {}
+        seen_hashes: Dict[str, str] = {}
+
+        for path in sorted(files, key=lambda f: f.name):
+            decision = self._classify(path)
+            if decision.action != TriageAction.SKIP:
+                digest = decision.content_hash = self._file_hash(path)
+                if digest in seen_hashes:
+                    decision.action = TriageAction.SKIP
+                    decision.reason = f"与 {seen_hashes[digest]} 内容相同"
+                else:
+                    seen_hashes[digest] = path.name
+
+            if decision.action == TriageAction.SKIP:
+                result.skipped.append(decision)
+            elif decision.action == TriageAction.LOCAL:
+                result.local.append(decision)
+            else:
+                if decision.file_type in ("text", "html"):
+                    texts[path] = self._read_text(path, decision.file_type)
+                    if not texts[path].strip():
+                        decision.action = TriageAction.SKIP
+                        decision.reason = "无可分析的文本内容"
+                        result.skipped.append(decision)
+                        continue
+                if not (known_hashes and decision.content_hash in known_hashes):
+                    decision.estimated_tokens = self._estimate_cost(decision, texts.get(path))
+                candidates.append(decision)
+
+        # 按预期信息量排序，同优先级内容更多的文件在前
+        candidates.sort(key=lambda d: (-d.priority, -d.estimated_tokens, d.path.name))
+
+        kept_shingles: List[Set[int]] = []
+        spent = 0
+        for decision in candidates:
+            text = texts.get(decision.path)
+            shingles = _shingles(text) if text is not None else None
+
+            if shingles is not None and any(
+                containment(shingles, kept) >= self.redundancy_threshold for kept in kept_shingles
+            ):
+                decision.action = TriageAction.SKIP
+                decision.reason = "内容已包含在其他文本文件中"
+                result.skipped.append(decision)
+                continue
+
+            if self.token_budget and result.analyze and spent + decision.estimated_tokens > self.token_budget:
+                decision.action = TriageAction.SKIP
+                decision.reason = f"超出任务token预算({self.token_budget})"
+                result.skipped.append(decision)
+                continue
+
+            spent += decision.estimated_tokens
+            result.analyze.append(decision)
+            if shingles is not None:
+                kept_shingles.append(shingles)
+
+        return result
+
+    def _classify(self, path: Path) -> TriageDecision:
+        """按文件名与类型初步分类"""
+        name = path.name.lower()
+        file_type = self._get_file_type(path)
+
+        if name in GENERATED_FILES or name.endswith(GENERATED_SUFFIXES):
+            return TriageDecision(path, file_type, TriageAction.SKIP, "系统生成的文件")
+        if artifact_size(path) == 0:
+            return TriageDecision(path, file_type, TriageAction.SKIP, "文件为空")
+        if name in LOCAL_FILES:
+            return TriageDecision(path, file_type, TriageAction.LOCAL, "元数据文件")
+        if file_type in ("document", "binary"):
+            return TriageDecision(path, file_type, TriageAction.LOCAL, "暂不支持内容分析的文件")
+
+        role = "primary_text" if name in PRIMARY_TEXT_FILES or path.suffix.lower() == ".md" else file_type
+        return TriageDecision(path, file_type, TriageAction.ANALYZE, priority=ROLE_PRIORITY.get(role, 0.3))
+
+    def _estimate_cost(self, decision: TriageDecision, text: Optional[str]) -> int:
+        """估算分析该文件消耗的 token（输入 + 输出）"""
+        output = OUTPUT_TOKENS.get(decision.file_type, 500)
+        if decision.file_type == "image":
+            return IMAGE_TOKEN_ESTIMATE * _image_tiles(decision.path) + output
+        if decision.file_type == "json":
+            return 200 + output
+        if decision.file_type == "html":
+            return estimate_tokens(text[:HTML_PROMPT_CHARS]) + output
+
+        tokens = estimate_tokens(text)
+        if tokens <= self.chunk_tokens:
+            return tokens + output
+        # 长文本：分段总结（全文输入 + 每段摘要输出），再分析压缩后的摘要
+        chunks = math.ceil(tokens / self.chunk_tokens)
+        return tokens + chunks * self.chunk_output_tokens + self.chunk_tokens + output
+
+    def _read_text(self, path: Path, file_type: str) -> str:
+        """读取文件中参与分析的文本"""
+        if file_type == "html":
+            return extract_text_from_file(path, max_chars=MAX_COMPARE_CHARS)
+        with open_artifact(path, "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+        return strip_content_header(content)
+
+    def _file_hash(self, path: Path) -> str:
+        """文件内容哈希（按解压后的内容计算，与是否压缩存储无关）"""
+        digest = hashlib.sha256()
+        with open_artifact(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _file_type(self, path: Path) -> str:
+        """按扩展名判定文件类型"""
+        suffix = path.suffix.lower()
+        if suffix == ".json":
+            return "json"
+        if suffix in (".html", ".htm"):
+            return "html"
+        if suffix in (".txt", ".md", ".log", ".csv"):
+            return "text"
+        if suffix in (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"):
+            return "image"
+        if suffix in (".pdf", ".doc", ".docx", ".xls", ".xlsx"):
+            return "document"
+        return "binary"
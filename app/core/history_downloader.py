@@ -13,7 +13,14 @@ from typing import Dict, List, Optional, Any
 from playwright.async_api import Page
 
 from app.core.browser_engine import EnhancedBrowserEngine
+from app.core.duplicate_index import DuplicateIndex, get_duplicate_index
 from app.core.logger import get_logger
+from app.storage.compression import compress_artifact, remove_artifact
+from app.storage.task_layout import METADATA_SCHEMA_VERSION, get_task_layout
+
+
+# 重新定位任务时标题相似度的下限（列表中的标题可能被截断或带有状态文字）
+REFIND_TITLE_THRESHOLD = 0.6
 
 
 @dataclass
@@ -803,8 +810,8 @@ class HistoryDownloader:
         try:
             self.logger.info(f"开始下载任务: {task.title[:50]}...")
             
-            # 创建任务专用目录
-            task_dir = download_dir / f"task_{task.id}"
+            # 创建任务专用目录（按平台和任务ID计算，下载报告仍写在 download_dir）
+            task_dir = get_task_layout().task_dir(self.platform, task.id)
             task_dir.mkdir(parents=True, exist_ok=True)
             
             downloaded_files = []
@@ -825,13 +832,24 @@ class HistoryDownloader:
             # 智能等待内容加载完成
             wait_result = await self.browser_engine.smart_wait_for_content(timeout=30)
             
-            # 提取任务内容
-            content_result = await self.browser_engine.smart_extract_content()
-            content = content_result.result if content_result.success else ""
+            # 提取任务内容（优先页面内正文提取，一次往返只返回正文）
+            content_hash = ""
+            readable_result = await self.browser_engine.extract_readable_content()
+            readable = readable_result.result if readable_result.success else None
+            if readable and not readable.low_coverage:
+                content = readable.to_markdown()
+                content_hash = readable.content_hash
+            else:
+                # 正文容器可能选错（只占页面文本的一小部分），取与选择器提取结果中较长的一个
+                content_result = await self.browser_engine.smart_extract_content(readable)
+                content = content_result.result if content_result.success else ""
+                if readable and content == readable.to_markdown():
+                    content_hash = readable.content_hash
             
             # 保存任务内容
             if content:
                 content_file = task_dir / f"content.txt"
+                remove_artifact(content_file)
                 with open(content_file, 'w', encoding='utf-8') as f:
                     f.write(f"任务标题: {task.title}\n")
                     f.write(f"任务日期: {task.date}\n")
@@ -839,39 +857,56 @@ class HistoryDownloader:
                     f.write(f"下载时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
                     f.write("="*60 + "\n\n")
                     f.write(content)
+                content_file = await asyncio.to_thread(compress_artifact, content_file)
                 downloaded_files.append(content_file)
+                
+                # 增量更新近似重复索引
+                get_duplicate_index().add(
+                    str(task_dir), task.title, content, group=self.platform,
+                    version=(task.title, content_file.stat().st_mtime_ns)
+                )
             
             # 查找并下载文件
             file_downloads = await self._download_task_files(task_dir)
+            file_downloads = await self._compress_artifacts(file_downloads)
             downloaded_files.extend(file_downloads)
             
-            # 保存页面截图
+            # 保存页面截图（先删除旧文件：它可能是指向共享 blob 的硬链接，不能原地覆盖）
             screenshot_file = task_dir / "screenshot.png"
+            screenshot_file.unlink(missing_ok=True)
             await self.page.screenshot(path=str(screenshot_file), full_page=True)
             downloaded_files.append(screenshot_file)
             
             # 保存页面HTML
             html_file = task_dir / "page.html"
+            remove_artifact(html_file)
             html_content = await self.page.content()
             with open(html_file, 'w', encoding='utf-8') as f:
                 f.write(html_content)
+            html_file = await asyncio.to_thread(compress_artifact, html_file)
             downloaded_files.append(html_file)
             
+            # 页面HTML、截图和下载文件写入内容寻址存储
+            await self._store_artifacts(file_downloads + [screenshot_file, html_file])
+            
             # 保存任务元数据
             metadata_file = task_dir / "metadata.json"
             metadata = {
+                "schema_version": METADATA_SCHEMA_VERSION,
                 "task": {
                     "id": task.id,
                     "title": task.title,
                     "date": task.date,
                     "url": task.url,
-                    "preview": task.preview
+                    "preview": task.preview,
+                    "platform": self.platform
                 },
                 "download": {
                     "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
                     "platform": self.platform,
                     "files_count": len(downloaded_files),
                     "content_length": len(content),
+                    "content_hash": content_hash,
                     "page_url": self.page.url,
                     "page_title": await self.page.title()
                 }
@@ -881,6 +916,9 @@ class HistoryDownloader:
                 json.dump(metadata, f, ensure_ascii=False, indent=2)
             downloaded_files.append(metadata_file)
             
+            # 更新任务磁盘用量
+            await self._record_usage(task_dir, task.id)
+            
             self.logger.info(f"任务下载完成: {len(downloaded_files)} 个文件")
             
             # 🔥 新增：自动生成AI总结
@@ -1100,13 +1138,12 @@ class HistoryDownloader:
             # 重新发现当前页面的任务项
             current_tasks = await self.discover_history_tasks()
             
-            # 查找匹配的任务
-            matching_task = None
-            for current_task in current_tasks:
-                # 基于标题相似度匹配
-                if self._calculate_title_similarity(task.title, current_task.title) > 0.7:
-                    matching_task = current_task
-                    break
+            # 基于标题的 MinHash 相似度查找最匹配的任务
+            index = DuplicateIndex()
+            for position, current_task in enumerate(current_tasks):
+                index.add(str(position), current_task.title)
+            matches = index.query(task.title, title_threshold=REFIND_TITLE_THRESHOLD)
+            matching_task = current_tasks[int(matches[0][0])] if matches else None
             
             if matching_task and matching_task.element_selector:
                 return await self._click_with_smart_engine(matching_task.element_selector)
@@ -1117,32 +1154,6 @@ class HistoryDownloader:
             self.logger.debug(f"重新查找并点击失败: {e}")
             return False
     
-    def _calculate_title_similarity(self, title1: str, title2: str) -> float:
-        """计算两个标题的相似度"""
-        try:
-            # 简单的字符级相似度计算
-            title1_clean = title1.strip().lower()
-            title2_clean = title2.strip().lower()
-            
-            if title1_clean == title2_clean:
-                return 1.0
-            
-            # 计算包含关系
-            if title1_clean in title2_clean or title2_clean in title1_clean:
-                return 0.8
-            
-            # 计算公共字符比例
-            common_chars = set(title1_clean) & set(title2_clean)
-            total_chars = set(title1_clean) | set(title2_clean)
-            
-            if total_chars:
-                return len(common_chars) / len(total_chars)
-            
-            return 0.0
-            
-        except Exception:
-            return 0.0
-    
     async def _verify_navigation_success(self) -> bool:
         """验证导航是否成功"""
         try:
@@ -1263,6 +1274,7 @@ class HistoryDownloader:
                                 download = await download_info.value
                                 filename = download.suggested_filename or f"download_{len(downloaded_files)}.bin"
                                 file_path = task_dir / filename
+                                remove_artifact(file_path)
                                 
                                 await download.save_as(file_path)
                                 downloaded_files.append(file_path)
@@ -1277,6 +1289,32 @@ class HistoryDownloader:
         
         return downloaded_files
     
+    async def _compress_artifacts(self, paths: List[Path]) -> List[Path]:
+        """按配置压缩文本类产物，返回压缩后的文件路径"""
+        return [await asyncio.to_thread(compress_artifact, path) for path in paths]
+    
+    async def _record_usage(self, task_dir: Path, task_id: str) -> None:
+        """更新任务磁盘用量索引"""
+        try:
+            from app.storage.retention import get_usage_index
+            await asyncio.to_thread(get_usage_index().record, task_dir, task_id, self.platform)
+        except Exception as e:
+            self.logger.warning(f"更新任务磁盘用量失败: {e}")
+    
+    async def _store_artifacts(self, paths: List[Path]) -> None:
+        """任务产物写入内容寻址存储，跨下载会话相同的文件只保存一份"""
+        from app.config.settings import get_settings
+        if not get_settings().storage.blob_store_enabled:
+            return
+        
+        try:
+            from app.storage.blob_store import get_blob_store
+            results = await asyncio.to_thread(get_blob_store().ingest_many, paths)
+            stored = sum(1 for digest in results.values() if digest)
+            self.logger.debug(f"任务产物写入内容寻址存储: {stored}/{len(paths)} 个文件")
+        except Exception as e:
+            self.logger.warning(f"任务产物写入内容寻址存储失败: {e}")
+    
     async def batch_download_all(self, download_dir: Path) -> List[DownloadResult]:
         """批量下载所有历史任务"""
         try:
@@ -0,0 +1,361 @@
+"""
+多模态分析前的图片预处理
+在进程池中把图片缩放到提供商可用的最大分辨率、把长截图纵向切分为多段，
+并重新编码为 WebP/JPEG；处理结果按文件哈希和处理参数缓存到磁盘，
+缓存超出容量或过期时按最久未使用淘汰。
+未安装 Pillow 时原样上传图片（仅修正 MIME 类型）。
+"""
+
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import io
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.config.settings import get_settings
+from app.core.logger import get_logger
+from app.utils.process_pool import run_in_process
+
+
+IMAGE_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".bmp": "image/bmp"
+}
+
+FORMAT_MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+# 整页截图可能远超 Pillow 默认的解压炸弹阈值
+MAX_SOURCE_PIXELS = 400_000_000
+
+
+def guess_mime_type(image_path: Union[str, Path]) -> str:
+    """按扩展名推断图片 MIME 类型"""
+    return IMAGE_MIME_TYPES.get(Path(image_path).suffix.lower(), "image/png")
+
+
+def plan_tiles(width: int, height: int, max_dimension: int, max_tiles: int) -> Tuple[int, int, int, int]:
+    """计算缩放后的尺寸与纵向切片方案
+
+    宽度缩放到 max_dimension 以内；高度超过 max_tiles 段时进一步整体缩小。
+
+    Returns:
+        (缩放后宽度, 缩放后高度, 每段高度, 段数)
+    """
+    scale = min(1.0, max_dimension / width)
+    if height * scale > max_dimension * max_tiles:
+        scale = max_dimension * max_tiles / height
+
+    scaled_width = max(1, round(width * scale))
+    scaled_height = max(1, round(height * scale))
+    count = max(1, math.ceil(scaled_height / max_dimension))
+    return scaled_width, scaled_height, math.ceil(scaled_height / count), count
+
+
+@dataclass
+class ImageOptions:
+    """图片处理参数"""
+    max_dimension: int = 2048
+    max_tiles: int = 6
+    format: str = "webp"
+    quality: int = 80
+
+    @property
+    def key(self) -> str:
+        """参数标识（参与缓存键）"""
+        return f"{self.max_dimension}-{self.max_tiles}-{self.format}-{self.quality}"
+
+
+@dataclass
+class ImageSegment:
+    """预处理后的图片段"""
+    mime_type: str
+    data: str  # base64
+    width: int = 0
+    height: int = 0
+
+    @property
+    def data_url(self) -> str:
+        """data URL 形式"""
+        return f"data:{self.mime_type};base64,{self.data}"
+
+
+@dataclass
+class PreparedImage:
+    """预处理结果"""
+    segments: List[ImageSegment] = field(default_factory=list)
+    source_bytes: int = 0
+    output_bytes: int = 0
+    cached: bool = False
+    processed: bool = False
+
+
+def _encode_tiles(data: bytes, options: ImageOptions) -> List[Tuple[str, bytes, int, int]]:
+    """缩放、切片并重新编码（需要 Pillow）"""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        width, height = image.size
+        scaled_width, scaled_height, tile_height, count = plan_tiles(
+            width, height, options.max_dimension, options.max_tiles
+        )
+        if (scaled_width, scaled_height) != (width, height):
+            image = image.resize((scaled_width, scaled_height), Image.LANCZOS, reducing_gap=3.0)
+
+        tiles = []
+        for index in range(count):
+            top = index * tile_height
+            tile = image.crop((0, top, scaled_width, min(scaled_height, top + tile_height)))
+            buffer = io.BytesIO()
+            tile.save(buffer, format=options.format.upper(), quality=options.quality)
+            tiles.append((FORMAT_MIME_TYPES[options.format], buffer.getvalue(), tile.width, tile.height))
+
+        if count == 1 and (scaled_width, scaled_height) == (width, height) and len(tiles[0][1]) >= len(data):
+            # 无需缩放的小图重新编码后反而更大时保留原图
+            return [("", data, width, height)]
+        return tiles
+
+
+def prepare_image_sync(
+    image_path: str,
+    options: ImageOptions,
+    cache_dir: Optional[str] = None
+) -> PreparedImage:
+    """预处理图片（同步，在进程池中执行）"""
+    path = Path(image_path)
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    mime_type = guess_mime_type(path)
+
+    if importlib.util.find_spec("PIL") is None:
+        segment = ImageSegment(mime_type, base64.b64encode(data).decode("utf-8"))
+        return PreparedImage([segment], len(data), len(data))
+
+    manifest_path = None
+    if cache_dir:
+        manifest_path = Path(cache_dir) / digest[:2] / f"{digest}-{options.key}.json"
+        if manifest_path.exists():
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+                segments = []
+                for item in manifest["segments"]:
+                    tile = (manifest_path.parent / item["file"]).read_bytes()
+                    segments.append(ImageSegment(
+                        item["mime_type"], base64.b64encode(tile).decode("utf-8"), item["width"], item["height"]
+                    ))
+                # 命中时刷新修改时间，淘汰按最久未使用进行
+                os.utime(manifest_path)
+                return PreparedImage(segments, len(data), manifest["output_bytes"], cached=True, processed=True)
+            except (OSError, ValueError, KeyError):
+                pass  # 缓存损坏时重新处理
+
+    tiles = _encode_tiles(data, options)
+    segments = [
+        ImageSegment(tile_mime or mime_type, base64.b64encode(tile).decode("utf-8"), width, height)
+        for tile_mime, tile, width, height in tiles
+    ]
+    output_bytes = sum(len(tile) for _, tile, _, _ in tiles)
+
+    if manifest_path is not None:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        items = []
+        for index, (segment, (_, tile, _, _)) in enumerate(zip(segments, tiles)):
+            extension = segment.mime_type.split("/", 1)[1]
+            file_name = f"{manifest_path.stem}-{index}.{extension}"
+            (manifest_path.parent / file_name).write_bytes(tile)
+            items.append({"file": file_name, "mime_type": segment.mime_type, "width": segment.width, "height": segment.height})
+        temp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps({"segments": items, "output_bytes": output_bytes}), encoding="utf-8")
+        os.replace(temp_path, manifest_path)
+
+    return PreparedImage(segments, len(data), output_bytes, processed=True)
+
+
+def _cache_entry_name(path: Path) -> Optional[str]:
+    """缓存文件所属的条目名（清单文件名去掉扩展名，切片文件再去掉序号）"""
+    if path.suffix == ".json":
+        return path.stem
+    if path.suffix == ".tmp":
+        return None
+    return path.stem.rsplit("-", 1)[0]
+
+
+class ImagePreprocessor:
+    """图片预处理器"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = "data/image_cache",
+        format: str = "webp",
+        quality: int = 80,
+        max_tiles: int = 6,
+        enabled: bool = True,
+        max_cache_bytes: int = 500 * 1024 * 1024,
+        cache_ttl: float = 30 * 24 * 3600
+    ):
+        self.logger = get_logger("image.preprocessor")
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_ttl = cache_ttl
+        self._cache_bytes: Optional[int] = None
+        self._evicting = False
+        self.format = format.lower() if format.lower() in FORMAT_MIME_TYPES else "webp"
+        self.quality = quality
+        self.max_tiles = max_tiles
+        self.enabled = enabled
+        self.pillow_available = importlib.util.find_spec("PIL") is not None
+        self.stats = {
+            "images": 0,
+            "cache_hits": 0,
+            "segments": 0,
+            "source_bytes": 0,
+            "output_bytes": 0,
+            "cache_evictions": 0
+        }
+
+        if enabled and not self.pillow_available:
+            self.logger.warning("未安装 Pillow，图片将原样上传（pip install Pillow 以启用缩放与切片）")
+
+    async def prepare(self, image_path: Union[str, Path], max_dimension: int = 2048) -> List[ImageSegment]:
+        """预处理图片，返回待上传的图片段"""
+        image_path = Path(image_path)
+        options = ImageOptions(max_dimension, self.max_tiles, self.format, self.quality)
+
+        if self.enabled and self.pillow_available:
+            prepared = await run_in_process(prepare_image_sync, str(image_path), options, self.cache_dir)
+        else:
+            # 无需解码，直接在线程中读取文件
+            data = await asyncio.to_thread(image_path.read_bytes)
+            segment = ImageSegment(guess_mime_type(image_path), base64.b64encode(data).decode("utf-8"))
+            prepared = PreparedImage([segment], len(data), len(data))
+
+        self.stats["images"] += 1
+        self.stats["cache_hits"] += int(prepared.cached)
+        self.stats["segments"] += len(prepared.segments)
+        self.stats["source_bytes"] += prepared.source_bytes
+        self.stats["output_bytes"] += prepared.output_bytes
+
+        if prepared.processed and not prepared.cached:
+            self.logger.debug(
+                f"图片预处理完成: {image_path.name}, {prepared.source_bytes} -> {prepared.output_bytes} 字节, "
+                f"{len(prepared.segments)} 段"
+            )
+            if self.cache_dir:
+                await self._account_cache(prepared.output_bytes)
+        return prepared.segments
+
+    async def _account_cache(self, added_bytes: int) -> None:
+        """累计缓存占用，超出容量时在线程中淘汰
+
+        首次写入时完整扫描一遍（同时清理过期条目），之后按写入量累计。
+        """
+        if self._evicting:
+            if self._cache_bytes is not None:
+                self._cache_bytes += added_bytes
+            return
+
+        self._evicting = True
+        try:
+            if self._cache_bytes is None:
+                self._cache_bytes = await asyncio.to_thread(self._evict_cache)
+            else:
+                self._cache_bytes += added_bytes
+                if self._cache_bytes > self.max_cache_bytes:
+                    self._cache_bytes = await asyncio.to_thread(self._evict_cache)
+        finally:
+            self._evicting = False
+
+    def _evict_cache(self) -> int:
+        """淘汰过期条目，仍超出容量时按最久未使用淘汰到容量的 90%，返回剩余占用
+
+        清单文件和它的切片作为一个条目淘汰，先删除清单，
+        并发读取时只会因清单缺失而重新处理。
+        """
+        entries: Dict[Tuple[Path, str], List[Any]] = {}
+        for path in Path(self.cache_dir).glob("*/*"):
+            name = _cache_entry_name(path)
+            if name is None:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            # [最近使用时间, 总大小, 清单文件, 切片文件]
+            entry = entries.setdefault((path.parent, name), [0.0, 0, None, []])
+            entry[1] += stat.st_size
+            if path.suffix == ".json":
+                entry[0] = stat.st_mtime
+                entry[2] = path
+            else:
+                entry[0] = entry[0] if entry[2] is not None else max(entry[0], stat.st_mtime)
+                entry[3].append(path)
+
+        now = time.time()
+        total = sum(entry[1] for entry in entries.values())
+        target = int(self.max_cache_bytes * 0.9)
+        evicted = 0
+        for used_at, size, manifest, tiles in sorted(entries.values(), key=lambda entry: entry[0]):
+            if total <= target and used_at + self.cache_ttl > now:
+                continue
+            for path in ([manifest] if manifest else []) + tiles:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            evicted += 1
+
+        self.stats["cache_evictions"] += evicted
+        if evicted:
+            self.logger.info(f"图片缓存淘汰 {evicted} 个条目, 当前占用 {total / 1024 / 1024:.1f}MB")
+        return total
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取预处理统计"""
+        source = self.stats["source_bytes"]
+        return {
+            **self.stats,
+            "enabled": self.enabled and self.pillow_available,
+            "compression_ratio": self.stats["output_bytes"] / source if source else 1.0
+        }
+
+
+# 全局图片预处理器实例
+_image_preprocessor = None
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """获取全局图片预处理器"""
+    global _image_preprocessor
+    if _image_preprocessor is None:
+        model_settings = get_settings().model
+        _image_preprocessor = ImagePreprocessor(
+            cache_dir=model_settings.image_cache_dir,
+            format=model_settings.image_format,
+            quality=model_settings.image_quality,
+            max_tiles=model_settings.image_max_tiles,
+            enabled=model_settings.image_preprocess_enabled,
+            max_cache_bytes=model_settings.image_cache_max_mb * 1024 * 1024,
+            cache_ttl=model_settings.image_cache_ttl
+        )
+    return _image_preprocessor
@@ -0,0 +1,234 @@
+"""
+大模型响应缓存
+按提供商、模型、规范化消息和生成参数的内容哈希缓存响应，
+内存 LRU 与磁盘两级存储，支持 TTL 与容量淘汰
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.logger import get_logger
+from app.utils.lru import LRUDict
+
+
+def _normalize_content(content: Any) -> Any:
+    """规范化消息内容：去除首尾空白，内联图片数据替换为哈希"""
+    if isinstance(content, str):
+        return content.strip()
+
+    parts = []
+    for item in content or []:
+        if item.get("type") == "image_url":
+            url = item.get("image_url", {}).get("url", "")
+            parts.append({"type": "image", "sha256": hashlib.sha256(url.encode("utf-8")).hexdigest()})
+        elif item.get("type") == "text":
+            parts.append({"type": "text", "text": item.get("text", "").strip()})
+        else:
+            parts.append(item)
+    return parts
+
+
+def make_cache_key(provider: str, model: str, messages: List[Any], params: Dict[str, Any]) -> str:
+    """计算缓存键
+
+    Args:
+        provider: 模型提供商
+        model: 模型名称
+        messages: 消息列表（ModelMessage 或 {"role", "content"} 字典）
+        params: 生成参数（max_tokens、temperature 等）
+    """
+    normalized = []
+    for message in messages:
+        if isinstance(message, dict):
+            role, content = message.get("role"), message.get("content")
+        else:
+            role, content = message.role, message.content
+        normalized.append({"role": role, "content": _normalize_content(content)})
+
+    payload = {
+        "provider": provider.lower(),
+        "model": model,
+        "messages": normalized,
+        "params": {key: params[key] for key in sorted(params)}
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ModelResponseCache:
+    """两级模型响应缓存"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: float = 7 * 24 * 3600,
+        memory_entries: int = 256,
+        max_disk_bytes: int = 200 * 1024 * 1024
+    ):
+        self.logger = get_logger("model.cache")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = LRUDict(memory_entries)
+        self._disk_bytes: Optional[int] = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_tokens": 0
+        }
+
+    def _entry_path(self, key: str) -> Path:
+        """磁盘条目路径（按前两位分目录）"""
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中或已过期返回 None"""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry["expires_at"] > now:
+                self.stats["memory_hits"] += 1
+                self._count_saved_tokens(entry["response"])
+                return entry["response"]
+            del self._memory[key]
+
+        if self.cache_dir is not None:
+            path = self._entry_path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                entry = None
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"读取缓存条目失败，已忽略: {path}: {e}")
+                entry = None
+
+            if entry is not None:
+                if entry.get("expires_at", 0) > now:
+                    self._memory[key] = entry
+                    self.stats["disk_hits"] += 1
+                    self._count_saved_tokens(entry["response"])
+                    return entry["response"]
+                self._remove_disk_entry(path)
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """写入缓存"""
+        entry = {"expires_at": time.time() + self.ttl, "response": response}
+        self._memory[key] = entry
+        self.stats["stores"] += 1
+
+        if self.cache_dir is None:
+            return
+
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            self.logger.warning(f"写入缓存条目失败: {path}: {e}")
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = self._scan_disk_usage()
+        else:
+            self._disk_bytes += path.stat().st_size
+
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _count_saved_tokens(self, response: Dict[str, Any]) -> None:
+        """累计命中缓存节省的 token 数"""
+        self.stats["saved_tokens"] += int(response.get("usage", {}).get("total_tokens", 0) or 0)
+
+    def _iter_disk_entries(self):
+        """遍历磁盘条目"""
+        if self.cache_dir is None or not self.cache_dir.exists():
+            return []
+        return self.cache_dir.glob("*/*.json")
+
+    def _scan_disk_usage(self) -> int:
+        """统计磁盘占用"""
+        total = 0
+        for path in self._iter_disk_entries():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def _remove_disk_entry(self, path: Path) -> None:
+        """删除磁盘条目"""
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        if self._disk_bytes is not None:
+            self._disk_bytes = max(0, self._disk_bytes - size)
+
+    def _evict_disk(self) -> None:
+        """淘汰过期条目，仍超出容量时按最久未写入淘汰到容量的 90%"""
+        now = time.time()
+        entries = []
+        for path in self._iter_disk_entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        evicted = 0
+        for mtime, size, path in entries:
+            if total <= target and mtime + self.ttl > now:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        self._disk_bytes = total
+        self.stats["evictions"] += evicted
+        if evicted:
+            self.logger.info(f"模型响应缓存淘汰 {evicted} 个条目, 当前占用 {total / 1024 / 1024:.1f}MB")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._memory.clear()
+        for path in list(self._iter_disk_entries()):
+            try:
+                path.unlink()
+            except OSError:
+                continue
+        self._disk_bytes = 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes if self._disk_bytes is not None else self._scan_disk_usage()
+        }
@@ -4,21 +4,85 @@
 """
 
 import asyncio
-import base64
 import json
-from typing import Dict, List, Optional, Any, Union
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Any, Union
 from pathlib import Path
 import aiohttp
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 
 from app.config.settings import get_settings
 from app.core.logger import get_logger
 from app.core.exceptions import AgentHubException
+from app.core.model_cache import ModelResponseCache, make_cache_key
+from app.core.model_failover import HedgePolicy, ProviderFailover
+from app.core.model_rate_limiter import ProviderRateLimiter, RetryPolicy
+from app.core.text_chunker import estimate_tokens, group_by_budget, split_text
+from app.storage.blob_store import hash_file
+
+
+# 可重试的 HTTP 状态码（429 单独处理）
+RETRYABLE_STATUS = {408, 500, 502, 503, 504}
+
+# 单张图片的预估 token 数（用于 token 预算）
+IMAGE_TOKEN_ESTIMATE = 258
+
+# 长文本分段总结提示词（不含分段序号，保证相同分段命中缓存）
+CHUNK_SUMMARY_PROMPT = "以下是一份长文档中的一个片段{heading}。请提炼该片段的核心内容、关键数据和结论，保持客观准确，300字以内：\n\n{text}"
+REDUCE_SUMMARY_PROMPT = "以下是同一文档多个片段的摘要，请合并为一份连贯的摘要，保留关键数据和结论，去除重复内容：\n\n{text}"
 
 
 class ModelClientError(AgentHubException):
     """模型客户端异常"""
-    pass
+    
+    def __init__(self, message: str, retryable: bool = False, http_status: Optional[int] = None):
+        super().__init__(
+            message=message,
+            code="MODEL_CLIENT_ERROR",
+            details={"retryable": retryable, "http_status": http_status}
+        )
+        self.retryable = retryable
+        self.http_status = http_status
+
+
+class ModelRateLimitError(ModelClientError):
+    """模型提供商限流错误"""
+    
+    def __init__(self, provider: str, retry_after: Optional[float] = None, message: Optional[str] = None):
+        super().__init__(
+            message=message or f"模型提供商 {provider} 达到调用限制",
+            retryable=True,
+            http_status=429
+        )
+        self.code = "MODEL_RATE_LIMIT"
+        self.retry_after = retry_after
+        self.details.update({"provider": provider, "retry_after": retry_after})
+
+
+def merge_usage(*usages: Dict[str, int]) -> Dict[str, int]:
+    """合并多次调用的 token 用量"""
+    merged = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for usage in usages:
+        for key in merged:
+            merged[key] += int((usage or {}).get(key, 0) or 0)
+    return merged
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
 
 
 @dataclass
@@ -36,14 +100,35 @@ class ModelResponse:
     model: str
     provider: str
     finish_reason: str = "stop"
+    cached: bool = False  # 是否来自响应缓存
+
+
+SessionFactory = Callable[[], Awaitable[aiohttp.ClientSession]]
 
 
 class BaseModelClient:
     """基础模型客户端"""
     
-    def __init__(self, config_section: Dict[str, Any]):
+    # 是否支持图片输入（用于图片分析的提供商选择）
+    supports_images = True
+    # 图片长边的最大有效分辨率，超出部分提供商会自行缩小
+    max_image_dimension = 2048
+    
+    def __init__(self, config_section: Dict[str, Any], session_factory: Optional[SessionFactory] = None):
         self.config = config_section
         self.logger = get_logger(f"model.{self.__class__.__name__.lower()}")
+        # 由管理器提供的长连接会话；未提供时每次调用使用临时会话
+        self._session_factory = session_factory
+        
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """获取HTTP会话（共享会话不在此关闭）"""
+        if self._session_factory is not None:
+            yield await self._session_factory()
+            return
+        
+        async with aiohttp.ClientSession() as session:
+            yield session
         
     async def chat_completion(
         self,
@@ -53,44 +138,111 @@ class BaseModelClient:
         """聊天完成"""
         raise NotImplementedError
         
+    async def stream_chat_completion(
+        self,
+        messages: List[ModelMessage],
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """流式聊天完成，逐段产出文本（默认一次性产出完整结果）
+        
+        Args:
+            on_usage: 收到用量统计（通常在最后一段）时的回调
+        """
+        response = await self.chat_completion(messages, **kwargs)
+        if on_usage:
+            on_usage(response.usage)
+        yield response.content
+        
     async def analyze_image(
         self,
         image_path: Union[str, Path],
         prompt: str = "请分析这张图片的内容",
         **kwargs
     ) -> ModelResponse:
-        """分析图片"""
-        # 读取图片
-        image_data = await self._encode_image(image_path)
+        """分析图片（长截图切分为多段按顺序上传）"""
+        image_urls = await self._prepare_image_urls(image_path)
         
         # 构建多模态消息
         message = ModelMessage(
             role="user",
             content=[
                 {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_data}"}}
+                *({"type": "image_url", "image_url": {"url": url}} for url in image_urls)
             ]
         )
         
         return await self.chat_completion([message], **kwargs)
     
-    async def _encode_image(self, image_path: Union[str, Path]) -> str:
-        """编码图片为base64"""
+    async def _read_response(
+        self,
+        response: aiohttp.ClientResponse,
+        provider: str,
+        label: str
+    ) -> Dict[str, Any]:
+        """读取响应JSON，非200状态按可重试性分类抛出异常"""
+        try:
+            response_data = await response.json(content_type=None)
+        except (aiohttp.ContentTypeError, ValueError):
+            response_data = {}
+        
+        if response.status == 200:
+            return response_data
+        
+        error = response_data.get("error", {}) if isinstance(response_data, dict) else {}
+        error_msg = (error.get("message") if isinstance(error, dict) else str(error)) or response.reason or "Unknown error"
+        
+        if response.status == 429:
+            raise ModelRateLimitError(
+                provider,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                message=f"{label} API error: {error_msg}"
+            )
+        raise ModelClientError(
+            f"{label} API error: {error_msg}",
+            retryable=response.status in RETRYABLE_STATUS,
+            http_status=response.status
+        )
+    
+    async def _iter_sse_data(self, response: aiohttp.ClientResponse) -> AsyncIterator[str]:
+        """逐行读取SSE响应，产出每个事件的 data 字段"""
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if line.startswith("data:"):
+                yield line[5:].strip()
+    
+    def _stream_timeout(self) -> aiohttp.ClientTimeout:
+        """流式请求超时：不限制总时长，只限制两段数据之间的间隔"""
+        return aiohttp.ClientTimeout(total=None, sock_read=self.config.get("timeout", 30))
+    
+    def _wrap_error(self, error: Exception, label: str) -> ModelClientError:
+        """将底层异常转换为分类后的客户端异常"""
+        if isinstance(error, asyncio.TimeoutError):
+            return ModelClientError(f"请求超时: {error}", retryable=True)
+        if isinstance(error, aiohttp.ClientError):
+            retryable = isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+            return ModelClientError(f"网络请求失败: {error}", retryable=retryable)
+        self.logger.error(f"{label} API调用失败: {error}")
+        return ModelClientError(f"调用失败: {error}")
+    
+    async def _prepare_image_urls(self, image_path: Union[str, Path]) -> List[str]:
+        """预处理图片（缩放、切片、重新编码）并转换为 data URL"""
         image_path = Path(image_path)
         if not image_path.exists():
             raise ModelClientError(f"图片文件不存在: {image_path}")
-            
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-            
-        return base64.b64encode(image_data).decode('utf-8')
+        
+        from app.core.image_preprocessor import get_image_preprocessor
+        segments = await get_image_preprocessor().prepare(image_path, self.max_image_dimension)
+        return [segment.data_url for segment in segments]
 
 
 class GeminiClient(BaseModelClient):
     """Google Gemini 客户端"""
     
-    def __init__(self, config_section: Dict[str, Any]):
-        super().__init__(config_section)
+    max_image_dimension = 3072
+    
+    def __init__(self, config_section: Dict[str, Any], session_factory: Optional[SessionFactory] = None):
+        super().__init__(config_section, session_factory)
         self.api_key = config_section.get("api_key")
         self.model = config_section.get("model", "gemini-2.0-flash-exp")
         self.base_url = config_section.get("base_url", "https://generativelanguage.googleapis.com")
@@ -105,44 +257,88 @@ class GeminiClient(BaseModelClient):
     ) -> ModelResponse:
         """Gemini 聊天完成"""
         try:
-            # 构建请求数据
-            contents = self._build_gemini_contents(messages)
-            
-            request_data = {
-                "contents": contents,
-                "generationConfig": {
-                    "maxOutputTokens": kwargs.get("max_tokens", self.config.get("max_tokens", 4000)),
-                    "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
-                }
-            }
-            
             # 构建请求URL
             url = f"{self.base_url}/v1beta/models/{self.model}:generateContent"
             
             # 发送请求
-            async with aiohttp.ClientSession() as session:
+            async with self._session() as session:
                 async with session.post(
                     url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "x-goog-api-key": self.api_key
-                    },
-                    json=request_data,
+                    headers=self._headers(),
+                    json=self._build_request_data(messages, kwargs),
                     timeout=aiohttp.ClientTimeout(total=self.config.get("timeout", 30))
                 ) as response:
-                    response_data = await response.json()
+                    response_data = await self._read_response(response, "gemini", "Gemini")
+                    return self._parse_gemini_response(response_data)
                     
+        except ModelClientError:
+            raise
+        except Exception as e:
+            raise self._wrap_error(e, "Gemini")
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[ModelMessage],
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Gemini 流式聊天完成（streamGenerateContent + SSE，每段都带累计用量，取最后一段）"""
+        url = f"{self.base_url}/v1beta/models/{self.model}:streamGenerateContent?alt=sse"
+        
+        try:
+            async with self._session() as session:
+                async with session.post(
+                    url,
+                    headers=self._headers(),
+                    json=self._build_request_data(messages, kwargs),
+                    timeout=self._stream_timeout()
+                ) as response:
                     if response.status != 200:
-                        error_msg = response_data.get("error", {}).get("message", "Unknown error")
-                        raise ModelClientError(f"Gemini API error: {error_msg}")
+                        await self._read_response(response, "gemini", "Gemini")
                     
-                    return self._parse_gemini_response(response_data)
-                    
-        except aiohttp.ClientError as e:
-            raise ModelClientError(f"网络请求失败: {e}")
+                    usage_metadata = None
+                    async for data in self._iter_sse_data(response):
+                        chunk = json.loads(data)
+                        if "error" in chunk:
+                            raise ModelClientError(f"Gemini API error: {chunk['error'].get('message', 'Unknown error')}")
+                        usage_metadata = chunk.get("usageMetadata") or usage_metadata
+                        for candidate in chunk.get("candidates", [])[:1]:
+                            for part in candidate.get("content", {}).get("parts", []):
+                                if part.get("text"):
+                                    yield part["text"]
+                    if on_usage and usage_metadata:
+                        on_usage(self._parse_usage(usage_metadata))
+                                    
+        except ModelClientError:
+            raise
         except Exception as e:
-            self.logger.error(f"Gemini API调用失败: {e}")
-            raise ModelClientError(f"调用失败: {e}")
+            raise self._wrap_error(e, "Gemini")
+    
+    def _headers(self) -> Dict[str, str]:
+        """请求头"""
+        return {
+            "Content-Type": "application/json",
+            "x-goog-api-key": self.api_key
+        }
+    
+    @staticmethod
+    def _parse_usage(usage_metadata: Dict[str, Any]) -> Dict[str, int]:
+        """转换Gemini用量统计"""
+        return {
+            "prompt_tokens": usage_metadata.get("promptTokenCount", 0),
+            "completion_tokens": usage_metadata.get("candidatesTokenCount", 0),
+            "total_tokens": usage_metadata.get("totalTokenCount", 0)
+        }
+    
+    def _build_request_data(self, messages: List[ModelMessage], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """构建请求数据"""
+        return {
+            "contents": self._build_gemini_contents(messages),
+            "generationConfig": {
+                "maxOutputTokens": kwargs.get("max_tokens", self.config.get("max_tokens", 4000)),
+                "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
+            }
+        }
     
     def _build_gemini_contents(self, messages: List[ModelMessage]) -> List[Dict[str, Any]]:
         """构建Gemini格式的内容"""
@@ -165,11 +361,11 @@ class GeminiClient(BaseModelClient):
                         # 处理base64图片
                         image_data = item["image_url"]["url"]
                         if image_data.startswith("data:"):
-                            # 提取base64数据
-                            _, base64_data = image_data.split(",", 1)
+                            # 提取MIME类型与base64数据
+                            header, base64_data = image_data.split(",", 1)
                             parts.append({
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": header[5:].split(";", 1)[0] or "image/png",
                                     "data": base64_data
                                 }
                             })
@@ -197,17 +393,9 @@ class GeminiClient(BaseModelClient):
             
             text_content = parts[0].get("text", "")
             
-            # 获取使用统计
-            usage_metadata = response_data.get("usageMetadata", {})
-            usage = {
-                "prompt_tokens": usage_metadata.get("promptTokenCount", 0),
-                "completion_tokens": usage_metadata.get("candidatesTokenCount", 0),
-                "total_tokens": usage_metadata.get("totalTokenCount", 0)
-            }
-            
             return ModelResponse(
                 content=text_content,
-                usage=usage,
+                usage=self._parse_usage(response_data.get("usageMetadata", {})),
                 model=self.model,
                 provider="gemini",
                 finish_reason=candidate.get("finishReason", "stop").lower()
@@ -218,16 +406,22 @@ class GeminiClient(BaseModelClient):
 
 
 class DeepSeekClient(BaseModelClient):
-    """DeepSeek 客户端"""
+    """DeepSeek 客户端（OpenAI 兼容接口）"""
     
-    def __init__(self, config_section: Dict[str, Any]):
-        super().__init__(config_section)
+    PROVIDER = "deepseek"
+    LABEL = "DeepSeek"
+    DEFAULT_MODEL = "deepseek-chat"
+    DEFAULT_BASE_URL = "https://api.deepseek.com"
+    supports_images = False
+    
+    def __init__(self, config_section: Dict[str, Any], session_factory: Optional[SessionFactory] = None):
+        super().__init__(config_section, session_factory)
         self.api_key = config_section.get("api_key")
-        self.model = config_section.get("model", "deepseek-chat")
-        self.base_url = config_section.get("base_url", "https://api.deepseek.com")
+        self.model = config_section.get("model", self.DEFAULT_MODEL)
+        self.base_url = config_section.get("base_url", self.DEFAULT_BASE_URL)
         
         if not self.api_key:
-            raise ModelClientError("DeepSeek API key is required")
+            raise ModelClientError(f"{self.LABEL} API key is required")
             
     async def chat_completion(
         self,
@@ -236,44 +430,93 @@ class DeepSeekClient(BaseModelClient):
     ) -> ModelResponse:
         """DeepSeek 聊天完成"""
         try:
-            # 构建请求数据
-            request_messages = self._build_deepseek_messages(messages)
-            
-            request_data = {
-                "model": self.model,
-                "messages": request_messages,
-                "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 4096)),
-                "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
-                "stream": False
-            }
-            
             # 构建请求URL
             url = f"{self.base_url}/chat/completions"
             
             # 发送请求
-            async with aiohttp.ClientSession() as session:
+            async with self._session() as session:
                 async with session.post(
                     url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json=request_data,
+                    headers=self._headers(),
+                    json=self._build_request_data(messages, kwargs, stream=False),
                     timeout=aiohttp.ClientTimeout(total=self.config.get("timeout", 30))
                 ) as response:
-                    response_data = await response.json()
+                    response_data = await self._read_response(response, self.PROVIDER, self.LABEL)
+                    return self._parse_deepseek_response(response_data)
                     
+        except ModelClientError:
+            raise
+        except Exception as e:
+            raise self._wrap_error(e, self.LABEL)
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[ModelMessage],
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """DeepSeek 流式聊天完成（SSE，用量在最后一段中返回）"""
+        url = f"{self.base_url}/chat/completions"
+        
+        try:
+            async with self._session() as session:
+                async with session.post(
+                    url,
+                    headers=self._headers(),
+                    json=self._build_request_data(messages, kwargs, stream=True),
+                    timeout=self._stream_timeout()
+                ) as response:
                     if response.status != 200:
-                        error_msg = response_data.get("error", {}).get("message", "Unknown error")
-                        raise ModelClientError(f"DeepSeek API error: {error_msg}")
-                    
-                    return self._parse_deepseek_response(response_data)
+                        await self._read_response(response, self.PROVIDER, self.LABEL)
                     
-        except aiohttp.ClientError as e:
-            raise ModelClientError(f"网络请求失败: {e}")
+                    async for data in self._iter_sse_data(response):
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if on_usage and chunk.get("usage"):
+                            on_usage(self._parse_usage(chunk["usage"]))
+                        for choice in chunk.get("choices", [])[:1]:
+                            delta = choice.get("delta", {}).get("content")
+                            if delta:
+                                yield delta
+                                
+        except ModelClientError:
+            raise
         except Exception as e:
-            self.logger.error(f"DeepSeek API调用失败: {e}")
-            raise ModelClientError(f"调用失败: {e}")
+            raise self._wrap_error(e, self.LABEL)
+    
+    def _headers(self) -> Dict[str, str]:
+        """请求头"""
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+    
+    @staticmethod
+    def _parse_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+        """转换用量统计"""
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0)
+        }
+    
+    def _build_request_data(
+        self,
+        messages: List[ModelMessage],
+        kwargs: Dict[str, Any],
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """构建请求数据"""
+        return {
+            "model": self.model,
+            "messages": self._build_deepseek_messages(messages),
+            "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 4096)),
+            "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
+            "stream": stream,
+            # 流式请求在最后一段返回用量
+            **({"stream_options": {"include_usage": True}} if stream else {})
+        }
     
     def _build_deepseek_messages(self, messages: List[ModelMessage]) -> List[Dict[str, Any]]:
         """构建DeepSeek格式的消息"""
@@ -315,24 +558,16 @@ class DeepSeekClient(BaseModelClient):
             message = choice.get("message", {})
             content = message.get("content", "")
             
-            # 获取使用统计
-            usage = response_data.get("usage", {})
-            usage_dict = {
-                "prompt_tokens": usage.get("prompt_tokens", 0),
-                "completion_tokens": usage.get("completion_tokens", 0),
-                "total_tokens": usage.get("total_tokens", 0)
-            }
-            
             return ModelResponse(
                 content=content,
-                usage=usage_dict,
+                usage=self._parse_usage(response_data.get("usage", {})),
                 model=response_data.get("model", self.model),
-                provider="deepseek",
+                provider=self.PROVIDER,
                 finish_reason=choice.get("finish_reason", "stop")
             )
             
         except Exception as e:
-            raise ModelClientError(f"解析DeepSeek响应失败: {e}")
+            raise ModelClientError(f"解析{self.LABEL}响应失败: {e}")
     
     async def analyze_image(
         self,
@@ -352,6 +587,189 @@ class DeepSeekClient(BaseModelClient):
         return await self.chat_completion([fallback_message], **kwargs)
 
 
+class OpenAIClient(DeepSeekClient):
+    """OpenAI 客户端（复用 OpenAI 兼容接口实现，支持图片）"""
+    
+    PROVIDER = "openai"
+    LABEL = "OpenAI"
+    DEFAULT_MODEL = "gpt-4o"
+    DEFAULT_BASE_URL = "https://api.openai.com/v1"
+    supports_images = True
+    
+    def _build_deepseek_messages(self, messages: List[ModelMessage]) -> List[Dict[str, Any]]:
+        """构建OpenAI格式的消息（多模态内容原样传递）"""
+        return [{"role": message.role, "content": message.content} for message in messages]
+    
+    async def analyze_image(
+        self,
+        image_path: Union[str, Path],
+        prompt: str = "请分析这张图片的内容",
+        **kwargs
+    ) -> ModelResponse:
+        """分析图片"""
+        return await BaseModelClient.analyze_image(self, image_path, prompt, **kwargs)
+
+
+class AnthropicClient(BaseModelClient):
+    """Anthropic Claude 客户端（Messages API）"""
+    
+    API_VERSION = "2023-06-01"
+    max_image_dimension = 1568
+    
+    def __init__(self, config_section: Dict[str, Any], session_factory: Optional[SessionFactory] = None):
+        super().__init__(config_section, session_factory)
+        self.api_key = config_section.get("api_key")
+        self.model = config_section.get("model", "claude-3-5-sonnet-20241022")
+        self.base_url = config_section.get("base_url", "https://api.anthropic.com")
+        
+        if not self.api_key:
+            raise ModelClientError("Anthropic API key is required")
+    
+    async def chat_completion(
+        self,
+        messages: List[ModelMessage],
+        **kwargs
+    ) -> ModelResponse:
+        """Anthropic 聊天完成"""
+        try:
+            async with self._session() as session:
+                async with session.post(
+                    f"{self.base_url}/v1/messages",
+                    headers=self._headers(),
+                    json=self._build_request_data(messages, kwargs),
+                    timeout=aiohttp.ClientTimeout(total=self.config.get("timeout", 30))
+                ) as response:
+                    response_data = await self._read_response(response, "anthropic", "Anthropic")
+                    return self._parse_anthropic_response(response_data)
+                    
+        except ModelClientError:
+            raise
+        except Exception as e:
+            raise self._wrap_error(e, "Anthropic")
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[ModelMessage],
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Anthropic 流式聊天完成（SSE，输入用量在 message_start、输出用量在 message_delta 中）"""
+        try:
+            async with self._session() as session:
+                async with session.post(
+                    f"{self.base_url}/v1/messages",
+                    headers=self._headers(),
+                    json=self._build_request_data(messages, kwargs, stream=True),
+                    timeout=self._stream_timeout()
+                ) as response:
+                    if response.status != 200:
+                        await self._read_response(response, "anthropic", "Anthropic")
+                    
+                    usage: Dict[str, Any] = {}
+                    async for data in self._iter_sse_data(response):
+                        event = json.loads(data)
+                        if event.get("type") == "message_start":
+                            usage.update(event.get("message", {}).get("usage", {}))
+                        elif event.get("type") == "message_delta":
+                            usage.update(event.get("usage", {}))
+                        if event.get("type") == "content_block_delta":
+                            text = event.get("delta", {}).get("text")
+                            if text:
+                                yield text
+                        elif event.get("type") == "error":
+                            raise ModelClientError(
+                                f"Anthropic API error: {event.get('error', {}).get('message', 'Unknown error')}",
+                                retryable=event.get("error", {}).get("type") == "overloaded_error"
+                            )
+                        elif event.get("type") == "message_stop":
+                            break
+                    if on_usage and usage:
+                        on_usage(self._parse_usage(usage))
+                            
+        except ModelClientError:
+            raise
+        except Exception as e:
+            raise self._wrap_error(e, "Anthropic")
+    
+    def _headers(self) -> Dict[str, str]:
+        """请求头"""
+        return {
+            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": self.API_VERSION
+        }
+    
+    def _build_request_data(
+        self,
+        messages: List[ModelMessage],
+        kwargs: Dict[str, Any],
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """构建请求数据（system 消息单独传递）"""
+        system_prompts = [m.content for m in messages if m.role == "system" and isinstance(m.content, str)]
+        request_data = {
+            "model": self.model,
+            "messages": [
+                {"role": message.role, "content": self._build_anthropic_content(message.content)}
+                for message in messages if message.role != "system"
+            ],
+            "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 4000)),
+            "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
+            "stream": stream
+        }
+        if system_prompts:
+            request_data["system"] = "\n\n".join(system_prompts)
+        return request_data
+    
+    @staticmethod
+    def _parse_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+        """转换Anthropic用量统计"""
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        return {
+            "prompt_tokens": input_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+    
+    def _build_anthropic_content(self, content: Union[str, List[Dict[str, Any]]]) -> Union[str, List[Dict[str, Any]]]:
+        """构建Anthropic格式的内容块"""
+        if isinstance(content, str):
+            return content
+        
+        blocks = []
+        for item in content:
+            if item["type"] == "text":
+                blocks.append({"type": "text", "text": item["text"]})
+            elif item["type"] == "image_url":
+                image_data = item["image_url"]["url"]
+                if image_data.startswith("data:"):
+                    header, base64_data = image_data.split(",", 1)
+                    media_type = header[5:].split(";", 1)[0] or "image/png"
+                    blocks.append({
+                        "type": "image",
+                        "source": {"type": "base64", "media_type": media_type, "data": base64_data}
+                    })
+        return blocks
+    
+    def _parse_anthropic_response(self, response_data: Dict[str, Any]) -> ModelResponse:
+        """解析Anthropic响应"""
+        try:
+            text_content = "".join(
+                block.get("text", "") for block in response_data.get("content", []) if block.get("type") == "text"
+            )
+            return ModelResponse(
+                content=text_content,
+                usage=self._parse_usage(response_data.get("usage", {})),
+                model=response_data.get("model", self.model),
+                provider="anthropic",
+                finish_reason=response_data.get("stop_reason") or "stop"
+            )
+            
+        except Exception as e:
+            raise ModelClientError(f"解析Anthropic响应失败: {e}")
+
+
 class ModelClientManager:
     """模型客户端管理器"""
     
@@ -359,6 +777,111 @@ class ModelClientManager:
         self.settings = get_settings()
         self.logger = get_logger("model.manager")
         self._clients = {}
+        # 每个提供商一个长连接会话，绑定创建它的事件循环
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._session_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        
+        # 每个提供商一个限流器，同样绑定事件循环
+        self._limiters: Dict[str, ProviderRateLimiter] = {}
+        self._limiter_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        
+        model_settings = self.settings.model
+        self.failover = ProviderFailover(HedgePolicy(
+            enabled=model_settings.hedge_enabled,
+            percentile=model_settings.hedge_percentile,
+            min_delay=model_settings.hedge_min_delay,
+            default_delay=model_settings.hedge_default_delay,
+            min_samples=model_settings.hedge_min_samples
+        ))
+        self.cache: Optional[ModelResponseCache] = None
+        if model_settings.cache_enabled:
+            self.cache = ModelResponseCache(
+                cache_dir=model_settings.cache_dir,
+                ttl=model_settings.cache_ttl,
+                memory_entries=model_settings.cache_memory_entries,
+                max_disk_bytes=model_settings.cache_max_disk_mb * 1024 * 1024
+            )
+        
+    async def get_session(self, provider: str) -> aiohttp.ClientSession:
+        """获取提供商的共享HTTP会话"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(provider)
+        
+        if session is not None and not session.closed and self._session_loops.get(provider) is not loop:
+            # CLI 每个命令运行在独立的事件循环中，旧循环的连接无法复用
+            self.logger.debug(f"事件循环已切换，重建 {provider} HTTP会话")
+            session = None
+        
+        if session is None or session.closed:
+            model_settings = self.settings.model
+            connector = aiohttp.TCPConnector(
+                limit=model_settings.http_pool_limit,
+                limit_per_host=model_settings.http_pool_limit_per_host,
+                ttl_dns_cache=model_settings.http_dns_cache_ttl,
+                keepalive_timeout=model_settings.http_keepalive_timeout
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=model_settings.timeout,
+                    connect=model_settings.http_connect_timeout
+                )
+            )
+            self._sessions[provider] = session
+            self._session_loops[provider] = loop
+            self.logger.info(f"创建 {provider} HTTP连接池, 最大连接数: {model_settings.http_pool_limit}")
+        
+        return session
+    
+    def get_rate_limiter(self, provider: str) -> ProviderRateLimiter:
+        """获取提供商的限流器"""
+        provider = provider.lower()
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(provider)
+        
+        if limiter is None or self._limiter_loops.get(provider) is not loop:
+            model_settings = self.settings.model
+            limiter = ProviderRateLimiter(
+                provider,
+                max_concurrency=getattr(model_settings, f"{provider}_max_concurrency", model_settings.max_concurrent_requests),
+                tokens_per_minute=getattr(model_settings, f"{provider}_tokens_per_minute", model_settings.tokens_per_minute),
+                retry_policy=RetryPolicy(
+                    max_retries=model_settings.max_retries,
+                    base_delay=model_settings.retry_base_delay,
+                    max_delay=model_settings.retry_max_delay
+                )
+            )
+            self._limiters[provider] = limiter
+            self._limiter_loops[provider] = loop
+        
+        return limiter
+    
+    def _estimate_tokens(self, messages: List[ModelMessage], kwargs: Dict[str, Any]) -> int:
+        """粗略预估请求 token 数（提示词按每 2 字符 1 token，加最大输出）"""
+        chars = 0
+        images = 0
+        for message in messages:
+            if isinstance(message.content, str):
+                chars += len(message.content)
+                continue
+            for item in message.content:
+                if item.get("type") == "text":
+                    chars += len(item.get("text", ""))
+                else:
+                    images += 1
+        
+        max_tokens = kwargs.get("max_tokens", self.settings.model.max_tokens)
+        return chars // 2 + images * IMAGE_TOKEN_ESTIMATE + int(max_tokens)
+    
+    async def close(self) -> None:
+        """关闭所有HTTP会话"""
+        loop = asyncio.get_running_loop()
+        for provider, session in list(self._sessions.items()):
+            if not session.closed and self._session_loops.get(provider) is loop:
+                await session.close()
+            self._sessions.pop(provider, None)
+            self._session_loops.pop(provider, None)
+        self.logger.info("模型客户端HTTP会话已关闭")
         
     def get_client(self, provider: Optional[str] = None) -> BaseModelClient:
         """获取模型客户端"""
@@ -369,6 +892,19 @@ class ModelClientManager:
             
         return self._clients[provider]
     
+    def model_name(self, provider: Optional[str] = None) -> str:
+        """提供商配置的模型名称（无需创建客户端）"""
+        provider = provider or self.settings.model.default_provider
+        if provider in self._clients:
+            return getattr(self._clients[provider], "model", "")
+        model_settings = self.settings.model
+        return {
+            "gemini": model_settings.gemini_model,
+            "deepseek": model_settings.default_model,
+            "openai": model_settings.openai_model,
+            "anthropic": model_settings.anthropic_model
+        }.get(provider.lower(), "")
+    
     def _create_client(self, provider: str) -> BaseModelClient:
         """创建模型客户端"""
         if provider.lower() == "gemini":
@@ -380,7 +916,7 @@ class ModelClientManager:
                 "temperature": self.settings.model.temperature,
                 "timeout": self.settings.model.timeout
             }
-            return GeminiClient(config)
+            return GeminiClient(config, lambda: self.get_session("gemini"))
         elif provider.lower() == "deepseek":
             config = {
                 "api_key": self.settings.model.deepseek_api_key,
@@ -390,34 +926,247 @@ class ModelClientManager:
                 "temperature": self.settings.model.temperature,
                 "timeout": self.settings.model.timeout
             }
-            return DeepSeekClient(config)
+            return DeepSeekClient(config, lambda: self.get_session("deepseek"))
+        elif provider.lower() == "openai":
+            config = {
+                "api_key": self.settings.model.openai_api_key,
+                "model": self.settings.model.openai_model,
+                "base_url": self.settings.model.openai_base_url,
+                "max_tokens": self.settings.model.max_tokens,
+                "temperature": self.settings.model.temperature,
+                "timeout": self.settings.model.timeout
+            }
+            return OpenAIClient(config, lambda: self.get_session("openai"))
+        elif provider.lower() == "anthropic":
+            config = {
+                "api_key": self.settings.model.anthropic_api_key,
+                "model": self.settings.model.anthropic_model,
+                "base_url": self.settings.model.anthropic_base_url,
+                "max_tokens": self.settings.model.max_tokens,
+                "temperature": self.settings.model.temperature,
+                "timeout": self.settings.model.timeout
+            }
+            return AnthropicClient(config, lambda: self.get_session("anthropic"))
         else:
             raise ModelClientError(f"不支持的模型提供商: {provider}")
     
+    def _cache_key(
+        self,
+        provider: str,
+        client: BaseModelClient,
+        messages: List[Any],
+        kwargs: Dict[str, Any]
+    ) -> str:
+        """计算请求的缓存键（生成参数包含配置默认值）"""
+        params = {
+            "max_tokens": self.settings.model.max_tokens,
+            "temperature": self.settings.model.temperature,
+            **kwargs
+        }
+        return make_cache_key(provider, getattr(client, "model", ""), messages, params)
+    
+    async def _cached_call(self, cache_key: Optional[str], call) -> ModelResponse:
+        """带缓存的模型调用"""
+        if self.cache is None or cache_key is None:
+            return await call()
+        
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.logger.debug(f"模型响应缓存命中: {cache_key[:12]}")
+            return ModelResponse(**{**cached, "cached": True})
+        
+        response = await call()
+        self.cache.put(cache_key, {**asdict(response), "cached": False})
+        return response
+    
+    def get_cache_statistics(self) -> Dict[str, Any]:
+        """获取响应缓存统计"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_statistics()}
+    
+    def get_rate_limit_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """获取各提供商的限流统计（排队等待、重试次数等）"""
+        return {provider: limiter.get_statistics() for provider, limiter in self._limiters.items()}
+    
+    def get_failover_providers(self, require_images: bool = False) -> List[str]:
+        """获取可用于故障转移的提供商（默认提供商优先，仅包含已配置密钥的提供商）"""
+        model_settings = self.settings.model
+        default = model_settings.default_provider
+        if not model_settings.failover_enabled:
+            return [default]
+        
+        providers = []
+        for provider in [default, *model_settings.failover_providers]:
+            provider = provider.lower()
+            if provider in providers or not getattr(model_settings, f"{provider}_api_key", None):
+                continue
+            if require_images:
+                try:
+                    if not self.get_client(provider).supports_images:
+                        continue
+                except ModelClientError:
+                    continue
+            providers.append(provider)
+        
+        return providers or [default]
+    
+    def get_failover_statistics(self) -> Dict[str, Any]:
+        """获取故障转移、对冲请求与各提供商延迟统计"""
+        return self.failover.get_statistics()
+    
+    async def _timed_call(self, provider: str, call: Callable[[], Awaitable[ModelResponse]]) -> ModelResponse:
+        """执行一次模型调用并记录成功调用的延迟"""
+        started = time.monotonic()
+        response = await call()
+        self.failover.observe(provider, time.monotonic() - started)
+        return response
+    
+    async def _with_failover(
+        self,
+        provider: Optional[str],
+        call: Callable[..., Awaitable[ModelResponse]],
+        require_images: bool = False
+    ) -> ModelResponse:
+        """执行调用：指定提供商时只调用该提供商，否则在可用提供商间对冲与故障转移
+
+        call 接受 on_sent（请求发出回调）和 retry（是否在限流器内重试）关键字参数。
+        """
+        if provider:
+            return await call(provider)
+        
+        providers = self.get_failover_providers(require_images)
+        if len(providers) == 1:
+            return await call(providers[0])
+        return await self.failover.run(providers, call)
+    
     async def chat_completion(
         self,
         messages: Union[List[ModelMessage], List[Dict[str, str]]],
         provider: Optional[str] = None,
+        use_cache: bool = True,
         **kwargs
     ) -> ModelResponse:
-        """聊天完成（简化接口）"""
+        """聊天完成（简化接口）
+        
+        未指定提供商时，默认提供商响应过慢会向备用提供商发送对冲请求，调用失败时自动切换。
+        """
         # 转换消息格式
         if messages and isinstance(messages[0], dict):
             messages = [ModelMessage(role=msg["role"], content=msg["content"]) for msg in messages]
         
+        estimated_tokens = self._estimate_tokens(messages, kwargs)
+        
+        async def call(name: str, on_sent=None, retry: bool = True) -> ModelResponse:
+            client = self.get_client(name)
+            cache_key = self._cache_key(name, client, messages, kwargs) if use_cache else None
+            limiter = self.get_rate_limiter(name)
+            return await self._cached_call(
+                cache_key,
+                lambda: limiter.execute(
+                    lambda: self._timed_call(name, lambda: client.chat_completion(messages, **kwargs)),
+                    estimated_tokens,
+                    on_sent=on_sent,
+                    retry=retry
+                )
+            )
+        
+        require_images = any(not isinstance(message.content, str) for message in messages)
+        return await self._with_failover(provider, call, require_images)
+    
+    async def stream_chat_completion(
+        self,
+        messages: Union[List[ModelMessage], List[Dict[str, str]]],
+        provider: Optional[str] = None,
+        use_cache: bool = True,
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """流式聊天完成（简化接口），逐段产出文本
+        
+        缓存命中时一次性产出完整内容（不产生新的用量）；完整流式结果连同用量写入缓存。
+        
+        Args:
+            on_usage: 流结束后收到实际用量时的回调
+        """
+        if messages and isinstance(messages[0], dict):
+            messages = [ModelMessage(role=msg["role"], content=msg["content"]) for msg in messages]
+        
+        # 流式输出已推送给调用方后无法切换，只在开始前选择第一个可用提供商
+        provider = provider or self.get_failover_providers()[0]
         client = self.get_client(provider)
-        return await client.chat_completion(messages, **kwargs)
+        cache_key = self._cache_key(provider, client, messages, kwargs) if use_cache and self.cache else None
+        
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached["content"]
+                return
+        
+        limiter = self.get_rate_limiter(provider)
+        parts = []
+        usage: Dict[str, int] = {}
+        
+        def open_stream():
+            usage.clear()
+            return client.stream_chat_completion(messages, on_usage=usage.update, **kwargs)
+        
+        async for delta in limiter.stream(open_stream, self._estimate_tokens(messages, kwargs), lambda: usage):
+            parts.append(delta)
+            yield delta
+        
+        if on_usage and usage:
+            on_usage(dict(usage))
+        if cache_key:
+            response = ModelResponse(
+                content="".join(parts),
+                usage=dict(usage),
+                model=getattr(client, "model", ""),
+                provider=provider
+            )
+            self.cache.put(cache_key, asdict(response))
     
     async def analyze_image(
         self,
         image_path: Union[str, Path],
         prompt: str = "请分析这张图片的内容",
         provider: Optional[str] = None,
+        use_cache: bool = True,
         **kwargs
     ) -> ModelResponse:
-        """分析图片（简化接口）"""
-        client = self.get_client(provider)
-        return await client.analyze_image(image_path, prompt, **kwargs)
+        """分析图片（简化接口），未指定提供商时在支持图片的提供商间故障转移"""
+        image_path = Path(image_path)
+        image_hash = None
+        if use_cache and image_path.exists():
+            # 整页截图可达数十MB，在线程中分块计算哈希，不阻塞事件循环
+            image_hash = await asyncio.to_thread(hash_file, image_path)
+        
+        estimated_tokens = self._estimate_tokens(
+            [ModelMessage(role="user", content=[{"type": "text", "text": prompt}, {"type": "image_url"}])],
+            kwargs
+        )
+        
+        async def call(name: str, on_sent=None, retry: bool = True) -> ModelResponse:
+            client = self.get_client(name)
+            cache_key = None
+            if image_hash:
+                messages = [{"role": "user", "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_file", "sha256": image_hash}
+                ]}]
+                cache_key = self._cache_key(name, client, messages, kwargs)
+            limiter = self.get_rate_limiter(name)
+            return await self._cached_call(
+                cache_key,
+                lambda: limiter.execute(
+                    lambda: self._timed_call(name, lambda: client.analyze_image(image_path, prompt, **kwargs)),
+                    estimated_tokens,
+                    on_sent=on_sent,
+                    retry=retry
+                )
+            )
+        
+        return await self._with_failover(provider, call, require_images=True)
     
     async def summarize_text(
         self,
@@ -426,11 +1175,84 @@ class ModelClientManager:
         provider: Optional[str] = None,
         **kwargs
     ) -> ModelResponse:
-        """文本总结（便捷方法）"""
-        prompt = prompt_template.format(text=text[:8000])  # 限制长度
+        """文本总结（便捷方法）
+        
+        超出单次预算的长文本先经 condense_text 分段总结，再套用提示词模板。
+        """
+        condensed = await self.condense_text(text, provider=provider, **kwargs)
+        prompt = prompt_template.format(text=condensed.content)
         
         messages = [ModelMessage(role="user", content=prompt)]
-        return await self.chat_completion(messages, provider, **kwargs)
+        response = await self.chat_completion(messages, provider, **kwargs)
+        response.usage = merge_usage(condensed.usage, response.usage)
+        response.cached = response.cached and condensed.cached
+        return response
+    
+    async def condense_text(
+        self,
+        text: str,
+        provider: Optional[str] = None,
+        *,
+        budget_tokens: Optional[int] = None,
+        **kwargs
+    ) -> ModelResponse:
+        """把长文本压缩到 token 预算以内（map-reduce）
+        
+        预算内的文本原样返回；否则按章节/段落分段并发总结（受提供商限流约束），
+        摘要合计仍超出预算时逐层分组归约。分段摘要经响应缓存按分段内容缓存，
+        文档修改后只有变化的分段会重新总结。
+        
+        Args:
+            text: 原始文本
+            provider: 模型提供商
+            budget_tokens: 输入 token 预算（默认 summary_chunk_tokens）
+            **kwargs: 分段总结调用的其他参数（max_tokens 输出上限不用于分段总结）
+        """
+        budget = budget_tokens or self.settings.model.summary_chunk_tokens
+        if estimate_tokens(text) <= budget:
+            return ModelResponse(
+                content=text,
+                usage=merge_usage(),
+                model="",
+                provider=provider or self.settings.model.default_provider,
+                cached=True
+            )
+        
+        kwargs.pop("max_tokens", None)
+        summary_tokens = self.settings.model.summary_chunk_output_tokens
+        
+        async def summarize(prompt: str) -> ModelResponse:
+            return await self.chat_completion(
+                [ModelMessage(role="user", content=prompt)], provider, max_tokens=summary_tokens, **kwargs
+            )
+        
+        chunks = split_text(text, budget)
+        self.logger.info(f"长文本分段总结: {estimate_tokens(text)} tokens, {len(chunks)} 个分段")
+        
+        responses = list(await asyncio.gather(*(
+            summarize(CHUNK_SUMMARY_PROMPT.format(
+                heading=f"（所在章节：{chunk.heading}）" if chunk.heading else "",
+                text=chunk.text
+            ))
+            for chunk in chunks
+        )))
+        summaries = [response.content for response in responses]
+        
+        while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > budget:
+            groups = group_by_budget(summaries, budget)
+            level = await asyncio.gather(*(
+                summarize(REDUCE_SUMMARY_PROMPT.format(text="\n\n".join(group))) for group in groups
+            ))
+            responses.extend(level)
+            summaries = [response.content for response in level]
+        
+        return ModelResponse(
+            content="\n\n".join(summaries),
+            usage=merge_usage(*(response.usage for response in responses)),
+            model=responses[0].model,
+            provider=responses[0].provider,
+            cached=all(response.cached for response in responses)
+        )
 
 
 # 全局模型客户端管理器实例
@@ -441,4 +1263,10 @@ def get_model_client() -> ModelClientManager:
     global _model_manager
     if _model_manager is None:
         _model_manager = ModelClientManager()
-    return _model_manager 
\ No newline at end of file
+    return _model_manager
+
+
+async def close_model_client() -> None:
+    """关闭全局模型客户端管理器持有的HTTP会话"""
+    if _model_manager is not None:
+        await _model_manager.close() 
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+大模型提供商故障转移与对冲请求
+按提供商记录延迟直方图，主请求超过 p95 延迟后向下一个提供商发送对冲请求，
+先返回的结果胜出并取消另一个；请求失败时自动切换到下一个提供商
+"""
+
+import asyncio
+import bisect
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.logger import get_logger
+
+
+# 直方图桶上界（秒），按约 1.25 倍递增，覆盖 50ms ~ 10min
+DEFAULT_BUCKETS = tuple(round(0.05 * 1.25 ** i, 3) for i in range(43))
+
+
+class LatencyHistogram:
+    """延迟直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为溢出桶
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """记录一次延迟"""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p: float) -> Optional[float]:
+        """估算分位数（返回所在桶的上界），无样本时返回 None"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "count": self.count,
+            "average": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99)
+        }
+
+
+@dataclass
+class HedgePolicy:
+    """对冲策略"""
+    enabled: bool = True
+    percentile: float = 0.95
+    min_delay: float = 2.0        # 对冲延迟下限（秒）
+    default_delay: float = 10.0   # 样本不足时的对冲延迟（秒）
+    min_samples: int = 20         # 使用直方图所需的最少样本数
+
+    def delay_for(self, histogram: LatencyHistogram) -> Optional[float]:
+        """计算对冲延迟，未启用对冲时返回 None"""
+        if not self.enabled:
+            return None
+        if histogram.count < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+
+class ProviderFailover:
+    """多提供商故障转移执行器"""
+
+    def __init__(self, policy: Optional[HedgePolicy] = None):
+        self.logger = get_logger("model.failover")
+        self.policy = policy or HedgePolicy()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "failovers": 0,
+            "failed": 0,
+            "wins": {}
+        }
+
+    def histogram(self, provider: str) -> LatencyHistogram:
+        """获取提供商的延迟直方图"""
+        if provider not in self.histograms:
+            self.histograms[provider] = LatencyHistogram()
+        return self.histograms[provider]
+
+    def observe(self, provider: str, seconds: float) -> None:
+        """记录提供商一次成功调用的延迟"""
+        self.histogram(provider).observe(seconds)
+
+    async def run(self, providers: List[str], call: Callable[..., Awaitable[Any]]) -> Any:
+        """按顺序在提供商之间执行调用
+
+        同时最多有两个请求在途：主请求真正发出（拿到并发槽位和 token 预算、退避结束）
+        后超过对冲延迟时发送对冲请求，任一请求失败时立即切换到下一个提供商。
+
+        Args:
+            providers: 按优先级排列的提供商
+            call: 协程工厂 call(provider, on_sent=..., retry=...)，请求发出时调用 on_sent()；
+                retry 为 False 表示还有后备提供商，失败后不在提供商内部重试
+        """
+        self.stats["requests"] += 1
+        remaining = list(providers)
+        pending: Dict[asyncio.Task, str] = {}
+        sent_at: Dict[str, float] = {}
+        sent_events: Dict[str, asyncio.Event] = {}
+        first_provider = remaining[0] if remaining else None
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            provider = remaining.pop(0)
+            event = sent_events[provider] = asyncio.Event()
+
+            def on_sent() -> None:
+                sent_at[provider] = time.monotonic()
+                event.set()
+
+            coroutine = call(provider, on_sent=on_sent, retry=not remaining)
+            pending[asyncio.create_task(coroutine, name=f"model-{provider}")] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                waiter = None
+                if remaining and len(pending) == 1:
+                    primary = next(iter(pending.values()))
+                    delay = self.policy.delay_for(self.histogram(primary))
+                    if delay is not None and primary in sent_at:
+                        timeout = max(0.0, delay - (time.monotonic() - sent_at[primary]))
+                    elif delay is not None:
+                        # 请求还在排队（限流、退避），发出后才开始计算对冲延迟
+                        waiter = asyncio.create_task(sent_events[primary].wait())
+
+                try:
+                    done, _ = await asyncio.wait(
+                        [*pending, *([waiter] if waiter else [])],
+                        timeout=timeout,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    if waiter is not None:
+                        waiter.cancel()
+                done.discard(waiter)
+
+                if not done:
+                    if waiter is not None:
+                        continue
+                    # 主请求发出后超过对冲延迟，向下一个提供商发送对冲请求
+                    self.stats["hedged"] += 1
+                    self.logger.info(
+                        f"{next(iter(pending.values()))} 发出后超过 {delay:.1f}秒未返回，对冲请求 {remaining[0]}"
+                    )
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        wins = self.stats["wins"]
+                        wins[provider] = wins.get(provider, 0) + 1
+                        if provider != first_provider:
+                            self.stats["hedge_wins" if pending else "failovers"] += 1
+                        return task.result()
+                    last_error = error
+                    self.logger.warning(f"模型提供商 {provider} 调用失败: {error}")
+
+                if not pending and remaining:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        self.stats["failed"] += 1
+        raise last_error
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取故障转移与延迟统计"""
+        return {
+            **self.stats,
+            "latency": {provider: histogram.to_dict() for provider, histogram in self.histograms.items()},
+            "hedge_delay": {
+                provider: self.policy.delay_for(histogram) for provider, histogram in self.histograms.items()
+            }
+        }
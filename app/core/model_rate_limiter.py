@@ -0,0 +1,255 @@
+"""
+大模型调用限流与重试
+每个提供商一个限流器：并发信号量 + 每分钟 token 预算，
+可重试错误按指数退避（带抖动）重试，429 时遵循 Retry-After 并暂停整个提供商
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+from app.core.logger import get_logger
+
+
+@dataclass
+class RetryPolicy:
+    """重试策略"""
+    max_retries: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """计算第 attempt 次重试前的等待时间（全抖动指数退避）"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """判断错误是否可重试"""
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+        return True
+    return bool(getattr(error, "retryable", False))
+
+
+class TokenBucket:
+    """每分钟 token 预算（令牌桶）"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        """预留 token，预算不足时按先来先到排队等待"""
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) / self.rate)
+
+    def settle(self, reserved: int, actual: int) -> None:
+        """按实际用量结算预留的 token（多退少补，允许透支）"""
+        self._refill()
+        self.available = min(self.capacity, self.available + min(float(reserved), self.capacity) - actual)
+
+
+class ProviderRateLimiter:
+    """单个提供商的限流器"""
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int = 4,
+        tokens_per_minute: int = 0,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        self.provider = provider
+        self.logger = get_logger(f"model.limiter.{provider}")
+        self.max_concurrency = max_concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._paused_until = 0.0
+
+        self.stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "in_flight": 0,
+            "total_queue_wait": 0.0,
+            "max_queue_wait": 0.0
+        }
+
+    async def _wait_for_pause(self) -> None:
+        """等待提供商级暂停结束（收到 429 后）"""
+        while True:
+            remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def _record_queue_wait(self, waited: float) -> None:
+        """记录排队等待时间"""
+        self.stats["total_queue_wait"] += waited
+        self.stats["max_queue_wait"] = max(self.stats["max_queue_wait"], waited)
+
+    async def execute(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 0,
+        on_sent: Optional[Callable[[], None]] = None,
+        retry: bool = True
+    ) -> Any:
+        """在限流下执行调用，可重试错误按策略重试
+
+        Args:
+            call: 发起一次模型请求的协程工厂
+            estimated_tokens: 预估 token 数（提示词 + 最大输出）
+            on_sent: 拿到并发槽位、即将发出请求时的回调（对冲计时从此开始）
+            retry: 是否在限流器内重试；有后备提供商时由故障转移处理，不再重试
+        """
+        self.stats["requests"] += 1
+        attempt = 0
+
+        while True:
+            queued_at = time.monotonic()
+            await self._wait_for_pause()
+            if self.token_bucket:
+                await self.token_bucket.acquire(estimated_tokens)
+
+            try:
+                async with self._semaphore:
+                    self._record_queue_wait(time.monotonic() - queued_at)
+                    self.stats["in_flight"] += 1
+                    try:
+                        if on_sent:
+                            on_sent()
+                        result = await call()
+                    finally:
+                        self.stats["in_flight"] -= 1
+            except asyncio.CancelledError:
+                # 对冲请求被取消时归还预留的 token
+                self._release(estimated_tokens)
+                raise
+            except Exception as e:
+                self._release(estimated_tokens)
+                error = e
+            else:
+                if self.token_bucket:
+                    usage = getattr(result, "usage", None) or {}
+                    self.token_bucket.settle(estimated_tokens, int(usage.get("total_tokens") or estimated_tokens))
+                self.stats["succeeded"] += 1
+                return result
+
+            await self._backoff_or_raise(error, attempt if retry else self.retry_policy.max_retries)
+            attempt += 1
+
+    def _release(self, estimated_tokens: int) -> None:
+        """归还未实际使用的预留 token"""
+        if self.token_bucket:
+            self.token_bucket.settle(estimated_tokens, 0)
+
+    async def stream(
+        self,
+        open_stream: Callable[[], AsyncIterator[Any]],
+        estimated_tokens: int = 0,
+        get_usage: Optional[Callable[[], Optional[Dict[str, int]]]] = None
+    ) -> AsyncIterator[Any]:
+        """在限流下执行流式调用
+
+        只有在产出第一段内容之前失败才会重试，之后的错误直接抛出。
+        流结束后按 get_usage 返回的实际用量结算预留的 token（没有用量时按预估结算）。
+
+        Args:
+            open_stream: 打开一次流式请求的异步迭代器工厂
+            estimated_tokens: 预估 token 数
+            get_usage: 流结束后获取实际用量
+        """
+        self.stats["requests"] += 1
+        attempt = 0
+
+        while True:
+            queued_at = time.monotonic()
+            await self._wait_for_pause()
+            if self.token_bucket:
+                await self.token_bucket.acquire(estimated_tokens)
+
+            started = False
+            try:
+                async with self._semaphore:
+                    self._record_queue_wait(time.monotonic() - queued_at)
+                    self.stats["in_flight"] += 1
+                    try:
+                        async for item in open_stream():
+                            started = True
+                            yield item
+                    finally:
+                        self.stats["in_flight"] -= 1
+            except asyncio.CancelledError:
+                if not started:
+                    self._release(estimated_tokens)
+                raise
+            except Exception as e:
+                if started:
+                    self.stats["failed"] += 1
+                    raise
+                self._release(estimated_tokens)
+                error = e
+            else:
+                if self.token_bucket and get_usage:
+                    usage = get_usage() or {}
+                    self.token_bucket.settle(estimated_tokens, int(usage.get("total_tokens") or estimated_tokens))
+                self.stats["succeeded"] += 1
+                return
+
+            await self._backoff_or_raise(error, attempt)
+            attempt += 1
+
+    async def _backoff_or_raise(self, error: Exception, attempt: int) -> None:
+        """可重试错误等待退避时间，否则（或重试耗尽）抛出原错误"""
+        retry_after = getattr(error, "retry_after", None)
+        if getattr(error, "http_status", None) == 429:
+            self.stats["rate_limited"] += 1
+
+        if not is_retryable_error(error) or attempt >= self.retry_policy.max_retries:
+            self.stats["failed"] += 1
+            raise error
+
+        delay = self.retry_policy.backoff(attempt, retry_after)
+        if retry_after is not None:
+            # 提供商明确要求等待，暂停该提供商的所有请求
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.stats["retries"] += 1
+        self.logger.warning(
+            f"{self.provider} 调用失败，{delay:.1f}秒后第 {attempt + 1} 次重试: {error}"
+        )
+        await asyncio.sleep(delay)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取限流统计"""
+        waits = self.stats["requests"] + self.stats["retries"]
+        return {
+            **self.stats,
+            "average_queue_wait": self.stats["total_queue_wait"] / waits if waits else 0.0,
+            "max_concurrency": self.max_concurrency,
+            "tokens_per_minute": int(self.token_bucket.capacity) if self.token_bucket else 0,
+            "available_tokens": int(self.token_bucket.available) if self.token_bucket else None
+        }
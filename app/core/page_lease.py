@@ -0,0 +1,104 @@
+"""
+浏览器页面租约
+多个平台实例并发执行时，保证每个实例独占一个标签页
+"""
+
+import uuid
+from typing import List, Optional
+
+from playwright.async_api import BrowserContext, Page
+
+from app.core.logger import get_logger
+
+
+# 租约记录在标签页的 sessionStorage 中：同源导航后仍然保留，
+# 且对连接到同一浏览器的所有 CDP 会话可见
+LEASE_KEY = "__agenthub_page_lease"
+
+ACQUIRE_SCRIPT = """
+(args) => {
+    try {
+        const now = Date.now();
+        const raw = window.sessionStorage.getItem(args.key);
+        const lease = raw ? JSON.parse(raw) : null;
+        if (lease && lease.owner !== args.owner && lease.expires > now) {
+            return false;
+        }
+        window.sessionStorage.setItem(args.key, JSON.stringify({ owner: args.owner, expires: now + args.ttlMs }));
+        return true;
+    } catch (e) {
+        return false;
+    }
+}
+"""
+
+RELEASE_SCRIPT = """
+(args) => {
+    try {
+        const raw = window.sessionStorage.getItem(args.key);
+        const lease = raw ? JSON.parse(raw) : null;
+        if (lease && lease.owner === args.owner) {
+            window.sessionStorage.removeItem(args.key);
+        }
+    } catch (e) {}
+}
+"""
+
+logger = get_logger("page_lease")
+
+
+def new_lease_owner(platform: str) -> str:
+    """生成租约持有者标识"""
+    return f"{platform}-{uuid.uuid4().hex[:12]}"
+
+
+async def try_lease_page(page: Page, owner: str, ttl: float = 7200) -> bool:
+    """尝试租用页面（JS 单线程执行，检查与写入是原子的）"""
+    try:
+        return bool(await page.evaluate(ACQUIRE_SCRIPT, {"key": LEASE_KEY, "owner": owner, "ttlMs": int(ttl * 1000)}))
+    except Exception as e:
+        logger.debug(f"页面租约检查失败: {e}")
+        return False
+
+
+async def acquire_platform_page(
+    context: BrowserContext,
+    domains: List[str],
+    base_url: str,
+    owner: str,
+    ttl: float = 7200
+) -> Page:
+    """租用一个平台页面
+
+    优先复用未被租用的平台标签页，全部被占用时新建标签页。
+
+    Args:
+        context: 浏览器上下文
+        domains: 平台域名列表
+        base_url: 新建标签页时打开的地址
+        owner: 租约持有者标识
+        ttl: 租约有效期（秒），持有者异常退出后到期自动释放
+    """
+    for page in context.pages:
+        if page.is_closed() or not any(domain in page.url.lower() for domain in domains):
+            continue
+        if await try_lease_page(page, owner, ttl):
+            logger.info(f"租用现有页面: {page.url}, 持有者: {owner}")
+            return page
+
+    page = await context.new_page()
+    await page.goto(base_url)
+    await try_lease_page(page, owner, ttl)
+    logger.info(f"新建并租用页面: {base_url}, 持有者: {owner}")
+    return page
+
+
+async def release_platform_page(page: Optional[Page], owner: str) -> None:
+    """释放页面租约"""
+    if not page or page.is_closed():
+        return
+    try:
+        await page.evaluate(RELEASE_SCRIPT, {"key": LEASE_KEY, "owner": owner})
+        logger.info(f"释放页面租约: {owner}")
+    except Exception as e:
+        logger.debug(f"释放页面租约失败: {e}")
@@ -0,0 +1,356 @@
+"""
+页面状态监听器
+通过 MutationObserver 和网络事件推送任务状态变化，替代固定间隔的轮询
+"""
+
+import asyncio
+import itertools
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import Page
+
+from app.core.logger import get_logger
+
+
+# 页面内注入的观察脚本：DOM 变化经防抖后计算状态，仅在状态变化时回传
+OBSERVER_SCRIPT = """
+(args) => {
+    const registry = window.__agenthubStatusWatchers = window.__agenthubStatusWatchers || {};
+    if (registry[args.watcherId]) {
+        registry[args.watcherId].disconnect();
+    }
+
+    const isVisible = (el) => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+    const queryAll = (selector) => {
+        try { return Array.from(document.querySelectorAll(selector)); } catch (e) { return []; }
+    };
+
+    const compute = () => {
+        if (args.loading.some((s) => queryAll(s).some(isVisible))) {
+            return { status: 'running', reason: 'loading' };
+        }
+        for (const selector of args.error) {
+            for (const el of queryAll(selector)) {
+                if (!isVisible(el)) continue;
+                const text = (el.textContent || '').toLowerCase();
+                if (args.errorKeywords.some((k) => text.includes(k.toLowerCase()))) {
+                    return { status: 'failed', reason: 'error', detail: text.slice(0, 200) };
+                }
+            }
+        }
+        let length = 0;
+        for (const selector of args.content) {
+            const elements = queryAll(selector);
+            if (elements.length) {
+                const text = (elements[elements.length - 1].textContent || '').trim();
+                length = Math.max(length, text.length);
+            }
+        }
+        if (length >= args.minContentLength) {
+            return { status: 'content', reason: 'content', length };
+        }
+        return { status: 'running', reason: length ? 'partial' : 'empty', length };
+    };
+
+    let timer = null;
+    let lastKey = null;
+    const report = () => {
+        timer = null;
+        const state = compute();
+        const key = state.status + ':' + (state.length || 0);
+        if (key !== lastKey) {
+            lastKey = key;
+            window[args.binding]({ watcherId: args.watcherId, state });
+        }
+    };
+
+    const observer = new MutationObserver(() => {
+        if (!timer) timer = setTimeout(report, args.debounceMs);
+    });
+    observer.observe(document.body || document.documentElement, {
+        childList: true,
+        subtree: true,
+        characterData: true,
+        attributes: true,
+        attributeFilter: ['class', 'style', 'data-loading', 'aria-busy', 'hidden']
+    });
+
+    registry[args.watcherId] = {
+        disconnect: () => {
+            observer.disconnect();
+            if (timer) clearTimeout(timer);
+            delete registry[args.watcherId];
+        }
+    };
+    report();
+}
+"""
+
+DISCONNECT_SCRIPT = """
+(watcherId) => {
+    const registry = window.__agenthubStatusWatchers || {};
+    if (registry[watcherId]) registry[watcherId].disconnect();
+}
+"""
+
+BINDING_NAME = "__agenthubStatusEvent"
+
+# 视为任务进行中的网络请求类型
+TRACKED_RESOURCE_TYPES = ("xhr", "fetch", "eventsource")
+
+DEFAULT_ERROR_KEYWORDS = ["积分", "insufficient", "error", "错误", "失败", "限制"]
+
+
+@dataclass
+class StatusEvent:
+    """状态事件"""
+    status: str
+    source: str
+    detail: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+
+# 每个页面只注册一次绑定，由 watcherId 分发到对应的监听器
+_page_channels: "weakref.WeakKeyDictionary[Page, Dict[str, PageStatusWatcher]]" = weakref.WeakKeyDictionary()
+_watcher_ids = itertools.count()
+
+
+class PageStatusWatcher:
+    """页面状态监听器
+
+    DOM 变化和网络请求结束都会触发状态重新评估；内容在 ``settle_time`` 秒内
+    不再变化、没有进行中的请求且 WebSocket 也没有收到新帧时判定为完成
+    （通过 WebSocket 推送生成内容的平台在帧停止前不会被误判完成）。
+    长时间没有事件时才调用 ``fallback`` 进行一次慢速轮询。
+    """
+
+    def __init__(
+        self,
+        page: Page,
+        loading_selectors: List[str],
+        content_selectors: List[str],
+        error_selectors: List[str],
+        error_keywords: Optional[List[str]] = None,
+        min_content_length: int = 100,
+        settle_time: float = 3.0,
+        debounce_ms: int = 300
+    ):
+        self.page = page
+        self.loading_selectors = loading_selectors
+        self.content_selectors = content_selectors
+        self.error_selectors = error_selectors
+        self.error_keywords = error_keywords or DEFAULT_ERROR_KEYWORDS
+        self.min_content_length = min_content_length
+        self.settle_time = settle_time
+        self.debounce_ms = debounce_ms
+
+        self.logger = get_logger("page_status_watcher")
+        self.watcher_id = f"w{next(_watcher_ids)}"
+
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._inflight_requests = 0
+        self._last_frame_at: Optional[float] = None
+        self._websockets: List[Any] = []
+        self._started = False
+        self._page_handlers: Dict[str, Callable] = {}
+
+    async def start(self) -> None:
+        """注入观察脚本并注册页面事件"""
+        if self._started:
+            return
+
+        await self._ensure_binding()
+        _page_channels[self.page][self.watcher_id] = self
+
+        self._page_handlers = {
+            "request": self._on_request,
+            "requestfinished": self._on_request_done,
+            "requestfailed": self._on_request_done,
+            "domcontentloaded": self._on_navigation,
+            "websocket": self._on_websocket,
+        }
+        for event, handler in self._page_handlers.items():
+            self.page.on(event, handler)
+
+        self._started = True
+        await self._inject()
+
+    async def stop(self) -> None:
+        """停止监听"""
+        if not self._started:
+            return
+
+        for event, handler in self._page_handlers.items():
+            self.page.remove_listener(event, handler)
+        self._page_handlers = {}
+        for websocket in self._websockets:
+            websocket.remove_listener("framereceived", self._on_websocket_frame)
+            websocket.remove_listener("close", self._on_websocket_close)
+        self._websockets = []
+        _page_channels.get(self.page, {}).pop(self.watcher_id, None)
+        self._started = False
+
+        try:
+            await self.page.evaluate(DISCONNECT_SCRIPT, self.watcher_id)
+        except Exception as e:
+            self.logger.debug(f"断开页面观察器失败: {e}")
+
+    async def __aenter__(self) -> "PageStatusWatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.stop()
+
+    async def _ensure_binding(self) -> None:
+        """为页面注册事件回传绑定（每个页面一次）"""
+        if self.page in _page_channels:
+            return
+
+        channel: Dict[str, PageStatusWatcher] = {}
+        _page_channels[self.page] = channel
+
+        def dispatch(source, payload):
+            watcher = channel.get(payload.get("watcherId"))
+            if watcher:
+                watcher._on_dom_state(payload.get("state") or {})
+
+        await self.page.expose_binding(BINDING_NAME, dispatch)
+
+    async def _inject(self) -> None:
+        """注入 MutationObserver"""
+        try:
+            await self.page.evaluate(OBSERVER_SCRIPT, {
+                "binding": BINDING_NAME,
+                "watcherId": self.watcher_id,
+                "loading": self.loading_selectors,
+                "content": self.content_selectors,
+                "error": self.error_selectors,
+                "errorKeywords": self.error_keywords,
+                "minContentLength": self.min_content_length,
+                "debounceMs": self.debounce_ms,
+            })
+        except Exception as e:
+            self.logger.warning(f"注入页面观察器失败: {e}")
+
+    def _on_dom_state(self, state: Dict[str, Any]) -> None:
+        """DOM 状态回调"""
+        self._events.put_nowait(StatusEvent(status=state.get("status", "running"), source="dom", detail=state))
+
+    def _on_request(self, request) -> None:
+        if request.resource_type in TRACKED_RESOURCE_TYPES:
+            self._inflight_requests += 1
+
+    def _on_request_done(self, request) -> None:
+        if request.resource_type in TRACKED_RESOURCE_TYPES:
+            self._inflight_requests = max(0, self._inflight_requests - 1)
+            if self._inflight_requests == 0:
+                # 流式响应结束通常意味着生成完成，通知重新评估
+                self._events.put_nowait(StatusEvent(status="network_idle", source="network"))
+
+    def _on_websocket(self, websocket) -> None:
+        """跟踪监听开始后打开的 WebSocket 的帧活动"""
+        self._websockets.append(websocket)
+        websocket.on("framereceived", self._on_websocket_frame)
+        websocket.on("close", self._on_websocket_close)
+
+    def _on_websocket_frame(self, *args) -> None:
+        # 帧很频繁，只记录时间，由 stream 在判定完成时检查
+        self._last_frame_at = time.monotonic()
+
+    def _on_websocket_close(self, websocket) -> None:
+        if websocket in self._websockets:
+            self._websockets.remove(websocket)
+        self._events.put_nowait(StatusEvent(status="network_idle", source="websocket"))
+
+    def _last_activity(self, content_since: float) -> float:
+        """内容或 WebSocket 帧最近一次变化的时间"""
+        return max(content_since, self._last_frame_at or content_since)
+
+    def _on_navigation(self, *args) -> None:
+        """页面导航后重新注入观察脚本"""
+        asyncio.ensure_future(self._inject())
+
+    async def stream(
+        self,
+        timeout: Optional[float] = None,
+        fallback: Optional[Callable[[], Awaitable[str]]] = None,
+        fallback_interval: float = 60.0
+    ) -> AsyncIterator[StatusEvent]:
+        """产出状态变化事件，直到任务完成、失败或超时
+
+        Args:
+            timeout: 总超时时间（秒），超时抛出 asyncio.TimeoutError
+            fallback: 长时间无事件时调用的状态查询函数
+            fallback_interval: 无事件多久后执行一次兜底查询（秒）
+        """
+        await self.start()
+
+        deadline = time.monotonic() + timeout if timeout else None
+        last_status: Optional[str] = None
+        content_since: Optional[float] = None
+        last_event_at = time.monotonic()
+
+        while True:
+            now = time.monotonic()
+            if deadline and now >= deadline:
+                raise asyncio.TimeoutError()
+
+            # 等待时间取下一个检查点：内容稳定判定、兜底轮询、总超时
+            wait_for = fallback_interval - (now - last_event_at) if fallback else None
+            if content_since is not None:
+                settle_left = self.settle_time - (now - self._last_activity(content_since))
+                wait_for = settle_left if wait_for is None else min(wait_for, settle_left)
+            if deadline:
+                wait_for = deadline - now if wait_for is None else min(wait_for, deadline - now)
+
+            try:
+                event = await asyncio.wait_for(self._events.get(), max(wait_for, 0) if wait_for is not None else None)
+            except asyncio.TimeoutError:
+                event = None
+
+            now = time.monotonic()
+
+            if event is None:
+                if content_since is not None and now - content_since >= self.settle_time:
+                    if now - self._last_activity(content_since) < self.settle_time:
+                        # WebSocket 仍在收到帧，等到帧停止后再判定
+                        continue
+                    if self._inflight_requests == 0:
+                        yield StatusEvent(status="completed", source="dom", detail={"settled": True})
+                        return
+                    content_since = now
+                    continue
+
+                if fallback and now - last_event_at >= fallback_interval:
+                    last_event_at = now
+                    status = await fallback()
+                    event = StatusEvent(status=status, source="poll")
+                else:
+                    continue
+            else:
+                last_event_at = now
+
+            if event.status == "network_idle":
+                if content_since is not None:
+                    # 网络空闲且已有内容，缩短到一次防抖后再判定
+                    content_since = min(content_since, now - self.settle_time + self.debounce_ms / 1000)
+                continue
+
+            if event.status == "content":
+                # 内容仍在增长时重新计时
+                content_since = now
+                status = "running"
+            else:
+                content_since = None
+                status = event.status
+
+            if status != last_status:
+                last_status = status
+                yield StatusEvent(status=status, source=event.source, detail=event.detail, timestamp=event.timestamp)
+
+            if status in ("completed", "failed"):
+                return
@@ -3,9 +3,15 @@
 定义平台功能标准和能力评估机制
 """
 
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any, Union
+from typing import Deque, Dict, List, Optional, Any, Tuple, Union
 from enum import Enum
+import asyncio
+import atexit
+import json
+import math
+import threading
 import time
 from pathlib import Path
 
@@ -30,13 +36,26 @@ class PerformanceLevel(Enum):
 
 @dataclass
 class CapabilityMetrics:
-    """能力指标"""
+    """能力指标
+
+    累计成功率/平均耗时之外，额外维护 EWMA 和最近 ``WINDOW_SIZE`` 次执行的
+    滑动窗口，用于发现近期的性能退化。
+    """
     success_rate: float = 0.0
     average_time: float = 0.0
     error_count: int = 0
     total_attempts: int = 0
     last_updated: float = field(default_factory=time.time)
     
+    # 近期指标
+    ewma_latency: Optional[float] = None
+    ewma_success: Optional[float] = None
+    recent: Deque[Tuple[float, bool, float]] = field(default_factory=deque)
+    
+    # 滑动窗口大小和 EWMA 平滑系数
+    WINDOW_SIZE = 50
+    EWMA_ALPHA = 0.2
+    
     def update(self, success: bool, elapsed_time: float):
         """更新指标"""
         self.total_attempts += 1
@@ -48,13 +67,74 @@ class CapabilityMetrics:
             # 更新平均时间
             current_total_time = self.average_time * (self.total_attempts - 1)
             self.average_time = (current_total_time + elapsed_time) / self.total_attempts
+            
+            # 延迟只统计成功的执行，失败的耗时不代表平台速度
+            self.ewma_latency = self._ewma(self.ewma_latency, elapsed_time)
         else:
             self.error_count += 1
             # 重新计算成功率
             current_successes = self.success_rate * (self.total_attempts - 1)
             self.success_rate = current_successes / self.total_attempts
         
+        self.ewma_success = self._ewma(self.ewma_success, 1.0 if success else 0.0)
+        
         self.last_updated = time.time()
+        self.recent.append((self.last_updated, success, elapsed_time))
+        while len(self.recent) > self.WINDOW_SIZE:
+            self.recent.popleft()
+    
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        """指数加权移动平均"""
+        if current is None:
+            return value
+        return self.EWMA_ALPHA * value + (1 - self.EWMA_ALPHA) * current
+    
+    @property
+    def recent_error_rate(self) -> float:
+        """滑动窗口内的错误率"""
+        if not self.recent:
+            return 0.0
+        return sum(1 for _, success, _ in self.recent if not success) / len(self.recent)
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """滑动窗口内成功执行耗时的百分位数（最近秩法）"""
+        latencies = sorted(elapsed for _, success, elapsed in self.recent if success)
+        if not latencies:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * len(latencies)))
+        return latencies[rank - 1]
+    
+    def get_recent_summary(self) -> Dict[str, Any]:
+        """获取近期指标摘要"""
+        return {
+            "samples": len(self.recent),
+            "ewma_latency": self.ewma_latency,
+            "ewma_success": self.ewma_success,
+            "recent_error_rate": self.recent_error_rate,
+            "p50": self.latency_percentile(50),
+            "p95": self.latency_percentile(95),
+            "p99": self.latency_percentile(99)
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（用于持久化）"""
+        return {
+            "success_rate": self.success_rate,
+            "average_time": self.average_time,
+            "error_count": self.error_count,
+            "total_attempts": self.total_attempts,
+            "last_updated": self.last_updated,
+            "ewma_latency": self.ewma_latency,
+            "ewma_success": self.ewma_success,
+            "recent": [list(item) for item in self.recent]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CapabilityMetrics":
+        """从字典恢复"""
+        data = dict(data)
+        recent = deque(tuple(item) for item in data.pop("recent", []))
+        return cls(recent=recent, **data)
     
     @property
     def performance_level(self) -> PerformanceLevel:
@@ -149,6 +229,15 @@ class PlatformCapabilities:
         """获取指定能力"""
         return getattr(self, name, None)
     
+    def get_all_capabilities(self) -> List[PlatformCapability]:
+        """获取全部能力项"""
+        return [
+            self.task_submission, self.history_download, self.file_management,
+            self.content_extraction, self.ai_analysis, self.multi_modal,
+            self.real_time_processing, self.web_search, self.voice_interaction,
+            self.collaborative_editing
+        ]
+    
     def get_available_capabilities(self) -> List[PlatformCapability]:
         """获取所有可用能力"""
         return [
@@ -317,21 +406,326 @@ class CapabilityValidator:
             }
 
 
+class CircuitState(Enum):
+    """熔断状态"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class CircuitBreaker:
+    """平台熔断器
+
+    近期错误率超过阈值时打开，冷却期后进入半开状态放行一次探测，
+    探测成功则关闭，失败则重新打开。探测任务被取消或中断时释放探测名额；
+    超过一个冷却期仍未结束的探测视为丢失，重新放行。关闭时清空统计窗口：
+    只统计关闭之后的执行，避免熔断前的失败让熔断器立即再次打开。
+    """
+    error_threshold: float = 0.5
+    min_samples: int = 5
+    cooldown: float = 300.0
+    state: CircuitState = CircuitState.CLOSED
+    opened_at: float = 0.0
+    closed_at: float = 0.0
+    probe_in_flight: bool = False
+    probe_started_at: float = 0.0
+    
+    def record(self, success: bool, metrics: CapabilityMetrics):
+        """根据最新执行结果更新熔断状态"""
+        if self.state == CircuitState.HALF_OPEN:
+            self.probe_in_flight = False
+            if success:
+                self.state = CircuitState.CLOSED
+                self.closed_at = metrics.last_updated
+            else:
+                self._open()
+        elif self.state == CircuitState.CLOSED:
+            window = [ok for timestamp, ok, _ in metrics.recent if timestamp > self.closed_at]
+            if len(window) >= self.min_samples and window.count(False) / len(window) >= self.error_threshold:
+                self._open()
+    
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self.opened_at = time.time()
+    
+    def allow_request(self) -> bool:
+        """是否允许路由到该平台"""
+        if self.state == CircuitState.OPEN and time.time() - self.opened_at >= self.cooldown:
+            self.state = CircuitState.HALF_OPEN
+            self.probe_in_flight = False
+        
+        if self.state == CircuitState.HALF_OPEN:
+            if self.probe_in_flight and time.time() - self.probe_started_at >= self.cooldown:
+                self.probe_in_flight = False
+            return not self.probe_in_flight
+        return self.state == CircuitState.CLOSED
+    
+    def start_probe(self):
+        """半开状态下占用探测名额"""
+        self.probe_in_flight = True
+        self.probe_started_at = time.time()
+    
+    def release_probe(self):
+        """释放探测名额（探测未产生结果时）"""
+        if self.state == CircuitState.HALF_OPEN:
+            self.probe_in_flight = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {"state": self.state.value, "opened_at": self.opened_at}
+
+
 class CapabilityManager:
     """能力管理器"""
     
-    def __init__(self):
+    # 指标写入文件的合并延迟（秒）
+    SAVE_DELAY = 5.0
+    
+    def __init__(self, metrics_file: Optional[Union[str, Path]] = None):
+        from app.config.settings import get_settings
+        
         self.logger = get_logger("capability_manager")
         self.platform_capabilities: Dict[str, PlatformCapabilities] = {}
         self.validator = CapabilityValidator()
+        
+        # 熔断器: (平台, 能力) -> CircuitBreaker
+        self.settings = get_settings().platform
+        self.circuit_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        
+        # 指标持久化（未指定文件时仅保存在内存中）；记录指标后延迟合并写入
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self._persisted_metrics: Dict[str, Dict[str, Any]] = {}
+        self._save_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        if self.metrics_file:
+            self._load_metrics()
+            atexit.register(self.flush_metrics)
     
     def register_platform_capabilities(self, platform_name: str, config: Dict[str, Any]):
-        """注册平台能力"""
+        """注册平台能力（重复注册时保留已积累的指标）"""
         capabilities = PlatformCapabilities.from_config(platform_name, config)
+        
+        existing = self.platform_capabilities.get(platform_name)
+        persisted = self._persisted_metrics.pop(platform_name, {})
+        for capability in capabilities.get_all_capabilities():
+            if existing:
+                capability.metrics = existing.get_capability(capability.name).metrics
+            elif capability.name in persisted:
+                capability.metrics = CapabilityMetrics.from_dict(persisted[capability.name])
+        
         self.platform_capabilities[platform_name] = capabilities
         self.logger.info(f"注册平台能力: {platform_name}")
         return capabilities
     
+    def record_metrics(self, platform_name: str, capability_name: str, success: bool, elapsed_time: float):
+        """记录一次能力执行结果（平台未注册时使用默认能力模型）"""
+        capabilities = self.platform_capabilities.get(platform_name)
+        if capabilities is None:
+            capabilities = self.register_platform_capabilities(platform_name, {})
+        capabilities.update_capability_metrics(capability_name, success, elapsed_time)
+        
+        capability = capabilities.get_capability(capability_name)
+        if capability:
+            breaker = self._get_circuit_breaker(platform_name, capability_name)
+            previous_state = breaker.state
+            breaker.record(success, capability.metrics)
+            if breaker.state != previous_state:
+                self.logger.warning(
+                    f"平台熔断状态变化: {platform_name}.{capability_name} "
+                    f"{previous_state.value} -> {breaker.state.value}, "
+                    f"近期错误率 {capability.metrics.recent_error_rate:.0%}"
+                )
+        
+        self._schedule_save()
+    
+    def _schedule_save(self):
+        """标记指标待保存，SAVE_DELAY 秒内的多次记录合并为一次写入
+
+        在事件循环中运行时延迟后在循环线程上取快照，只把文件写入放到线程中；
+        没有运行中的事件循环时只做标记，由 flush_metrics（退出时自动调用）写入。
+        """
+        if not self.metrics_file:
+            return
+        with self._save_lock:
+            self._dirty = True
+            if self._save_handle is not None:
+                return
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._save_handle = loop.call_later(self.SAVE_DELAY, self._start_background_save)
+    
+    def _start_background_save(self):
+        """延迟到期后在后台写入"""
+        with self._save_lock:
+            self._save_handle = None
+        self._save_task = asyncio.get_running_loop().create_task(self._save_in_background())
+    
+    async def _save_in_background(self):
+        """取快照并在线程中写入文件"""
+        try:
+            data = self._take_snapshot()
+            if data is not None:
+                await asyncio.to_thread(self._write_metrics, data)
+        except Exception as e:
+            self._mark_dirty()
+            self.logger.warning(f"保存能力指标失败: {e}")
+    
+    def flush_metrics(self):
+        """立即写入待保存的指标"""
+        with self._save_lock:
+            if self._save_handle is not None:
+                self._save_handle.cancel()
+                self._save_handle = None
+        try:
+            data = self._take_snapshot()
+            if data is not None:
+                self._write_metrics(data)
+        except Exception as e:
+            self._mark_dirty()
+            self.logger.warning(f"保存能力指标失败: {e}")
+    
+    def _mark_dirty(self):
+        """写入失败时保留待保存标记，下次保存时重试"""
+        with self._save_lock:
+            self._dirty = True
+    
+    def _take_snapshot(self) -> Optional[Dict[str, Any]]:
+        """复制待保存的指标（没有变化时返回 None）"""
+        with self._save_lock:
+            if not self._dirty:
+                return None
+            data = self._metrics_snapshot()
+            self._dirty = False
+            return data
+    
+    def _get_circuit_breaker(self, platform_name: str, capability_name: str) -> CircuitBreaker:
+        """获取熔断器"""
+        key = (platform_name, capability_name)
+        if key not in self.circuit_breakers:
+            self.circuit_breakers[key] = CircuitBreaker(
+                error_threshold=self.settings.circuit_error_threshold,
+                min_samples=self.settings.circuit_min_samples,
+                cooldown=self.settings.circuit_cooldown
+            )
+        return self.circuit_breakers[key]
+    
+    def is_platform_healthy(self, platform_name: str, capability_name: str = "task_submission") -> bool:
+        """平台是否可路由（熔断器未打开）"""
+        return self._get_circuit_breaker(platform_name, capability_name).allow_request()
+    
+    def select_platform(
+        self,
+        capability_name: str = "task_submission",
+        candidates: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> Optional[str]:
+        """选择最快的健康平台
+        
+        按期望耗时（EWMA 延迟 / EWMA 成功率）排序；没有历史数据的平台优先，
+        以便积累指标；有执行记录但从未成功的平台排在最后。
+        熔断中的平台被跳过，半开状态的平台只放行一次探测。
+        
+        Args:
+            capability_name: 需要的能力
+            candidates: 候选平台，默认为所有具备该能力的平台
+            exclude: 排除的平台
+        """
+        platforms = candidates if candidates is not None else self.get_platforms_by_capability(capability_name)
+        platforms = [p for p in platforms if p not in (exclude or [])]
+        
+        scored = []
+        for platform_name in platforms:
+            if not self.is_platform_healthy(platform_name, capability_name):
+                continue
+            
+            capabilities = self.platform_capabilities.get(platform_name)
+            capability = capabilities.get_capability(capability_name) if capabilities else None
+            metrics = capability.metrics if capability else None
+            
+            if not metrics or metrics.total_attempts == 0:
+                score = 0.0
+            elif metrics.ewma_latency is None:
+                score = math.inf
+            else:
+                score = metrics.ewma_latency / max(metrics.ewma_success or 0.0, 0.05)
+            scored.append((score, platform_name))
+        
+        if not scored:
+            self.logger.warning(f"没有可用的健康平台: {capability_name}")
+            return None
+        
+        scored.sort()
+        selected = scored[0][1]
+        
+        breaker = self._get_circuit_breaker(selected, capability_name)
+        if breaker.state == CircuitState.HALF_OPEN:
+            breaker.start_probe()
+        
+        self.logger.info(f"路由选择平台: {selected}, 候选评分: {scored}")
+        return selected
+    
+    def release_probe(self, platform_name: str, capability_name: str = "task_submission"):
+        """路由选中的任务被取消或中断（不记录指标）时释放半开探测"""
+        breaker = self.circuit_breakers.get((platform_name, capability_name))
+        if breaker:
+            breaker.release_probe()
+    
+    def get_routing_report(self, capability_name: str = "task_submission") -> Dict[str, Any]:
+        """获取各平台近期指标和熔断状态"""
+        report = {}
+        for platform_name, capabilities in self.platform_capabilities.items():
+            capability = capabilities.get_capability(capability_name)
+            if capability:
+                report[platform_name] = {
+                    **capability.metrics.get_recent_summary(),
+                    "circuit": self._get_circuit_breaker(platform_name, capability_name).to_dict()
+                }
+        return report
+    
+    def _load_metrics(self):
+        """加载持久化的指标"""
+        if not self.metrics_file.exists():
+            return
+        try:
+            with open(self.metrics_file, "r", encoding="utf-8") as f:
+                self._persisted_metrics = json.load(f)
+            self.logger.info(f"已加载能力指标: {self.metrics_file}")
+        except Exception as e:
+            self.logger.warning(f"加载能力指标失败: {e}")
+    
+    def _metrics_snapshot(self) -> Dict[str, Any]:
+        """复制当前指标（to_dict 会复制滑动窗口）"""
+        data = {platform_name: dict(metrics) for platform_name, metrics in self._persisted_metrics.items()}
+        for platform_name, capabilities in self.platform_capabilities.items():
+            data[platform_name] = {
+                capability.name: capability.metrics.to_dict()
+                for capability in capabilities.get_all_capabilities()
+                if capability.metrics.total_attempts > 0
+            }
+        return data
+    
+    def _write_metrics(self, data: Dict[str, Any]):
+        """把指标快照写入文件（可在线程中执行）"""
+        with self._write_lock:
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.metrics_file.with_suffix(".tmp")
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            temp_file.replace(self.metrics_file)
+    
+    def save_metrics(self):
+        """保存指标到文件"""
+        if not self.metrics_file:
+            return
+        self._mark_dirty()
+        self.flush_metrics()
+    
     def get_platform_capabilities(self, platform_name: str) -> Optional[PlatformCapabilities]:
         """获取平台能力"""
         return self.platform_capabilities.get(platform_name)
@@ -404,4 +798,17 @@ class CapabilityManager:
                 }
             matrix["platforms"][platform_name] = platform_matrix
         
-        return matrix 
\ No newline at end of file
+        return matrix 
+
+
+# 全局能力管理器实例
+_capability_manager: Optional[CapabilityManager] = None
+
+
+def get_capability_manager() -> CapabilityManager:
+    """获取全局能力管理器（指标持久化到配置的文件）"""
+    global _capability_manager
+    if _capability_manager is None:
+        from app.config.settings import get_settings
+        _capability_manager = CapabilityManager(get_settings().platform.metrics_file)
+    return _capability_manager
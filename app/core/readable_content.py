@@ -0,0 +1,248 @@
+"""
+页面正文提取
+注入页面执行的 Readability 风格提取脚本：一次遍历为段落的祖先节点打分选出正文容器，
+并像 Readability 一样合并得分足够高的兄弟节点，再遍历这些节点输出结构化内容块
+（标题、段落、列表项、代码、表格）及内容哈希，同时返回正文占页面可见文本的比例。
+一次 page.evaluate 往返只返回有用的文本，无需把整个 HTML 传回 Python。
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+
+# 正文占页面可见文本的比例低于该值时，调用方应与按选择器提取的结果比较
+MIN_COVERAGE = 0.3
+
+READABLE_CONTENT_SCRIPT = r"""
+(maxChars) => {
+    const SKIP_TAGS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'SVG', 'CANVAS', 'IFRAME', 'OBJECT',
+        'NAV', 'HEADER', 'FOOTER', 'ASIDE', 'FORM', 'BUTTON', 'SELECT', 'DIALOG', 'INPUT', 'TEXTAREA']);
+    const SKIP_ROLES = new Set(['navigation', 'banner', 'contentinfo', 'complementary', 'menu', 'menubar', 'toolbar']);
+    const INLINE_TAGS = new Set(['A', 'SPAN', 'B', 'STRONG', 'I', 'EM', 'U', 'S', 'CODE', 'KBD', 'SAMP', 'VAR', 'SUB',
+        'SUP', 'SMALL', 'MARK', 'ABBR', 'CITE', 'Q', 'TIME', 'LABEL', 'FONT', 'BR', 'IMG', 'WBR', 'DEL', 'INS']);
+    const PARAGRAPH_TAGS = 'p, pre, td, li, blockquote, dd, h2, h3';
+    const POSITIVE = /article|content|main|result|response|answer|message|markdown|post|body|text|report/i;
+    const NEGATIVE = /comment|sidebar|footer|header|menu|nav|banner|sponsor|promo|popup|modal|share|related|breadcrumb|toolbar/i;
+
+    const clean = (text) => (text || '').replace(/\s+/g, ' ').trim();
+    const skipped = (el) => SKIP_TAGS.has(el.tagName) || el.hidden ||
+        el.getAttribute('aria-hidden') === 'true' || SKIP_ROLES.has((el.getAttribute('role') || '').toLowerCase());
+
+    // 1. 打分：每个段落按长度和逗号数为祖先节点加分（越远的祖先分得越少）
+    const scores = new Map();
+    for (const paragraph of document.body.querySelectorAll(PARAGRAPH_TAGS)) {
+        const text = clean(paragraph.textContent);
+        if (text.length < 25) continue;
+        const score = 1 + (text.match(/[,，、;；]/g) || []).length + Math.min(3, Math.floor(text.length / 100));
+        let ancestor = paragraph.parentElement;
+        for (let level = 0; ancestor && level < 5; level++, ancestor = ancestor.parentElement) {
+            if (!scores.has(ancestor)) {
+                const weight = (ancestor.className && typeof ancestor.className === 'string' ? ancestor.className : '') + ' ' + ancestor.id;
+                scores.set(ancestor, (POSITIVE.test(weight) ? 25 : 0) - (NEGATIVE.test(weight) ? 25 : 0));
+            }
+            scores.set(ancestor, scores.get(ancestor) + score / (level === 0 ? 1 : level === 1 ? 2 : level * 3));
+        }
+    }
+
+    // 只对得分最高的几个候选计算链接密度
+    const linkDensity = (el) => {
+        const total = clean(el.textContent).length || 1;
+        let links = 0;
+        for (const link of el.querySelectorAll('a')) links += clean(link.textContent).length;
+        return links / total;
+    };
+    let root = document.body;
+    let best = 0;
+    const candidates = [...scores.entries()].sort((a, b) => b[1] - a[1]).slice(0, 5);
+    for (const [el, score] of candidates) {
+        const adjusted = score * (1 - linkDensity(el));
+        if (adjusted > best) { best = adjusted; root = el; }
+    }
+
+    // 合并兄弟节点（同 Readability）：正文常被拆成多个并列的块，只取最高分的一块会丢内容
+    let roots = [root];
+    if (root !== document.body && root.parentElement) {
+        const threshold = Math.max(10, best * 0.2);
+        roots = [...root.parentElement.children].filter((sibling) => {
+            if (sibling === root) return true;
+            if (skipped(sibling)) return false;
+            let bonus = 0;
+            if (root.className && sibling.className === root.className) bonus = best * 0.2;
+            if (scores.has(sibling) && scores.get(sibling) * (1 - linkDensity(sibling)) + bonus >= threshold) return true;
+            if (sibling.tagName !== 'P') return false;
+            const text = clean(sibling.textContent);
+            const density = linkDensity(sibling);
+            return (text.length > 80 && density < 0.25) || (text.length > 0 && density === 0 && /[.。!?！？]$/.test(text));
+        });
+    }
+    const rootSet = new Set(roots);
+
+    // 2. 遍历正文容器，输出结构化内容块
+    const blocks = [];
+    let length = 0;
+    let truncated = false;
+    let buffer = [];
+
+    const push = (block) => {
+        if (truncated) return;
+        let size = block.type === 'table' ? block.rows.reduce((n, row) => n + row.join(' ').length, 0) : block.text.length;
+        if (maxChars && length + size > maxChars) {
+            truncated = true;
+            if (block.type === 'table') return;
+            block.text = block.text.slice(0, maxChars - length);
+            size = block.text.length;
+            if (!size) return;
+        }
+        length += size;
+        blocks.push(block);
+    };
+    const flush = (type = 'paragraph') => {
+        const text = clean(buffer.join(''));
+        buffer = [];
+        if (text) push({type, text});
+    };
+    const walk = (node) => {
+        if (truncated) return;
+        if (node.nodeType === Node.TEXT_NODE) { buffer.push(node.nodeValue); return; }
+        if (node.nodeType !== Node.ELEMENT_NODE || skipped(node)) return;
+        const tag = node.tagName;
+        if (INLINE_TAGS.has(tag)) {
+            for (const child of node.childNodes) walk(child);
+            return;
+        }
+        flush();
+        if (!rootSet.has(node) && node.getClientRects().length === 0) return;  // 未渲染的块
+        if (/^H[1-6]$/.test(tag)) {
+            const text = clean(node.textContent);
+            if (text) push({type: 'heading', level: Number(tag[1]), text});
+        } else if (tag === 'PRE') {
+            const code = node.querySelector('code');
+            const language = ((code || node).className.match(/(?:language|lang)-([\w+#-]+)/) || [])[1] || '';
+            const text = node.textContent.replace(/\s+$/, '');
+            if (text.trim()) push({type: 'code', text, language});
+        } else if (tag === 'TABLE') {
+            const rows = [];
+            for (const row of node.querySelectorAll('tr')) {
+                const cells = [...row.children].map((cell) => clean(cell.textContent));
+                if (cells.some(Boolean)) rows.push(cells);
+                if (rows.length >= 200) break;
+            }
+            if (rows.length) push({type: 'table', rows});
+        } else if (tag === 'LI') {
+            for (const child of node.childNodes) walk(child);
+            flush('list_item');
+        } else {
+            for (const child of node.childNodes) walk(child);
+            flush();
+        }
+    };
+    for (const node of roots) {
+        walk(node);
+        flush();
+    }
+
+    // 正文占页面可见文本的比例（不受字符预算截断影响）
+    const bodyLength = clean(document.body.innerText).length || 1;
+    const rootLength = roots.reduce((n, node) => n + clean(node.innerText).length, 0);
+
+    // 3. 内容哈希（FNV-1a）
+    let hash = 0x811c9dc5;
+    for (const block of blocks) {
+        const text = block.type === 'table' ? block.rows.map((row) => row.join('\t')).join('\n') : block.text;
+        for (let i = 0; i < text.length; i++) {
+            hash ^= text.charCodeAt(i);
+            hash = Math.imul(hash, 0x01000193) >>> 0;
+        }
+    }
+
+    const describe = (el) => el.tagName.toLowerCase() + (el.id ? '#' + el.id : '') +
+        (el.className && typeof el.className === 'string' ? '.' + el.className.trim().split(/\s+/).slice(0, 2).join('.') : '');
+    return {
+        title: document.title,
+        url: location.href,
+        blocks,
+        content_hash: hash.toString(16).padStart(8, '0'),
+        text_length: length,
+        truncated,
+        root: describe(root),
+        root_score: Math.round(best),
+        merged_siblings: roots.length - 1,
+        coverage: Math.min(1, rootLength / bodyLength)
+    };
+}
+"""
+
+
+@dataclass
+class ContentBlock:
+    """结构化内容块"""
+    type: str  # heading / paragraph / list_item / code / table
+    text: str = ""
+    level: int = 0
+    language: str = ""
+    rows: List[List[str]] = field(default_factory=list)
+
+    def to_markdown(self) -> str:
+        """渲染为 Markdown"""
+        if self.type == "heading":
+            return f"{'#' * max(1, self.level)} {self.text}"
+        if self.type == "list_item":
+            return f"- {self.text}"
+        if self.type == "code":
+            return f"```{self.language}\n{self.text}\n```"
+        if self.type == "table":
+            lines = [f"| {' | '.join(row)} |" for row in self.rows]
+            if lines:
+                lines.insert(1, f"|{'---|' * len(self.rows[0])}")
+            return "\n".join(lines)
+        return self.text
+
+
+@dataclass
+class ReadableContent:
+    """页面正文提取结果"""
+    title: str
+    url: str
+    blocks: List[ContentBlock]
+    content_hash: str
+    text_length: int = 0
+    truncated: bool = False
+    root: str = ""
+    root_score: int = 0
+    merged_siblings: int = 0
+    coverage: float = 1.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ReadableContent":
+        """从提取脚本的返回值构建"""
+        blocks = [
+            ContentBlock(
+                type=block.get("type", "paragraph"),
+                text=block.get("text", ""),
+                level=block.get("level", 0),
+                language=block.get("language", ""),
+                rows=block.get("rows", [])
+            )
+            for block in data.get("blocks", [])
+        ]
+        return cls(
+            title=data.get("title", ""),
+            url=data.get("url", ""),
+            blocks=blocks,
+            content_hash=data.get("content_hash", ""),
+            text_length=data.get("text_length", 0),
+            truncated=data.get("truncated", False),
+            root=data.get("root", ""),
+            root_score=data.get("root_score", 0),
+            merged_siblings=data.get("merged_siblings", 0),
+            coverage=data.get("coverage", 1.0)
+        )
+
+    @property
+    def low_coverage(self) -> bool:
+        """正文只占页面可见文本的一小部分（可能选错了容器）"""
+        return self.coverage < MIN_COVERAGE
+
+    def to_markdown(self) -> str:
+        """渲染为 Markdown 文本（块之间空行分隔）"""
+        return "\n\n".join(block.to_markdown() for block in self.blocks)
@@ -0,0 +1,321 @@
+"""
+AI总结批量补全
+扫描已下载的任务目录，为缺少 ai_summary.json 或总结已过期的任务批量生成总结。
+有界工作协程池处理任务（模型调用另受各提供商限流器约束），进度写入检查点文件，
+中断或暂停后可继续。
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.file_triage import GENERATED_FILES, GENERATED_SUFFIXES
+from app.core.logger import get_logger
+
+
+SUMMARY_FILE_NAME = "ai_summary.json"
+
+
+class BackfillStatus(Enum):
+    """补全作业状态"""
+    IDLE = "idle"
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class BackfillProgress:
+    """补全进度"""
+    status: str = BackfillStatus.IDLE.value
+    total: int = 0
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    workers: int = 0
+    in_progress: List[str] = field(default_factory=list)
+    recent_errors: List[Dict[str, str]] = field(default_factory=list)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def summary_state(task_dir: Path) -> Optional[str]:
+    """判断任务是否需要生成总结
+
+    Returns:
+        "missing"（无总结）、"stale"（总结之后有文件更新）或 None（总结有效）
+    """
+    summary_file = task_dir / SUMMARY_FILE_NAME
+    if not summary_file.exists():
+        return "missing"
+
+    summary_mtime = summary_file.stat().st_mtime
+    for path in task_dir.iterdir():
+        name = path.name.lower()
+        if not path.is_file() or name in GENERATED_FILES or name.endswith(GENERATED_SUFFIXES):
+            continue
+        if path.stat().st_mtime > summary_mtime:
+            return "stale"
+    return None
+
+
+def find_task_dirs(roots: Optional[List[str]] = None) -> List[Path]:
+    """列出所有任务目录（按路径排序去重）
+
+    未指定 roots 时返回新布局下的任务目录和配置中旧版下载目录里的 task_* 目录
+    （与历史任务接口的扫描范围一致）；指定 roots 时在这些目录中查找 task_* 目录。
+    """
+    from app.storage.task_layout import TaskLayout, get_task_layout
+
+    if roots:
+        layout_dirs = []
+        legacy_dirs = TaskLayout(roots=[], legacy_roots=roots).legacy_task_dirs()
+    else:
+        layout = get_task_layout()
+        layout_dirs = [task_dir for _, task_dir in layout.iter_task_dirs()]
+        legacy_dirs = layout.legacy_task_dirs()
+    return sorted(set(layout_dirs) | set(legacy_dirs))
+
+
+class SummaryBackfill:
+    """AI总结批量补全作业"""
+
+    def __init__(
+        self,
+        checkpoint_file: str = "data/summary_backfill.json",
+        roots: Optional[List[str]] = None,
+        max_attempts: int = 3
+    ):
+        self.logger = get_logger("summary_backfill")
+        self.checkpoint_file = Path(checkpoint_file)
+        self.roots = roots
+        self.max_attempts = max_attempts
+        self.progress = BackfillProgress()
+        self._attempts: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._resume_event: Optional[asyncio.Event] = None
+        self._write_lock = threading.Lock()
+        self._checkpoint_version = 0
+        self._written_version = 0
+        self._load_checkpoint()
+
+    def _load_checkpoint(self) -> None:
+        """读取检查点（失败次数与上次进度）"""
+        if not self.checkpoint_file.exists():
+            return
+        try:
+            data = json.loads(self.checkpoint_file.read_text(encoding="utf-8"))
+            self._attempts = data.get("attempts", {})
+            progress = data.get("progress", {})
+            if progress.get("status") in (BackfillStatus.RUNNING.value, BackfillStatus.PAUSED.value):
+                # 上次作业未结束（进程退出），重新启动后可继续
+                progress["status"] = BackfillStatus.PAUSED.value
+            progress["in_progress"] = []
+            self.progress = BackfillProgress(**progress)
+        except (OSError, ValueError, TypeError) as e:
+            self.logger.warning(f"读取补全检查点失败: {e}")
+
+    def _checkpoint_snapshot(self) -> Dict[str, Any]:
+        """在事件循环线程上复制检查点数据（其他协程会同时修改进度和失败次数）"""
+        self._checkpoint_version += 1
+        return {
+            "version": self._checkpoint_version,
+            "attempts": dict(self._attempts),
+            "progress": asdict(self.progress),
+        }
+
+    def _write_checkpoint(self, data: Dict[str, Any]) -> None:
+        """写入检查点快照（可在线程中执行，较旧的快照不会覆盖较新的）"""
+        with self._write_lock:
+            if data["version"] <= self._written_version:
+                return
+            try:
+                self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.checkpoint_file.with_suffix(".tmp")
+                payload = {"attempts": data["attempts"], "progress": data["progress"]}
+                temp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(temp_path, self.checkpoint_file)
+                self._written_version = data["version"]
+            except OSError as e:
+                self.logger.warning(f"保存补全检查点失败: {e}")
+
+    def _save_checkpoint(self) -> None:
+        """保存检查点"""
+        self._write_checkpoint(self._checkpoint_snapshot())
+
+    async def _save_checkpoint_async(self) -> None:
+        """在事件循环上取快照，只把文件写入放到线程中"""
+        await asyncio.to_thread(self._write_checkpoint, self._checkpoint_snapshot())
+
+    def rename_tasks(self, renames: Dict[str, str]) -> None:
+        """任务目录移动后更新检查点中按目录记录的失败次数"""
+        moved = {renames[key]: count for key, count in self._attempts.items() if key in renames}
+        if not moved:
+            return
+        self._attempts = {key: count for key, count in self._attempts.items() if key not in renames}
+        self._attempts.update(moved)
+        self._save_checkpoint()
+
+    @property
+    def running(self) -> bool:
+        """作业是否在运行（含暂停）"""
+        return self._task is not None and not self._task.done()
+
+    def pending_tasks(self, force: bool = False) -> List[Path]:
+        """需要生成总结的任务目录（缺失或过期，失败次数未超限）"""
+        pending = []
+        for task_dir in find_task_dirs(self.roots):
+            if self._attempts.get(str(task_dir), 0) >= self.max_attempts:
+                continue
+            if force or summary_state(task_dir):
+                pending.append(task_dir)
+        return pending
+
+    async def start(self, workers: int = 2, force: bool = False, limit: Optional[int] = None) -> Dict[str, Any]:
+        """启动补全作业；作业暂停时恢复运行
+
+        Args:
+            workers: 并发处理的任务数
+            force: 是否重新生成所有任务的总结
+            limit: 最多处理的任务数
+        """
+        if self.running:
+            self.resume()
+            return self.get_progress()
+
+        pending = await asyncio.to_thread(self.pending_tasks, force)
+        if limit:
+            pending = pending[:limit]
+
+        self.progress = BackfillProgress(
+            status=BackfillStatus.RUNNING.value,
+            total=len(pending),
+            workers=workers,
+            started_at=datetime.now().isoformat()
+        )
+        self._resume_event = asyncio.Event()
+        self._resume_event.set()
+        self._task = asyncio.create_task(self._run(pending, max(1, workers)), name="summary-backfill")
+        self.logger.info(f"AI总结补全开始: {len(pending)} 个任务, {workers} 个并发")
+        return self.get_progress()
+
+    def pause(self) -> Dict[str, Any]:
+        """暂停作业（正在处理的任务完成后停止领取新任务）"""
+        if self.running and self._resume_event.is_set():
+            self._resume_event.clear()
+            self.progress.status = BackfillStatus.PAUSED.value
+            self._save_checkpoint()
+            self.logger.info("AI总结补全已暂停")
+        return self.get_progress()
+
+    def resume(self) -> Dict[str, Any]:
+        """恢复暂停的作业"""
+        if self.running and not self._resume_event.is_set():
+            self._resume_event.set()
+            self.progress.status = BackfillStatus.RUNNING.value
+            self.logger.info("AI总结补全已恢复")
+        return self.get_progress()
+
+    async def wait(self) -> Dict[str, Any]:
+        """等待作业结束"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+        return self.get_progress()
+
+    async def _run(self, pending: List[Path], workers: int) -> None:
+        """按工作协程池处理任务"""
+        started = time.monotonic()
+        queue: asyncio.Queue = asyncio.Queue()
+        for task_dir in pending:
+            queue.put_nowait(task_dir)
+
+        try:
+            await asyncio.gather(*(self._worker(queue) for _ in range(min(workers, len(pending)) or 1)))
+            self.progress.status = BackfillStatus.COMPLETED.value
+        except Exception as e:
+            self.logger.error(f"AI总结补全异常终止: {e}")
+            self.progress.status = BackfillStatus.FAILED.value
+        finally:
+            self.progress.elapsed = time.monotonic() - started
+            self.progress.finished_at = datetime.now().isoformat()
+            self.progress.in_progress = []
+            await self._save_checkpoint_async()
+            self.logger.info(
+                f"AI总结补全结束: 成功 {self.progress.succeeded}, 失败 {self.progress.failed}, "
+                f"跳过 {self.progress.skipped}, 耗时 {self.progress.elapsed:.1f}秒"
+            )
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        """工作协程：依次领取并处理任务
+
+        总结通过作业管理器提交，与接口触发的生成共用并发上限；
+        同一任务已有进行中的作业时等待该作业而不重复生成。
+        """
+        from app.core.summary_jobs import SummaryJobStatus, get_summary_job_manager
+        from app.storage.task_layout import read_task_metadata
+
+        manager = get_summary_job_manager()
+        while not queue.empty():
+            await self._resume_event.wait()
+            try:
+                task_dir = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            key = str(task_dir)
+            self.progress.in_progress.append(task_dir.name)
+            try:
+                if not task_dir.exists():
+                    self.progress.skipped += 1
+                    continue
+
+                task = (await asyncio.to_thread(read_task_metadata, task_dir))["task"]
+                job = manager.submit(task["id"], task_dir, task.get("title", ""))
+                await manager.wait(job.job_id)
+                if job.status == SummaryJobStatus.SUCCEEDED:
+                    self.progress.succeeded += 1
+                    self._attempts.pop(key, None)
+                else:
+                    self._record_failure(key, task_dir.name, job.error or "总结生成失败")
+            except Exception as e:
+                self._record_failure(key, task_dir.name, str(e))
+            finally:
+                self.progress.in_progress.remove(task_dir.name)
+                self.progress.processed += 1
+                await self._save_checkpoint_async()
+
+    def _record_failure(self, key: str, task_name: str, error: str) -> None:
+        """记录失败（超过最大尝试次数后不再自动重试）"""
+        self.progress.failed += 1
+        self._attempts[key] = self._attempts.get(key, 0) + 1
+        self.progress.recent_errors = (self.progress.recent_errors + [{"task": task_name, "error": error}])[-20:]
+        self.logger.warning(f"任务 {task_name} 总结生成失败: {error}")
+
+    def get_progress(self) -> Dict[str, Any]:
+        """获取进度"""
+        progress = asdict(self.progress)
+        if self.running:
+            progress["elapsed"] = time.time() - datetime.fromisoformat(self.progress.started_at).timestamp()
+        return progress
+
+
+# 全局补全作业实例
+_summary_backfill = None
+
+
+def get_summary_backfill() -> SummaryBackfill:
+    """获取全局AI总结补全作业"""
+    global _summary_backfill
+    if _summary_backfill is None:
+        _summary_backfill = SummaryBackfill()
+    return _summary_backfill
@@ -0,0 +1,202 @@
+"""
+AI总结后台作业
+生成请求只负责入队并返回作业ID，总结在后台协程中生成；
+同一任务的并发请求合并为同一个进行中的作业（singleflight），
+客户端通过状态接口或 SSE 订阅进度，断开连接不会中断生成。
+"""
+
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.logger import get_logger
+from app.utils.lru import LRUDict
+
+
+class SummaryJobStatus(Enum):
+    """总结作业状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+TERMINAL_EVENTS = ("done", "error")
+
+
+@dataclass
+class SummaryJob:
+    """总结作业"""
+    job_id: str
+    task_id: str
+    task_dir: Path
+    task_title: str = ""
+    status: SummaryJobStatus = SummaryJobStatus.QUEUED
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    files_analyzed: int = 0
+    summary: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        """作业是否已结束"""
+        return self.status in (SummaryJobStatus.SUCCEEDED, SummaryJobStatus.FAILED)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """记录事件并推送给所有订阅者"""
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """作业状态（不含事件历史）"""
+        return {
+            "job_id": self.job_id,
+            "task_id": self.task_id,
+            "status": self.status.value,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "files_analyzed": self.files_analyzed,
+            "summary": self.summary,
+            "error": self.error
+        }
+
+
+class SummaryJobManager:
+    """AI总结作业管理器"""
+
+    def __init__(self, max_concurrent: int = 2, max_finished_jobs: int = 200):
+        self.logger = get_logger("summary_jobs")
+        self.max_concurrent = max_concurrent
+        self._jobs: Dict[str, SummaryJob] = {}
+        self._finished: LRUDict = LRUDict(max_finished_jobs)
+        self._active_by_task: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, task_id: str, task_dir: Path, task_title: str = "") -> SummaryJob:
+        """提交总结作业；该任务已有进行中的作业时直接返回该作业"""
+        active_id = self._active_by_task.get(task_id)
+        if active_id is not None:
+            self.logger.info(f"任务 {task_id} 已有进行中的总结作业 {active_id}")
+            return self._jobs[active_id]
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        job = SummaryJob(job_id=uuid.uuid4().hex[:12], task_id=task_id, task_dir=Path(task_dir), task_title=task_title)
+        self._jobs[job.job_id] = job
+        self._active_by_task[task_id] = job.job_id
+        self._tasks[job.job_id] = asyncio.create_task(self._run(job), name=f"summary-job-{job.job_id}")
+        self.logger.info(f"总结作业已入队: {job.job_id} (任务 {task_id})")
+        return job
+
+    def get(self, job_id: str) -> Optional[SummaryJob]:
+        """获取作业（进行中或最近结束的）"""
+        return self._jobs.get(job_id) or self._finished.get(job_id)
+
+    def get_active_job(self, task_id: str) -> Optional[SummaryJob]:
+        """获取任务进行中的作业"""
+        job_id = self._active_by_task.get(task_id)
+        return self._jobs.get(job_id) if job_id else None
+
+    async def _run(self, job: SummaryJob) -> None:
+        """在并发上限内执行作业"""
+        from app.core.task_summary_generator import stream_task_summary
+
+        try:
+            async with self._semaphore:
+                job.status = SummaryJobStatus.RUNNING
+                job.started_at = datetime.now().isoformat()
+                async for event in stream_task_summary(job.task_dir, job.task_title):
+                    if event["event"] == "file":
+                        job.files_analyzed += 1
+                    elif event["event"] == "done":
+                        job.summary = event["data"].get("summary")
+                        job.status = SummaryJobStatus.SUCCEEDED
+                    elif event["event"] == "error":
+                        job.error = event["data"].get("error")
+                        job.status = SummaryJobStatus.FAILED
+                    job.publish(event)
+        except Exception as e:
+            self.logger.error(f"总结作业 {job.job_id} 执行失败: {e}")
+            job.error = str(e)
+            job.status = SummaryJobStatus.FAILED
+            job.publish({"event": "error", "data": {"success": False, "error": str(e), "summary": None}})
+        finally:
+            if not job.finished:
+                job.status = SummaryJobStatus.FAILED
+                job.error = job.error or "作业被取消"
+                job.publish({"event": "error", "data": {"success": False, "error": job.error, "summary": None}})
+            job.finished_at = datetime.now().isoformat()
+            self._active_by_task.pop(job.task_id, None)
+            self._tasks.pop(job.job_id, None)
+            self._finished[job.job_id] = self._jobs.pop(job.job_id)
+            job.done.set()
+            self.logger.info(f"总结作业结束: {job.job_id}, 状态 {job.status.value}")
+
+    async def wait(self, job_id: str) -> Optional[SummaryJob]:
+        """等待作业结束"""
+        job = self.get(job_id)
+        if job is not None:
+            await job.done.wait()
+        return job
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """订阅作业事件：先回放已产生的事件，再推送后续事件直到作业结束"""
+        job = self.get(job_id)
+        if job is None:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        history = list(job.events)
+        if not job.finished:
+            job.subscribers.append(queue)
+        try:
+            for event in history:
+                yield event
+            if job.finished:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            if queue in job.subscribers:
+                job.subscribers.remove(queue)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """列出进行中和最近结束的作业"""
+        return [job.to_dict() for job in [*self._jobs.values(), *reversed(list(self._finished.values()))]]
+
+    async def shutdown(self) -> None:
+        """取消所有进行中的作业"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 全局作业管理器实例
+_summary_job_manager = None
+
+
+def get_summary_job_manager() -> SummaryJobManager:
+    """获取全局AI总结作业管理器"""
+    global _summary_job_manager
+    if _summary_job_manager is None:
+        from app.config.settings import get_settings
+        _summary_job_manager = SummaryJobManager(max_concurrent=get_settings().model.summary_job_concurrency)
+    return _summary_job_manager
@@ -0,0 +1,393 @@
+"""
+并发任务执行引擎
+基于 TaskProcessor 的工作池执行器，支持优先级队列、平台并发配额和任务取消
+"""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Deque, Dict, List, Optional, Any, Tuple
+
+from app.core.logger import get_logger
+from app.core.task_processor import TaskProcessor, TaskRequest, TaskResult, TaskStatus
+
+
+class ExecutionState(Enum):
+    """执行状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+
+
+@dataclass(order=True)
+class QueuedExecution:
+    """排队中的执行项（按优先级排序，优先级数值越大越先执行）"""
+    sort_key: Tuple[int, int]
+    execution_id: str = field(compare=False)
+    request: TaskRequest = field(compare=False)
+    task_id: Optional[str] = field(compare=False, default=None)
+    priority: int = field(compare=False, default=1)
+    state: ExecutionState = field(compare=False, default=ExecutionState.QUEUED)
+    enqueued_at: float = field(compare=False, default_factory=time.time)
+    started_at: Optional[float] = field(compare=False, default=None)
+    cancel_requested: bool = field(compare=False, default=False)
+    future: Optional[asyncio.Future] = field(compare=False, default=None, repr=False)
+    worker_task: Optional[asyncio.Task] = field(compare=False, default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "execution_id": self.execution_id,
+            "platform": self.request.platform,
+            "priority": self.priority,
+            "state": self.state.value,
+            "enqueued_at": self.enqueued_at,
+            "started_at": self.started_at,
+        }
+
+
+class TaskExecutor:
+    """并发任务执行器
+
+    每个平台拥有独立的优先级队列和与可用浏览器标签页数量一致的工作协程，
+    全局并发上限由 ``max_workers`` 控制。
+    """
+
+    # 吞吐量统计窗口（秒）
+    THROUGHPUT_WINDOW = 300
+
+    def __init__(
+        self,
+        processor: Optional[TaskProcessor] = None,
+        max_workers: Optional[int] = None,
+        platform_limits: Optional[Dict[str, int]] = None
+    ):
+        from app.config.settings import get_settings
+
+        self.logger = get_logger("task_executor")
+        self.settings = get_settings()
+        self.processor = processor or TaskProcessor()
+        self.processor.executor = self
+
+        self.max_workers = max_workers or self.settings.scheduler.max_workers
+        self.platform_limits = platform_limits if platform_limits is not None else self._load_platform_limits()
+
+        self._queues: Dict[str, asyncio.PriorityQueue] = {}
+        self._workers: Dict[str, List[asyncio.Task]] = {}
+        self._executions: Dict[str, QueuedExecution] = {}
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._sequence = itertools.count()
+        self._running = False
+        self._stopping = False
+        # 已结束的执行项只保留最近一部分，避免长期运行时无限增长
+        self._finished_ids: Deque[str] = deque()
+        self.max_finished = self.settings.scheduler.task_cache_size
+
+        # 统计信息
+        self._completion_times: Deque[float] = deque()
+        self._queue_wait_total = 0.0
+        self.total_submitted = 0
+        self.total_finished = 0
+        self.total_cancelled = 0
+
+    def _load_platform_limits(self) -> Dict[str, int]:
+        """从平台配置读取已启用平台的并发上限（浏览器标签页数量）"""
+        from app.config.settings import get_platform_configs
+
+        default_limit = self.settings.platform.max_concurrent_tasks
+        limits = {}
+        for platform_name, config in get_platform_configs().items():
+            if isinstance(config, dict) and "base_url" in config and config.get("enabled", False):
+                limits[platform_name] = int(config.get("max_concurrent_tasks", default_limit))
+        return limits
+
+    def get_platform_limit(self, platform: str) -> int:
+        """获取平台并发上限"""
+        return max(1, self.platform_limits.get(platform, self.settings.platform.max_concurrent_tasks))
+
+    @property
+    def running(self) -> bool:
+        """执行器是否在运行"""
+        return self._running
+
+    async def start(self) -> None:
+        """启动执行器"""
+        if self._running:
+            self.logger.warning("任务执行器已在运行")
+            return
+
+        self._global_slots = asyncio.Semaphore(self.max_workers)
+        self._running = True
+
+        for platform in self.platform_limits:
+            self._ensure_platform_workers(platform)
+
+        self.logger.info(f"任务执行器已启动: 全局并发 {self.max_workers}, 平台配额 {self.platform_limits}")
+
+    async def stop(self, wait: bool = True) -> None:
+        """停止执行器
+
+        Args:
+            wait: 是否等待队列中的任务全部执行完毕；为 False 时执行中的任务
+                保存为中断状态，下次启动时由 recover_pending_tasks 继续执行
+        """
+        if not self._running:
+            return
+
+        if wait:
+            await asyncio.gather(*(queue.join() for queue in self._queues.values()))
+        else:
+            self._stopping = True
+            self.processor.shutting_down = True
+            for execution_id, execution in list(self._executions.items()):
+                if execution.state in (ExecutionState.QUEUED, ExecutionState.RUNNING):
+                    self.cancel(execution_id)
+
+        workers = [worker for workers in self._workers.values() for worker in workers]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        self._workers.clear()
+        self._queues.clear()
+        self._running = False
+        self._stopping = False
+        self.processor.shutting_down = False
+        self.logger.info("任务执行器已停止")
+
+    def _ensure_platform_workers(self, platform: str) -> asyncio.PriorityQueue:
+        """确保平台队列和工作协程存在"""
+        if platform not in self._queues:
+            self._queues[platform] = asyncio.PriorityQueue()
+            self._workers[platform] = [
+                asyncio.create_task(self._worker_loop(platform, index), name=f"executor-{platform}-{index}")
+                for index in range(self.get_platform_limit(platform))
+            ]
+        return self._queues[platform]
+
+    def submit(self, request: TaskRequest, priority: int = 1, task_id: Optional[str] = None) -> str:
+        """提交任务到执行队列
+
+        Args:
+            request: 任务请求
+            priority: 优先级（数值越大越优先，对应 Topic.priority）
+            task_id: 已持久化的任务ID，传入时从最后完成的阶段继续执行
+
+        Returns:
+            执行ID
+        """
+        if not self._running:
+            raise RuntimeError("任务执行器未启动")
+
+        sequence = next(self._sequence)
+        # 新任务在入队时即确定任务ID，执行ID中带上任务ID，执行项被清理后仍可从任务存储取回结果
+        task_id = task_id or self.processor.new_task_id(request.platform)
+        execution_id = f"exec_{sequence}_{task_id}"
+
+        execution = QueuedExecution(
+            sort_key=(-priority, sequence),
+            execution_id=execution_id,
+            request=request,
+            task_id=task_id,
+            priority=priority,
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._executions[execution_id] = execution
+
+        queue = self._ensure_platform_workers(request.platform)
+        queue.put_nowait(execution)
+        self.total_submitted += 1
+
+        self.logger.info(f"任务已入队: {execution_id}, 优先级 {priority}, 队列深度 {self.queue_depth}")
+        return execution_id
+
+    def submit_topic(self, topic, platforms: Optional[List[str]] = None, **request_options) -> List[str]:
+        """按命题提交到多个平台，优先级取自 Topic.priority"""
+        target_platforms = platforms or topic.platforms or list(self.platform_limits)
+
+        execution_ids = []
+        for platform in target_platforms:
+            request = TaskRequest(
+                platform=platform,
+                topic=topic.content,
+                title=topic.title,
+                **request_options
+            )
+            execution_ids.append(self.submit(request, priority=topic.priority))
+        return execution_ids
+
+    def recover_pending_tasks(self, priority: int = 1) -> List[str]:
+        """重新提交重启前未完成的任务"""
+        execution_ids = []
+        for result in self.processor.get_resumable_tasks():
+            execution_ids.append(self.submit(result.request, priority=priority, task_id=result.task_id))
+
+        if execution_ids:
+            self.logger.info(f"已恢复 {len(execution_ids)} 个未完成任务")
+        return execution_ids
+
+    async def wait_for(self, execution_id: str, timeout: Optional[float] = None) -> TaskResult:
+        """等待执行结果（已结束并被清理的执行项从任务存储恢复结果）"""
+        execution = self._executions.get(execution_id)
+        if execution:
+            return await asyncio.wait_for(asyncio.shield(execution.future), timeout)
+
+        parts = execution_id.split("_", 2)
+        record = self.processor.task_store.get_task(parts[2]) if len(parts) == 3 and parts[0] == "exec" else None
+        if not record:
+            raise KeyError(f"未知的执行ID: {execution_id}")
+        return self.processor._restore_result(record)
+
+    def cancel(self, execution_id: str) -> bool:
+        """取消排队中或执行中的任务"""
+        execution = self._executions.get(execution_id)
+        if not execution or execution.state in (ExecutionState.FINISHED, ExecutionState.CANCELLED):
+            return False
+
+        execution.cancel_requested = True
+        if execution.state == ExecutionState.RUNNING and execution.worker_task:
+            execution.worker_task.cancel()
+        else:
+            # 排队中的任务在出队时被跳过
+            self._finish(execution, ExecutionState.CANCELLED, self._cancelled_result(execution))
+
+        self.logger.info(f"任务已取消: {execution_id}")
+        return True
+
+    async def _worker_loop(self, platform: str, index: int) -> None:
+        """平台工作协程"""
+        queue = self._queues[platform]
+
+        while True:
+            execution = await queue.get()
+            try:
+                if execution.state == ExecutionState.CANCELLED:
+                    continue
+
+                async with self._global_slots:
+                    if execution.state == ExecutionState.CANCELLED:
+                        continue
+                    await self._run_execution(execution)
+            finally:
+                queue.task_done()
+
+    async def _run_execution(self, execution: QueuedExecution) -> None:
+        """执行单个任务"""
+        execution.state = ExecutionState.RUNNING
+        execution.started_at = time.time()
+        self._queue_wait_total += execution.started_at - execution.enqueued_at
+
+        execution.worker_task = asyncio.create_task(
+            self.processor.process_task(execution.request, task_id=execution.task_id)
+        )
+        try:
+            result = await execution.worker_task
+            self._finish(execution, ExecutionState.FINISHED, result)
+        except asyncio.CancelledError:
+            self._finish(execution, ExecutionState.CANCELLED, self._cancelled_result(execution))
+            # 执行器自身被停止时继续向上传播（否则工作协程的取消会被吞掉）
+            if not execution.cancel_requested or self._stopping:
+                raise
+        except Exception as e:
+            self.logger.error(f"任务执行异常: {execution.execution_id}, {e}")
+            self._finish(execution, ExecutionState.FINISHED, e)
+        finally:
+            execution.worker_task = None
+
+    def _finish(self, execution: QueuedExecution, state: ExecutionState, outcome: Any) -> None:
+        """结束执行并设置结果"""
+        if execution.started_at is None:
+            # 排队中被取消的恢复任务释放租约，之后可被再次恢复
+            self.processor.release_claim(execution.task_id)
+        execution.state = state
+        if state == ExecutionState.CANCELLED:
+            self.total_cancelled += 1
+        else:
+            self.total_finished += 1
+            self._completion_times.append(time.time())
+
+        self._finished_ids.append(execution.execution_id)
+        while len(self._finished_ids) > self.max_finished:
+            self._executions.pop(self._finished_ids.popleft(), None)
+
+        if execution.future and not execution.future.done():
+            if isinstance(outcome, Exception):
+                execution.future.set_exception(outcome)
+            else:
+                execution.future.set_result(outcome)
+
+    def _cancelled_result(self, execution: QueuedExecution) -> TaskResult:
+        """构建已取消任务的结果"""
+        return TaskResult(
+            request=execution.request,
+            task_id=execution.execution_id,
+            status=TaskStatus.CANCELLED,
+            platform=execution.request.platform,
+            error_message="任务已取消"
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """排队中的任务数量"""
+        return sum(
+            1 for execution in self._executions.values()
+            if execution.state == ExecutionState.QUEUED
+        )
+
+    def _throughput_per_minute(self) -> float:
+        """计算最近窗口内的吞吐量（任务/分钟）"""
+        now = time.time()
+        while self._completion_times and now - self._completion_times[0] > self.THROUGHPUT_WINDOW:
+            self._completion_times.popleft()
+        return len(self._completion_times) * 60.0 / self.THROUGHPUT_WINDOW
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取执行器统计信息"""
+        queued_by_platform: Dict[str, int] = {}
+        running_by_platform: Dict[str, int] = {}
+        for execution in self._executions.values():
+            platform = execution.request.platform
+            if execution.state == ExecutionState.QUEUED:
+                queued_by_platform[platform] = queued_by_platform.get(platform, 0) + 1
+            elif execution.state == ExecutionState.RUNNING:
+                running_by_platform[platform] = running_by_platform.get(platform, 0) + 1
+
+        started = self.total_finished + sum(running_by_platform.values())
+        return {
+            "running": self._running,
+            "max_workers": self.max_workers,
+            "platform_limits": dict(self.platform_limits),
+            "queue_depth": self.queue_depth,
+            "queued_by_platform": queued_by_platform,
+            "running_by_platform": running_by_platform,
+            "submitted": self.total_submitted,
+            "finished": self.total_finished,
+            "cancelled": self.total_cancelled,
+            "throughput_per_minute": self._throughput_per_minute(),
+            "average_queue_wait": self._queue_wait_total / started if started else 0.0,
+        }
+
+    def get_execution(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """获取执行项信息"""
+        execution = self._executions.get(execution_id)
+        return execution.to_dict() if execution else None
+
+    def list_executions(self) -> List[Dict[str, Any]]:
+        """列出排队中、执行中和最近结束的执行项"""
+        return [execution.to_dict() for execution in self._executions.values()]
+
+
+# 全局任务执行器实例
+_task_executor: Optional[TaskExecutor] = None
+
+
+def get_task_executor() -> TaskExecutor:
+    """获取全局任务执行器"""
+    global _task_executor
+    if _task_executor is None:
+        _task_executor = TaskExecutor()
+    return _task_executor
@@ -1,9 +1,15 @@
 """
-任务管理器模块（占位符实现）
+任务管理器模块
+通过多平台编排器执行命题，各平台分支经任务执行器排队执行
 """
 
-from typing import List, Optional
+from pathlib import Path
+from typing import List, Optional, Union
+
 from app.core.logger import get_logger
+from app.core.fanout_orchestrator import FanoutMode, FanoutOrchestrator, PlatformOutcome
+from app.core.task_executor import TaskExecutor, get_task_executor
+from app.core.topic_manager import Topic, TopicManager
 
 
 class TaskResult:
@@ -12,41 +18,94 @@ class TaskResult:
         self.platform = platform
         self.success = success
         self.result = result
+    
+    @classmethod
+    def from_outcome(cls, outcome: PlatformOutcome) -> "TaskResult":
+        """从平台执行结果创建"""
+        if outcome.success:
+            text = outcome.result.content
+        else:
+            text = f"[{outcome.status}] {outcome.error}"
+        return cls(platform=outcome.platform, success=outcome.success, result=text)
 
 
 class TaskManager:
-    """任务管理器（占位符实现）"""
+    """任务管理器"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        orchestrator: Optional[FanoutOrchestrator] = None,
+        executor: Optional[TaskExecutor] = None,
+        topic_manager: Optional[TopicManager] = None
+    ):
         self.logger = get_logger("task_manager")
+        self.topic_manager = topic_manager or TopicManager()
+        self.executor = executor or (orchestrator and orchestrator.executor) or get_task_executor()
+        self.orchestrator = orchestrator or FanoutOrchestrator(self.executor.processor, executor=self.executor)
+    
+    async def start(self, recover: bool = False) -> None:
+        """启动任务执行器（已启动时不重复启动）
+        
+        Args:
+            recover: 是否重新提交上次停止时中断和未完成的任务
+        """
+        if not self.executor.running:
+            await self.executor.start()
+            if recover:
+                self.executor.recover_pending_tasks()
+    
+    async def stop(self, wait: bool = True) -> None:
+        """停止任务执行器"""
+        await self.executor.stop(wait=wait)
+    
+    def _default_platforms(self) -> List[str]:
+        """获取配置中启用的平台"""
+        from app.config.settings import get_platform_configs
+        
+        return [
+            name for name, config in get_platform_configs().items()
+            if isinstance(config, dict) and config.get("enabled", False)
+        ]
     
     async def execute_topic(
         self, 
-        topic_id: str, 
-        platforms: Optional[List[str]] = None
+        topic_id: Union[str, Topic], 
+        platforms: Optional[List[str]] = None,
+        mode: FanoutMode = FanoutMode.ALL,
+        deadline: Optional[float] = None,
+        on_result=None,
+        download_root: Optional[Path] = None
     ) -> List[TaskResult]:
-        """执行指定命题的任务"""
-        self.logger.info(f"执行命题任务: {topic_id}, 平台: {platforms}")
-        
-        # 占位符实现
-        results = []
-        test_platforms = platforms or ["manus", "skywork", "chatgpt_deepsearch", "kouzi"]
+        """执行指定命题的任务（多平台并发）"""
+        topic = topic_id if isinstance(topic_id, Topic) else await self.topic_manager.get_topic(topic_id)
+        if topic is None:
+            self.logger.error(f"命题不存在: {topic_id}")
+            return []
         
-        for platform in test_platforms:
-            results.append(TaskResult(
-                platform=platform,
-                success=True,
-                result=f"[占位符] {platform} 平台执行命题 {topic_id} 的结果"
-            ))
+        target_platforms = platforms or topic.platforms or self._default_platforms()
+        await self.start()
+        self.logger.info(f"执行命题任务: {topic.id}, 平台: {target_platforms}, 模式: {mode.value}")
         
-        return results
+        fanout = await self.orchestrator.run(
+            topic,
+            target_platforms,
+            mode=mode,
+            deadline=deadline,
+            on_result=on_result,
+            download_root=download_root
+        )
+        return [TaskResult.from_outcome(outcome) for outcome in fanout.outcomes]
     
     async def execute_pending_tasks(
         self, 
-        platforms: Optional[List[str]] = None
+        platforms: Optional[List[str]] = None,
+        **options
     ) -> List[TaskResult]:
-        """执行所有待处理任务"""
+        """执行所有尚未执行过的命题"""
         self.logger.info(f"执行待处理任务, 平台: {platforms}")
         
-        # 占位符实现
-        return await self.execute_topic("demo_topic", platforms) 
\ No newline at end of file
+        results = []
+        for topic in await self.topic_manager.list_topics(pending_only=True):
+            results.extend(await self.execute_topic(topic, platforms, **options))
+            await self.topic_manager.mark_executed(topic.id)
+        return results
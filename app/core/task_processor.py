@@ -4,15 +4,19 @@
 """
 
 import asyncio
+import os
+import socket
 import time
+import uuid
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 from enum import Enum
 
 from app.core.logger import get_logger
-from app.core.exceptions import AgentHubException, PlatformError
-from app.core.platform_capabilities import PlatformCapabilities, CapabilityManager
+from app.core.exceptions import AgentHubException, PlatformError, TaskError
+from app.core.platform_capabilities import get_capability_manager
+from app.utils.lru import LRUDict
 
 
 class TaskStatus(Enum):
@@ -23,6 +27,7 @@ class TaskStatus(Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     CANCELLED = "cancelled"
+    INTERRUPTED = "interrupted"  # 服务停止时中断，重启后继续执行
 
 
 class ProcessingStage(Enum):
@@ -67,7 +72,7 @@ class ProcessingMetrics:
 @dataclass
 class TaskRequest:
     """任务请求"""
-    platform: str
+    platform: str  # 为空或 "auto" 时按平台近期指标自动路由
     topic: str
     title: Optional[str] = None
     download_dir: Optional[Path] = None
@@ -84,6 +89,26 @@ class TaskRequest:
         """后处理"""
         if self.download_dir:
             self.download_dir = Path(self.download_dir)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（用于持久化）"""
+        return {
+            "platform": self.platform,
+            "topic": self.topic,
+            "title": self.title,
+            "download_dir": str(self.download_dir) if self.download_dir else None,
+            "enable_ai_summary": self.enable_ai_summary,
+            "force_ai_regenerate": self.force_ai_regenerate,
+            "custom_options": self.custom_options,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries,
+            "retry_delay": self.retry_delay
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TaskRequest":
+        """从字典创建"""
+        return cls(**data)
 
 
 @dataclass
@@ -196,77 +221,294 @@ class QualityController:
 class TaskProcessor:
     """标准化任务处理器"""
     
-    def __init__(self):
+    def __init__(self, task_store=None):
+        from app.config.settings import get_settings
+        from app.storage.task_store import get_task_store
+        
         self.logger = get_logger("task_processor")
-        self.capability_manager = CapabilityManager()
+        self.capability_manager = get_capability_manager()
         self.quality_controller = QualityController()
+        self.task_store = task_store or get_task_store()
         
-        # 处理状态
+        # 执行中的任务在存储中持有租约并定期续约，其他进程只恢复租约过期的任务
+        self.lease_owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = get_settings().scheduler.task_lease_ttl
+        self._lease_renewer: Optional[asyncio.Task] = None
+        # 已领取、尚在执行队列中等待的恢复任务（同样需要续约）
+        self._claimed_tasks: set = set()
+        
+        # 处理状态（已完成任务只在内存中保留最近的一部分，其余从存储读取）
         self.active_tasks: Dict[str, TaskResult] = {}
-        self.completed_tasks: Dict[str, TaskResult] = {}
+        self.completed_tasks: Dict[str, TaskResult] = LRUDict(get_settings().scheduler.task_cache_size)
         
         # 统计信息
         self.total_tasks_processed = 0
         self.successful_tasks = 0
         self.failed_tasks = 0
-    
-    async def process_task(self, request: TaskRequest) -> TaskResult:
-        """处理单个任务"""
-        task_id = f"{request.platform}_{int(time.time())}"
         
-        result = TaskResult(
-            request=request,
-            task_id=task_id,
-            status=TaskStatus.CREATED,
-            platform=request.platform
-        )
+        # 并发执行器（由 TaskExecutor 绑定）
+        self.executor = None
+        # 执行器停止时置位，此时被取消的任务记为中断而非取消
+        self.shutting_down = False
+        
+        # 每个任务在各阶段复用同一个平台实例（及其租用的浏览器页面）
+        self._task_platforms: Dict[str, Any] = {}
+    
+    @staticmethod
+    def new_task_id(platform: str) -> str:
+        """生成任务ID（并发执行时同一秒内可能提交多个任务，追加随机后缀保证唯一）"""
+        return f"{platform}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+    async def process_task(self, request: TaskRequest, task_id: Optional[str] = None) -> TaskResult:
+        """处理单个任务
+        
+        Args:
+            request: 任务请求
+            task_id: 已存在的任务ID，传入时从最后完成的阶段继续执行
+        """
+        record = self.task_store.get_task(task_id) if task_id else None
+        
+        # 未指定平台时按近期指标路由
+        routed = not record and request.platform in ("", "auto")
+        if routed:
+            request.platform = self._route_platform()
+        
+        if record:
+            result = self._restore_result(record)
+            completed_stages = set(record["completed_stages"])
+            if result.status == TaskStatus.INTERRUPTED:
+                submitted = ProcessingStage.TASK_SUBMISSION.value in completed_stages
+                result.status = TaskStatus.RUNNING if submitted else TaskStatus.CREATED
+                result.error_message = ""
+            if not self.task_store.claim_task(task_id, self.lease_owner, self.lease_ttl):
+                raise TaskError("任务正由其他进程执行", task_id=task_id, platform=result.platform)
+            self.logger.info(f"恢复任务: {task_id}, 已完成阶段: {record['completed_stages']}")
+        else:
+            task_id = task_id or self.new_task_id(request.platform)
+            result = TaskResult(
+                request=request,
+                task_id=task_id,
+                status=TaskStatus.CREATED,
+                platform=request.platform
+            )
+            completed_stages = set()
+            self._persist_result(result, [], lease=True)
         
         self.active_tasks[task_id] = result
+        self._claimed_tasks.discard(task_id)
+        self._ensure_lease_renewer()
+        completed_order = [stage.value for stage in ProcessingStage if stage.value in completed_stages]
         
         try:
-            # 阶段1: 初始化
-            await self._stage_initialization(result)
-            
-            # 阶段2: 任务提交
-            await self._stage_task_submission(result)
-            
-            # 阶段3: 任务监控
-            await self._stage_task_monitoring(result)
-            
-            # 阶段4: 内容提取
-            await self._stage_content_extraction(result)
-            
-            # 阶段5: 文件下载
-            if request.download_dir:
-                await self._stage_file_download(result)
-            
-            # 阶段6: AI分析
-            if request.enable_ai_summary:
-                await self._stage_ai_analysis(result)
-            
-            # 阶段7: 质量控制
-            await self._stage_quality_control(result)
-            
-            # 阶段8: 完成
-            await self._stage_completion(result)
-            
+            for stage, handler in self._build_pipeline(result.request):
+                # 初始化阶段只注册本进程的平台能力，恢复时也需要重新执行
+                if stage.value in completed_stages and stage != ProcessingStage.INITIALIZATION:
+                    self.logger.info(f"跳过已完成阶段: {task_id}, {stage.value}")
+                    continue
+                
+                self.task_store.record_transition(task_id, stage.value, "started")
+                await handler(result)
+                
+                if stage.value not in completed_order:
+                    completed_order.append(stage.value)
+                self.task_store.record_transition(
+                    task_id, stage.value, "completed",
+                    elapsed=result.metrics.stage_times.get(stage.value)
+                )
+                self._persist_result(result, completed_order)
+        
+        except asyncio.CancelledError:
+            if self.shutting_down:
+                result.status = TaskStatus.INTERRUPTED
+                result.error_message = "服务停止，任务已中断"
+            else:
+                result.status = TaskStatus.CANCELLED
+                result.error_message = "任务已取消"
+            result.metrics.end_time = time.time()
+            self.task_store.record_transition(task_id, result.current_stage.value, result.status.value)
+            self._persist_result(result, completed_order)
+            raise
+        
         except Exception as e:
             await self._handle_task_error(result, e)
+            self.task_store.record_transition(task_id, result.current_stage.value, "failed", message=str(e))
+            self._persist_result(result, completed_order)
         
         finally:
+            await self._release_task_platform(task_id)
+            self._release_lease(task_id)
+            if result.status not in (TaskStatus.CANCELLED, TaskStatus.INTERRUPTED):
+                self._record_capability_metrics(result)
+            elif routed:
+                self.capability_manager.release_probe(result.platform)
+            
             # 移动到已完成任务
             self.active_tasks.pop(task_id, None)
+            self._stop_lease_renewer_if_idle()
             self.completed_tasks[task_id] = result
             
             # 更新统计
             self.total_tasks_processed += 1
             if result.success:
                 self.successful_tasks += 1
-            else:
+            elif result.status not in (TaskStatus.CANCELLED, TaskStatus.INTERRUPTED):
                 self.failed_tasks += 1
         
         return result
     
+    def _route_platform(self) -> str:
+        """为未指定平台的请求选择最快的健康平台"""
+        from app.config.settings import get_platform_configs
+        
+        candidates = []
+        for platform_name, config in get_platform_configs().items():
+            if isinstance(config, dict) and config.get("enabled", False):
+                if not self.capability_manager.get_platform_capabilities(platform_name):
+                    self.capability_manager.register_platform_capabilities(platform_name, config)
+                candidates.append(platform_name)
+        
+        platform_name = self.capability_manager.select_platform("task_submission", candidates=candidates)
+        if not platform_name:
+            raise PlatformError("没有可用的健康平台", platform="auto")
+        return platform_name
+    
+    def _record_capability_metrics(self, result: TaskResult):
+        """将任务耗时和结果记入平台能力指标"""
+        stage_times = result.metrics.stage_times
+        success = result.success
+        
+        self.capability_manager.record_metrics(
+            result.platform, "task_submission", success, result.metrics.total_time
+        )
+        for stage, capability in (("content_extraction", "content_extraction"),
+                                  ("file_download", "file_management"),
+                                  ("ai_analysis", "ai_analysis")):
+            if stage in stage_times:
+                self.capability_manager.record_metrics(result.platform, capability, success, stage_times[stage])
+    
+    def _build_pipeline(self, request: TaskRequest) -> List[tuple]:
+        """构建处理阶段流水线"""
+        pipeline = [
+            (ProcessingStage.INITIALIZATION, self._stage_initialization),
+            (ProcessingStage.TASK_SUBMISSION, self._stage_task_submission),
+            (ProcessingStage.TASK_MONITORING, self._stage_task_monitoring),
+            (ProcessingStage.CONTENT_EXTRACTION, self._stage_content_extraction),
+        ]
+        if request.download_dir:
+            pipeline.append((ProcessingStage.FILE_DOWNLOAD, self._stage_file_download))
+        if request.enable_ai_summary:
+            pipeline.append((ProcessingStage.AI_ANALYSIS, self._stage_ai_analysis))
+        pipeline.append((ProcessingStage.QUALITY_CONTROL, self._stage_quality_control))
+        pipeline.append((ProcessingStage.COMPLETION, self._stage_completion))
+        return pipeline
+    
+    def _persist_result(self, result: TaskResult, completed_stages: List[str], lease: bool = False):
+        """保存任务状态到存储
+
+        Args:
+            lease: 同时写入本进程的租约（新建任务时，避免写入后被其他进程领取）
+        """
+        metrics = result.metrics
+        lease_fields = {"owner": self.lease_owner, "lease_expires_at": time.time() + self.lease_ttl} if lease else {}
+        try:
+            self.task_store.save_task({
+                "task_id": result.task_id,
+                "platform": result.platform,
+                "status": result.status.value,
+                "current_stage": result.current_stage.value,
+                "completed_stages": completed_stages,
+                "request": result.request.to_dict(),
+                "content": result.content,
+                "files": [str(path) for path in result.files],
+                "ai_summary": result.ai_summary,
+                "metadata": result.metadata,
+                "metrics": {
+                    "start_time": metrics.start_time,
+                    "end_time": metrics.end_time,
+                    "stage_times": metrics.stage_times,
+                    "success_rate": metrics.success_rate,
+                    "total_files": metrics.total_files,
+                    "files_downloaded": metrics.files_downloaded,
+                    "ai_summary_generated": metrics.ai_summary_generated,
+                    "errors": metrics.errors
+                },
+                "error_message": result.error_message,
+                "created_at": metrics.start_time,
+                **lease_fields
+            })
+        except AgentHubException as e:
+            # 持久化失败不影响任务本身的执行
+            self.logger.error(f"任务状态保存失败: {result.task_id}, {e}")
+    
+    def _restore_result(self, record: Dict[str, Any]) -> TaskResult:
+        """从存储记录恢复任务结果"""
+        return TaskResult(
+            request=TaskRequest.from_dict(record["request"]),
+            task_id=record["task_id"],
+            status=TaskStatus(record["status"]),
+            platform=record["platform"],
+            content=record["content"],
+            files=[Path(path) for path in record["files"]],
+            ai_summary=record["ai_summary"],
+            metadata=record["metadata"],
+            metrics=ProcessingMetrics(**record["metrics"]),
+            current_stage=ProcessingStage(record["current_stage"]),
+            error_message=record["error_message"]
+        )
+    
+    def get_resumable_tasks(self) -> List[TaskResult]:
+        """领取租约已过期的未完成任务（领取后租约归本进程并持续续约，需随后执行或 release_claim）"""
+        results = [
+            self._restore_result(record)
+            for record in self.task_store.claim_unfinished_tasks(self.lease_owner, self.lease_ttl)
+        ]
+        self._claimed_tasks.update(result.task_id for result in results)
+        self._ensure_lease_renewer()
+        return results
+    
+    def release_claim(self, task_id: str):
+        """放弃已领取但未执行的任务（如排队时被取消），之后可被再次恢复"""
+        if task_id in self._claimed_tasks:
+            self._claimed_tasks.discard(task_id)
+            self._release_lease(task_id)
+            self._stop_lease_renewer_if_idle()
+    
+    def _ensure_lease_renewer(self):
+        """有执行中或已领取的任务时保持续约协程运行"""
+        if not (self.active_tasks or self._claimed_tasks):
+            return
+        if self._lease_renewer is None or self._lease_renewer.done():
+            try:
+                self._lease_renewer = asyncio.get_running_loop().create_task(self._renew_leases())
+            except RuntimeError:
+                self.logger.warning("没有运行中的事件循环，任务租约不会自动续约")
+    
+    def _stop_lease_renewer_if_idle(self):
+        """没有需要续约的任务时停止续约协程"""
+        if not (self.active_tasks or self._claimed_tasks) and self._lease_renewer is not None:
+            self._lease_renewer.cancel()
+            self._lease_renewer = None
+    
+    async def _renew_leases(self):
+        """每三分之一个租约期为执行中和已领取的任务续约"""
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            task_ids = [*self.active_tasks, *self._claimed_tasks]
+            try:
+                renewed = self.task_store.renew_leases(self.lease_owner, task_ids, self.lease_ttl)
+            except AgentHubException as e:
+                self.logger.error(f"任务租约续约失败: {e}")
+                continue
+            if renewed < len(task_ids):
+                self.logger.warning(f"部分任务租约已丢失: 续约 {renewed}/{len(task_ids)}")
+    
+    def _release_lease(self, task_id: str):
+        """任务结束时释放租约"""
+        try:
+            self.task_store.release_lease(task_id, self.lease_owner)
+        except AgentHubException as e:
+            self.logger.error(f"任务租约释放失败: {task_id}, {e}")
+    
     async def _stage_initialization(self, result: TaskResult):
         """初始化阶段"""
         result.current_stage = ProcessingStage.INITIALIZATION
@@ -295,7 +537,7 @@ class TaskProcessor:
         self.logger.info(f"提交任务: {result.task_id}")
         
         # 获取平台实例
-        platform_instance = await self._get_platform_instance(result.platform)
+        platform_instance = await self._get_task_platform(result)
         
         # 提交任务
         submitted_task_id = await platform_instance.submit_task(
@@ -318,32 +560,29 @@ class TaskProcessor:
         
         self.logger.info(f"监控任务状态: {result.task_id}")
         
-        platform_instance = await self._get_platform_instance(result.platform)
+        platform_instance = await self._get_task_platform(result)
         platform_task_id = result.metadata.get("platform_task_id", result.task_id)
         
         timeout = result.request.timeout
-        start_time = time.time()
         
-        while True:
-            # 检查超时
-            if time.time() - start_time > timeout:
-                raise TimeoutError(f"任务超时: {timeout}秒")
-            
-            # 获取任务状态
-            status = await platform_instance.get_task_status(platform_task_id)
-            
-            if status == "completed":
-                result.status = TaskStatus.COMPLETED
-                break
-            elif status == "failed":
-                result.status = TaskStatus.FAILED
-                raise PlatformError(f"平台任务执行失败", platform=result.platform)
-            elif status in ["pending", "running"]:
+        def on_status(status: str):
+            if status in ["pending", "running"]:
                 result.status = TaskStatus.RUNNING
-                await asyncio.sleep(10)  # 等待10秒后再检查
-            else:
+            elif status not in ["completed", "failed"]:
                 self.logger.warning(f"未知任务状态: {status}")
-                await asyncio.sleep(5)
+        
+        # 等待平台推送的状态变化，不支持事件的平台内部退回轮询
+        try:
+            status = await platform_instance.wait_for_task_completion(
+                platform_task_id, timeout=timeout, on_status=on_status
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"任务超时: {timeout}秒")
+        
+        if status == "failed":
+            result.status = TaskStatus.FAILED
+            raise PlatformError(f"平台任务执行失败", platform=result.platform)
+        result.status = TaskStatus.COMPLETED
         
         result.metrics.stage_times["task_monitoring"] = time.time() - stage_start
         self.logger.info(f"任务监控完成: {result.task_id}")
@@ -355,7 +594,7 @@ class TaskProcessor:
         
         self.logger.info(f"提取任务内容: {result.task_id}")
         
-        platform_instance = await self._get_platform_instance(result.platform)
+        platform_instance = await self._get_task_platform(result)
         platform_task_id = result.metadata.get("platform_task_id", result.task_id)
         
         # 获取任务结果
@@ -374,7 +613,7 @@ class TaskProcessor:
         
         self.logger.info(f"下载任务文件: {result.task_id}")
         
-        platform_instance = await self._get_platform_instance(result.platform)
+        platform_instance = await self._get_task_platform(result)
         platform_task_id = result.metadata.get("platform_task_id", result.task_id)
         
         try:
@@ -501,6 +740,21 @@ class TaskProcessor:
         factory = PlatformFactory()
         return await factory.create_platform(platform_name)
     
+    async def _get_task_platform(self, result: TaskResult):
+        """获取任务专属的平台实例"""
+        if result.task_id not in self._task_platforms:
+            self._task_platforms[result.task_id] = await self._get_platform_instance(result.platform)
+        return self._task_platforms[result.task_id]
+    
+    async def _release_task_platform(self, task_id: str):
+        """关闭任务专属的平台实例，释放页面租约"""
+        platform_instance = self._task_platforms.pop(task_id, None)
+        if platform_instance and hasattr(platform_instance, "close"):
+            try:
+                await platform_instance.close()
+            except Exception as e:
+                self.logger.warning(f"关闭平台实例失败: {task_id}, {e}")
+    
     def get_processing_statistics(self) -> Dict[str, Any]:
         """获取处理统计信息"""
         success_rate = (
@@ -508,7 +762,7 @@ class TaskProcessor:
             if self.total_tasks_processed > 0 else 0.0
         )
         
-        return {
+        statistics = {
             "total_processed": self.total_tasks_processed,
             "successful": self.successful_tasks,
             "failed": self.failed_tasks,
@@ -516,6 +770,14 @@ class TaskProcessor:
             "active_tasks": len(self.active_tasks),
             "completed_tasks": len(self.completed_tasks)
         }
+        
+        if self.executor:
+            executor_stats = self.executor.get_statistics()
+            statistics["queue_depth"] = executor_stats["queue_depth"]
+            statistics["throughput_per_minute"] = executor_stats["throughput_per_minute"]
+            statistics["executor"] = executor_stats
+        
+        return statistics
     
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """获取任务状态"""
@@ -527,4 +789,11 @@ class TaskProcessor:
         if task_id in self.completed_tasks:
             return self.completed_tasks[task_id].to_dict()
         
+        # 最后从持久化存储中查找
+        record = self.task_store.get_task(task_id)
+        if record:
+            status = self._restore_result(record).to_dict()
+            status["completed_stages"] = record["completed_stages"]
+            return status
+        
         return None 
\ No newline at end of file
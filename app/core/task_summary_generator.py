@@ -13,10 +13,12 @@ import json
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import AsyncIterator, Dict, Optional, Union
 
 from app.core.logger import get_logger
 from app.config.settings import get_settings
+from app.storage.compression import logical_path, open_artifact
+from app.storage.task_layout import task_id_of
 
 logger = get_logger("task_summary_generator")
 
@@ -117,8 +119,7 @@ class TaskSummaryGenerator:
                 analysis_type = "basic"
             
             # 保存总结
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary_data, f, ensure_ascii=False, indent=2)
+            self._save_summary(task_dir, summary_data)
             
             logger.info(f"任务 {task_id} 总结生成成功 ({analysis_type})")
             
@@ -140,6 +141,52 @@ class TaskSummaryGenerator:
                 "summary": None
             }
     
+    async def stream_summary(
+        self,
+        task_dir: Union[str, Path],
+        task_title: str = ""
+    ) -> AsyncIterator[Dict]:
+        """
+        流式生成任务总结（总是重新生成）
+        
+        逐步产出 file / delta 进度事件，最后产出 done（包含完整总结）或 error 事件
+        """
+        task_dir = Path(task_dir)
+        task_id = self._extract_task_id(task_dir)
+        
+        try:
+            logger.info(f"开始流式生成任务总结: {task_id}")
+            
+            task_info = self._load_task_metadata(task_dir)
+            if not task_title:
+                task_title = task_info.get("task", {}).get("title", task_id)
+            
+            if self.use_ai and self.ai_processor:
+                analysis_result = None
+                async for event in self.ai_processor.stream_task_analysis(task_dir, task_title):
+                    if event["event"] == "result":
+                        analysis_result = event["data"]
+                    else:
+                        yield event
+                summary_data = self._format_ai_summary(analysis_result, task_id)
+            else:
+                analysis_result = await self._basic_file_analysis(task_dir, task_title)
+                summary_data = self._format_basic_summary(analysis_result, task_id)
+            
+            self._save_summary(task_dir, summary_data)
+            logger.info(f"任务 {task_id} 流式总结生成成功")
+            
+            yield {"event": "done", "data": {"success": True, "summary": summary_data, "cached": False}}
+            
+        except Exception as e:
+            logger.error(f"任务 {task_id} 流式总结生成失败: {e}")
+            yield {"event": "error", "data": {"success": False, "error": str(e), "summary": None}}
+    
+    def _save_summary(self, task_dir: Path, summary_data: Dict) -> None:
+        """保存总结到任务目录"""
+        with open(task_dir / "ai_summary.json", 'w', encoding='utf-8') as f:
+            json.dump(summary_data, f, ensure_ascii=False, indent=2)
+    
     def get_existing_summary(self, task_dir: Union[str, Path]) -> Optional[Dict]:
         """获取已有的总结"""
         task_dir = Path(task_dir)
@@ -187,10 +234,7 @@ class TaskSummaryGenerator:
     
     def _extract_task_id(self, task_dir: Path) -> str:
         """从任务目录路径中提取任务ID"""
-        dir_name = task_dir.name
-        if dir_name.startswith("task_"):
-            return dir_name[5:]  # 移除 "task_" 前缀
-        return dir_name
+        return task_id_of(task_dir)
     
     def _load_task_metadata(self, task_dir: Path) -> Dict:
         """加载任务元数据"""
@@ -212,20 +256,22 @@ class TaskSummaryGenerator:
         file_analyses = []
         total_size = 0
         
-        for file_path in files:
+        for stored_path in files:
             try:
-                file_stat = file_path.stat()
-                file_size = file_stat.st_size
+                file_size = stored_path.stat().st_size
                 total_size += file_size
                 
+                # 压缩存储的文件按原文件名分析
+                file_path = logical_path(stored_path)
+                
                 file_type = self._get_file_type(file_path)
                 
                 # 基础内容分析
                 content_preview = ""
                 if file_type == "text" and file_size < 100000:  # 100KB以内的文本文件
                     try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()[:2000]  # 前2000字符
+                        with open_artifact(stored_path, 'r', encoding='utf-8', errors='ignore') as f:
+                            content = f.read(2000)  # 前2000字符
                             content_preview = content[:200]
                     except:
                         content_preview = "无法读取文件内容"
@@ -241,7 +287,7 @@ class TaskSummaryGenerator:
                 })
                 
             except Exception as e:
-                logger.warning(f"分析文件 {file_path} 失败: {e}")
+                logger.warning(f"分析文件 {stored_path} 失败: {e}")
         
         return {
             "task_title": task_title,
@@ -269,8 +315,9 @@ class TaskSummaryGenerator:
                 }
                 for fa in analysis_result.file_analyses
             ],
-            "total_files": len(analysis_result.file_analyses),
+            "total_files": len(analysis_result.file_analyses) + len(analysis_result.skipped_files),
             "analyzed_files": len([fa for fa in analysis_result.file_analyses if fa.analysis_success]),
+            "skipped_files": analysis_result.skipped_files,
             "confidence_score": analysis_result.content_quality_score,
             "content_quality": "high" if analysis_result.content_quality_score > 0.7 else "medium" if analysis_result.content_quality_score > 0.4 else "low",
             "main_topics": [insight.split("：")[0] if "：" in insight else insight for insight in analysis_result.key_insights[:5]],
@@ -403,6 +450,14 @@ async def generate_task_summary(
     return await generator.generate_summary(task_dir, task_title, force)
 
 
+def stream_task_summary(task_dir: Union[str, Path], task_title: str = "") -> AsyncIterator[Dict]:
+    """
+    便捷函数：流式生成任务总结
+    """
+    generator = get_task_summary_generator()
+    return generator.stream_summary(task_dir, task_title)
+
+
 def get_task_summary(task_dir: Union[str, Path]) -> Optional[Dict]:
     """
     便捷函数：获取已有的任务总结
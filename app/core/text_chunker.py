@@ -0,0 +1,171 @@
+"""
+长文本分段
+按标题、段落和句子边界把长文本切分为 token 预算内的分段，
+长度估算区分中日韩字符，用于 map-reduce 分段总结
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+# 中日韩字符（约 1 字 1 token），其余字符约 4 字符 1 token
+CJK_PATTERN = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+# 章节标题：一、二级 Markdown 标题或中文章节标题（一、/第一章 等）
+HEADING_PATTERN = re.compile(
+    r"^\s*(#{1,2}\s+\S|[一二三四五六七八九十]+、|第[一二三四五六七八九十百\d]+[章节部分])"
+)
+
+# 句子结束位置（中英文标点之后）
+SENTENCE_PATTERN = re.compile(r"(?<=[。！？；!?;])|(?<=\.)\s+")
+
+# content.txt 头部的分隔线
+HEADER_SEPARATOR = re.compile(r"^={10,}\s*$")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def strip_content_header(text: str, max_header_lines: int = 15) -> str:
+    """去除下载时写入 content.txt 的元信息头部（标题、URL、下载时间等）
+
+    头部由若干 "键: 值" 行和一条 "=" 分隔线组成；不符合该格式时原样返回。
+    """
+    lines = text.splitlines()
+    for index, line in enumerate(lines[:max_header_lines]):
+        if HEADER_SEPARATOR.match(line):
+            header = [l for l in lines[:index] if l.strip()]
+            if header and all(re.match(r"^[^:：]{1,20}[:：]", l) for l in header):
+                return "\n".join(lines[index + 1:]).strip()
+            break
+    return text
+
+
+@dataclass
+class TextChunk:
+    """文本分段"""
+    index: int
+    text: str
+    tokens: int
+    heading: Optional[str] = None
+
+    @property
+    def hash(self) -> str:
+        """分段内容哈希"""
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+
+def _split_sections(text: str) -> List[List[str]]:
+    """按标题切分为章节，每个章节为段落列表"""
+    sections: List[List[str]] = [[]]
+    paragraph: List[str] = []
+
+    def flush_paragraph():
+        if paragraph:
+            sections[-1].append("\n".join(paragraph))
+            paragraph.clear()
+
+    for line in text.splitlines():
+        if HEADING_PATTERN.match(line):
+            flush_paragraph()
+            if sections[-1]:
+                sections.append([])
+            paragraph.append(line)
+            flush_paragraph()
+        elif not line.strip():
+            flush_paragraph()
+        else:
+            paragraph.append(line)
+    flush_paragraph()
+
+    return [section for section in sections if section]
+
+
+def _split_oversized(block: str, max_tokens: int) -> List[str]:
+    """把超出预算的段落按句子切分，单句仍超出时按字符硬切"""
+    pieces: List[str] = []
+    for sentence in SENTENCE_PATTERN.split(block):
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        # 按估算比例硬切
+        step = max(1, int(len(sentence) * max_tokens / estimate_tokens(sentence)))
+        pieces.extend(sentence[start:start + step] for start in range(0, len(sentence), step))
+    return pieces
+
+
+def split_text(text: str, max_tokens: int = 3000) -> List[TextChunk]:
+    """把文本切分为不超过 max_tokens 的分段
+
+    完整章节按顺序合并打包，超出预算的章节再按段落、句子切分。
+    分段边界跟随章节，修改某一章节通常只会改变其所在分段的哈希。
+    """
+    chunks: List[TextChunk] = []
+    current: List[str] = []
+    current_tokens = 0
+    current_heading: Optional[str] = None
+
+    def emit():
+        nonlocal current, current_tokens, current_heading
+        content = "\n\n".join(current).strip()
+        if content:
+            chunks.append(TextChunk(len(chunks), content, estimate_tokens(content), current_heading))
+        current, current_tokens, current_heading = [], 0, None
+
+    def append(piece: str, tokens: int, heading: Optional[str]):
+        nonlocal current_tokens, current_heading
+        if current and current_tokens + tokens > max_tokens:
+            emit()
+        if not current:
+            current_heading = heading
+        current.append(piece)
+        current_tokens += tokens
+
+    for section in _split_sections(text):
+        heading = section[0].strip() if HEADING_PATTERN.match(section[0]) else None
+        section_text = "\n\n".join(section)
+        section_tokens = estimate_tokens(section_text)
+
+        if section_tokens <= max_tokens:
+            append(section_text, section_tokens, heading)
+            continue
+
+        # 大章节单独切分，不与前后章节合并
+        emit()
+        for block in section:
+            pieces = [block] if estimate_tokens(block) <= max_tokens else _split_oversized(block, max_tokens)
+            for piece in pieces:
+                append(piece, estimate_tokens(piece), heading)
+        emit()
+
+    emit()
+    return chunks
+
+
+def group_by_budget(texts: List[str], max_tokens: int) -> List[List[str]]:
+    """把若干文本按预算分组（每组至少两项，保证逐层归约收敛）"""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+    return groups
@@ -1,9 +1,28 @@
 """
-命题管理器模块（占位符实现）
+命题管理器模块
+命题保存在数据库中，run_once --topic-id 和调度器可在其他进程中取到已创建的命题
 """
 
+import hashlib
+import json
+import time
 from typing import List, Optional
+
 from app.core.logger import get_logger
+from app.storage.database import Database, get_database
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    topic_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    platforms TEXT NOT NULL DEFAULT '[]',
+    priority INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    executed_at REAL
+);
+"""
 
 
 class Topic:
@@ -16,12 +35,25 @@ class Topic:
         self.priority = priority
 
 
+def topic_id_of(content: str) -> str:
+    """由命题内容得到命题ID（跨进程稳定）"""
+    return f"topic_{hashlib.sha1(content.encode('utf-8')).hexdigest()[:10]}"
+
+
 class TopicManager:
-    """命题管理器（占位符实现）"""
-    
-    def __init__(self):
+    """命题管理器"""
+
+    def __init__(self, database: Optional[Database] = None):
         self.logger = get_logger("topic_manager")
-    
+        self.database = database or get_database()
+        self._schema_ready = False
+
+    def _ensure_schema(self) -> None:
+        """首次使用时建表"""
+        if not self._schema_ready:
+            self.database.executescript(SCHEMA)
+            self._schema_ready = True
+
     async def create_topic(
         self,
         title: str,
@@ -29,17 +61,58 @@ class TopicManager:
         platforms: Optional[List[str]] = None,
         priority: int = 1
     ) -> Topic:
-        """创建新命题"""
-        topic_id = f"topic_{hash(content) % 100000}"
-        
+        """创建新命题（内容相同的命题更新标题、平台和优先级）"""
+        self._ensure_schema()
         topic = Topic(
-            id=topic_id,
+            id=topic_id_of(content),
             title=title,
             content=content,
             platforms=platforms,
             priority=priority
         )
-        
-        self.logger.info(f"创建新命题: {topic_id}, 标题: {title}")
-        
-        return topic 
\ No newline at end of file
+
+        self.database.execute(
+            "INSERT INTO topics (topic_id, title, content, platforms, priority, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(topic_id) DO UPDATE SET title = excluded.title, "
+            "platforms = excluded.platforms, priority = excluded.priority",
+            (topic.id, title, content, json.dumps(topic.platforms), priority, time.time())
+        )
+        self.logger.info(f"创建新命题: {topic.id}, 标题: {title}")
+
+        return topic
+
+    async def get_topic(self, topic_id: str) -> Optional[Topic]:
+        """获取命题"""
+        self._ensure_schema()
+        row = self.database.fetchone("SELECT * FROM topics WHERE topic_id = ?", (topic_id,))
+        return self._row_to_topic(row) if row else None
+
+    async def list_topics(self, pending_only: bool = False) -> List[Topic]:
+        """获取命题（按优先级从高到低）
+
+        Args:
+            pending_only: 只返回尚未执行过的命题
+        """
+        self._ensure_schema()
+        sql = "SELECT * FROM topics"
+        if pending_only:
+            sql += " WHERE executed_at IS NULL"
+        sql += " ORDER BY priority DESC, created_at"
+        return [self._row_to_topic(row) for row in self.database.fetchall(sql)]
+
+    async def mark_executed(self, topic_id: str) -> None:
+        """记录命题已执行"""
+        self._ensure_schema()
+        self.database.execute("UPDATE topics SET executed_at = ? WHERE topic_id = ?", (time.time(), topic_id))
+
+    @staticmethod
+    def _row_to_topic(row) -> Topic:
+        """数据库行转换为命题"""
+        return Topic(
+            id=row["topic_id"],
+            title=row["title"],
+            content=row["content"],
+            platforms=json.loads(row["platforms"]),
+            priority=row["priority"]
+        )
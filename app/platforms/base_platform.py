@@ -3,8 +3,10 @@
 定义所有平台实现需要遵循的接口
 """
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Callable, Dict, List, Optional, Any
 from pathlib import Path
 
 from app.core.logger import get_logger
@@ -103,6 +105,97 @@ class BasePlatform(ABC):
         """
         pass
     
+    async def _create_status_watcher(self, task_id: str):
+        """
+        创建页面状态监听器
+        
+        支持页面事件的平台返回 PageStatusWatcher，否则返回 None 使用轮询
+        """
+        return None
+    
+    def _get_poll_intervals(self) -> tuple:
+        """获取轮询间隔（无事件平台的轮询间隔, 事件平台的兜底轮询间隔）"""
+        from app.config.settings import get_settings
+        
+        settings = get_settings().platform
+        return (
+            self.config.get("status_poll_interval", settings.status_poll_interval),
+            self.config.get("status_fallback_interval", settings.status_fallback_interval)
+        )
+    
+    async def watch_task_status(
+        self,
+        task_id: str,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        监听任务状态变化
+        
+        优先使用页面事件（DOM 变化、网络请求完成），不支持时退回轮询。
+        只在状态变化时产出，产出 completed/failed 后结束。
+        
+        Args:
+            task_id: 任务ID
+            timeout: 超时时间（秒），超时抛出 asyncio.TimeoutError
+        """
+        poll_interval, fallback_interval = self._get_poll_intervals()
+        
+        watcher = None
+        try:
+            watcher = await self._create_status_watcher(task_id)
+        except Exception as e:
+            self.logger.warning(f"创建状态监听器失败，使用轮询: {e}")
+        
+        if watcher:
+            try:
+                async for event in watcher.stream(
+                    timeout=timeout,
+                    fallback=lambda: self.get_task_status(task_id),
+                    fallback_interval=fallback_interval
+                ):
+                    yield event.status
+            finally:
+                await watcher.stop()
+            return
+        
+        deadline = time.monotonic() + timeout if timeout else None
+        last_status = None
+        while True:
+            status = await self.get_task_status(task_id)
+            if status != last_status:
+                last_status = status
+                yield status
+            if status in ("completed", "failed"):
+                return
+            
+            if deadline and time.monotonic() + poll_interval > deadline:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(poll_interval)
+    
+    async def wait_for_task_completion(
+        self,
+        task_id: str,
+        timeout: Optional[float] = None,
+        on_status: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        等待任务结束
+        
+        Args:
+            task_id: 任务ID
+            timeout: 超时时间（秒），超时抛出 asyncio.TimeoutError
+            on_status: 状态变化回调
+            
+        Returns:
+            最终状态 (completed/failed)
+        """
+        status = "pending"
+        async for status in self.watch_task_status(task_id, timeout=timeout):
+            self.logger.info(f"任务状态: {status}")
+            if on_status:
+                on_status(status)
+        return status
+    
     async def execute_full_task(
         self,
         topic: str,
@@ -127,18 +220,7 @@ class BasePlatform(ABC):
         self.logger.info(f"任务已提交: {task_id}")
         
         # 监控任务状态
-        import asyncio
-        while True:
-            status = await self.get_task_status(task_id)
-            self.logger.info(f"任务状态: {status}")
-            
-            if status in ["completed", "failed"]:
-                break
-            elif status in ["pending", "running"]:
-                await asyncio.sleep(10)  # 等待10秒后再检查
-            else:
-                self.logger.warning(f"未知任务状态: {status}")
-                await asyncio.sleep(10)
+        await self.wait_for_task_completion(task_id)
         
         # 获取任务结果
         result = await self.get_task_result(task_id)
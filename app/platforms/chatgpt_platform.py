@@ -13,6 +13,7 @@ from app.platforms.enhanced_platform_base import EnhancedPlatformBase
 from app.core.platform_capabilities import PlatformCapabilities, CapabilityLevel
 from app.core.exceptions import PlatformError, PlatformConnectionError
 from app.core.logger import get_logger
+from app.storage.compression import compress_artifacts
 
 
 class ChatGPTPlatform(EnhancedPlatformBase):
@@ -561,7 +562,7 @@ class ChatGPTPlatform(EnhancedPlatformBase):
             
             self.logger.info(f"ChatGPT文件下载完成: {len(downloaded_files)} 个文件")
             
-            return downloaded_files
+            return await asyncio.to_thread(compress_artifacts, downloaded_files)
             
         except Exception as e:
             self.logger.error(f"下载ChatGPT文件失败: {e}")
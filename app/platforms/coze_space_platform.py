@@ -13,6 +13,7 @@ from app.platforms.enhanced_platform_base import EnhancedPlatformBase
 from app.core.platform_capabilities import PlatformCapabilities, CapabilityLevel
 from app.core.exceptions import PlatformError, PlatformConnectionError
 from app.core.logger import get_logger
+from app.storage.compression import compress_artifacts
 
 
 class CozeSpacePlatform(EnhancedPlatformBase):
@@ -1084,7 +1085,7 @@ class CozeSpacePlatform(EnhancedPlatformBase):
             
             self.logger.info(f"扣子空间文件下载完成: {len(downloaded_files)} 个文件")
             
-            return downloaded_files
+            return await asyncio.to_thread(compress_artifacts, downloaded_files)
             
         except Exception as e:
             self.logger.error(f"下载扣子空间文件失败: {e}")
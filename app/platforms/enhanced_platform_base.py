@@ -15,8 +15,10 @@ from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 from app.core.exceptions import PlatformError, PlatformConnectionError
 from app.platforms.base_platform import BasePlatform, TaskResult
 from app.core.browser_engine import EnhancedBrowserEngine
+from app.core.page_lease import new_lease_owner, acquire_platform_page, release_platform_page
 from app.core.history_downloader import HistoryDownloader, DownloadResult
 from app.core.logger import get_logger
+from app.storage.compression import compress_artifacts
 
 
 class EnhancedPlatformBase(BasePlatform, ABC):
@@ -39,6 +41,9 @@ class EnhancedPlatformBase(BasePlatform, ABC):
         # 平台特定选择器配置
         self.platform_selectors = self._get_platform_selectors()
         
+        # 页面租约：并发执行时每个实例独占一个标签页
+        self.lease_owner = new_lease_owner(name)
+        
     @abstractmethod
     def _get_platform_selectors(self) -> Dict[str, List[str]]:
         """获取平台特定的选择器配置"""
@@ -89,28 +94,13 @@ class EnhancedPlatformBase(BasePlatform, ABC):
             raise PlatformConnectionError(self.name, e)
     
     async def _find_or_create_platform_page(self) -> Page:
-        """查找或创建平台页面"""
-        # 查找现有平台页面
-        pages = self.context.pages
-        platform_page = None
-        
-        platform_domains = self._get_platform_domains()
-        
-        for page in pages:
-            url = page.url
-            if any(domain in url.lower() for domain in platform_domains):
-                platform_page = page
-                self.logger.info(f"找到现有{self.name}页面: {url}")
-                break
-        
-        if platform_page:
-            return platform_page
-        else:
-            # 创建新标签页并导航到平台
-            new_page = await self.context.new_page()
-            await new_page.goto(self.base_url)
-            self.logger.info(f"创建新{self.name}页面: {self.base_url}")
-            return new_page
+        """租用平台页面，已有页面均被占用时创建新标签页"""
+        return await acquire_platform_page(
+            self.context,
+            self._get_platform_domains(),
+            self.base_url,
+            self.lease_owner
+        )
     
     @abstractmethod
     def _get_platform_domains(self) -> List[str]:
@@ -192,6 +182,21 @@ class EnhancedPlatformBase(BasePlatform, ABC):
             self.logger.error(f"提交任务失败: {e}")
             raise PlatformError(f"提交任务失败: {e}", platform=self.name)
     
+    async def _create_status_watcher(self, task_id: str):
+        """创建页面状态监听器"""
+        from app.core.page_status_watcher import PageStatusWatcher
+        
+        if not self.browser_engine:
+            await self._connect_to_existing_browser()
+        
+        strategies = self.browser_engine.selector_strategies
+        return PageStatusWatcher(
+            self.page,
+            loading_selectors=strategies["loading"],
+            content_selectors=strategies["content"],
+            error_selectors=strategies["error"]
+        )
+    
     async def get_task_status(self, task_id: str) -> str:
         """获取任务状态"""
         try:
@@ -380,7 +385,7 @@ class EnhancedPlatformBase(BasePlatform, ABC):
         except Exception as e:
             self.logger.error(f"下载文件过程出错: {e}")
         
-        return downloaded_files
+        return await asyncio.to_thread(compress_artifacts, downloaded_files)
     
     async def execute_full_task(
         self,
@@ -398,13 +403,15 @@ class EnhancedPlatformBase(BasePlatform, ABC):
             task_id = await self.submit_task(topic, title, **kwargs)
             self.logger.info(f"任务已提交: {task_id}")
             
-            # 智能等待内容生成
-            wait_result = await self.browser_engine.smart_wait_for_content(timeout=1800)  # 30分钟
-            
-            if wait_result.success:
-                self.logger.info("内容生成完成")
-            else:
-                self.logger.warning(f"等待内容超时或失败: {wait_result.error}")
+            # 等待页面事件推送的内容完成（30分钟）
+            try:
+                status = await self.wait_for_task_completion(task_id, timeout=1800)
+                if status == "completed":
+                    self.logger.info("内容生成完成")
+                else:
+                    self.logger.warning("检测到任务失败，将尝试获取中间结果")
+            except asyncio.TimeoutError:
+                self.logger.warning("等待内容超时")
             
         except KeyboardInterrupt:
             self.logger.warning("任务被用户中断，正在尝试获取中间结果...")
@@ -501,6 +508,8 @@ class EnhancedPlatformBase(BasePlatform, ABC):
                 summary = self.browser_engine.get_operation_summary()
                 self.logger.info(f"浏览器引擎操作摘要: {summary}")
             
+            await release_platform_page(self.page, self.lease_owner)
+            
             if self.playwright:
                 await self.playwright.stop()
                 self.playwright = None
@@ -15,11 +15,43 @@ from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 
 from app.core.exceptions import PlatformError, PlatformConnectionError
 from app.platforms.base_platform import BasePlatform, TaskResult
+from app.core.page_lease import new_lease_owner, acquire_platform_page, release_platform_page
+from app.storage.compression import compress_artifacts
 
 
 class ManusPlatform(BasePlatform):
     """Manus平台实现"""
     
+    # 状态检测选择器: 加载指示器
+    LOADING_SELECTORS = [
+        '.loading',
+        '.spinner',
+        '[data-loading="true"]',
+        '.generating',
+        '.thinking',
+        '.processing'
+    ]
+    
+    # 状态检测选择器: 错误信息
+    ERROR_SELECTORS = [
+        '.error',
+        '.failed',
+        '.insufficient',
+        '[class*="error"]',
+        '[class*="fail"]'
+    ]
+    
+    # 状态检测选择器: 生成内容
+    CONTENT_SELECTORS = [
+        '.message',
+        '.response',
+        '.result',
+        '.answer',
+        '.generated-content',
+        '.chat-message',
+        '.output'
+    ]
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__("manus", config)
         self.browser: Optional[Browser] = None
@@ -32,6 +64,9 @@ class ManusPlatform(BasePlatform):
         self.debug_port = config.get("debug_port", 9222)
         self.timeout = config.get("timeout", 30000)  # 30秒超时
         
+        # 页面租约：并发执行时每个实例独占一个标签页
+        self.lease_owner = new_lease_owner("manus")
+        
     async def _connect_to_existing_browser(self) -> None:
         """连接到现有的Chrome浏览器实例"""
         try:
@@ -51,24 +86,14 @@ class ManusPlatform(BasePlatform):
             # 使用第一个上下文
             self.context = contexts[0]
             
-            # 查找Manus页面
-            pages = self.context.pages
-            manus_page = None
-            
-            for page in pages:
-                url = page.url
-                if "manus" in url.lower() or "manus.ai" in url.lower():
-                    manus_page = page
-                    break
-            
-            if manus_page:
-                self.page = manus_page
-                self.logger.info(f"找到Manus页面: {self.page.url}")
-            else:
-                # 如果没有找到Manus页面，创建新标签页
-                self.page = await self.context.new_page()
-                await self.page.goto(self.base_url)
-                self.logger.info("创建新的Manus页面")
+            # 租用Manus页面（已被其他实例占用时新建标签页）
+            self.page = await acquire_platform_page(
+                self.context,
+                self.config.get("domains", ["manus.ai", "manus.im"]),
+                self.base_url,
+                self.lease_owner
+            )
+            self.logger.info(f"使用Manus页面: {self.page.url}")
             
         except Exception as e:
             self.logger.error(f"连接浏览器失败: {e}")
@@ -248,26 +273,28 @@ class ManusPlatform(BasePlatform):
             self.logger.error(f"提交任务失败: {e}")
             raise PlatformError(f"提交任务失败: {e}", platform="manus")
     
+    async def _create_status_watcher(self, task_id: str):
+        """创建页面状态监听器"""
+        from app.core.page_status_watcher import PageStatusWatcher
+        
+        if not self.page:
+            await self._connect_to_existing_browser()
+        
+        return PageStatusWatcher(
+            self.page,
+            loading_selectors=self.LOADING_SELECTORS,
+            content_selectors=self.CONTENT_SELECTORS,
+            error_selectors=self.ERROR_SELECTORS
+        )
+    
     async def get_task_status(self, task_id: str) -> str:
         """获取任务状态"""
         try:
             if not self.page:
                 await self._connect_to_existing_browser()
             
-            # 等待页面内容更新
-            await self.page.wait_for_timeout(2000)
-            
             # 检查页面中是否有加载指示器
-            loading_selectors = [
-                '.loading',
-                '.spinner',
-                '[data-loading="true"]',
-                '.generating',
-                '.thinking',
-                '.processing'
-            ]
-            
-            for selector in loading_selectors:
+            for selector in self.LOADING_SELECTORS:
                 try:
                     loading_element = await self.page.query_selector(selector)
                     if loading_element and await loading_element.is_visible():
@@ -277,15 +304,7 @@ class ManusPlatform(BasePlatform):
                     continue
             
             # 检查是否有错误信息
-            error_selectors = [
-                '.error',
-                '.failed',
-                '.insufficient',
-                '[class*="error"]',
-                '[class*="fail"]'
-            ]
-            
-            for selector in error_selectors:
+            for selector in self.ERROR_SELECTORS:
                 try:
                     error_element = await self.page.query_selector(selector)
                     if error_element and await error_element.is_visible():
@@ -297,17 +316,7 @@ class ManusPlatform(BasePlatform):
                     continue
             
             # 检查是否有新的内容生成
-            content_selectors = [
-                '.message',
-                '.response',
-                '.result',
-                '.answer',
-                '.generated-content',
-                '.chat-message',
-                '.output'
-            ]
-            
-            for selector in content_selectors:
+            for selector in self.CONTENT_SELECTORS:
                 try:
                     elements = await self.page.query_selector_all(selector)
                     if elements:
@@ -596,7 +605,7 @@ class ManusPlatform(BasePlatform):
             except:
                 pass
         
-        return downloaded_files
+        return await asyncio.to_thread(compress_artifacts, downloaded_files)
     
     async def execute_full_task(
         self,
@@ -617,36 +626,14 @@ class ManusPlatform(BasePlatform):
             task_id = await self.submit_task(topic, title, **kwargs)
             self.logger.info(f"任务已提交: {task_id}")
             
-            # 监控任务状态
-            import asyncio
-            max_iterations = 180  # 最多监控30分钟（每10秒检查一次）
-            iteration = 0
-            
-            while iteration < max_iterations:
-                try:
-                    status = await self.get_task_status(task_id)
-                    self.logger.info(f"任务状态: {status} (第{iteration+1}次检查)")
-                    
-                    if status == "completed":
-                        self.logger.info("任务已完成")
-                        break
-                    elif status == "failed":
-                        self.logger.warning("任务失败，但将尝试获取中间结果")
-                        break
-                    elif status in ["pending", "running"]:
-                        await asyncio.sleep(10)  # 等待10秒后再检查
-                        iteration += 1
-                    else:
-                        self.logger.warning(f"未知任务状态: {status}")
-                        await asyncio.sleep(10)
-                        iteration += 1
-                        
-                except Exception as status_error:
-                    self.logger.warning(f"状态检查出错: {status_error}")
-                    await asyncio.sleep(10)
-                    iteration += 1
-            
-            if iteration >= max_iterations:
+            # 监控任务状态（页面事件驱动，最多30分钟）
+            try:
+                status = await self.wait_for_task_completion(task_id, timeout=1800)
+                if status == "completed":
+                    self.logger.info("任务已完成")
+                else:
+                    self.logger.warning("任务失败，但将尝试获取中间结果")
+            except asyncio.TimeoutError:
                 self.logger.warning("任务监控超时，但将尝试获取当前结果")
             
         except KeyboardInterrupt:
@@ -686,6 +673,8 @@ class ManusPlatform(BasePlatform):
     async def close(self):
         """关闭连接"""
         try:
+            await release_platform_page(self.page, self.lease_owner)
+            
             if self.playwright:
                 await self.playwright.stop()
                 self.playwright = None
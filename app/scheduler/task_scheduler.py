@@ -288,6 +288,22 @@ class TaskScheduler:
                 seconds=300  # 5分钟
             )
             
+            # 归档长期未修改的任务目录（默认关闭）
+            if self.settings.storage.archive_enabled:
+                await self.add_cron_job(
+                    job_id="archive_cold_tasks",
+                    func=self._archive_cold_tasks,
+                    cron_expression=self.settings.storage.archive_schedule
+                )
+            
+            # 按保留策略清理数据目录（默认关闭，开启后默认只生成报告）
+            if self.settings.storage.retention_enabled:
+                await self.add_cron_job(
+                    job_id="apply_retention",
+                    func=self._apply_retention,
+                    cron_expression=self.settings.storage.retention_schedule
+                )
+            
             self.logger.info("Default jobs added successfully")
             
         except Exception as e:
@@ -297,14 +313,47 @@ class TaskScheduler:
         """执行每日任务"""
         self.logger.info("Starting daily task execution")
         
+        from app.core.task_manager import TaskManager
+        
         try:
-            # 这里将调用任务管理器执行任务
-            # TODO: 实现任务管理器后填充此逻辑
-            self.logger.info("Daily tasks executed successfully")
+            results = await TaskManager().execute_pending_tasks()
+            self.logger.info(
+                "Daily tasks executed successfully",
+                total=len(results),
+                succeeded=sum(1 for result in results if result.success)
+            )
             
         except Exception as e:
             self.logger.error("Failed to execute daily tasks", error=str(e))
     
+    async def _archive_cold_tasks(self) -> None:
+        """归档冷任务目录并压缩引用数据过少的打包文件"""
+        from app.core.summary_backfill import find_task_dirs
+        from app.storage.pack_archive import get_pack_archive
+        
+        try:
+            days = self.settings.storage.archive_after_days
+            task_dirs = await asyncio.to_thread(find_task_dirs)
+            result = await asyncio.to_thread(get_pack_archive().archive_cold_tasks, task_dirs, days)
+            self.logger.info("Cold tasks archived", older_than_days=days, **result)
+            compacted = await asyncio.to_thread(get_pack_archive().compact)
+            self.logger.info("Archive packs compacted", **compacted)
+            
+        except Exception as e:
+            self.logger.error("Failed to archive cold tasks", error=str(e))
+    
+    async def _apply_retention(self) -> None:
+        """执行数据保留策略"""
+        from app.storage.retention import get_retention_engine
+        
+        try:
+            dry_run = self.settings.storage.retention_dry_run
+            report = await asyncio.to_thread(get_retention_engine().apply, dry_run)
+            self.logger.info("Retention policies applied", **report.to_dict())
+            
+        except Exception as e:
+            self.logger.error("Failed to apply retention policies", error=str(e))
+    
     async def _health_check(self) -> None:
         """系统健康检查"""
         self.logger.debug("Performing health check")
@@ -0,0 +1,282 @@
+"""
+内容寻址存储
+任务产物（页面HTML、截图、下载文件）按 sha256 存入 blob 目录，任务目录中的文件替换为指向 blob 的硬链接，
+读取方照常按路径读取；多次下载中内容相同的文件只占用一份磁盘空间。
+引用计数记录在数据库中，删除任务时递减，计数归零的 blob 由 gc 清理。
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from app.core.logger import get_logger
+from app.storage.database import Database, get_database
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_blobs_refcount ON blobs(refcount);
+
+CREATE TABLE IF NOT EXISTS blob_refs (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES blobs(digest),
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_blob_refs_digest ON blob_refs(digest);
+"""
+
+PathLike = Union[str, Path]
+
+# 会被原地改写的文件不能与其他任务共享 inode，不写入存储
+MUTABLE_FILES = {"content.txt", "metadata.json", "ai_summary.json", "ai_file_analyses.json", "download_report.json"}
+
+
+def hash_file(path: PathLike) -> str:
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """内容寻址 blob 存储"""
+
+    def __init__(
+        self,
+        root: Optional[PathLike] = None,
+        database: Optional[Database] = None,
+        min_size: Optional[int] = None
+    ):
+        if root is None or min_size is None:
+            from app.config.settings import get_settings
+            storage_settings = get_settings().storage
+            root = storage_settings.blob_dir if root is None else root
+            min_size = storage_settings.blob_min_size if min_size is None else min_size
+
+        self.logger = get_logger("blob_store")
+        self.root = Path(root)
+        self.min_size = min_size
+        self.database = database or get_database()
+        self._lock = threading.RLock()
+        self._schema_ready = False
+
+    def _ensure_schema(self) -> None:
+        """首次使用时建表"""
+        if not self._schema_ready:
+            self.database.executescript(SCHEMA)
+            self._schema_ready = True
+
+    @staticmethod
+    def _ref_key(path: PathLike) -> str:
+        """引用路径（绝对路径，保证同一文件只有一个引用）"""
+        return str(Path(path).resolve())
+
+    def blob_path(self, digest: str) -> Path:
+        """blob 文件路径"""
+        return self.root / digest[:2] / digest
+
+    def ingest(self, path: PathLike) -> Optional[str]:
+        """将文件存入 blob 存储，并把原文件替换为指向 blob 的硬链接
+
+        Returns:
+            内容哈希；文件过小或无法建立硬链接（如跨文件系统）时返回 None，原文件保持不变
+        """
+        path = Path(path)
+        if not path.is_file() or path.stat().st_size < self.min_size:
+            return None
+
+        digest = hash_file(path)
+        blob = self.blob_path(digest)
+
+        with self._lock:
+            try:
+                if not blob.exists():
+                    # 新内容：直接把原文件链接进存储，无需复制
+                    # （不修改权限：blob 与任务文件共用 inode，设为只读会使任务文件一并只读）
+                    blob.parent.mkdir(parents=True, exist_ok=True)
+                    temp_blob = blob.with_name(f"{digest}.{uuid.uuid4().hex[:8]}.tmp")
+                    os.link(path, temp_blob)
+                    os.replace(temp_blob, blob)
+                elif not os.path.samefile(path, blob):
+                    # 已有相同内容：原文件替换为指向已有 blob 的硬链接
+                    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+                    os.link(blob, temp_path)
+                    os.replace(temp_path, path)
+            except OSError as e:
+                self.logger.debug(f"文件未写入内容寻址存储 {path}: {e}")
+                return None
+
+            self._add_ref(self._ref_key(path), digest, blob.stat().st_size)
+        return digest
+
+    def ingest_many(self, paths: Iterable[PathLike]) -> Dict[str, Optional[str]]:
+        """批量存入文件"""
+        return {str(path): self.ingest(path) for path in paths}
+
+    def ingest_tree(self, directory: PathLike) -> Dict[str, Optional[str]]:
+        """存入目录下的所有任务产物（跳过会被改写的文件）"""
+        paths = [
+            path for path in Path(directory).rglob("*")
+            if path.is_file() and path.name not in MUTABLE_FILES and not path.name.endswith(".tmp")
+        ]
+        return self.ingest_many(paths)
+
+    def _add_ref(self, key: str, digest: str, size: int) -> None:
+        """记录引用（路径原先指向其他 blob 时转移引用）"""
+        self._ensure_schema()
+        now = time.time()
+        with self.database.transaction() as conn:
+            row = conn.execute("SELECT digest FROM blob_refs WHERE path = ?", (key,)).fetchone()
+            if row and row["digest"] == digest:
+                return
+            conn.execute(
+                "INSERT INTO blobs (digest, size, refcount, created_at) VALUES (?, ?, 0, ?) "
+                "ON CONFLICT(digest) DO NOTHING",
+                (digest, size, now)
+            )
+            if row:
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (row["digest"],))
+            conn.execute(
+                "INSERT INTO blob_refs (path, digest, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET digest = excluded.digest, created_at = excluded.created_at",
+                (key, digest, now)
+            )
+            conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+
+    def _remove_refs(self, keys: List[str]) -> List[str]:
+        """删除引用并递减计数，返回受影响的 blob"""
+        self._ensure_schema()
+        digests = []
+        with self.database.transaction() as conn:
+            for key in keys:
+                row = conn.execute("SELECT digest FROM blob_refs WHERE path = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                conn.execute("DELETE FROM blob_refs WHERE path = ?", (key,))
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (row["digest"],))
+                digests.append(row["digest"])
+        return digests
+
+    def release(self, path: PathLike) -> List[str]:
+        """释放单个文件的引用（文件本身由调用方删除）"""
+        return self._remove_refs([self._ref_key(path)])
+
+    def release_tree(self, directory: PathLike) -> List[str]:
+        """释放目录下所有文件的引用（删除任务目录前调用）"""
+        self._ensure_schema()
+        prefix = self._ref_key(directory).rstrip(os.sep) + os.sep
+        rows = self.database.fetchall(
+            "SELECT path FROM blob_refs WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix)
+        )
+        return self._remove_refs([row["path"] for row in rows])
+
+    def rename_tree(self, old_directory: PathLike, new_directory: PathLike) -> int:
+        """目录移动后更新其中文件的引用路径，返回更新的引用数量"""
+        self._ensure_schema()
+        old_prefix = self._ref_key(old_directory).rstrip(os.sep) + os.sep
+        new_prefix = self._ref_key(new_directory).rstrip(os.sep) + os.sep
+        with self.database.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE blob_refs SET path = ? || substr(path, ?) WHERE substr(path, 1, ?) = ?",
+                (new_prefix, len(old_prefix) + 1, len(old_prefix), old_prefix)
+            )
+            return cursor.rowcount
+
+    def gc(self, digests: Optional[Iterable[str]] = None, verify: bool = False) -> Dict[str, int]:
+        """清理引用计数归零的 blob
+
+        Args:
+            digests: 只检查这些 blob（默认检查全部）
+            verify: 先释放已不存在或已被替换的文件的引用（任务目录在存储之外被删除时）
+        """
+        self._ensure_schema()
+        if verify:
+            self._prune_stale_refs()
+
+        if digests is None:
+            rows = self.database.fetchall("SELECT digest, size FROM blobs WHERE refcount <= 0")
+        else:
+            digests = list(set(digests))
+            if not digests:
+                return {"removed": 0, "freed_bytes": 0}
+            placeholders = ", ".join("?" for _ in digests)
+            rows = self.database.fetchall(
+                f"SELECT digest, size FROM blobs WHERE refcount <= 0 AND digest IN ({placeholders})",
+                digests
+            )
+
+        removed = freed = 0
+        with self._lock:
+            for row in rows:
+                blob = self.blob_path(row["digest"])
+                try:
+                    if blob.exists():
+                        # 仍有未登记的硬链接时删除 blob 不会释放空间
+                        if blob.stat().st_nlink == 1:
+                            freed += row["size"]
+                        blob.unlink()
+                except OSError as e:
+                    self.logger.warning(f"删除 blob 失败 {blob}: {e}")
+                    continue
+                self.database.execute("DELETE FROM blobs WHERE digest = ? AND refcount <= 0", (row["digest"],))
+                removed += 1
+
+        if removed:
+            self.logger.info(f"blob 清理完成: 删除 {removed} 个, 释放 {freed} 字节")
+        return {"removed": removed, "freed_bytes": freed}
+
+    def _prune_stale_refs(self) -> None:
+        """释放文件已不存在或不再指向 blob 的引用"""
+        stale = []
+        for row in self.database.fetchall("SELECT path, digest FROM blob_refs"):
+            path, blob = Path(row["path"]), self.blob_path(row["digest"])
+            try:
+                if not path.exists() or not blob.exists() or not os.path.samefile(path, blob):
+                    stale.append(row["path"])
+            except OSError:
+                stale.append(row["path"])
+        if stale:
+            self.logger.info(f"释放 {len(stale)} 个失效的 blob 引用")
+            self._remove_refs(stale)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """存储统计：blob 数量与实际占用、引用数量与逻辑大小"""
+        self._ensure_schema()
+        blobs = self.database.fetchone("SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS size FROM blobs")
+        refs = self.database.fetchone(
+            "SELECT COUNT(*) AS count, COALESCE(SUM(b.size), 0) AS size "
+            "FROM blob_refs r JOIN blobs b ON b.digest = r.digest"
+        )
+        return {
+            "blobs": blobs["count"],
+            "stored_bytes": blobs["size"],
+            "references": refs["count"],
+            "logical_bytes": refs["size"],
+            "saved_bytes": refs["size"] - blobs["size"]
+        }
+
+
+# 全局 blob 存储实例
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """获取全局 blob 存储实例"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+    return _blob_store
@@ -0,0 +1,199 @@
+"""
+任务产物压缩存储
+页面HTML和文本类产物写入后可按配置压缩为 <文件名>.zst（需安装 zstandard）或 <文件名>.gz，
+读取方通过原文件名（逻辑路径）访问，解压以流式进行；HTTP 下载时客户端支持对应编码则直接返回压缩字节。
+"""
+
+import gzip
+import io
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Union
+
+from app.core.logger import get_logger
+
+
+logger = get_logger("compression")
+
+# 压缩后缀与编码
+COMPRESSION_SUFFIXES = {".zst": "zstd", ".gz": "gzip"}
+CODEC_SUFFIXES = {codec: suffix for suffix, codec in COMPRESSION_SUFFIXES.items()}
+
+# 可压缩的文本类产物（JSON 文件会被原地改写，不压缩）
+COMPRESSIBLE_SUFFIXES = {".html", ".htm", ".txt", ".md", ".csv", ".log"}
+
+CHUNK_SIZE = 64 * 1024
+
+PathLike = Union[str, Path]
+
+
+def zstd_available() -> bool:
+    """是否安装了 zstandard"""
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def artifact_encoding(path: PathLike) -> Optional[str]:
+    """文件的压缩编码（zstd / gzip），未压缩返回 None"""
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def logical_path(path: PathLike) -> Path:
+    """去掉压缩后缀后的逻辑路径"""
+    path = Path(path)
+    return path.with_suffix("") if artifact_encoding(path) else path
+
+
+def resolve_artifact(path: PathLike) -> Optional[Path]:
+    """逻辑路径对应的实际文件（原文件或其压缩文件），不存在返回 None"""
+    path = Path(path)
+    if path.is_file():
+        return path
+    for suffix in COMPRESSION_SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def open_artifact(path: PathLike, mode: str = "rb", encoding: str = "utf-8", errors: str = "strict") -> IO:
+    """以流式解压的方式打开产物（接受逻辑路径或实际路径）
+
+    Args:
+        mode: "rb" 返回字节流，"r"/"rt" 返回文本流
+    """
+    actual = resolve_artifact(path)
+    if actual is None:
+        raise FileNotFoundError(str(path))
+
+    stream = decompress_stream(open(actual, "rb"), artifact_encoding(actual))
+    if "b" in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, errors=errors)
+
+
+class _GzipReader(gzip.GzipFile):
+    """关闭时一并关闭底层文件的 gzip 读取流"""
+
+    def __init__(self, raw: IO):
+        super().__init__(fileobj=raw, mode="rb")
+        self._raw = raw
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+def decompress_stream(raw: IO, codec: Optional[str]) -> IO:
+    """为字节流套上流式解压（codec 为 None 时原样返回），关闭返回的流时关闭 raw"""
+    if codec == "zstd":
+        import zstandard
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), CHUNK_SIZE)
+    if codec == "gzip":
+        return _GzipReader(raw)
+    return raw
+
+
+def read_artifact_text(path: PathLike, encoding: str = "utf-8", errors: str = "strict") -> str:
+    """读取产物的全部文本"""
+    with open_artifact(path, "r", encoding=encoding, errors=errors) as f:
+        return f.read()
+
+
+def iter_artifact_bytes(path: PathLike, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """分块读取解压后的内容（用于流式响应）"""
+    return iter_stream_bytes(open_artifact(path, "rb"), chunk_size)
+
+
+def iter_stream_bytes(stream: IO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """分块读取字节流，读完后关闭"""
+    with stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            yield chunk
+
+
+def artifact_size(path: PathLike) -> int:
+    """产物在磁盘上的大小"""
+    actual = resolve_artifact(path)
+    return actual.stat().st_size if actual else 0
+
+
+def compress_artifact(
+    path: PathLike,
+    codec: Optional[str] = None,
+    level: Optional[int] = None,
+    min_size: Optional[int] = None,
+    force: bool = False
+) -> Path:
+    """按配置压缩文本类产物，返回压缩后的实际路径（未压缩时返回原路径）
+
+    压缩结果先写入临时文件再替换，完成后删除原文件。
+    Args:
+        force: 忽略配置中的开关（codec 等参数仍取配置默认值）
+    """
+    from app.config.settings import get_settings
+    storage_settings = get_settings().storage
+
+    path = Path(path)
+    if not (force or storage_settings.compression_enabled):
+        return path
+    if artifact_encoding(path) or path.suffix.lower() not in COMPRESSIBLE_SUFFIXES or not path.is_file():
+        return path
+    if path.stat().st_size < (storage_settings.compression_min_size if min_size is None else min_size):
+        return path
+
+    codec = codec or storage_settings.compression_codec
+    if codec == "zstd" and not zstd_available():
+        codec = "gzip"
+    level = storage_settings.compression_level if level is None else level
+    target = path.with_name(path.name + CODEC_SUFFIXES[codec])
+    temp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+    try:
+        with open(path, "rb") as source, open(temp_path, "wb") as raw:
+            if codec == "zstd":
+                import zstandard
+                with zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False) as writer:
+                    shutil.copyfileobj(source, writer, CHUNK_SIZE)
+            else:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=max(1, min(level, 9)), mtime=0) as writer:
+                    shutil.copyfileobj(source, writer, CHUNK_SIZE)
+        os.replace(temp_path, target)
+        path.unlink()
+    except OSError as e:
+        temp_path.unlink(missing_ok=True)
+        logger.warning(f"压缩文件失败 {path}: {e}")
+        return path
+
+    return target
+
+
+def accepts_encoding(accept_encoding: Optional[str], codec: str) -> bool:
+    """客户端 Accept-Encoding 是否接受指定编码"""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() in (codec, "*") and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
+
+
+def remove_artifact(path: PathLike) -> None:
+    """删除产物及其压缩文件（重新写入前调用，避免旧的压缩文件遮盖新内容）"""
+    path = logical_path(path)
+    path.unlink(missing_ok=True)
+    for suffix in COMPRESSION_SUFFIXES:
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def compress_artifacts(paths: List[Path]) -> List[Path]:
+    """按配置批量压缩产物，返回压缩后的文件路径（不可压缩的文件原样返回）"""
+    return [compress_artifact(path) for path in paths]
@@ -0,0 +1,114 @@
+"""
+SQLite 数据库访问
+基于 DatabaseSettings.url 的轻量级连接管理
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional
+
+from app.core.logger import get_logger
+from app.core.exceptions import DatabaseError
+
+
+def resolve_sqlite_path(url: str) -> Path:
+    """解析 sqlite:/// 形式的数据库地址"""
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        raise DatabaseError(f"仅支持 SQLite 数据库: {url}", operation="connect")
+    return Path(url[len(prefix):])
+
+
+class Database:
+    """SQLite 数据库
+
+    单连接 + 线程锁，开启 WAL 以便 API 进程与调度进程并发读取。
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        if url is None:
+            from app.config.settings import get_settings
+            url = get_settings().database.url
+
+        self.logger = get_logger("database")
+        self.path = resolve_sqlite_path(url)
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """获取数据库连接（延迟创建）"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA foreign_keys=ON")
+            except sqlite3.Error as e:
+                raise DatabaseError(f"数据库连接失败: {e}", operation="connect")
+            self._conn = conn
+            self.logger.info(f"数据库已连接: {self.path}")
+        return self._conn
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
+        """执行单条语句"""
+        with self._lock:
+            try:
+                return self.connection.execute(sql, tuple(params))
+            except sqlite3.Error as e:
+                raise DatabaseError(f"数据库执行失败: {e}", operation="execute", query=sql)
+
+    def executescript(self, script: str) -> None:
+        """执行脚本（建表等）"""
+        with self._lock:
+            try:
+                self.connection.executescript(script)
+            except sqlite3.Error as e:
+                raise DatabaseError(f"数据库脚本执行失败: {e}", operation="executescript")
+
+    def fetchone(self, sql: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+        """查询单行"""
+        with self._lock:
+            return self.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        """查询多行"""
+        with self._lock:
+            return self.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """事务上下文"""
+        with self._lock:
+            conn = self.connection
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局数据库实例
+_database: Optional[Database] = None
+
+
+def get_database() -> Database:
+    """获取全局数据库实例"""
+    global _database
+    if _database is None:
+        _database = Database()
+    return _database
@@ -0,0 +1,571 @@
+"""
+冷任务归档
+长期未修改的任务目录按月打包进 tar 文件（data/packs/YYYY-MM.tar，成员不压缩），每个文件在包内的数据偏移
+记录在数据库中；历史接口按偏移直接读取单个文件，无需解包，任务也可以按需还原为目录。
+打包后原目录被删除，数据目录下的小文件数量随之减少，目录扫描、备份和打包下载都更快。
+追加时按数据库记录的包尾偏移直接定位写入（不重新扫描已有成员），并对打包文件加进程间文件锁。
+包内成员名为 <平台>/<任务ID>/<文件>，不包含主机上的路径。
+任务被还原或删除后包内数据不再被引用，引用数据占比过低的打包文件由 compact 重写。
+"""
+
+import io
+import os
+import shutil
+import tarfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只依赖进程内锁
+    fcntl = None
+
+from app.core.exceptions import StorageError
+from app.core.logger import get_logger
+from app.storage.blob_store import BlobStore, get_blob_store
+from app.storage.compression import COMPRESSION_SUFFIXES
+from app.storage.database import Database, get_database
+from app.storage.task_layout import detect_platform, task_id_of
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packed_tasks (
+    task_dir TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    platform TEXT NOT NULL DEFAULT '',
+    pack TEXT NOT NULL,
+    modified_at REAL NOT NULL,
+    packed_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_packed_tasks_task_id ON packed_tasks(task_id);
+
+CREATE TABLE IF NOT EXISTS pack_members (
+    task_dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data_offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (task_dir, name)
+);
+
+CREATE TABLE IF NOT EXISTS packs (
+    pack TEXT PRIMARY KEY,
+    end_offset INTEGER NOT NULL
+);
+"""
+
+PathLike = Union[str, Path]
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+CHUNK_SIZE = 64 * 1024
+# tar 结尾标记：两个全零块
+END_OF_ARCHIVE = b"\0" * (BLOCK_SIZE * 2)
+
+
+@dataclass
+class PackMember:
+    """包内文件"""
+    name: str
+    offset: int
+    size: int
+    mtime: float
+
+
+@dataclass
+class PackedTask:
+    """已归档的任务"""
+    task_dir: str
+    task_id: str
+    platform: str
+    pack: str
+    modified_at: float
+    packed_at: float
+    members: Dict[str, PackMember] = field(default_factory=dict)
+
+    def resolve(self, name: str) -> Optional[PackMember]:
+        """按原文件名查找包内文件（兼容压缩存储的文件）"""
+        if name in self.members:
+            return self.members[name]
+        for suffix in COMPRESSION_SUFFIXES:
+            if name + suffix in self.members:
+                return self.members[name + suffix]
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_dir": self.task_dir,
+            "task_id": self.task_id,
+            "platform": self.platform,
+            "pack": self.pack,
+            "modified_at": self.modified_at,
+            "packed_at": self.packed_at,
+            "files_count": len(self.members)
+        }
+
+
+class _MemberReader(io.RawIOBase):
+    """只读取包内一个文件的数据区间"""
+
+    def __init__(self, path: Path, offset: int, size: int):
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self._remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:min(len(buffer), self._remaining)]
+        count = self._file.readinto(view)
+        self._remaining -= count
+        return count
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def _scan_end_offset(pack_file: Path) -> int:
+    """扫描打包文件得到最后一个成员之后的位置（没有记录包尾偏移的旧打包文件才需要）"""
+    if not pack_file.exists() or pack_file.stat().st_size == 0:
+        return 0
+    with tarfile.open(pack_file, "r") as tar:
+        end = 0
+        for info in tar:
+            end = info.offset_data + (info.size + BLOCK_SIZE - 1) // BLOCK_SIZE * BLOCK_SIZE
+    return end
+
+
+def _member_prefix(platform: str, task_id: str) -> str:
+    """包内成员名前缀（相对任务根目录，不依赖任务目录在主机上的位置）"""
+    return f"{platform or 'unknown'}/{task_id}"
+
+
+def _member_header(name: str, size: int, mtime: float) -> bytes:
+    """普通文件条目的 tar 头（共享 blob 的硬链接也要写入完整内容，因此手动构造）"""
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = mtime
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, tarfile.ENCODING, "surrogateescape")
+
+
+def _write_member(handle: IO, name: str, size: int, mtime: float, source: IO) -> int:
+    """在当前位置写入一个成员，返回数据区偏移"""
+    handle.write(_member_header(name, size, mtime))
+    offset = handle.tell()
+    tarfile.copyfileobj(source, handle, size, StorageError, CHUNK_SIZE)
+    handle.write(b"\0" * (-size % BLOCK_SIZE))
+    return offset
+
+
+def _open_locked(pack_file: Path) -> IO:
+    """打开并锁定打包文件；等锁期间文件被压缩替换（已删除）时重新打开"""
+    while True:
+        handle = open(os.open(pack_file, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        if fcntl is None:
+            return handle
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        if os.fstat(handle.fileno()).st_nlink > 0:
+            return handle
+        handle.close()
+
+
+def last_modified(task_dir: PathLike) -> float:
+    """任务目录中最近一次修改的时间"""
+    task_dir = Path(task_dir)
+    latest = task_dir.stat().st_mtime
+    for path in task_dir.rglob("*"):
+        latest = max(latest, path.stat().st_mtime)
+    return latest
+
+
+class PackArchive:
+    """按月打包的冷任务归档"""
+
+    def __init__(
+        self,
+        root: Optional[PathLike] = None,
+        database: Optional[Database] = None,
+        blob_store: Optional[BlobStore] = None
+    ):
+        if root is None:
+            from app.config.settings import get_settings
+            root = get_settings().storage.archive_dir
+
+        self.logger = get_logger("pack_archive")
+        self.root = Path(root)
+        self.database = database or get_database()
+        self._blob_store = blob_store
+        self._lock = threading.RLock()
+        self._schema_ready = False
+
+    def _ensure_schema(self) -> None:
+        """首次使用时建表"""
+        if not self._schema_ready:
+            self.database.executescript(SCHEMA)
+            self._schema_ready = True
+
+    def pack_path(self, pack: str) -> Path:
+        """打包文件路径"""
+        return self.root / pack
+
+    def find_cold_tasks(self, task_dirs: Iterable[PathLike], older_than_days: float) -> List[Path]:
+        """筛选超过指定天数未修改的任务目录"""
+        cutoff = time.time() - older_than_days * 86400
+        cold = []
+        for task_dir in task_dirs:
+            try:
+                if last_modified(task_dir) < cutoff:
+                    cold.append(Path(task_dir))
+            except OSError:
+                continue
+        return cold
+
+    def pack_task(self, task_dir: PathLike, platform: str = "") -> PackedTask:
+        """将任务目录追加到所属月份的打包文件，记录偏移索引后删除原目录"""
+        self._ensure_schema()
+        task_dir = Path(task_dir)
+        files = sorted(
+            path for path in task_dir.rglob("*")
+            if path.is_file() and not path.name.endswith(".tmp")
+        )
+        if not files:
+            raise StorageError(f"任务目录为空: {task_dir}", operation="pack")
+
+        modified_at = last_modified(task_dir)
+        pack = time.strftime("%Y-%m", time.localtime(modified_at)) + ".tar"
+        pack_file = self.pack_path(pack)
+        task_id = task_id_of(task_dir)
+        prefix = _member_prefix(platform, task_id)
+
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            members = []
+            with _open_locked(pack_file) as pack_handle:
+                # 从上次记录的包尾写入，覆盖原来的结尾标记；中途失败时记录不变，下次写入覆盖残留数据
+                end_offset = self._end_offset(pack, pack_file)
+                pack_handle.seek(end_offset)
+                for path in files:
+                    name = path.relative_to(task_dir).as_posix()
+                    stat_result = path.stat()
+                    with open(path, "rb") as source:
+                        offset = _write_member(
+                            pack_handle, f"{prefix}/{name}", stat_result.st_size, stat_result.st_mtime, source
+                        )
+                    members.append(PackMember(name, offset, stat_result.st_size, stat_result.st_mtime))
+                end_offset = pack_handle.tell()
+                pack_handle.write(END_OF_ARCHIVE)
+                pack_handle.truncate()
+                pack_handle.flush()
+                os.fsync(pack_handle.fileno())
+
+                packed = PackedTask(
+                    task_dir=str(task_dir),
+                    task_id=task_id,
+                    platform=platform,
+                    pack=pack,
+                    modified_at=modified_at,
+                    packed_at=time.time(),
+                    members={member.name: member for member in members}
+                )
+                self._save(packed, end_offset)
+
+        self._discard_directory(task_dir)
+        self.logger.info(f"任务已归档: {task_dir} -> {pack} ({len(members)} 个文件)")
+        return packed
+
+    def _end_offset(self, pack: str, pack_file: Path) -> int:
+        """打包文件中下一个成员的写入位置"""
+        row = self.database.fetchone("SELECT end_offset FROM packs WHERE pack = ?", (pack,))
+        if row is not None and row["end_offset"] <= pack_file.stat().st_size:
+            return row["end_offset"]
+        return _scan_end_offset(pack_file)
+
+    def _save(self, packed: PackedTask, end_offset: int) -> None:
+        """写入偏移索引（覆盖同一任务的旧记录）和打包文件的包尾偏移"""
+        with self.database.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO packs (pack, end_offset) VALUES (?, ?)", (packed.pack, end_offset)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO packed_tasks "
+                "(task_dir, task_id, platform, pack, modified_at, packed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (packed.task_dir, packed.task_id, packed.platform, packed.pack, packed.modified_at, packed.packed_at)
+            )
+            conn.execute("DELETE FROM pack_members WHERE task_dir = ?", (packed.task_dir,))
+            conn.executemany(
+                "INSERT INTO pack_members (task_dir, name, data_offset, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (packed.task_dir, member.name, member.offset, member.size, member.mtime)
+                    for member in packed.members.values()
+                ]
+            )
+
+    def _discard_directory(self, task_dir: Path) -> None:
+        """删除已归档的任务目录，并释放其在内容寻址存储中的引用"""
+        blob_store = self._blob_store or get_blob_store()
+        released = []
+        try:
+            released = blob_store.release_tree(task_dir)
+        except Exception as e:
+            self.logger.warning(f"释放任务 blob 引用失败: {e}")
+
+        shutil.rmtree(task_dir)
+
+        try:
+            from app.storage.retention import UsageIndex
+            UsageIndex(self.database).forget(task_dir)
+        except Exception as e:
+            self.logger.warning(f"移除任务磁盘用量记录失败: {e}")
+
+        if released:
+            try:
+                blob_store.gc(released)
+            except Exception as e:
+                self.logger.warning(f"清理 blob 失败: {e}")
+
+    def archive_cold_tasks(
+        self,
+        task_dirs: Iterable[PathLike],
+        older_than_days: float,
+        platform_of: Optional[Callable[[Path], str]] = None
+    ) -> Dict[str, int]:
+        """归档超过指定天数未修改的任务目录
+
+        Args:
+            platform_of: 由任务目录得到平台名称的函数（默认 detect_platform）
+        """
+        result = {"packed": 0, "files": 0, "bytes": 0, "failed": 0}
+        for task_dir in self.find_cold_tasks(task_dirs, older_than_days):
+            try:
+                platform = (platform_of or detect_platform)(task_dir)
+                packed = self.pack_task(task_dir, platform)
+            except Exception as e:
+                self.logger.warning(f"归档任务失败 {task_dir}: {e}")
+                result["failed"] += 1
+                continue
+            result["packed"] += 1
+            result["files"] += len(packed.members)
+            result["bytes"] += sum(member.size for member in packed.members.values())
+        return result
+
+    def _load(self, rows: List[Any]) -> List[PackedTask]:
+        """由索引记录构造 PackedTask（含包内文件）"""
+        tasks = {
+            row["task_dir"]: PackedTask(
+                task_dir=row["task_dir"],
+                task_id=row["task_id"],
+                platform=row["platform"],
+                pack=row["pack"],
+                modified_at=row["modified_at"],
+                packed_at=row["packed_at"]
+            )
+            for row in rows
+        }
+        if not tasks:
+            return []
+
+        task_dirs = list(tasks)
+        placeholders = ", ".join("?" for _ in task_dirs)
+        for row in self.database.fetchall(
+            f"SELECT task_dir, name, data_offset, size, mtime FROM pack_members WHERE task_dir IN ({placeholders})",
+            task_dirs
+        ):
+            tasks[row["task_dir"]].members[row["name"]] = PackMember(
+                row["name"], row["data_offset"], row["size"], row["mtime"]
+            )
+        return list(tasks.values())
+
+    def get(self, task_dir: PathLike) -> Optional[PackedTask]:
+        """按原任务目录查找归档"""
+        self._ensure_schema()
+        rows = self.database.fetchall("SELECT * FROM packed_tasks WHERE task_dir = ?", (str(task_dir),))
+        tasks = self._load(rows)
+        return tasks[0] if tasks else None
+
+    def find(self, task_id: str) -> Optional[PackedTask]:
+        """按任务ID查找归档（同一ID归档过多次时返回最近的一次）"""
+        self._ensure_schema()
+        rows = self.database.fetchall(
+            "SELECT * FROM packed_tasks WHERE task_id = ? ORDER BY packed_at DESC LIMIT 1",
+            (task_id,)
+        )
+        tasks = self._load(rows)
+        return tasks[0] if tasks else None
+
+    def list_tasks(self, platform: Optional[str] = None) -> List[PackedTask]:
+        """列出已归档的任务"""
+        self._ensure_schema()
+        if platform:
+            rows = self.database.fetchall(
+                "SELECT * FROM packed_tasks WHERE platform = ? ORDER BY task_dir", (platform,)
+            )
+        else:
+            rows = self.database.fetchall("SELECT * FROM packed_tasks ORDER BY task_dir")
+        return self._load(rows)
+
+    def open_member(self, packed: PackedTask, name: str) -> IO:
+        """按偏移打开包内文件（返回的是存储时的字节，压缩存储的文件需由调用方解压）"""
+        member = packed.members.get(name)
+        if member is None:
+            raise FileNotFoundError(f"{packed.task_dir}/{name}")
+        return io.BufferedReader(_MemberReader(self.pack_path(packed.pack), member.offset, member.size), CHUNK_SIZE)
+
+    def rehydrate(self, packed: PackedTask) -> Path:
+        """将归档的任务还原为目录，并删除其偏移索引（包内数据保留，不再被引用）"""
+        self._ensure_schema()
+        task_dir = Path(packed.task_dir)
+        with self._lock:
+            for member in packed.members.values():
+                target = task_dir / member.name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = target.with_name(f".{target.name}.tmp")
+                with self.open_member(packed, member.name) as source, open(temp_path, "wb") as f:
+                    shutil.copyfileobj(source, f, CHUNK_SIZE)
+                os.replace(temp_path, target)
+                os.utime(target, (member.mtime, member.mtime))
+            self.remove(packed)
+
+        self.logger.info(f"任务已从归档还原: {task_dir}")
+        return task_dir
+
+    def relocate(self, packed: PackedTask, task_dir: PathLike) -> PackedTask:
+        """修改任务的还原位置（任务目录布局迁移时使用）"""
+        self._ensure_schema()
+        task_dir = str(task_dir)
+        with self.database.transaction() as conn:
+            conn.execute("UPDATE packed_tasks SET task_dir = ? WHERE task_dir = ?", (task_dir, packed.task_dir))
+            conn.execute("UPDATE pack_members SET task_dir = ? WHERE task_dir = ?", (task_dir, packed.task_dir))
+        packed.task_dir = task_dir
+        return packed
+
+    def remove(self, packed: PackedTask) -> None:
+        """删除任务的偏移索引"""
+        self._ensure_schema()
+        with self.database.transaction() as conn:
+            conn.execute("DELETE FROM pack_members WHERE task_dir = ?", (packed.task_dir,))
+            conn.execute("DELETE FROM packed_tasks WHERE task_dir = ?", (packed.task_dir,))
+
+    def compact(self, min_live_ratio: Optional[float] = None) -> Dict[str, int]:
+        """重写仍被引用的数据占比低于阈值的打包文件，不再有引用的打包文件直接删除
+
+        Args:
+            min_live_ratio: 引用数据（含 tar 头）占打包文件大小的最低比例，默认取配置
+        """
+        self._ensure_schema()
+        if min_live_ratio is None:
+            from app.config.settings import get_settings
+            min_live_ratio = get_settings().storage.archive_compact_ratio
+
+        result = {"compacted": 0, "removed": 0, "reclaimed_bytes": 0}
+        if not self.root.exists():
+            return result
+
+        for pack_file in sorted(self.root.glob("*.tar")):
+            try:
+                self._compact_pack(pack_file.name, min_live_ratio, result)
+            except Exception as e:
+                self.logger.warning(f"压缩打包文件失败 {pack_file.name}: {e}")
+        return result
+
+    def _compact_pack(self, pack: str, min_live_ratio: float, result: Dict[str, int]) -> None:
+        """压缩单个打包文件，结果累计到 result
+
+        引用的数据按成员复制到新的打包文件，索引在一个事务中切换到新文件后删除旧文件，
+        中途失败时旧文件和索引保持不变。
+        """
+        pack_file = self.pack_path(pack)
+        with self._lock, _open_locked(pack_file) as pack_handle:
+            size = os.fstat(pack_handle.fileno()).st_size
+            tasks = self._load(self.database.fetchall("SELECT * FROM packed_tasks WHERE pack = ?", (pack,)))
+
+            if not tasks:
+                with self.database.transaction() as conn:
+                    conn.execute("DELETE FROM packs WHERE pack = ?", (pack,))
+                pack_file.unlink()
+                result["removed"] += 1
+                result["reclaimed_bytes"] += size
+                self.logger.info(f"打包文件已无引用，已删除: {pack}")
+                return
+
+            live = len(END_OF_ARCHIVE)
+            for task in tasks:
+                prefix = _member_prefix(task.platform, task.task_id)
+                for member in task.members.values():
+                    header = _member_header(f"{prefix}/{member.name}", member.size, member.mtime)
+                    live += len(header) + member.size + (-member.size % BLOCK_SIZE)
+            if live >= size * min_live_ratio:
+                return
+
+            new_pack = f"{pack.split('.', 1)[0]}.{int(time.time() * 1000)}.tar"
+            new_file = self.pack_path(new_pack)
+            offsets = []
+            try:
+                with open(new_file, "xb") as target:
+                    for task in tasks:
+                        prefix = _member_prefix(task.platform, task.task_id)
+                        for member in task.members.values():
+                            pack_handle.seek(member.offset)
+                            offset = _write_member(
+                                target, f"{prefix}/{member.name}", member.size, member.mtime, pack_handle
+                            )
+                            offsets.append((offset, task.task_dir, member.name))
+                    end_offset = target.tell()
+                    target.write(END_OF_ARCHIVE)
+                    target.flush()
+                    os.fsync(target.fileno())
+
+                with self.database.transaction() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO packs (pack, end_offset) VALUES (?, ?)", (new_pack, end_offset)
+                    )
+                    conn.execute("DELETE FROM packs WHERE pack = ?", (pack,))
+                    conn.execute("UPDATE packed_tasks SET pack = ? WHERE pack = ?", (new_pack, pack))
+                    conn.executemany(
+                        "UPDATE pack_members SET data_offset = ? WHERE task_dir = ? AND name = ?", offsets
+                    )
+            except BaseException:
+                new_file.unlink(missing_ok=True)
+                raise
+
+            pack_file.unlink()
+
+        reclaimed = size - new_file.stat().st_size
+        result["compacted"] += 1
+        result["reclaimed_bytes"] += reclaimed
+        self.logger.info(f"打包文件已压缩: {pack} -> {new_pack}, 回收 {reclaimed / 1024 / 1024:.1f}MB")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """归档统计：打包文件数量与大小、已归档任务与文件、仍被索引引用的数据量"""
+        self._ensure_schema()
+        tasks = self.database.fetchone("SELECT COUNT(*) AS count FROM packed_tasks")
+        members = self.database.fetchone(
+            "SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS size FROM pack_members"
+        )
+        packs = list(self.root.glob("*.tar")) if self.root.exists() else []
+        return {
+            "packs": len(packs),
+            "pack_bytes": sum(pack.stat().st_size for pack in packs),
+            "tasks": tasks["count"],
+            "files": members["count"],
+            "live_bytes": members["size"]
+        }
+
+
+# 全局归档实例
+_pack_archive: Optional[PackArchive] = None
+
+
+def get_pack_archive() -> PackArchive:
+    """获取全局冷任务归档实例"""
+    global _pack_archive
+    if _pack_archive is None:
+        _pack_archive = PackArchive()
+    return _pack_archive
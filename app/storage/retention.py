@@ -0,0 +1,615 @@
+"""
+数据保留策略与磁盘用量统计
+按平台和产物类型配置保留策略（最长保留天数、总大小上限、同一产物保留最新 N 个版本），
+清理临时目录中的截图和打包文件、过期的任务产物以及被重新下载取代的重复任务目录。
+每个任务按产物类型的字节数记录在数据库中，目录内容未变化时不重新统计，按平台汇总无需扫描磁盘。
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import time
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.core.exceptions import ValidationError
+from app.core.file_triage import GENERATED_FILES, PRIMARY_TEXT_FILES
+from app.core.logger import get_logger
+from app.storage.compression import logical_path
+from app.storage.database import Database, get_database
+from app.storage.task_layout import read_task_metadata, task_identity
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_usage (
+    task_dir TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    platform TEXT NOT NULL DEFAULT '',
+    identity TEXT,
+    bytes INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    modified_at REAL NOT NULL,
+    signature INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_usage_platform ON task_usage(platform);
+
+CREATE TABLE IF NOT EXISTS task_usage_types (
+    task_dir TEXT NOT NULL,
+    artifact_type TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    PRIMARY KEY (task_dir, artifact_type)
+);
+"""
+
+PathLike = Union[str, Path]
+
+# 产物类型：整个任务目录、临时文件，以及任务目录中可单独清理的文件
+TASK = "task"
+TEMP = "temp"
+FILE_ARTIFACT_TYPES = ("screenshot", "html", "download", "summary")
+
+# 任务的元数据和正文不单独清理（只随任务目录一起删除）
+CORE_FILES = {"metadata.json"} | PRIMARY_TEXT_FILES
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+HTML_SUFFIXES = {".html", ".htm"}
+
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def artifact_type(path: PathLike) -> str:
+    """任务目录中文件的产物类型（元数据和正文为 core）"""
+    name = logical_path(path).name.lower()
+    suffix = Path(name).suffix
+    if name in CORE_FILES:
+        return "core"
+    if name in GENERATED_FILES:
+        return "summary"
+    if name.startswith("screenshot") and suffix in IMAGE_SUFFIXES:
+        return "screenshot"
+    if suffix in HTML_SUFFIXES:
+        return "html"
+    return "download"
+
+
+def directory_signature(task_dir: PathLike) -> int:
+    """目录签名：目录中所有文件的相对路径、大小和修改时间的哈希（增删文件和原地改写都会改变）"""
+    digest = hashlib.blake2b(digest_size=7)
+    for directory, dirnames, _ in os.walk(task_dir):
+        dirnames.sort()
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda item: item.name):
+                if entry.is_file(follow_symlinks=False):
+                    stat_result = entry.stat(follow_symlinks=False)
+                    relative = os.path.relpath(entry.path, task_dir)
+                    digest.update(f"{relative}\0{stat_result.st_size}\0{stat_result.st_mtime_ns}\n".encode("utf-8"))
+    return int.from_bytes(digest.digest(), "big")
+
+
+@dataclass
+class TaskUsage:
+    """任务的磁盘用量"""
+    task_dir: str
+    task_id: str
+    platform: str
+    identity: Optional[str]
+    bytes: int
+    files: int
+    modified_at: float
+    types: Dict[str, int] = field(default_factory=dict)
+
+
+class UsageIndex:
+    """任务磁盘用量索引（按任务、产物类型记录字节数）"""
+
+    def __init__(self, database: Optional[Database] = None):
+        self.database = database or get_database()
+        self._schema_ready = False
+
+    def _ensure_schema(self) -> None:
+        """首次使用时建表（旧版用量表结构不同时重建，用量可由任务目录重新统计）"""
+        if not self._schema_ready:
+            columns = {row["name"] for row in self.database.fetchall("PRAGMA table_info(task_usage)")}
+            if columns and "identity" not in columns:
+                self.database.executescript("DROP TABLE task_usage; DROP TABLE IF EXISTS task_usage_types;")
+            self.database.executescript(SCHEMA)
+            self._schema_ready = True
+
+    def record(self, task_dir: PathLike, task_id: Optional[str] = None, platform: Optional[str] = None) -> TaskUsage:
+        """统计任务目录并写入索引"""
+        self._ensure_schema()
+        task_dir = Path(task_dir)
+        signature = directory_signature(task_dir)
+        metadata = read_task_metadata(task_dir)
+        task_id = task_id or metadata["task"]["id"]
+        platform = platform or metadata["task"]["platform"]
+        # 与历史任务列表的精确去重键一致，只用可靠的任务ID或具体任务页面的链接
+        identity = task_identity(platform, task_id, metadata["download"].get("page_url") or "")
+
+        usage = TaskUsage(str(task_dir), str(task_id), platform, identity, 0, 0, task_dir.stat().st_mtime)
+        files: Dict[str, int] = {}
+        for path in task_dir.rglob("*"):
+            if not path.is_file():
+                continue
+            stat_result = path.stat()
+            kind = artifact_type(path)
+            usage.types[kind] = usage.types.get(kind, 0) + stat_result.st_size
+            files[kind] = files.get(kind, 0) + 1
+            usage.bytes += stat_result.st_size
+            usage.files += 1
+            usage.modified_at = max(usage.modified_at, stat_result.st_mtime)
+
+        with self.database.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO task_usage "
+                "(task_dir, task_id, platform, identity, bytes, files, modified_at, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    usage.task_dir, usage.task_id, usage.platform, usage.identity,
+                    usage.bytes, usage.files, usage.modified_at, signature
+                )
+            )
+            conn.execute("DELETE FROM task_usage_types WHERE task_dir = ?", (usage.task_dir,))
+            conn.executemany(
+                "INSERT INTO task_usage_types (task_dir, artifact_type, bytes, files) VALUES (?, ?, ?, ?)",
+                [(usage.task_dir, kind, size, files[kind]) for kind, size in usage.types.items()]
+            )
+        return usage
+
+    def forget(self, task_dir: PathLike) -> None:
+        """任务目录删除后移除其用量记录"""
+        self._ensure_schema()
+        with self.database.transaction() as conn:
+            conn.execute("DELETE FROM task_usage WHERE task_dir = ?", (str(task_dir),))
+            conn.execute("DELETE FROM task_usage_types WHERE task_dir = ?", (str(task_dir),))
+
+    def rename(self, old_task_dir: PathLike, new_task_dir: PathLike) -> None:
+        """任务目录移动后更新用量记录的路径"""
+        self._ensure_schema()
+        params = (str(new_task_dir), str(old_task_dir))
+        with self.database.transaction() as conn:
+            conn.execute("UPDATE task_usage SET task_dir = ? WHERE task_dir = ?", params)
+            conn.execute("UPDATE task_usage_types SET task_dir = ? WHERE task_dir = ?", params)
+
+    def refresh(self, task_dirs: Iterable[PathLike]) -> Dict[str, int]:
+        """增量更新：只重新统计签名变化的任务目录，并移除已不存在的目录"""
+        self._ensure_schema()
+        known = {
+            row["task_dir"]: row["signature"]
+            for row in self.database.fetchall("SELECT task_dir, signature FROM task_usage")
+        }
+        seen = set()
+        updated = removed = 0
+        for task_dir in task_dirs:
+            key = str(task_dir)
+            seen.add(key)
+            try:
+                if known.get(key) == directory_signature(task_dir):
+                    continue
+                self.record(task_dir)
+                updated += 1
+            except OSError:
+                continue
+
+        for key in set(known) - seen:
+            if not Path(key).exists():
+                self.forget(key)
+                removed += 1
+        return {"scanned": len(seen), "updated": updated, "removed": removed}
+
+    @staticmethod
+    def _rows_to_usage(rows, type_rows) -> List[TaskUsage]:
+        usages = {
+            row["task_dir"]: TaskUsage(
+                row["task_dir"], row["task_id"], row["platform"], row["identity"],
+                row["bytes"], row["files"], row["modified_at"]
+            )
+            for row in rows
+        }
+        for row in type_rows:
+            if row["task_dir"] in usages:
+                usages[row["task_dir"]].types[row["artifact_type"]] = row["bytes"]
+        return list(usages.values())
+
+    def get(self, task_dir: PathLike) -> Optional[TaskUsage]:
+        """查询单个任务的用量"""
+        self._ensure_schema()
+        params = (str(task_dir),)
+        usages = self._rows_to_usage(
+            self.database.fetchall("SELECT * FROM task_usage WHERE task_dir = ?", params),
+            self.database.fetchall("SELECT * FROM task_usage_types WHERE task_dir = ?", params)
+        )
+        return usages[0] if usages else None
+
+    def list_tasks(self, platform: Optional[str] = None) -> List[TaskUsage]:
+        """列出任务用量（可按平台过滤）"""
+        self._ensure_schema()
+        where, params = ("WHERE u.platform = ?", (platform,)) if platform else ("", ())
+        return self._rows_to_usage(
+            self.database.fetchall(f"SELECT * FROM task_usage u {where} ORDER BY u.task_dir", params),
+            self.database.fetchall(
+                f"SELECT t.* FROM task_usage_types t JOIN task_usage u ON u.task_dir = t.task_dir {where}", params
+            )
+        )
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """按平台汇总任务数、文件数和字节数（含各产物类型的字节数）"""
+        self._ensure_schema()
+        platforms: Dict[str, Dict[str, Any]] = {}
+        for row in self.database.fetchall(
+            "SELECT platform, COUNT(*) AS tasks, SUM(files) AS files, SUM(bytes) AS bytes "
+            "FROM task_usage GROUP BY platform"
+        ):
+            platforms[row["platform"]] = {
+                "tasks": row["tasks"], "files": row["files"], "bytes": row["bytes"], "types": {}
+            }
+        for row in self.database.fetchall(
+            "SELECT u.platform, t.artifact_type, SUM(t.bytes) AS bytes FROM task_usage_types t "
+            "JOIN task_usage u ON u.task_dir = t.task_dir GROUP BY u.platform, t.artifact_type"
+        ):
+            platforms[row["platform"]]["types"][row["artifact_type"]] = row["bytes"]
+
+        return {
+            "tasks": sum(item["tasks"] for item in platforms.values()),
+            "files": sum(item["files"] for item in platforms.values()),
+            "bytes": sum(item["bytes"] for item in platforms.values()),
+            "platforms": platforms
+        }
+
+
+@dataclass
+class RetentionPolicy:
+    """保留策略
+
+    artifact_type 为 "*" 时匹配任务目录中可单独清理的文件（不含 task 和 temp），
+    platform 为 "*" 时对每个平台分别生效。多个策略匹配同一产物时取最具体的一个。
+    """
+    artifact_type: str = "*"
+    platform: str = "*"
+    max_age_days: Optional[float] = None
+    max_bytes: Optional[int] = None
+    keep_latest: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RetentionPolicy":
+        names = {item.name for item in fields(cls)}
+        unknown = set(data) - names
+        if unknown:
+            raise ValidationError(f"未知的保留策略字段: {', '.join(sorted(unknown))}", field="retention_policies")
+        policy = cls(**data)
+        if policy.artifact_type not in ("*", TASK, TEMP, *FILE_ARTIFACT_TYPES):
+            raise ValidationError(
+                f"未知的产物类型: {policy.artifact_type}", field="artifact_type", value=policy.artifact_type
+            )
+        return policy
+
+    def matches(self, kind: str, platform: str) -> bool:
+        """策略是否适用于指定平台的产物类型"""
+        if self.artifact_type == "*":
+            if kind not in FILE_ARTIFACT_TYPES:
+                return False
+        elif self.artifact_type != kind:
+            return False
+        return self.platform in ("*", platform)
+
+    @property
+    def specificity(self) -> int:
+        return (self.artifact_type != "*") + (self.platform != "*")
+
+
+@dataclass
+class RetentionCandidate:
+    """可被保留策略清理的产物"""
+    path: Path
+    artifact_type: str
+    platform: str
+    version_key: Optional[str]
+    size: int
+    modified_at: float
+    task_dir: Optional[str] = None
+
+
+@dataclass
+class RetentionAction:
+    """清理动作"""
+    candidate: RetentionCandidate
+    reason: str
+    policy: RetentionPolicy
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.candidate.path),
+            "artifact_type": self.candidate.artifact_type,
+            "platform": self.candidate.platform,
+            "size": self.candidate.size,
+            "modified_at": self.candidate.modified_at,
+            "reason": self.reason,
+            "policy": asdict(self.policy)
+        }
+
+
+@dataclass
+class RetentionReport:
+    """清理报告"""
+    actions: List[RetentionAction] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    dry_run: bool = False
+
+    @property
+    def freed_bytes(self) -> int:
+        failed = {path for path, _ in self.failed}
+        return sum(action.candidate.size for action in self.actions if str(action.candidate.path) not in failed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        by_reason: Dict[str, int] = {}
+        by_type: Dict[str, Dict[str, int]] = {}
+        for action in self.actions:
+            by_reason[action.reason] = by_reason.get(action.reason, 0) + 1
+            item = by_type.setdefault(action.candidate.artifact_type, {"count": 0, "bytes": 0})
+            item["count"] += 1
+            item["bytes"] += action.candidate.size
+        return {
+            "dry_run": self.dry_run,
+            "removed": len(self.actions) - len(self.failed),
+            "failed": len(self.failed),
+            "freed_bytes": self.freed_bytes,
+            "by_reason": by_reason,
+            "by_type": by_type
+        }
+
+
+class RetentionEngine:
+    """按保留策略清理临时文件、任务产物和重复任务目录"""
+
+    def __init__(
+        self,
+        policies: Optional[List[RetentionPolicy]] = None,
+        temp_dir: Optional[PathLike] = None,
+        usage_index: Optional[UsageIndex] = None,
+        blob_store=None,
+        duplicate_index=None
+    ):
+        if policies is None or temp_dir is None:
+            from app.config.settings import get_settings
+            storage_settings = get_settings().storage
+            if policies is None:
+                policies = [RetentionPolicy.from_dict(item) for item in storage_settings.retention_policies]
+            temp_dir = storage_settings.temp_dir if temp_dir is None else temp_dir
+
+        self.logger = get_logger("retention")
+        self.policies = policies
+        self.temp_dir = Path(temp_dir)
+        self.usage_index = usage_index or get_usage_index()
+        self._blob_store = blob_store
+        self._duplicate_index = duplicate_index
+
+    def policy_for(self, kind: str, platform: str) -> Optional[RetentionPolicy]:
+        """产物适用的策略（最具体的一个，同样具体时取先配置的）"""
+        matched = [policy for policy in self.policies if policy.matches(kind, platform)]
+        return max(matched, key=lambda policy: policy.specificity) if matched else None
+
+    def _wants(self, kinds: Iterable[str]) -> bool:
+        return any(policy.matches(kind, policy.platform) for policy in self.policies for kind in kinds)
+
+    def _temp_candidates(self) -> List[RetentionCandidate]:
+        """临时目录中的文件（同名去掉数字后视为同一产物的不同版本）"""
+        candidates = []
+        if not self.temp_dir.is_dir():
+            return candidates
+        for path in self.temp_dir.rglob("*"):
+            try:
+                if not path.is_file():
+                    continue
+                stat_result = path.stat()
+            except OSError:
+                continue
+            version_key = DIGITS_PATTERN.sub("", path.relative_to(self.temp_dir).as_posix())
+            candidates.append(RetentionCandidate(path, TEMP, "", version_key, stat_result.st_size, stat_result.st_mtime))
+        return candidates
+
+    def _file_candidates(self, usage: TaskUsage) -> List[RetentionCandidate]:
+        """任务目录中可单独清理的文件（同一任务的同名文件视为同一产物的不同版本）"""
+        candidates = []
+        task_dir = Path(usage.task_dir)
+        for path in task_dir.rglob("*"):
+            try:
+                if not path.is_file():
+                    continue
+                stat_result = path.stat()
+            except OSError:
+                continue
+            kind = artifact_type(path)
+            if kind not in FILE_ARTIFACT_TYPES:
+                continue
+            name = logical_path(path.relative_to(task_dir)).as_posix()
+            candidates.append(RetentionCandidate(
+                path, kind, usage.platform, f"{usage.identity}/{name}" if usage.identity else None,
+                stat_result.st_size, stat_result.st_mtime, usage.task_dir
+            ))
+        return candidates
+
+    def plan(self, task_dirs: Optional[Iterable[PathLike]] = None) -> List[RetentionAction]:
+        """计算清理动作（不删除文件）"""
+        if task_dirs is None:
+            from app.core.summary_backfill import find_task_dirs
+            task_dirs = find_task_dirs()
+        task_dirs = [str(task_dir) for task_dir in task_dirs]
+        self.usage_index.refresh(task_dirs)
+        selected = set(task_dirs)
+        usages = [usage for usage in self.usage_index.list_tasks() if usage.task_dir in selected]
+
+        candidates = self._temp_candidates()
+        if self._wants([TASK]):
+            # 任务标识相同的多个目录（重复下载）视为同一任务的不同版本
+            candidates.extend(
+                RetentionCandidate(
+                    Path(usage.task_dir), TASK, usage.platform, usage.identity,
+                    usage.bytes, usage.modified_at, usage.task_dir
+                )
+                for usage in usages
+            )
+        if self._wants(FILE_ARTIFACT_TYPES):
+            for usage in usages:
+                candidates.extend(self._file_candidates(usage))
+
+        groups: Dict[Tuple[int, str], List[RetentionCandidate]] = {}
+        for candidate in candidates:
+            policy = self.policy_for(candidate.artifact_type, candidate.platform)
+            if policy is not None:
+                groups.setdefault((self.policies.index(policy), candidate.platform), []).append(candidate)
+
+        actions = []
+        for (index, _), items in groups.items():
+            actions.extend(self._select(self.policies[index], items, time.time()))
+
+        # 任务目录整体删除时不再单独删除其中的文件
+        removed_tasks = {action.candidate.task_dir for action in actions if action.candidate.artifact_type == TASK}
+        return [
+            action for action in actions
+            if action.candidate.artifact_type == TASK or action.candidate.task_dir not in removed_tasks
+        ]
+
+    def _select(
+        self, policy: RetentionPolicy, candidates: List[RetentionCandidate], now: float
+    ) -> List[RetentionAction]:
+        """按策略选出要清理的产物：超出最新 N 个版本、超过保留天数、超出总大小上限（保留较新的）"""
+        newest_first = sorted(candidates, key=lambda candidate: candidate.modified_at, reverse=True)
+        reasons: Dict[Path, str] = {}
+
+        if policy.keep_latest is not None:
+            # 没有可靠标识的产物无法判断是否为同一产物的版本，不按版本数清理
+            versions: Dict[str, int] = {}
+            for candidate in newest_first:
+                if candidate.version_key is None:
+                    continue
+                versions[candidate.version_key] = versions.get(candidate.version_key, 0) + 1
+                if versions[candidate.version_key] > policy.keep_latest:
+                    reasons.setdefault(candidate.path, "superseded")
+
+        if policy.max_age_days is not None:
+            cutoff = now - policy.max_age_days * 86400
+            for candidate in newest_first:
+                if candidate.modified_at < cutoff:
+                    reasons.setdefault(candidate.path, "expired")
+
+        if policy.max_bytes is not None:
+            total = 0
+            for candidate in newest_first:
+                if candidate.path in reasons:
+                    continue
+                total += candidate.size
+                if total > policy.max_bytes:
+                    reasons[candidate.path] = "over_quota"
+
+        return [
+            RetentionAction(candidate, reasons[candidate.path], policy)
+            for candidate in newest_first if candidate.path in reasons
+        ]
+
+    def apply(self, dry_run: bool = False, task_dirs: Optional[Iterable[PathLike]] = None) -> RetentionReport:
+        """执行保留策略；dry_run 时只返回报告"""
+        report = RetentionReport(actions=self.plan(task_dirs), dry_run=dry_run)
+        if dry_run:
+            self.logger.info(f"保留策略试运行: 将清理 {len(report.actions)} 项, 释放 {report.freed_bytes} 字节")
+            return report
+
+        released: List[str] = []
+        touched = set()
+        for action in report.actions:
+            try:
+                released.extend(self._remove(action.candidate))
+                if action.candidate.artifact_type in FILE_ARTIFACT_TYPES:
+                    touched.add(action.candidate.task_dir)
+            except OSError as e:
+                self.logger.warning(f"清理失败 {action.candidate.path}: {e}")
+                report.failed.append((str(action.candidate.path), str(e)))
+
+        if released:
+            try:
+                self._get_blob_store().gc(released)
+            except Exception as e:
+                self.logger.warning(f"清理 blob 失败: {e}")
+
+        for task_dir in touched:
+            if Path(task_dir).is_dir():
+                self.usage_index.record(task_dir)
+
+        self.logger.info(
+            f"保留策略执行完成: 清理 {len(report.actions) - len(report.failed)} 项, "
+            f"释放 {report.freed_bytes} 字节, 失败 {len(report.failed)} 项"
+        )
+        return report
+
+    def _remove(self, candidate: RetentionCandidate) -> List[str]:
+        """删除产物，返回引用计数归零的 blob"""
+        if candidate.artifact_type == TEMP:
+            candidate.path.unlink(missing_ok=True)
+            return []
+
+        blob_store = self._get_blob_store()
+        if candidate.artifact_type != TASK:
+            released = blob_store.release(candidate.path)
+            candidate.path.unlink(missing_ok=True)
+            return released
+
+        released = blob_store.release_tree(candidate.path)
+        shutil.rmtree(candidate.path)
+        self.usage_index.forget(candidate.path)
+        try:
+            self._get_duplicate_index().remove(str(candidate.path))
+        except Exception as e:
+            self.logger.warning(f"更新近似重复索引失败: {e}")
+        return released
+
+    def _get_blob_store(self):
+        if self._blob_store is None:
+            from app.storage.blob_store import get_blob_store
+            self._blob_store = get_blob_store()
+        return self._blob_store
+
+    def _get_duplicate_index(self):
+        if self._duplicate_index is None:
+            from app.core.duplicate_index import get_duplicate_index
+            self._duplicate_index = get_duplicate_index()
+        return self._duplicate_index
+
+
+def temp_usage(temp_dir: Optional[PathLike] = None) -> Dict[str, int]:
+    """临时目录的文件数和字节数"""
+    if temp_dir is None:
+        from app.config.settings import get_settings
+        temp_dir = get_settings().storage.temp_dir
+    files = size = 0
+    for path in Path(temp_dir).rglob("*"):
+        try:
+            if path.is_file():
+                files += 1
+                size += path.stat().st_size
+        except OSError:
+            continue
+    return {"files": files, "bytes": size}
+
+
+# 全局用量索引与保留策略实例
+_usage_index: Optional[UsageIndex] = None
+_retention_engine: Optional[RetentionEngine] = None
+
+
+def get_usage_index() -> UsageIndex:
+    """获取全局磁盘用量索引"""
+    global _usage_index
+    if _usage_index is None:
+        _usage_index = UsageIndex()
+    return _usage_index
+
+
+def get_retention_engine() -> RetentionEngine:
+    """获取全局保留策略引擎"""
+    global _retention_engine
+    if _retention_engine is None:
+        _retention_engine = RetentionEngine()
+    return _retention_engine
@@ -0,0 +1,405 @@
+"""
+任务目录布局
+任务统一存放在 <根目录>/<平台>/<分片>/task_<任务ID>/ 下（分片取任务ID哈希的前两位），
+查找任务只需按平台计算路径，无需扫描下载会话目录；元数据统一为 v2 格式。
+旧版下载目录（各平台的会话目录、多平台目录）可用迁移工具一次性并行迁移到新布局。
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from app.core.logger import get_logger
+
+
+METADATA_SCHEMA_VERSION = 2
+SHARD_WIDTH = 2
+
+# 按下载目录名推断平台时识别的平台
+PLATFORM_NAMES = ("skywork", "manus", "coze_space", "chatgpt")
+
+UNSAFE_NAME_PATTERN = re.compile(r"[^\w.\-]+")
+
+# 任务目录名前缀（新布局与旧版下载目录一致）
+TASK_DIR_PREFIX = "task_"
+
+# 按序号和时间自动生成的任务ID（不能标识任务）
+AUTO_TASK_ID_PATTERN = re.compile(r"^coze_space_history_\d+_\d+")
+
+# 平台首页等通用页面：所有任务共用，不能标识任务
+GENERIC_PAGE_URLS = {"https://manus.im/app", "https://space.coze.cn", "https://www.skywork.ai", "https://chatgpt.com"}
+GENERIC_PAGE_PATHS = {"", "app", "chat", "home", "index", "history"}
+
+PathLike = Union[str, Path]
+
+
+def safe_task_name(task_id: str) -> str:
+    """任务ID对应的目录名（替换路径中不安全的字符）"""
+    name = UNSAFE_NAME_PATTERN.sub("_", str(task_id)).strip("._")
+    return name or "unknown"
+
+
+def task_dir_name(task_id: str) -> str:
+    """任务ID对应的任务目录名"""
+    return f"{TASK_DIR_PREFIX}{safe_task_name(task_id)}"
+
+
+def task_id_of(task_dir: PathLike) -> str:
+    """由任务目录名得到任务ID（task_dir_name 的逆映射）"""
+    name = Path(task_dir).name
+    return name[len(TASK_DIR_PREFIX):] if name.startswith(TASK_DIR_PREFIX) else name
+
+
+def shard_of(task_id: str) -> str:
+    """任务ID所在的分片"""
+    return hashlib.sha1(str(task_id).encode("utf-8")).hexdigest()[:SHARD_WIDTH]
+
+
+def detect_platform(task_dir: PathLike) -> str:
+    """任务所属平台：优先取元数据中的平台，其次按下载目录名推断"""
+    task_dir = Path(task_dir)
+    try:
+        with open(task_dir / "metadata.json", "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        platform = metadata.get("download", {}).get("platform", "") or metadata.get("platform", "")
+        if platform:
+            return platform
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    for part in reversed(task_dir.parent.parts):
+        for platform in PLATFORM_NAMES:
+            if part.startswith(platform.split("_")[0]):
+                return platform
+    return "unknown"
+
+
+def is_task_page_url(url: str) -> bool:
+    """链接是否指向具体任务（排除相对链接、站点首页和平台通用页面）"""
+    if not url:
+        return False
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return False
+    if url.rstrip("/") in GENERIC_PAGE_URLS:
+        return False
+    return bool(parsed.query or parsed.path.strip("/").lower() not in GENERIC_PAGE_PATHS)
+
+
+def task_identity(platform: str, task_id: str, page_url: str = "") -> Optional[str]:
+    """任务标识：优先用任务ID，其次用具体任务页面的链接；都不可靠时返回 None"""
+    platform = platform or "unknown"
+    task_id = str(task_id or "").strip()
+    if task_id and not AUTO_TASK_ID_PATTERN.match(task_id):
+        return f"{platform}:id:{task_id}"
+    if is_task_page_url(page_url):
+        return f"{platform}:url:{page_url}"
+    return None
+
+
+def normalize_metadata(raw: Dict[str, Any], task_id: str = "", platform: str = "") -> Dict[str, Any]:
+    """将任务元数据转换为 v2 格式
+
+    兼容三种旧格式：标准化格式（task/download 两段）、旧版扁平格式（url/title/preview/timestamp）
+    以及平台下载文件时写入的元数据（task_id/page_url/page_title）。
+    """
+    raw = raw if isinstance(raw, dict) else {}
+    if "task" in raw:
+        task = dict(raw.get("task") or {})
+        download = dict(raw.get("download") or {})
+        extra = {key: value for key, value in raw.items() if key not in ("task", "download", "schema_version")}
+    else:
+        task = {
+            "id": raw.get("task_id") or raw.get("id"),
+            "title": raw.get("title") or raw.get("page_title", ""),
+            "date": raw.get("date", ""),
+            "url": raw.get("url") or raw.get("page_url", ""),
+            "preview": raw.get("preview", "")
+        }
+        download = {
+            "timestamp": raw.get("timestamp", ""),
+            "platform": raw.get("platform", ""),
+            "page_url": raw.get("page_url") or raw.get("url", ""),
+            "page_title": raw.get("page_title") or raw.get("title", "")
+        }
+        mapped = {"task_id", "id", "title", "date", "url", "preview", "timestamp", "platform", "page_url", "page_title"}
+        extra = {key: value for key, value in raw.items() if key not in mapped}
+
+    task["id"] = task.get("id") or task_id
+    platform = download.get("platform") or task.get("platform") or platform
+    task["platform"] = platform
+    download["platform"] = platform
+
+    metadata = {"schema_version": METADATA_SCHEMA_VERSION, "task": task, "download": download}
+    if extra:
+        metadata["legacy"] = extra
+    return metadata
+
+
+def read_task_metadata(task_dir: PathLike) -> Dict[str, Any]:
+    """读取任务目录的元数据并转换为 v2 格式（缺少任务ID时取目录名）"""
+    task_dir = Path(task_dir)
+    raw: Dict[str, Any] = {}
+    try:
+        with open(task_dir / "metadata.json", "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        pass
+    return normalize_metadata(raw, task_id_of(task_dir), detect_platform(task_dir))
+
+
+class TaskLayout:
+    """任务目录布局"""
+
+    def __init__(self, roots: Optional[List[PathLike]] = None, legacy_roots: Optional[List[PathLike]] = None):
+        if roots is None or legacy_roots is None:
+            from app.config.settings import get_settings
+            storage_settings = get_settings().storage
+            roots = storage_settings.task_roots if roots is None else roots
+            legacy_roots = storage_settings.legacy_task_roots if legacy_roots is None else legacy_roots
+
+        self.roots = [Path(root) for root in roots]
+        self.legacy_roots = [Path(root) for root in legacy_roots]
+
+    @property
+    def write_root(self) -> Path:
+        """新任务写入的根目录"""
+        return self.roots[0]
+
+    def task_dir(self, platform: str, task_id: str, root: Optional[PathLike] = None) -> Path:
+        """任务目录路径"""
+        root = Path(root) if root is not None else self.write_root
+        return root / (platform or "unknown") / shard_of(task_id) / task_dir_name(task_id)
+
+    def platforms(self) -> List[str]:
+        """已有任务的平台"""
+        names = set()
+        for root in self.roots:
+            if root.is_dir():
+                names.update(path.name for path in root.iterdir() if path.is_dir())
+        return sorted(names)
+
+    def find(self, task_id: str, platform: Optional[str] = None) -> Optional[Path]:
+        """按任务ID计算任务目录（不扫描任务目录），不存在返回 None"""
+        platforms = [platform] if platform else self.platforms()
+        for root in self.roots:
+            for name in platforms:
+                task_dir = self.task_dir(name, task_id, root)
+                if task_dir.is_dir():
+                    return task_dir
+        return None
+
+    def iter_task_dirs(self, platform: Optional[str] = None) -> Iterator[Tuple[str, Path]]:
+        """遍历新布局下的任务目录，产出 (平台, 任务目录)"""
+        for root in self.roots:
+            if not root.is_dir():
+                continue
+            for platform_dir in sorted(root.iterdir()):
+                if not platform_dir.is_dir() or (platform and platform_dir.name != platform):
+                    continue
+                for task_dir in sorted(platform_dir.glob("*/*")):
+                    if task_dir.is_dir():
+                        yield platform_dir.name, task_dir
+
+    def misplaced_task_dirs(self) -> List[Tuple[Path, Path]]:
+        """新布局中目录名与任务ID不对应的任务目录（目录名未带前缀的旧版本布局），产出 (当前目录, 应在目录)"""
+        misplaced = []
+        for platform, task_dir in self.iter_task_dirs():
+            expected = self.task_dir(platform, read_task_metadata(task_dir)["task"]["id"], task_dir.parents[2])
+            if expected != task_dir:
+                misplaced.append((task_dir, expected))
+        return misplaced
+
+    def legacy_task_dirs(self) -> List[Path]:
+        """旧版下载目录中的任务目录"""
+        task_dirs = set()
+        for root in self.legacy_roots:
+            if root.exists():
+                task_dirs.update(path for path in root.rglob("task_*") if path.is_dir())
+        return sorted(task_dirs)
+
+    def is_legacy(self, path: PathLike) -> bool:
+        """路径是否位于旧版下载目录中"""
+        path = Path(path)
+        return any(root == path or root in path.parents for root in self.legacy_roots)
+
+
+@dataclass
+class MigrationReport:
+    """迁移结果"""
+    migrated: List[Tuple[str, str]] = field(default_factory=list)
+    conflicts: List[Tuple[str, str]] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    relocated_packs: int = 0
+    dry_run: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "migrated": len(self.migrated),
+            "conflicts": len(self.conflicts),
+            "failed": len(self.failed),
+            "relocated_packs": self.relocated_packs,
+            "dry_run": self.dry_run
+        }
+
+
+class LayoutMigrator:
+    """旧版下载目录迁移到新布局"""
+
+    def __init__(
+        self,
+        layout: Optional[TaskLayout] = None,
+        blob_store=None,
+        pack_archive=None,
+        usage_index=None,
+        summary_backfill=None
+    ):
+        self.logger = get_logger("task_layout")
+        self.layout = layout or get_task_layout()
+        self._blob_store = blob_store
+        self._pack_archive = pack_archive
+        self._usage_index = usage_index
+        self._summary_backfill = summary_backfill
+
+    def plan(self) -> Tuple[List[Tuple[Path, Path]], List[Tuple[str, str]]]:
+        """计算迁移计划：返回 (源目录, 目标目录) 列表与冲突列表
+
+        包括旧版下载目录和新布局中目录名与任务ID不对应的目录；
+        多个目录对应同一任务时保留最近修改的一个，其余记为冲突（原地保留，不删除）。
+        """
+        from app.storage.pack_archive import last_modified
+
+        candidates = list(self.layout.misplaced_task_dirs())
+        for source in self.layout.legacy_task_dirs():
+            metadata = read_task_metadata(source)
+            candidates.append((source, self.layout.task_dir(metadata["task"]["platform"], metadata["task"]["id"])))
+
+        by_target: Dict[Path, List[Tuple[float, Path]]] = {}
+        for source, target in candidates:
+            try:
+                modified = last_modified(source)
+            except OSError:
+                modified = 0.0
+            by_target.setdefault(target, []).append((modified, source))
+
+        moves, conflicts = [], []
+        for target, sources in sorted(by_target.items()):
+            sources.sort(key=lambda item: item[0], reverse=True)
+            if target.exists():
+                conflicts.extend((str(source), str(target)) for _, source in sources)
+                continue
+            moves.append((sources[0][1], target))
+            conflicts.extend((str(source), str(target)) for _, source in sources[1:])
+        return moves, conflicts
+
+    def migrate_task(self, source: Path, target: Path) -> None:
+        """迁移单个任务目录：移动目录、写入 v2 元数据、更新 blob 引用路径"""
+        metadata = read_task_metadata(source)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(source), str(target))
+
+        metadata_file = target / "metadata.json"
+        temp_file = target / ".metadata.json.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, metadata_file)
+
+        try:
+            self._get_blob_store().rename_tree(source, target)
+        except Exception as e:
+            self.logger.warning(f"更新 blob 引用路径失败 {source}: {e}")
+
+    def migrate(self, workers: int = 8, dry_run: bool = False) -> MigrationReport:
+        """并行迁移所有旧版任务目录，并把已归档任务的还原位置指向新布局"""
+        moves, conflicts = self.plan()
+        report = MigrationReport(conflicts=conflicts, dry_run=dry_run)
+        if dry_run:
+            report.migrated = [(str(source), str(target)) for source, target in moves]
+            return report
+
+        def run(move: Tuple[Path, Path]) -> Optional[str]:
+            try:
+                self.migrate_task(*move)
+                return None
+            except Exception as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for (source, target), error in zip(moves, executor.map(run, moves)):
+                if error:
+                    self.logger.warning(f"迁移任务失败 {source}: {error}")
+                    report.failed.append((str(source), error))
+                else:
+                    report.migrated.append((str(source), str(target)))
+
+        self._rename_task_records(report.migrated)
+        report.relocated_packs = self._relocate_packed_tasks()
+        self.logger.info(
+            f"任务目录迁移完成: 迁移 {len(report.migrated)} 个, 冲突 {len(report.conflicts)} 个, "
+            f"失败 {len(report.failed)} 个"
+        )
+        return report
+
+    def _rename_task_records(self, moves: List[Tuple[str, str]]) -> None:
+        """按任务目录路径记录的用量索引和总结补全检查点随目录更新"""
+        if not moves:
+            return
+        usage_index = self._get_usage_index()
+        for source, target in moves:
+            usage_index.rename(source, target)
+        self._get_summary_backfill().rename_tasks(dict(moves))
+
+    def _relocate_packed_tasks(self) -> int:
+        """已归档且原位置在旧版目录中（或目录名与任务ID不对应）的任务，还原位置改为新布局"""
+        archive = self._get_pack_archive()
+        relocated = 0
+        for packed in archive.list_tasks():
+            if self.layout.is_legacy(packed.task_dir) or Path(packed.task_dir).name != task_dir_name(packed.task_id):
+                target = self.layout.task_dir(packed.platform, packed.task_id)
+                if archive.get(target) is None:
+                    archive.relocate(packed, target)
+                    relocated += 1
+        return relocated
+
+    def _get_blob_store(self):
+        if self._blob_store is None:
+            from app.storage.blob_store import get_blob_store
+            self._blob_store = get_blob_store()
+        return self._blob_store
+
+    def _get_pack_archive(self):
+        if self._pack_archive is None:
+            from app.storage.pack_archive import get_pack_archive
+            self._pack_archive = get_pack_archive()
+        return self._pack_archive
+
+    def _get_usage_index(self):
+        if self._usage_index is None:
+            from app.storage.retention import get_usage_index
+            self._usage_index = get_usage_index()
+        return self._usage_index
+
+    def _get_summary_backfill(self):
+        if self._summary_backfill is None:
+            from app.core.summary_backfill import get_summary_backfill
+            self._summary_backfill = get_summary_backfill()
+        return self._summary_backfill
+
+
+# 全局布局实例
+_task_layout: Optional[TaskLayout] = None
+
+
+def get_task_layout() -> TaskLayout:
+    """获取全局任务目录布局"""
+    global _task_layout
+    if _task_layout is None:
+        _task_layout = TaskLayout()
+    return _task_layout
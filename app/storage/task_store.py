@@ -0,0 +1,238 @@
+"""
+任务持久化存储
+记录任务状态和各处理阶段的状态流转，用于重启后恢复任务。
+执行中的任务由执行进程持有租约（owner / lease_expires_at）并定期续约，
+只有租约过期（持有进程已退出）的未完成任务才会被其他进程领取恢复。
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.logger import get_logger
+from app.storage.database import Database, get_database
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    status TEXT NOT NULL,
+    current_stage TEXT,
+    completed_stages TEXT NOT NULL DEFAULT '[]',
+    request TEXT NOT NULL,
+    content TEXT NOT NULL DEFAULT '',
+    files TEXT NOT NULL DEFAULT '[]',
+    ai_summary TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    metrics TEXT NOT NULL DEFAULT '{}',
+    error_message TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_expires_at REAL NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_platform ON tasks(platform);
+
+CREATE TABLE IF NOT EXISTS task_stage_transitions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL REFERENCES tasks(task_id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    event TEXT NOT NULL,
+    elapsed REAL,
+    message TEXT,
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_transitions_task ON task_stage_transitions(task_id);
+"""
+
+# 失败或取消的任务不再恢复（服务停止时中断的任务为 interrupted，会被恢复）；
+# 平台侧完成后状态即为 completed，需以完成阶段判断是否结束
+ABANDONED_STATUSES = ("failed", "cancelled")
+FINAL_STAGE = "completion"
+
+_JSON_FIELDS = ("completed_stages", "request", "files", "ai_summary", "metadata", "metrics")
+
+# 旧版任务表缺少的租约列
+_LEASE_COLUMNS = {
+    "owner": "owner TEXT",
+    "lease_expires_at": "lease_expires_at REAL NOT NULL DEFAULT 0",
+}
+
+
+class TaskStore:
+    """任务存储"""
+
+    def __init__(self, database: Optional[Database] = None):
+        self.logger = get_logger("task_store")
+        self.database = database or get_database()
+        self._schema_ready = False
+
+    def _ensure_schema(self) -> None:
+        """首次使用时建表"""
+        if not self._schema_ready:
+            self.database.executescript(SCHEMA)
+            columns = {row["name"] for row in self.database.fetchall("PRAGMA table_info(tasks)")}
+            for column, definition in _LEASE_COLUMNS.items():
+                if column not in columns:
+                    self.database.execute(f"ALTER TABLE tasks ADD COLUMN {definition}")
+            self._schema_ready = True
+
+    def save_task(self, record: Dict[str, Any]) -> None:
+        """新增或更新任务记录
+
+        Args:
+            record: 任务记录，字段与 tasks 表一致，JSON 字段传入原始对象
+        """
+        self._ensure_schema()
+        now = time.time()
+
+        values = dict(record)
+        for key in _JSON_FIELDS:
+            if key in values:
+                values[key] = json.dumps(values[key], ensure_ascii=False, default=str)
+        values.setdefault("created_at", now)
+        values["updated_at"] = now
+
+        columns = list(values.keys())
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in columns
+            if column not in ("task_id", "created_at")
+        )
+        self.database.execute(
+            f"INSERT INTO tasks ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(task_id) DO UPDATE SET {updates}",
+            [values[column] for column in columns]
+        )
+
+    def record_transition(
+        self,
+        task_id: str,
+        stage: str,
+        event: str,
+        elapsed: Optional[float] = None,
+        message: Optional[str] = None
+    ) -> None:
+        """记录阶段状态流转（started / completed / failed / skipped）"""
+        self._ensure_schema()
+        self.database.execute(
+            "INSERT INTO task_stage_transitions (task_id, stage, event, elapsed, message, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (task_id, stage, event, elapsed, message, time.time())
+        )
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务记录"""
+        self._ensure_schema()
+        row = self.database.fetchone("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+        return self._row_to_record(row) if row else None
+
+    def list_unfinished_tasks(self, platform: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出未进入终态的任务（含其他进程正在执行的任务）"""
+        self._ensure_schema()
+        placeholders = ", ".join("?" for _ in ABANDONED_STATUSES)
+        sql = f"SELECT * FROM tasks WHERE status NOT IN ({placeholders}) AND current_stage != ?"
+        params: List[Any] = [*ABANDONED_STATUSES, FINAL_STAGE]
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        sql += " ORDER BY created_at"
+        return [self._row_to_record(row) for row in self.database.fetchall(sql, params)]
+
+    def claim_unfinished_tasks(self, owner: str, ttl: float, platform: Optional[str] = None) -> List[Dict[str, Any]]:
+        """领取租约已过期的未完成任务（用于重启恢复）
+
+        领取是一条 UPDATE ... RETURNING 语句，多个进程同时恢复时每个任务只会被一个进程领取。
+        """
+        self._ensure_schema()
+        now = time.time()
+        placeholders = ", ".join("?" for _ in ABANDONED_STATUSES)
+        sql = (
+            "UPDATE tasks SET owner = ?, lease_expires_at = ? "
+            f"WHERE status NOT IN ({placeholders}) AND current_stage != ? AND lease_expires_at < ?"
+        )
+        params: List[Any] = [owner, now + ttl, *ABANDONED_STATUSES, FINAL_STAGE, now]
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        sql += " RETURNING *"
+        records = [self._row_to_record(row) for row in self.database.fetchall(sql, params)]
+        return sorted(records, key=lambda record: record["created_at"])
+
+    def claim_task(self, task_id: str, owner: str, ttl: float) -> bool:
+        """领取单个任务的租约（已由自己持有或已过期时成功）"""
+        self._ensure_schema()
+        now = time.time()
+        cursor = self.database.execute(
+            "UPDATE tasks SET owner = ?, lease_expires_at = ? "
+            "WHERE task_id = ? AND (owner IS NULL OR owner = ? OR lease_expires_at < ?)",
+            (owner, now + ttl, task_id, owner, now)
+        )
+        return cursor.rowcount > 0
+
+    def renew_leases(self, owner: str, task_ids: List[str], ttl: float) -> int:
+        """为仍由自己持有的任务续约，返回续约成功的数量"""
+        if not task_ids:
+            return 0
+        self._ensure_schema()
+        placeholders = ", ".join("?" for _ in task_ids)
+        cursor = self.database.execute(
+            f"UPDATE tasks SET lease_expires_at = ? WHERE owner = ? AND task_id IN ({placeholders})",
+            [time.time() + ttl, owner, *task_ids]
+        )
+        return cursor.rowcount
+
+    def release_lease(self, task_id: str, owner: str) -> None:
+        """释放任务租约（任务结束或中断时，中断的任务可立即被恢复）"""
+        self._ensure_schema()
+        self.database.execute(
+            "UPDATE tasks SET owner = NULL, lease_expires_at = 0 WHERE task_id = ? AND owner = ?",
+            (task_id, owner)
+        )
+
+    def get_transitions(self, task_id: str) -> List[Dict[str, Any]]:
+        """获取任务的阶段流转记录"""
+        self._ensure_schema()
+        rows = self.database.fetchall(
+            "SELECT stage, event, elapsed, message, created_at FROM task_stage_transitions "
+            "WHERE task_id = ? ORDER BY id",
+            (task_id,)
+        )
+        return [dict(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """按状态统计任务数量"""
+        self._ensure_schema()
+        rows = self.database.fetchall("SELECT status, COUNT(*) AS total FROM tasks GROUP BY status")
+        return {row["status"]: row["total"] for row in rows}
+
+    def delete_task(self, task_id: str) -> bool:
+        """删除任务记录"""
+        self._ensure_schema()
+        cursor = self.database.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _row_to_record(row) -> Dict[str, Any]:
+        """数据库行转换为任务记录"""
+        record = dict(row)
+        for key in _JSON_FIELDS:
+            if record.get(key) is not None:
+                record[key] = json.loads(record[key])
+        return record
+
+
+# 全局任务存储实例
+_task_store: Optional[TaskStore] = None
+
+
+def get_task_store() -> TaskStore:
+    """获取全局任务存储实例"""
+    global _task_store
+    if _task_store is None:
+        _task_store = TaskStore()
+    return _task_store
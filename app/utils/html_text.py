@@ -0,0 +1,151 @@
+"""
+HTML 正文提取
+基于标准库 html.parser 的增量解析：分块读取并解析页面，丢弃脚本、样式和导航、页脚，
+达到字符预算后立即停止，内存占用与页面大小无关。可在进程池中执行。
+"""
+
+import asyncio
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import List, Optional, Union
+
+from app.storage.compression import artifact_size, open_artifact
+from app.utils.process_pool import run_in_process
+
+
+# 内容不可见的标签
+SKIP_TAGS = {"script", "style", "noscript"}
+
+# 样板容器（导航、页脚）；页眉、表单等可能包含正文，保留
+BOILERPLATE_TAGS = {"nav", "footer"}
+
+# 块级标签：前后换行
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "dl", "dt", "dd", "tr", "table", "section", "article", "main",
+    "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "hr", "title", "figcaption"
+}
+
+# 无结束标签的元素
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# 再次出现同名开始标签时隐式结束上一个的元素
+AUTO_CLOSE_TAGS = {"p", "li", "dt", "dd", "tr", "td", "th", "option"}
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 超过该大小的文件在进程池中解析
+PROCESS_POOL_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class HTMLTextExtractor(HTMLParser):
+    """增量 HTML 文本提取器"""
+
+    def __init__(self, max_chars: Optional[int] = None, drop_boilerplate: bool = True):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.drop_boilerplate = drop_boilerplate
+        self.parts: List[str] = []
+        self.length = 0
+        self.done = False
+        # 当前打开的元素；丢弃区间从 _skip_depth 层开始，该元素或其祖先结束时丢弃结束
+        self._open: List[str] = []
+        self._skip_depth: Optional[int] = None
+
+    @property
+    def skipping(self) -> bool:
+        """是否处于被丢弃的元素内"""
+        return self._skip_depth is not None
+
+    def _is_skipped(self, tag: str) -> bool:
+        """判断元素内容是否应被丢弃"""
+        return tag in SKIP_TAGS or (self.drop_boilerplate and tag in BOILERPLATE_TAGS)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS and not self.skipping:
+                self._append("\n")
+            return
+        if tag in AUTO_CLOSE_TAGS and self._open and self._open[-1] == tag:
+            self._close(tag)
+        if not self.skipping and self._is_skipped(tag):
+            self._skip_depth = len(self._open)
+        self._open.append(tag)
+        if tag in BLOCK_TAGS and not self.skipping:
+            self._append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS and not self.skipping:
+            self._append("\n")
+
+    def handle_endtag(self, tag):
+        # 容错：关闭到最近的同名元素（其中未闭合的元素一并结束），忽略不匹配的结束标签
+        if tag not in self._open:
+            return
+        self._close(tag)
+        if tag in BLOCK_TAGS and not self.skipping:
+            self._append("\n")
+
+    def _close(self, tag: str) -> None:
+        """结束最近的同名元素；被丢弃的元素或其父元素结束时恢复提取"""
+        while self._open.pop() != tag:
+            pass
+        if self._skip_depth is not None and len(self._open) <= self._skip_depth:
+            self._skip_depth = None
+
+    def handle_data(self, data):
+        if self.skipping or self.done:
+            return
+        text = WHITESPACE_PATTERN.sub(" ", data)
+        if text.strip():
+            self._append(text)
+
+    def _append(self, text: str) -> None:
+        """追加文本，达到字符预算后标记完成"""
+        if self.done:
+            return
+        if self.max_chars is not None and self.length + len(text) >= self.max_chars:
+            text = text[:self.max_chars - self.length]
+            self.done = True
+        self.parts.append(text)
+        self.length += len(text)
+
+    def get_text(self) -> str:
+        """整理后的文本（每个块一行，去除空行）"""
+        lines = (line.strip() for line in "".join(self.parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+def extract_text(html: str, max_chars: Optional[int] = None, drop_boilerplate: bool = True) -> str:
+    """从 HTML 字符串中提取正文"""
+    parser = HTMLTextExtractor(max_chars, drop_boilerplate)
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        if parser.done:
+            break
+    return parser.get_text()
+
+
+def extract_text_from_file(
+    path: Union[str, Path],
+    max_chars: Optional[int] = None,
+    drop_boilerplate: bool = True,
+    encoding: str = "utf-8"
+) -> str:
+    """分块读取 HTML 文件并提取正文，达到字符预算后不再读取（压缩存储的文件流式解压）"""
+    parser = HTMLTextExtractor(max_chars, drop_boilerplate)
+    with open_artifact(path, "r", encoding=encoding, errors="ignore") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), ""):
+            parser.feed(chunk)
+            if parser.done:
+                break
+    return parser.get_text()
+
+
+async def extract_text_from_file_async(path: Union[str, Path], max_chars: Optional[int] = None) -> str:
+    """异步提取 HTML 文件正文（大文件在进程池中解析，小文件在线程中解析）"""
+    path = Path(path)
+    if artifact_size(path) > PROCESS_POOL_THRESHOLD:
+        return await run_in_process(extract_text_from_file, str(path), max_chars)
+    return await asyncio.to_thread(extract_text_from_file, path, max_chars)
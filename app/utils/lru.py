@@ -0,0 +1,32 @@
+"""
+有界 LRU 字典
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUDict(OrderedDict):
+    """超过容量时淘汰最久未访问条目的字典"""
+
+    def __init__(self, maxsize: int = 128, *args, **kwargs):
+        self.maxsize = maxsize
+        super().__init__(*args, **kwargs)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        if key in self:
+            self.move_to_end(key)
+        super().__setitem__(key, value)
+        while self.maxsize > 0 and len(self) > self.maxsize:
+            oldest = next(iter(self))
+            super().__delitem__(oldest)
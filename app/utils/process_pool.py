@@ -0,0 +1,42 @@
+"""
+共享进程池
+CPU 密集的同步任务（图片解码、缩放、编码等）在独立进程中执行，避免阻塞事件循环
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from app.core.logger import get_logger
+
+
+logger = get_logger("utils.process_pool")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取全局进程池（首次使用时创建）"""
+    global _executor
+    if _executor is None:
+        from app.config.settings import get_settings
+        workers = max(1, get_settings().model.image_process_workers)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        logger.info(f"创建进程池, 进程数: {workers}")
+    return _executor
+
+
+async def run_in_process(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在进程池中执行同步函数（函数与参数须可序列化）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), partial(func, *args, **kwargs))
+
+
+def shutdown_process_pool() -> None:
+    """关闭全局进程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        logger.info("进程池已关闭")
@@ -42,9 +42,31 @@ export const historyService = {
     return await apiGet(`/api/v1/history/${taskId}`)
   },
 
-  // 生成AI总结
+  // 获取近似重复的历史任务分组
+  async getDuplicateTasks(platform) {
+    const query = platform ? `?platform=${encodeURIComponent(platform)}` : ''
+    return await apiGet(`/api/v1/history/duplicates${query}`)
+  },
+
+  // 提交AI总结作业，立即返回 job_id（同一任务进行中的作业会被复用）
   async generateAISummary(taskId) {
-    return await apiPost(`/api/v1/history/${taskId}/ai-summary`)
+    return await apiPost(`/api/v1/history/${taskId}/ai-summary?async=true`)
+  },
+
+  // 查询AI总结作业状态
+  async getAISummaryJob(jobId) {
+    return await apiGet(`/api/v1/history/ai-summary/jobs/${jobId}`)
+  },
+
+  // 订阅AI总结作业进度（SSE），返回 EventSource，调用方负责关闭
+  streamAISummaryJob(jobId) {
+    return new EventSource(`/api/v1/history/ai-summary/jobs/${jobId}/events`)
+  },
+
+  // 流式生成AI总结（SSE）：提交作业后订阅其进度，返回 EventSource，调用方负责关闭
+  async streamAISummary(taskId) {
+    const { job_id } = await this.generateAISummary(taskId)
+    return this.streamAISummaryJob(job_id)
   },
 
   // 获取AI总结
@@ -25,6 +25,23 @@ from app.scheduler.task_scheduler import TaskScheduler
 console = Console()
 
 
+def run_async(coro):
+    """在新事件循环中运行协程，退出前关闭模型客户端的HTTP会话和进程池"""
+    from app.core.model_client import close_model_client
+    from app.utils.process_pool import shutdown_process_pool
+    
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_model_client()
+    
+    try:
+        return asyncio.run(runner())
+    finally:
+        shutdown_process_pool()
+
+
 @click.group()
 @click.option('--debug/--no-debug', default=False, help='启用调试模式')
 @click.option('--config', '-c', default='configs/settings.yaml', help='配置文件路径')
@@ -72,6 +89,10 @@ def scheduler():
     console.print("⏰ 启动任务调度器", style="green bold")
     
     async def run_scheduler():
+        from app.core.task_manager import TaskManager
+        
+        task_manager = TaskManager()
+        await task_manager.start(recover=get_settings().scheduler.resume_on_startup)
         scheduler = TaskScheduler()
         await scheduler.start()
         
@@ -79,36 +100,63 @@ def scheduler():
             # 保持调度器运行
             while True:
                 await asyncio.sleep(1)
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # Ctrl+C 时 asyncio.run 会取消主协程
             console.print("⏹️  正在停止调度器...", style="yellow")
             await scheduler.stop()
+            # 执行中的任务保存为中断状态，下次启动时继续
+            await task_manager.stop(wait=False)
     
-    asyncio.run(run_scheduler())
+    run_async(run_scheduler())
 
 
 @cli.command()
 @click.option('--platforms', '-p', multiple=True, help='指定平台')
 @click.option('--topic-id', help='指定命题ID')
-def run_once(platforms: tuple, topic_id: str):
+@click.option('--topic', 'topic_content', help='直接指定命题内容')
+@click.option('--title', help='命题标题')
+@click.option('--mode', type=click.Choice(['all', 'first']), default='all', help='all: 收集全部平台结果; first: 第一个成功结果胜出')
+@click.option('--deadline', type=float, help='每个平台的截止时间(秒)')
+@click.option('--download-dir', help='下载根目录，每个平台写入其子目录')
+def run_once(platforms: tuple, topic_id: str, topic_content: str, title: str, mode: str, deadline: float, download_dir: str):
     """运行单次任务"""
     console.print("▶️  执行单次任务", style="blue bold")
     
     async def execute_task():
         from app.core.task_manager import TaskManager
+        from app.core.fanout_orchestrator import FanoutMode
         
         task_manager = TaskManager()
         
-        if topic_id:
-            # 执行指定命题
-            results = await task_manager.execute_topic(
-                topic_id=topic_id,
-                platforms=list(platforms) if platforms else None
-            )
-        else:
-            # 执行所有待处理的命题
-            results = await task_manager.execute_pending_tasks(
-                platforms=list(platforms) if platforms else None
-            )
+        def on_result(outcome):
+            status = "✅" if outcome.success else "❌"
+            console.print(f"{status} {outcome.platform}: {outcome.status} ({outcome.elapsed:.1f}秒)")
+        
+        options = dict(
+            platforms=list(platforms) if platforms else None,
+            mode=FanoutMode(mode),
+            deadline=deadline,
+            on_result=on_result,
+            download_root=Path(download_dir) if download_dir else None
+        )
+        
+        try:
+            if topic_content:
+                # 直接执行命令行指定的命题
+                topic = await task_manager.topic_manager.create_topic(
+                    title=title or topic_content[:30],
+                    content=topic_content,
+                    platforms=list(platforms) if platforms else None
+                )
+                results = await task_manager.execute_topic(topic, **options)
+            elif topic_id:
+                # 执行指定命题
+                results = await task_manager.execute_topic(topic_id=topic_id, **options)
+            else:
+                # 执行所有待处理的命题
+                results = await task_manager.execute_pending_tasks(**options)
+        finally:
+            await task_manager.stop()
         
         # 显示结果
         table = Table(title="任务执行结果")
@@ -126,7 +174,7 @@ def run_once(platforms: tuple, topic_id: str):
         
         console.print(table)
     
-    asyncio.run(execute_task())
+    run_async(execute_task())
 
 
 @cli.command()
@@ -152,7 +200,7 @@ def add_topic(content: str, title: str, platforms: tuple, priority: int):
         
         console.print(f"✅ 命题已创建，ID: {topic.id}", style="green")
     
-    asyncio.run(create_topic())
+    run_async(create_topic())
 
 
 @cli.command()
@@ -182,7 +230,7 @@ def status():
         
         console.print(table)
     
-    asyncio.run(show_status())
+    run_async(show_status())
 
 
 @cli.command()
@@ -209,7 +257,7 @@ def export(output_format: str, output: str, start_date: str, end_date: str):
         
         console.print(f"✅ 数据已导出到: {file_path}", style="green")
     
-    asyncio.run(export_data())
+    run_async(export_data())
 
 
 @cli.command()
@@ -225,7 +273,7 @@ def init():
         
         console.print("✅ 项目初始化完成", style="green")
     
-    asyncio.run(initialize())
+    run_async(initialize())
 
 
 @cli.command()
@@ -267,7 +315,7 @@ def test_connection(platform: str):
         
         console.print(table)
     
-    asyncio.run(test_platforms())
+    run_async(test_platforms())
 
 
 @cli.command()
@@ -332,7 +380,7 @@ def manus_task(topic: str, title: str, download_dir: str, debug_port: int):
             except:
                 pass
     
-    asyncio.run(run_manus_task())
+    run_async(run_manus_task())
 
 
 @cli.command()
@@ -397,7 +445,7 @@ def skywork_task(topic: str, title: str, download_dir: str, debug_port: int):
             except:
                 pass
     
-    asyncio.run(run_skywork_task())
+    run_async(run_skywork_task())
 
 
 @cli.command()
@@ -473,7 +521,7 @@ def enhanced_skywork_task(topic: str, title: str, download_dir: str, debug_port:
             except:
                 pass
     
-    asyncio.run(run_enhanced_skywork_task())
+    run_async(run_enhanced_skywork_task())
 
 
 @cli.command()
@@ -549,7 +597,7 @@ def enhanced_manus_task(topic: str, title: str, download_dir: str, debug_port: i
             except:
                 pass
     
-    asyncio.run(run_enhanced_manus_task())
+    run_async(run_enhanced_manus_task())
 
 
 @cli.command()
@@ -643,7 +691,7 @@ def analyze_page(platform: str, debug_port: int):
             except:
                 pass
     
-    asyncio.run(run_page_analysis())
+    run_async(run_page_analysis())
 
 
 @cli.command()
@@ -771,7 +819,7 @@ def download_history(platform: str, download_dir: str, debug_port: int, preview_
             except:
                 pass
     
-    asyncio.run(run_history_download())
+    run_async(run_history_download())
 
 
 @cli.command()
@@ -839,7 +887,7 @@ def list_history(platform: str, debug_port: int):
             except:
                 pass
     
-    asyncio.run(run_list_history())
+    run_async(run_list_history())
 
 
 @cli.command()
@@ -969,7 +1017,7 @@ def download_multi_history(download_dir: str, skywork_port: int, manus_port: int
             except:
                 pass
     
-    asyncio.run(run_multi_download())
+    run_async(run_multi_download())
 
 
 @cli.command()
@@ -1061,7 +1109,7 @@ def list_multi_history(skywork_port: int, manus_port: int):
             except:
                 pass
     
-    asyncio.run(run_list_multi_history())
+    run_async(run_list_multi_history())
 
 
 @cli.command()
@@ -1075,6 +1123,7 @@ def download_coze_history(download_dir: str, debug_port: int, preview_only: bool
     async def run_coze_download():
         try:
             from app.platforms.coze_space_platform import CozeSpacePlatform
+            from app.storage.task_layout import get_task_layout, normalize_metadata
             from pathlib import Path
             
             # 创建扣子空间平台实例
@@ -1176,8 +1225,8 @@ def download_coze_history(download_dir: str, debug_port: int, preview_only: bool
                     console.print(f"📄 下载任务 {i+1}/{len(tasks)}: {task['title'][:50]}...", style="cyan")
                     
                     # 创建任务目录
-                    task_dir = download_path / f"task_{task['id']}"
-                    task_dir.mkdir(exist_ok=True)
+                    task_dir = get_task_layout().task_dir("coze_space", task['id'])
+                    task_dir.mkdir(parents=True, exist_ok=True)
                     
                     # 尝试点击任务获取详细内容
                     if 'element' in task:
@@ -1216,7 +1265,7 @@ def download_coze_history(download_dir: str, debug_port: int, preview_only: bool
                     }
                     
                     with open(task_dir / "metadata.json", 'w', encoding='utf-8') as f:
-                        json.dump(metadata, f, ensure_ascii=False, indent=2)
+                        json.dump(normalize_metadata(metadata, task['id'], "coze_space"), f, ensure_ascii=False, indent=2)
                     
                     # 截图
                     try:
@@ -1235,7 +1284,7 @@ def download_coze_history(download_dir: str, debug_port: int, preview_only: bool
             console.print(f"\n📊 下载完成:", style="bold green")
             console.print(f"✅ 成功: {downloaded_count} 个任务")
             console.print(f"❌ 失败: {failed_count} 个任务")
-            console.print(f"📁 保存位置: {download_path.absolute()}")
+            console.print(f"📁 保存位置: {get_task_layout().write_root.absolute()}")
             
             await browser.close()
             
@@ -1297,8 +1346,187 @@ def download_coze_history(download_dir: str, debug_port: int, preview_only: bool
         
         return tasks
     
-    asyncio.run(run_coze_download())
+    run_async(run_coze_download())
+
+
+
+@cli.command()
+@click.option('--workers', '-w', type=int, help='并发处理的任务数')
+@click.option('--force', is_flag=True, help='重新生成所有任务的总结')
+@click.option('--limit', type=int, help='最多处理的任务数')
+def backfill_summaries(workers: int, force: bool, limit: int):
+    """为缺少或已过期AI总结的历史任务批量生成总结（可中断后继续）"""
+    console.print("🧠 AI总结批量补全", style="blue bold")
+    
+    async def run_backfill():
+        from app.config.settings import get_settings
+        from app.core.summary_backfill import get_summary_backfill
+        
+        backfill = get_summary_backfill()
+        progress = await backfill.start(
+            workers=workers or get_settings().model.summary_backfill_workers,
+            force=force,
+            limit=limit
+        )
+        if not progress["total"]:
+            console.print("✅ 所有任务均已有最新总结", style="green")
+            return
+        
+        console.print(f"📋 待处理任务: {progress['total']} 个, 并发: {progress['workers']}")
+        with console.status("[bold blue]正在生成总结...") as status_line:
+            while backfill.running:
+                await asyncio.sleep(1)
+                progress = backfill.get_progress()
+                status_line.update(
+                    f"[bold blue]正在生成总结... {progress['processed']}/{progress['total']} "
+                    f"(成功 {progress['succeeded']}, 失败 {progress['failed']})"
+                )
+        
+        progress = await backfill.wait()
+        console.print(
+            f"✅ 补全完成: 成功 {progress['succeeded']}, 失败 {progress['failed']}, "
+            f"跳过 {progress['skipped']}, 耗时 {progress['elapsed']:.1f}秒",
+            style="green"
+        )
+        for error in progress["recent_errors"]:
+            console.print(f"   ❌ {error['task']}: {error['error']}", style="red")
+    
+    run_async(run_backfill())
 
 
+@cli.command()
+@click.option('--ingest', is_flag=True, help='先将已下载任务中的产物写入内容寻址存储')
+def blob_gc(ingest: bool):
+    """清理内容寻址存储中不再被任务引用的 blob"""
+    from app.core.summary_backfill import find_task_dirs
+    from app.storage.blob_store import get_blob_store
+    
+    blob_store = get_blob_store()
+    
+    if ingest:
+        task_dirs = find_task_dirs()
+        stored = 0
+        with console.status("[bold blue]正在写入内容寻址存储...") as status_line:
+            for index, task_dir in enumerate(task_dirs, 1):
+                stored += sum(1 for digest in blob_store.ingest_tree(task_dir).values() if digest)
+                status_line.update(f"[bold blue]正在写入内容寻址存储... {index}/{len(task_dirs)}")
+        console.print(f"📦 {len(task_dirs)} 个任务, 写入 {stored} 个文件")
+    
+    result = blob_store.gc(verify=True)
+    stats = blob_store.get_statistics()
+    console.print(f"🧹 删除 {result['removed']} 个 blob, 释放 {result['freed_bytes'] / 1024 / 1024:.1f} MB", style="green")
+    console.print(
+        f"📊 blob {stats['blobs']} 个 ({stats['stored_bytes'] / 1024 / 1024:.1f} MB), "
+        f"引用 {stats['references']} 个, 去重节省 {stats['saved_bytes'] / 1024 / 1024:.1f} MB"
+    )
+
+
+@cli.command()
+@click.option('--days', type=int, help='归档超过多少天未修改的任务（默认取配置）')
+@click.option('--dry-run', is_flag=True, help='仅列出将被归档的任务')
+def archive_tasks(days: int, dry_run: bool):
+    """将长期未修改的任务目录按月打包归档"""
+    from app.core.summary_backfill import find_task_dirs
+    from app.storage.pack_archive import get_pack_archive
+    
+    archive = get_pack_archive()
+    days = days if days is not None else get_settings().storage.archive_after_days
+    task_dirs = find_task_dirs()
+    
+    if dry_run:
+        cold = archive.find_cold_tasks(task_dirs, days)
+        for task_dir in cold:
+            console.print(f"   📁 {task_dir}")
+        console.print(f"📋 {len(cold)}/{len(task_dirs)} 个任务超过 {days} 天未修改")
+        return
+    
+    with console.status(f"[bold blue]正在归档超过 {days} 天未修改的任务..."):
+        result = archive.archive_cold_tasks(task_dirs, days)
+    stats = archive.get_statistics()
+    console.print(
+        f"📦 归档 {result['packed']} 个任务, {result['files']} 个文件 ({result['bytes'] / 1024 / 1024:.1f} MB)"
+        + (f", 失败 {result['failed']} 个" if result['failed'] else ""),
+        style="green"
+    )
+    console.print(
+        f"📊 打包文件 {stats['packs']} 个 ({stats['pack_bytes'] / 1024 / 1024:.1f} MB), "
+        f"已归档任务 {stats['tasks']} 个"
+    )
+
+
+@cli.command()
+@click.argument('task_id')
+def rehydrate_task(task_id: str):
+    """将已归档的任务还原为任务目录"""
+    from app.storage.pack_archive import get_pack_archive
+    
+    archive = get_pack_archive()
+    packed = archive.find(task_id)
+    if packed is None:
+        console.print(f"❌ 未找到已归档的任务: {task_id}", style="red")
+        return
+    
+    task_dir = archive.rehydrate(packed)
+    console.print(f"✅ 任务已还原: {task_dir}", style="green")
+
+
+@cli.command()
+@click.option('--workers', '-w', default=8, help='并行迁移的线程数')
+@click.option('--dry-run', is_flag=True, help='仅列出迁移计划')
+def migrate_layout(workers: int, dry_run: bool):
+    """将旧版下载目录中的任务迁移到 <平台>/<分片>/<任务ID> 布局"""
+    from app.storage.task_layout import LayoutMigrator
+    
+    migrator = LayoutMigrator()
+    with console.status("[bold blue]正在迁移任务目录..."):
+        report = migrator.migrate(workers=workers, dry_run=dry_run)
+    
+    if dry_run:
+        for source, target in report.migrated:
+            console.print(f"   📁 {source} -> {target}")
+    for source, target in report.conflicts:
+        console.print(f"   ⚠️ 冲突，保留原目录: {source} (目标 {target})", style="yellow")
+    for source, error in report.failed:
+        console.print(f"   ❌ {source}: {error}", style="red")
+    
+    console.print(
+        f"{'📋 计划' if dry_run else '✅ 已'}迁移 {len(report.migrated)} 个任务, "
+        f"冲突 {len(report.conflicts)} 个, 失败 {len(report.failed)} 个"
+        + (f", 更新归档任务位置 {report.relocated_packs} 个" if report.relocated_packs else ""),
+        style="green"
+    )
+    if not dry_run and not report.failed:
+        console.print("💡 确认无误后可从配置 storage.legacy_task_roots 中移除旧版下载目录")
+
+
+@cli.command()
+@click.option('--dry-run', is_flag=True, help='仅列出将被清理的文件')
+def apply_retention(dry_run: bool):
+    """按保留策略清理临时文件、过期产物和重复下载的任务"""
+    from app.storage.retention import get_retention_engine, get_usage_index
+    
+    with console.status("[bold blue]正在执行保留策略..."):
+        report = get_retention_engine().apply(dry_run=dry_run)
+    
+    for action in report.actions if dry_run else []:
+        candidate = action.candidate
+        console.print(f"   🗑️ [{action.reason}] {candidate.path} ({candidate.size / 1024:.1f} KB)")
+    summary = report.to_dict()
+    console.print(
+        f"{'📋 将清理' if dry_run else '🧹 已清理'} {summary['removed']} 项, "
+        f"释放 {summary['freed_bytes'] / 1024 / 1024:.1f} MB"
+        + (f", 失败 {summary['failed']} 项" if summary['failed'] else ""),
+        style="green"
+    )
+    
+    table = Table(title="任务磁盘用量")
+    table.add_column("平台", style="cyan")
+    table.add_column("任务数", justify="right")
+    table.add_column("文件数", justify="right")
+    table.add_column("大小(MB)", justify="right")
+    for platform, usage in sorted(get_usage_index().get_statistics()["platforms"].items()):
+        table.add_row(platform or "unknown", str(usage["tasks"]), str(usage["files"]), f"{usage['bytes'] / 1024 / 1024:.1f}")
+    console.print(table)
+
 if __name__ == "__main__":
     cli() 
\ No newline at end of file
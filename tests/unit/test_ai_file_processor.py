@@ -0,0 +1,105 @@
+"""
+AI文件处理器测试
+"""
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core.ai_file_processor import AIFileProcessor, FileAnalysisResult
+
+
+def make_analysis(file_path, tokens: int) -> FileAnalysisResult:
+    return FileAnalysisResult(
+        file_path=str(file_path),
+        file_type="text",
+        analysis_success=True,
+        summary=file_path.name,
+        key_points=[],
+        content_type="文本",
+        importance_score=0.5,
+        ai_preview="",
+        ai_usage={"prompt_tokens": tokens, "completion_tokens": 0, "total_tokens": tokens}
+    )
+
+
+class TestAIFileProcessor:
+    """AI文件处理器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_files_analyzed_concurrently(self, tmp_path, monkeypatch):
+        """测试文件并发分析、结果按文件名排序、单个失败不影响其他文件"""
+        for name in ["e.txt", "d.txt", "c.txt", "b.txt", "a.txt"]:
+            (tmp_path / name).write_text(name, encoding="utf-8")
+
+        processor = AIFileProcessor()
+        monkeypatch.setattr(processor, "_file_concurrency", lambda: 5)
+        delays = {"a.txt": 0.15, "b.txt": 0.05, "c.txt": 0.08, "d.txt": 0.1, "e.txt": 0.1}
+
+        async def analyze_single_file(file_path):
+            await asyncio.sleep(delays[file_path.name])
+            if file_path.name == "c.txt":
+                raise RuntimeError("模型不可用")
+            return make_analysis(file_path, tokens=len(file_path.name) * 10)
+
+        async def generate_overall(task_title, file_analyses, total_usage):
+            return {"summary": "整体", "insights": [], "completion": "完成", "quality_score": 0.8, "recommendations": []}
+
+        monkeypatch.setattr(processor, "analyze_single_file", analyze_single_file)
+        monkeypatch.setattr(processor, "_generate_overall_analysis", generate_overall)
+
+        events = []
+        start = time.monotonic()
+        async for event in processor.stream_task_analysis(tmp_path, "测试", stream_overall=False):
+            events.append(event)
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 0.3
+        assert [event["data"]["filename"] for event in events[:2]] == ["b.txt", "c.txt"]
+
+        result = events[-1]["data"]
+        assert [analysis.summary for analysis in result.file_analyses][:2] == ["a.txt", "b.txt"]
+        assert not result.file_analyses[2].analysis_success
+        assert result.total_ai_usage["total_tokens"] == 4 * 50
+        assert result.analysis_success
+
+    @pytest.mark.asyncio
+    async def test_unchanged_files_reuse_cached_analysis(self, tmp_path, monkeypatch):
+        """测试重新分析时只分析新增或内容变化的文件"""
+        (tmp_path / "content.txt").write_text("第一版正文内容", encoding="utf-8")
+        (tmp_path / "notes.md").write_text("独立的补充笔记", encoding="utf-8")
+
+        processor = AIFileProcessor()
+        analyzed = []
+
+        async def analyze_single_file(file_path):
+            analyzed.append(file_path.name)
+            return make_analysis(file_path, tokens=100)
+
+        async def generate_overall(task_title, file_analyses, total_usage):
+            return {"summary": "整体", "insights": [], "completion": "完成", "quality_score": 0.8, "recommendations": []}
+
+        monkeypatch.setattr(processor, "analyze_single_file", analyze_single_file)
+        monkeypatch.setattr(processor, "_generate_overall_analysis", generate_overall)
+
+        first = await processor.analyze_task_files(tmp_path, "测试")
+        assert sorted(analyzed) == ["content.txt", "notes.md"]
+        assert first.total_ai_usage["total_tokens"] == 200
+        assert (tmp_path / "ai_file_analyses.json").exists()
+
+        (tmp_path / "content.txt").write_text("第二版正文内容", encoding="utf-8")
+        analyzed.clear()
+        second = await processor.analyze_task_files(tmp_path, "测试")
+
+        assert analyzed == ["content.txt"]
+        assert [analysis.cached for analysis in second.file_analyses] == [False, True]
+        assert second.total_ai_usage["total_tokens"] == 100
+        assert "ai_file_analyses.json" not in [Path(a.file_path).name for a in second.file_analyses]
+
+        # 切换模型后不复用其他模型的分析结果
+        monkeypatch.setattr(processor, "_analysis_model", lambda: "other/model")
+        analyzed.clear()
+        third = await processor.analyze_task_files(tmp_path, "测试")
+        assert sorted(analyzed) == ["content.txt", "notes.md"]
+        assert not any(analysis.cached for analysis in third.file_analyses)
@@ -0,0 +1,91 @@
+"""
+内容寻址存储测试
+"""
+import os
+import shutil
+
+from app.storage.blob_store import BlobStore
+from app.storage.database import Database
+
+
+def make_store(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'agenthub.db'}")
+    return BlobStore(root=tmp_path / "blobs", database=database, min_size=1), database
+
+
+def make_task(root, name, html, screenshot=b"\x89PNG same screenshot"):
+    task_dir = root / name
+    task_dir.mkdir(parents=True)
+    (task_dir / "page.html").write_text(html, encoding="utf-8")
+    (task_dir / "screenshot.png").write_bytes(screenshot)
+    (task_dir / "metadata.json").write_text("{}", encoding="utf-8")
+    return task_dir
+
+
+class TestBlobStore:
+    """内容寻址存储测试"""
+
+    def test_dedup_across_sessions(self, tmp_path):
+        """不同下载会话中相同的文件共享同一个 blob"""
+        store, database = make_store(tmp_path)
+        first = make_task(tmp_path / "session_1", "task_1", "<p>same</p>")
+        second = make_task(tmp_path / "session_2", "task_1", "<p>same</p>")
+
+        store.ingest_tree(first)
+        store.ingest_tree(second)
+
+        assert os.path.samefile(first / "page.html", second / "page.html")
+        assert (second / "page.html").read_text(encoding="utf-8") == "<p>same</p>"
+        assert not os.path.samefile(first / "metadata.json", second / "metadata.json")
+        statistics = store.get_statistics()
+        assert statistics["blobs"] == 2
+        assert statistics["references"] == 4
+        assert statistics["saved_bytes"] == statistics["stored_bytes"]
+        database.close()
+
+    def test_ingest_is_idempotent(self, tmp_path):
+        """重复存入同一文件不增加引用计数"""
+        store, database = make_store(tmp_path)
+        task_dir = make_task(tmp_path, "task_1", "<p>a</p>")
+
+        digest = store.ingest(task_dir / "page.html")
+        assert store.ingest(task_dir / "page.html") == digest
+
+        row = database.fetchone("SELECT refcount FROM blobs WHERE digest = ?", (digest,))
+        assert row["refcount"] == 1
+        # 任务文件与 blob 共用 inode，存入后权限保持不变
+        assert (task_dir / "page.html").stat().st_mode & 0o200
+        database.close()
+
+    def test_release_and_gc(self, tmp_path):
+        """删除任务后递减引用计数，只清理不再被引用的 blob"""
+        store, database = make_store(tmp_path)
+        first = make_task(tmp_path / "session_1", "task_1", "<p>old</p>")
+        second = make_task(tmp_path / "session_2", "task_1", "<p>new</p>")
+        store.ingest_tree(first)
+        store.ingest_tree(second)
+        old_blob = store.blob_path(store.ingest(first / "page.html"))
+        shared_blob = store.blob_path(store.ingest(first / "screenshot.png"))
+
+        released = store.release_tree(first)
+        shutil.rmtree(first)
+        result = store.gc(released)
+
+        assert result["removed"] == 1
+        assert not old_blob.exists()
+        assert shared_blob.exists()
+        assert (second / "screenshot.png").read_bytes() == b"\x89PNG same screenshot"
+        database.close()
+
+    def test_gc_verify_prunes_missing_files(self, tmp_path):
+        """任务目录在存储之外被删除时，verify 会释放失效的引用"""
+        store, database = make_store(tmp_path)
+        task_dir = make_task(tmp_path, "task_1", "<p>a</p>")
+        store.ingest_tree(task_dir)
+
+        shutil.rmtree(task_dir)
+
+        assert store.gc()["removed"] == 0
+        assert store.gc(verify=True)["removed"] == 2
+        assert store.get_statistics()["blobs"] == 0
+        database.close()
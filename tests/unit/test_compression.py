@@ -0,0 +1,83 @@
+"""
+产物压缩存储测试
+"""
+import gzip
+
+import app.storage.compression as compression
+from app.storage.compression import (
+    accepts_encoding, compress_artifact, iter_artifact_bytes, logical_path, open_artifact,
+    read_artifact_text, remove_artifact, resolve_artifact
+)
+from app.utils.html_text import extract_text_from_file
+
+
+HTML = "<html><body><nav>菜单</nav><p>" + "新能源汽车市场保持高速增长。" * 500 + "</p></body></html>"
+
+
+class TestCompressArtifact:
+    """写入时压缩测试"""
+
+    def test_gzip_round_trip(self, tmp_path):
+        """压缩后原文件被替换，按原文件名透明读取"""
+        page = tmp_path / "page.html"
+        page.write_text(HTML, encoding="utf-8")
+
+        stored = compress_artifact(page, codec="gzip", min_size=0, force=True)
+
+        assert stored == tmp_path / "page.html.gz"
+        assert not page.exists()
+        assert stored.stat().st_size < len(HTML.encode("utf-8"))
+        assert resolve_artifact(page) == stored
+        assert logical_path(stored) == page
+        assert read_artifact_text(page) == HTML
+        assert b"".join(iter_artifact_bytes(page)) == HTML.encode("utf-8")
+        assert extract_text_from_file(page).startswith("新能源汽车市场")
+
+    def test_skips_small_binary_and_disabled(self, tmp_path):
+        """小文件、非文本文件以及未启用压缩时保持原样"""
+        small = tmp_path / "content.txt"
+        small.write_text("短内容", encoding="utf-8")
+        image = tmp_path / "screenshot.png"
+        image.write_bytes(b"\x89PNG" * 2000)
+        page = tmp_path / "page.html"
+        page.write_text(HTML, encoding="utf-8")
+
+        assert compress_artifact(small, min_size=4096, force=True) == small
+        assert compress_artifact(image, min_size=0, force=True) == image
+        assert compress_artifact(page, min_size=0) == page
+        with open_artifact(small, "r") as f:
+            assert f.read() == "短内容"
+
+    def test_falls_back_to_gzip(self, tmp_path, monkeypatch):
+        """未安装 zstandard 时使用 gzip"""
+        monkeypatch.setattr(compression, "zstd_available", lambda: False)
+        page = tmp_path / "page.html"
+        page.write_text(HTML, encoding="utf-8")
+
+        stored = compress_artifact(page, codec="zstd", min_size=0, force=True)
+
+        assert stored.name == "page.html.gz"
+        with gzip.open(stored, "rt", encoding="utf-8") as f:
+            assert f.read() == HTML
+
+    def test_remove_artifact(self, tmp_path):
+        """重新写入前删除旧的压缩文件"""
+        page = tmp_path / "page.html"
+        page.write_text(HTML, encoding="utf-8")
+        compress_artifact(page, codec="gzip", min_size=0, force=True)
+
+        remove_artifact(page)
+
+        assert resolve_artifact(page) is None
+
+
+class TestAcceptsEncoding:
+    """Accept-Encoding 协商测试"""
+
+    def test_accepts_encoding(self):
+        assert accepts_encoding("gzip, deflate, br", "gzip")
+        assert accepts_encoding("br, zstd", "zstd")
+        assert accepts_encoding("*", "zstd")
+        assert not accepts_encoding("gzip;q=0, br", "gzip")
+        assert not accepts_encoding("gzip", "zstd")
+        assert not accepts_encoding(None, "gzip")
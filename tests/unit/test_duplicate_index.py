@@ -0,0 +1,100 @@
+"""
+近似重复任务索引测试
+"""
+import pytest
+
+from app.core import duplicate_index
+from app.core.duplicate_index import DuplicateIndex, MinHasher, estimate_similarity, jaccard, shingles
+from app.storage.database import Database
+
+
+REPORT = "".join(f"第{index}部分：新能源汽车市场在过去一年保持高速增长，电池成本持续下降。" for index in range(30))
+OTHER_REPORT = "".join(f"第{index}节：量子计算硬件路线包括超导、离子阱与光量子，各有优劣。" for index in range(30))
+
+
+class TestMinHash:
+    """MinHash 签名测试"""
+
+    def test_estimate_close_to_jaccard(self):
+        """签名估算的相似度接近真实 Jaccard 相似度"""
+        a = shingles(REPORT, 5)
+        b = shingles(REPORT[:len(REPORT) * 3 // 4] + OTHER_REPORT[:len(OTHER_REPORT) // 4], 5)
+        hasher = MinHasher(num_perm=128)
+
+        estimate = estimate_similarity(hasher.signature(a), hasher.signature(b))
+
+        assert abs(estimate - jaccard(a, b)) < 0.15
+
+    def test_signature_is_stable(self):
+        """固定种子时签名在不同实例间一致"""
+        assert MinHasher().signature(shingles("任务标题", 3)) == MinHasher().signature(shingles("任务标题", 3))
+        assert MinHasher().signature(set()) is None
+
+    def test_numpy_matches_pure_python(self, monkeypatch):
+        """numpy 矩阵计算与逐个排列计算的签名一致"""
+        pytest.importorskip("numpy")
+        hashes = shingles(REPORT, 5)
+        vectorized = MinHasher().signature(hashes)
+
+        monkeypatch.setattr(duplicate_index, "numpy", None)
+
+        assert MinHasher().signature(hashes) == vectorized
+
+
+class TestDuplicateIndex:
+    """近似重复索引测试"""
+
+    def test_content_duplicates_cluster(self):
+        """正文几乎相同的任务归为一组，标题不同也能识别"""
+        index = DuplicateIndex()
+        index.add("a", "新能源汽车市场分析", REPORT, group="manus")
+        index.add("b", "新能源汽车市场分析 一轮任务完成", REPORT + "补充一句。", group="manus")
+        index.add("c", "过去7天 新能源车调研", REPORT, group="manus")
+        index.add("d", "新能源汽车市场分析", OTHER_REPORT, group="manus")
+        index.add("e", "新能源汽车市场分析", REPORT, group="skywork")
+
+        assert index.clusters() == [["a", "b", "c"]]
+        duplicates = dict(index.duplicates_of("a"))
+        assert set(duplicates) == {"b", "c"}
+        assert duplicates["c"] == 1.0
+
+    def test_title_only_matching(self):
+        """没有正文时按标题判定"""
+        index = DuplicateIndex()
+        index.add("1", "分析2024年全球半导体供应链风险")
+        index.add("2", "帮我写一首关于秋天的诗")
+
+        matches = index.query("分析2024年全球半导体供应链风险...", title_threshold=0.6)
+
+        assert [key for key, _ in matches] == ["1"]
+
+    def test_incremental_update_and_remove(self):
+        """更新和删除任务后索引保持一致"""
+        index = DuplicateIndex()
+        index.add("a", "标题", REPORT, version=1)
+        index.add("b", "标题", REPORT, version=1)
+        assert index.is_current("a", 1) and not index.is_current("a", 2)
+
+        index.add("b", "标题", OTHER_REPORT, version=2)
+        assert index.clusters() == []
+
+        index.remove("a")
+        assert "a" not in index and len(index) == 1
+        assert index.query("标题", REPORT) == []
+
+    def test_signatures_persisted(self, tmp_path):
+        """签名保存到数据库，新实例直接加载，无需重新计算"""
+        database = Database(f"sqlite:///{tmp_path / 'agenthub.db'}")
+        index = DuplicateIndex(database=database)
+        index.add("a", "标题", REPORT, group="manus", version=("标题", 1))
+        index.add("b", "标题", REPORT + "补充。", group="manus", version=("标题", 2))
+        index.add("c", "其他", OTHER_REPORT, group="manus", version=("其他", 3))
+        index.remove("c")
+
+        reloaded = DuplicateIndex(database=database)
+
+        assert len(reloaded) == 2
+        assert reloaded.is_current("a", ("标题", 1)) and not reloaded.is_current("a", ("标题", 9))
+        assert reloaded.clusters() == [["a", "b"]]
+        assert reloaded._documents["a"] == index._documents["a"]
+        database.close()
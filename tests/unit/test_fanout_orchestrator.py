@@ -0,0 +1,97 @@
+"""
+多平台编排器测试
+"""
+import asyncio
+
+import pytest
+
+from app.core.fanout_orchestrator import FanoutMode, FanoutOrchestrator
+from app.core.task_executor import TaskExecutor
+from app.core.platform_capabilities import CapabilityManager
+from app.core.task_processor import TaskProcessor, TaskRequest, TaskResult, TaskStatus
+from app.core.topic_manager import Topic
+
+
+class FakeProcessor(TaskProcessor):
+    """按平台设定耗时和结果的模拟处理器"""
+
+    def __init__(self, plan):
+        super().__init__()
+        self.capability_manager = CapabilityManager()
+        self.plan = plan
+        self.cancelled = []
+
+    async def process_task(self, request: TaskRequest, task_id=None) -> TaskResult:
+        delay, success = self.plan[request.platform]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(request.platform)
+            raise
+        return TaskResult(
+            request=request,
+            task_id=f"{request.platform}_task",
+            status=TaskStatus.COMPLETED if success else TaskStatus.FAILED,
+            platform=request.platform,
+            content=f"{request.platform} 结果"
+        )
+
+
+TOPIC = Topic(id="topic_1", title="测试", content="测试命题")
+
+
+class TestFanoutOrchestrator:
+    """编排器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_stream_in_completion_order(self):
+        """测试按完成顺序产出结果"""
+        processor = FakeProcessor({"manus": (0.1, True), "skywork": (0.02, True), "coze_space": (0.05, False)})
+        orchestrator = FanoutOrchestrator(processor)
+
+        platforms = [outcome.platform async for outcome in orchestrator.stream(TOPIC, ["manus", "skywork", "coze_space"])]
+
+        assert platforms == ["skywork", "coze_space", "manus"]
+
+    @pytest.mark.asyncio
+    async def test_first_success_cancels_rest(self):
+        """测试第一个成功结果胜出并取消其余平台"""
+        processor = FakeProcessor({"manus": (1, True), "skywork": (0.05, False), "coze_space": (0.1, True)})
+        orchestrator = FanoutOrchestrator(processor)
+
+        result = await orchestrator.run(TOPIC, ["manus", "skywork", "coze_space"], mode=FanoutMode.FIRST_SUCCESS)
+
+        assert result.winner == "coze_space"
+        assert processor.cancelled == ["manus"]
+        statuses = {outcome.platform: outcome.status for outcome in result.outcomes}
+        assert statuses == {"skywork": "failed", "coze_space": "completed", "manus": "cancelled"}
+
+    @pytest.mark.asyncio
+    async def test_all_with_deadline(self):
+        """测试收集全部结果并应用平台截止时间，超时记入能力指标"""
+        processor = FakeProcessor({"manus": (1, True), "skywork": (0.01, True)})
+        orchestrator = FanoutOrchestrator(processor)
+
+        result = await orchestrator.run(TOPIC, ["manus", "skywork"], deadline=0.1)
+
+        statuses = {outcome.platform: outcome.status for outcome in result.outcomes}
+        assert statuses == {"manus": "timeout", "skywork": "completed"}
+
+        manus_metrics = processor.capability_manager.get_platform_capabilities("manus").task_submission.metrics
+        assert manus_metrics.error_count == 1
+
+    @pytest.mark.asyncio
+    async def test_runs_through_executor(self):
+        """测试绑定执行器时分支经执行器排队，胜出后其余执行被取消"""
+        processor = FakeProcessor({"manus": (1, True), "skywork": (0.02, True)})
+        executor = TaskExecutor(processor, max_workers=2, platform_limits={"manus": 1, "skywork": 1})
+        orchestrator = FanoutOrchestrator(executor=executor)
+        await executor.start()
+
+        result = await orchestrator.run(TOPIC, ["manus", "skywork"], mode=FanoutMode.FIRST_SUCCESS)
+        await executor.stop()
+
+        assert result.winner == "skywork"
+        assert processor.cancelled == ["manus"]
+        stats = executor.get_statistics()
+        assert stats["finished"] == 1 and stats["cancelled"] == 1
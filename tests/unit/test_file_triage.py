@@ -0,0 +1,57 @@
+"""
+任务文件分诊测试
+"""
+import json
+
+from app.core.file_triage import FileTriage, TriageAction
+
+
+REPORT = "\n\n".join(f"第{index}段：研究表明该方向在{index}年取得了显著进展。" * 5 for index in range(40))
+
+
+def make_task_dir(tmp_path):
+    (tmp_path / "content.txt").write_text(
+        "任务标题: 测试\n任务URL: https://x\n" + "=" * 60 + "\n\n" + REPORT, encoding="utf-8"
+    )
+    html_body = "".join(f"<p>{paragraph}</p>" for paragraph in REPORT.split("\n\n"))
+    (tmp_path / "page.html").write_text(
+        f"<html><head><style>p {{}}</style><script>var a = 1;</script></head><body>{html_body}</body></html>",
+        encoding="utf-8"
+    )
+    (tmp_path / "metadata.json").write_text(json.dumps({"task": {"title": "测试"}}), encoding="utf-8")
+    (tmp_path / "ai_summary.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "download_report.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "notes.md").write_text("# 补充说明\n\n另一份独立的笔记内容。", encoding="utf-8")
+    (tmp_path / "notes_copy.md").write_text("# 补充说明\n\n另一份独立的笔记内容。", encoding="utf-8")
+    (tmp_path / "empty.txt").write_text("", encoding="utf-8")
+    return [path for path in tmp_path.iterdir()]
+
+
+class TestFileTriage:
+    """文件分诊测试类"""
+
+    def test_skip_generated_and_redundant_files(self, tmp_path):
+        """测试跳过系统生成、空文件、内容相同以及与正文重复的HTML"""
+        result = FileTriage().triage(make_task_dir(tmp_path))
+
+        assert [d.path.name for d in result.analyze] == ["content.txt", "notes.md"]
+        assert [d.path.name for d in result.local] == ["metadata.json"]
+
+        reasons = {item["filename"]: item["reason"] for item in result.skipped_files()}
+        assert set(reasons) == {"ai_summary.json", "download_report.json", "empty.txt", "notes_copy.md", "page.html"}
+        assert "notes.md" in reasons["notes_copy.md"]
+        assert "包含" in reasons["page.html"]
+
+    def test_token_budget_keeps_highest_priority(self, tmp_path):
+        """测试token预算：优先级最高的文件总会保留，超出预算的文件被跳过"""
+        files = make_task_dir(tmp_path)
+        (tmp_path / "chart.json").write_text(json.dumps({"values": [1, 2, 3]}), encoding="utf-8")
+        files.append(tmp_path / "chart.json")
+
+        result = FileTriage(token_budget=100).triage(files)
+
+        assert [d.path.name for d in result.analyze] == ["content.txt"]
+        assert result.estimated_tokens > 100
+        budget_skipped = [d for d in result.skipped if "预算" in d.reason]
+        assert {d.path.name for d in budget_skipped} == {"notes.md", "chart.json"}
+        assert all(d.action == TriageAction.SKIP for d in budget_skipped)
@@ -0,0 +1,86 @@
+"""
+HTML 正文提取测试
+"""
+import pytest
+
+from app.utils.html_text import HTMLTextExtractor, extract_text, extract_text_from_file, extract_text_from_file_async
+
+
+PAGE = """
+<html>
+<head><title>报告</title><style>body { color: red; }</style><script>var secret = 1;</script></head>
+<body>
+<nav><a href="/">首页</a><a href="/about">关于</a></nav>
+<header>站点页眉</header>
+<main>
+<h1>研究结论</h1>
+<p>第一段&amp;内容，
+   包含换行。</p>
+<div role="navigation">侧边菜单</div>
+<p>第二段<br>续行<img src="a.png"></p>
+<div hidden>隐藏内容</div>
+<svg><text>图形文字</text></svg>
+</main>
+<footer>版权所有</footer>
+</body>
+</html>
+"""
+
+
+class TestHTMLTextExtractor:
+    """HTML 正文提取测试"""
+
+    def test_drops_invisible_and_boilerplate(self):
+        """只丢弃脚本、样式、导航和页脚，页眉等其他容器保留"""
+        text = extract_text(PAGE)
+
+        assert text.split("\n") == [
+            "报告", "站点页眉", "研究结论", "第一段&内容， 包含换行。", "侧边菜单", "第二段", "续行", "隐藏内容", "图形文字"
+        ]
+
+    def test_keeps_boilerplate_when_disabled(self):
+        """关闭样板过滤时保留导航文本，但仍丢弃脚本"""
+        text = extract_text(PAGE, drop_boilerplate=False)
+
+        assert "首页" in text and "版权所有" in text
+        assert "secret" not in text and "color" not in text
+
+    def test_stops_at_budget(self):
+        """达到字符预算后停止解析"""
+        html = "<p>" + "内容" * 100 + "</p>" * 10000
+        parser = HTMLTextExtractor(max_chars=50)
+        parser.feed(html)
+
+        assert parser.done
+        assert len(extract_text(html, max_chars=50)) <= 50
+        assert extract_text(html, max_chars=50).startswith("内容内容")
+
+    def test_unbalanced_tags(self):
+        """未闭合或多余的结束标签不影响后续文本"""
+        text = extract_text("<div><nav><span>菜单</nav></span><p>正文</p></div>")
+
+        assert text == "正文"
+
+    def test_unclosed_boilerplate_ends_with_parent(self):
+        """未闭合的导航在父元素结束时结束，不会吞掉后续文档"""
+        text = extract_text("<body><div><nav>菜单<ul><li>一<li>二</div><p>正文一</p><p>正文二</body>")
+
+        assert text.split("\n") == ["正文一", "正文二"]
+        assert extract_text("<p>开头<footer>页脚<p>未闭合到结尾") == "开头"
+
+    def test_file_streaming(self, tmp_path):
+        """分块读取文件，结果与字符串解析一致"""
+        html = "<body>" + "".join(f"<p>段落{index}</p>" for index in range(20000)) + "</body>"
+        path = tmp_path / "page.html"
+        path.write_text(html, encoding="utf-8")
+
+        assert extract_text_from_file(path) == extract_text(html)
+        assert extract_text_from_file(path, max_chars=100) == extract_text(html, max_chars=100)
+
+    @pytest.mark.asyncio
+    async def test_file_async(self, tmp_path):
+        """异步接口返回相同结果"""
+        path = tmp_path / "page.html"
+        path.write_text(PAGE, encoding="utf-8")
+
+        assert await extract_text_from_file_async(path, max_chars=20) == extract_text(PAGE, max_chars=20)
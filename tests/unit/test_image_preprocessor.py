@@ -0,0 +1,91 @@
+"""
+图片预处理测试
+"""
+import base64
+import importlib.util
+
+import pytest
+
+from app.core.image_preprocessor import ImageOptions, ImagePreprocessor, plan_tiles, prepare_image_sync
+from app.core.model_client import GeminiClient, ModelMessage
+
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+
+class TestImagePreprocessor:
+    """图片预处理测试类"""
+
+    def test_plan_tiles(self):
+        """测试宽度缩放、长截图切片以及超出段数上限时整体缩小"""
+        assert plan_tiles(1000, 800, 2048, 6) == (1000, 800, 800, 1)
+        assert plan_tiles(4096, 2000, 2048, 6) == (2048, 1000, 1000, 1)
+
+        width, height, tile_height, count = plan_tiles(1280, 9000, 2048, 6)
+        assert (width, count) == (1280, 5)
+        assert tile_height <= 2048 and tile_height * count >= height
+
+        width, height, tile_height, count = plan_tiles(1280, 60000, 2048, 6)
+        assert count == 6 and height <= 2048 * 6 and width < 1280
+
+    @pytest.mark.asyncio
+    async def test_passthrough_keeps_mime_type(self, tmp_path):
+        """测试未启用预处理时原样上传并按扩展名标注 MIME 类型"""
+        image_path = tmp_path / "photo.jpg"
+        image_path.write_bytes(b"fake-jpeg")
+        preprocessor = ImagePreprocessor(cache_dir=str(tmp_path / "cache"), enabled=False)
+
+        segments = await preprocessor.prepare(image_path)
+
+        assert len(segments) == 1
+        assert segments[0].data_url == "data:image/jpeg;base64," + base64.b64encode(b"fake-jpeg").decode()
+        assert preprocessor.get_statistics()["images"] == 1
+
+    @pytest.mark.skipif(not PILLOW_AVAILABLE, reason="未安装 Pillow")
+    def test_tall_screenshot_tiled_and_cached(self, tmp_path):
+        """测试长截图缩放切片、重新编码并按文件哈希缓存"""
+        from PIL import Image
+
+        image_path = tmp_path / "screenshot.png"
+        Image.new("RGBA", (1600, 6000), (30, 60, 90, 255)).save(image_path)
+        options = ImageOptions(max_dimension=1000, max_tiles=6, format="jpeg")
+
+        prepared = prepare_image_sync(str(image_path), options, str(tmp_path / "cache"))
+        assert len(prepared.segments) == 4
+        assert all(segment.mime_type == "image/jpeg" and segment.width == 1000 for segment in prepared.segments)
+        assert not prepared.cached
+
+        again = prepare_image_sync(str(image_path), options, str(tmp_path / "cache"))
+        assert again.cached and [s.data for s in again.segments] == [s.data for s in prepared.segments]
+
+    def test_cache_eviction(self, tmp_path):
+        """测试缓存按最久未使用淘汰，清单和切片一起删除，过期条目被清理"""
+        import os
+        import time
+
+        cache_dir = tmp_path / "cache" / "ab"
+        cache_dir.mkdir(parents=True)
+        now = time.time()
+        for name, age in (("old", 3000), ("expired", 10 ** 6), ("recent", 10)):
+            (cache_dir / f"{name}-key.json").write_bytes(b"m" * 10)
+            (cache_dir / f"{name}-key-0.webp").write_bytes(b"t" * 90)
+            os.utime(cache_dir / f"{name}-key.json", (now - age, now - age))
+        (cache_dir / "orphan-key-0.webp").write_bytes(b"t" * 50)
+        os.utime(cache_dir / "orphan-key-0.webp", (now - 5000, now - 5000))
+
+        preprocessor = ImagePreprocessor(cache_dir=str(tmp_path / "cache"), max_cache_bytes=200, cache_ttl=10 ** 5)
+        remaining = preprocessor._evict_cache()
+
+        assert sorted(path.name for path in cache_dir.iterdir()) == ["recent-key-0.webp", "recent-key.json"]
+        assert remaining == 100
+        assert preprocessor.get_statistics()["cache_evictions"] == 3
+
+
+def test_gemini_uses_data_url_mime_type():
+    """测试 Gemini 请求使用 data URL 中的 MIME 类型"""
+    client = GeminiClient({"api_key": "test"})
+    contents = client._build_gemini_contents([ModelMessage(role="user", content=[
+        {"type": "text", "text": "描述"},
+        {"type": "image_url", "image_url": {"url": "data:image/webp;base64,AAAA"}}
+    ])])
+    assert contents[0]["parts"][1]["inline_data"]["mime_type"] == "image/webp"
@@ -0,0 +1,204 @@
+"""
+模型客户端测试
+"""
+import pytest
+
+from app.core.model_cache import ModelResponseCache, make_cache_key
+from app.core.model_client import (
+    BaseModelClient,
+    DeepSeekClient,
+    GeminiClient,
+    ModelClientManager,
+    ModelMessage,
+    ModelResponse
+)
+
+
+class TestModelClientSessions:
+    """HTTP会话池测试类"""
+
+    @pytest.mark.asyncio
+    async def test_session_reused_per_provider(self):
+        """测试同一提供商复用会话，关闭后重建"""
+        manager = ModelClientManager()
+
+        session = await manager.get_session("gemini")
+        assert await manager.get_session("gemini") is session
+        assert await manager.get_session("deepseek") is not session
+        assert session.connector.limit == manager.settings.model.http_pool_limit
+
+        await manager.close()
+        assert session.closed
+
+        new_session = await manager.get_session("gemini")
+        assert new_session is not session
+        await manager.close()
+
+
+class FakeClient(BaseModelClient):
+    """记录调用次数的模拟客户端"""
+
+    def __init__(self):
+        super().__init__({})
+        self.model = "fake-model"
+        self.calls = 0
+
+    async def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        return ModelResponse(
+            content=f"回答{self.calls}",
+            usage={"total_tokens": 10},
+            model=self.model,
+            provider="fake"
+        )
+
+
+class TestModelResponseCache:
+    """响应缓存测试类"""
+
+    def test_key_normalization(self):
+        """测试缓存键忽略首尾空白、区分生成参数"""
+        key = make_cache_key("gemini", "m", [{"role": "user", "content": "你好 "}], {"temperature": 0.7})
+        assert key == make_cache_key("Gemini", "m", [ModelMessage("user", "你好")], {"temperature": 0.7})
+        assert key != make_cache_key("gemini", "m", [{"role": "user", "content": "你好"}], {"temperature": 0.2})
+
+    def test_disk_tier_ttl_and_eviction(self, tmp_path):
+        """测试磁盘层命中、过期和容量淘汰"""
+        cache = ModelResponseCache(cache_dir=str(tmp_path), memory_entries=1, max_disk_bytes=10_000)
+        cache.put("a" * 64, {"content": "x", "usage": {"total_tokens": 5}})
+        cache.ttl = -1
+        cache.put("b" * 64, {"content": "y", "usage": {}})
+
+        assert cache.get("a" * 64)["content"] == "x"
+        assert cache.stats["disk_hits"] == 1
+        assert cache.stats["saved_tokens"] == 5
+        assert cache.get("b" * 64) is None
+        assert not (tmp_path / "bb" / f"{'b' * 64}.json").exists()
+
+        cache.ttl = 3600
+        cache.max_disk_bytes = 200
+        for index in range(5):
+            cache.put(f"{index}" * 64, {"content": "z" * 50, "usage": {}})
+        assert cache.stats["evictions"] > 0
+        assert cache.get_statistics()["disk_bytes"] <= 200
+
+    @pytest.mark.asyncio
+    async def test_manager_serves_repeated_requests_from_cache(self, tmp_path):
+        """测试管理器对重复请求返回缓存响应"""
+        manager = ModelClientManager()
+        manager.cache = ModelResponseCache(cache_dir=str(tmp_path))
+        client = FakeClient()
+        manager._clients["fake"] = client
+
+        first = await manager.chat_completion([{"role": "user", "content": "总结"}], provider="fake")
+        second = await manager.chat_completion([{"role": "user", "content": "总结"}], provider="fake")
+        bypass = await manager.chat_completion([{"role": "user", "content": "总结"}], provider="fake", use_cache=False)
+
+        assert client.calls == 2
+        assert not first.cached and second.cached
+        assert second.content == first.content
+        assert bypass.content == "回答2"
+        assert manager.get_cache_statistics()["hits"] == 1
+
+
+class FakeStreamResponse:
+    """模拟SSE响应"""
+
+    def __init__(self, lines):
+        self.status = 200
+        self.content = self._iter(lines)
+
+    async def _iter(self, lines):
+        for line in lines:
+            yield line.encode("utf-8")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeStreamSession:
+    """记录请求体的模拟会话"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.request = None
+
+    def post(self, url, **kwargs):
+        self.request = {"url": url, **kwargs}
+        return FakeStreamResponse(self.lines)
+
+
+class TestStreaming:
+    """流式调用测试类"""
+
+    @pytest.mark.asyncio
+    async def test_deepseek_sse_parsing(self):
+        """测试DeepSeek SSE增量解析"""
+        session = FakeStreamSession([
+            'data: {"choices": [{"delta": {"role": "assistant"}}]}\n',
+            '\n',
+            'data: {"choices": [{"delta": {"content": "你"}}]}\n',
+            'data: {"choices": [{"delta": {"content": "好"}}]}\n',
+            'data: {"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}}\n',
+            'data: [DONE]\n'
+        ])
+
+        async def session_factory():
+            return session
+
+        client = DeepSeekClient({"api_key": "k"}, session_factory)
+        usages = []
+        deltas = [
+            delta async for delta in client.stream_chat_completion([ModelMessage("user", "hi")], on_usage=usages.append)
+        ]
+
+        assert deltas == ["你", "好"]
+        assert usages == [{"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}]
+        assert session.request["json"]["stream"] is True
+        assert session.request["json"]["stream_options"] == {"include_usage": True}
+
+    @pytest.mark.asyncio
+    async def test_gemini_sse_parsing(self):
+        """测试Gemini streamGenerateContent 解析"""
+        session = FakeStreamSession([
+            'data: {"candidates": [{"content": {"parts": [{"text": "第一段"}]}}]}\n',
+            'data: {"candidates": [{"content": {"parts": [{"text": "第二段"}]}, "finishReason": "STOP"}], '
+            '"usageMetadata": {"promptTokenCount": 4, "candidatesTokenCount": 6, "totalTokenCount": 10}}\n'
+        ])
+
+        async def session_factory():
+            return session
+
+        client = GeminiClient({"api_key": "k", "model": "m"}, session_factory)
+        usages = []
+        deltas = [
+            delta async for delta in client.stream_chat_completion([ModelMessage("user", "hi")], on_usage=usages.append)
+        ]
+
+        assert deltas == ["第一段", "第二段"]
+        assert usages == [{"prompt_tokens": 4, "completion_tokens": 6, "total_tokens": 10}]
+        assert session.request["url"].endswith(":streamGenerateContent?alt=sse")
+
+    @pytest.mark.asyncio
+    async def test_manager_stream_is_cached(self, tmp_path):
+        """测试管理器流式结果写入缓存，再次请求直接返回完整内容"""
+        manager = ModelClientManager()
+        manager.cache = ModelResponseCache(cache_dir=str(tmp_path))
+        client = FakeClient()
+        manager._clients["fake"] = client
+
+        usages = []
+        first = [delta async for delta in manager.stream_chat_completion(
+            [{"role": "user", "content": "总结"}], provider="fake", on_usage=usages.append
+        )]
+        second = [delta async for delta in manager.stream_chat_completion(
+            [{"role": "user", "content": "总结"}], provider="fake", on_usage=usages.append
+        )]
+
+        assert first == second == ["回答1"]
+        assert client.calls == 1
+        # 实际用量转发给调用方并随结果缓存，缓存命中不再计入用量
+        assert usages == [{"total_tokens": 10}]
@@ -0,0 +1,147 @@
+"""
+模型提供商故障转移与对冲请求测试
+"""
+import asyncio
+
+import pytest
+
+from app.core.model_cache import ModelResponseCache
+from app.core.model_client import BaseModelClient, ModelClientError, ModelClientManager, ModelResponse
+from app.core.model_failover import HedgePolicy, LatencyHistogram, ProviderFailover
+
+
+class DelayedClient(BaseModelClient):
+    """按指定延迟返回或失败的模拟客户端"""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        super().__init__({})
+        self.model = name
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return ModelResponse(content=self.name, usage={"total_tokens": 1}, model=self.model, provider=self.name)
+
+
+def make_manager(tmp_path, clients, policy: HedgePolicy) -> ModelClientManager:
+    manager = ModelClientManager()
+    manager.cache = ModelResponseCache(cache_dir=str(tmp_path))
+    manager.failover = ProviderFailover(policy)
+    for client in clients:
+        manager._clients[client.name] = client
+    manager.get_failover_providers = lambda require_images=False: [client.name for client in clients]
+    return manager
+
+
+class TestLatencyHistogram:
+    """延迟直方图测试类"""
+
+    def test_percentile(self):
+        """测试分位数估算返回所在桶上界"""
+        histogram = LatencyHistogram()
+        assert histogram.percentile(0.95) is None
+
+        for _ in range(95):
+            histogram.observe(0.1)
+        for _ in range(5):
+            histogram.observe(5.0)
+
+        assert 0.1 <= histogram.percentile(0.5) < 0.13
+        assert 0.1 <= histogram.percentile(0.95) < 0.13
+        assert 5.0 <= histogram.percentile(0.99) < 6.3
+
+    def test_hedge_delay(self):
+        """测试样本不足时使用默认延迟，且不低于下限"""
+        policy = HedgePolicy(min_delay=1.0, default_delay=10.0, min_samples=3)
+        histogram = LatencyHistogram()
+        histogram.observe(0.1)
+        assert policy.delay_for(histogram) == 10.0
+
+        histogram.observe(0.1)
+        histogram.observe(0.1)
+        assert policy.delay_for(histogram) == 1.0
+        assert HedgePolicy(enabled=False).delay_for(histogram) is None
+
+
+class TestProviderFailover:
+    """故障转移测试类"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_fast_provider_wins(self, tmp_path):
+        """测试主提供商过慢时对冲请求先返回，慢请求被取消"""
+        slow, fast = DelayedClient("slow", delay=5.0), DelayedClient("fast", delay=0.01)
+        manager = make_manager(tmp_path, [slow, fast], HedgePolicy(default_delay=0.05))
+
+        response = await manager.chat_completion([{"role": "user", "content": "总结"}])
+
+        assert response.content == "fast"
+        assert slow.cancelled
+        stats = manager.get_failover_statistics()
+        assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+        assert stats["latency"]["fast"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failover_on_error(self, tmp_path):
+        """测试主提供商失败时切换到下一个提供商"""
+        broken = DelayedClient("broken", error=ModelClientError("400", http_status=400))
+        backup = DelayedClient("backup")
+        manager = make_manager(tmp_path, [broken, backup], HedgePolicy(default_delay=5.0))
+
+        response = await manager.chat_completion([{"role": "user", "content": "总结"}])
+
+        assert response.content == "backup"
+        assert manager.get_failover_statistics()["failovers"] == 1
+
+        with pytest.raises(ModelClientError):
+            await manager.chat_completion([{"role": "user", "content": "总结"}], provider="broken")
+        assert backup.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_all_providers_fail(self):
+        """测试所有提供商失败时抛出最后一个错误"""
+        failover = ProviderFailover(HedgePolicy(default_delay=5.0))
+
+        async def call(provider, on_sent, retry):
+            on_sent()
+            raise ModelClientError(provider)
+
+        with pytest.raises(ModelClientError, match="b"):
+            await failover.run(["a", "b"], call)
+        assert failover.get_statistics()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hedge_clock_starts_when_sent(self):
+        """测试主请求排队（限流、退避）期间不计入对冲延迟，只有最后一个提供商允许重试"""
+        failover = ProviderFailover(HedgePolicy(default_delay=0.05))
+        calls = []
+
+        async def call(provider, on_sent, retry):
+            calls.append((provider, retry))
+            await asyncio.sleep(0.1)  # 等待并发槽位
+            on_sent()
+            await asyncio.sleep(0.02)
+            return provider
+
+        assert await failover.run(["a", "b"], call) == "a"
+        assert calls == [("a", False)]
+        assert failover.get_statistics()["hedged"] == 0
+
+        async def stuck(provider, on_sent, retry):
+            calls.append((provider, retry))
+            on_sent()
+            await asyncio.sleep(0 if provider == "b" else 5)
+            return provider
+
+        assert await failover.run(["a", "b"], stuck) == "b"
+        assert calls[-1] == ("b", True)
@@ -0,0 +1,131 @@
+"""
+模型调用限流与重试测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.model_client import ModelClientError, ModelRateLimitError, ModelResponse, parse_retry_after
+from app.core.model_rate_limiter import ProviderRateLimiter, RetryPolicy, TokenBucket
+
+
+def make_response(tokens: int = 10) -> ModelResponse:
+    return ModelResponse(content="ok", usage={"total_tokens": tokens}, model="m", provider="fake")
+
+
+class TestProviderRateLimiter:
+    """提供商限流器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_retries_retryable_errors(self):
+        """测试可重试错误按退避重试，429 遵循 Retry-After"""
+        limiter = ProviderRateLimiter("fake", retry_policy=RetryPolicy(max_retries=3, base_delay=0.01))
+        errors = [ModelClientError("503", retryable=True, http_status=503), ModelRateLimitError("fake", retry_after=0.05)]
+
+        async def call():
+            if errors:
+                raise errors.pop(0)
+            return make_response()
+
+        start = time.monotonic()
+        result = await limiter.execute(call)
+
+        assert result.content == "ok"
+        assert time.monotonic() - start >= 0.05
+        stats = limiter.get_statistics()
+        assert stats["retries"] == 2
+        assert stats["rate_limited"] == 1
+        assert stats["succeeded"] == 1
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_error_fails_fast(self):
+        """测试不可重试错误立即失败，重试耗尽后失败"""
+        limiter = ProviderRateLimiter("fake", retry_policy=RetryPolicy(max_retries=1, base_delay=0.01))
+        calls = []
+
+        async def bad_request():
+            calls.append(1)
+            raise ModelClientError("400", http_status=400)
+
+        with pytest.raises(ModelClientError):
+            await limiter.execute(bad_request)
+        assert len(calls) == 1
+
+        async def unavailable():
+            calls.append(1)
+            raise asyncio.TimeoutError()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await limiter.execute(unavailable)
+        assert len(calls) == 3
+        assert limiter.get_statistics()["failed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_and_queue_wait(self):
+        """测试并发上限与排队等待统计"""
+        limiter = ProviderRateLimiter("fake", max_concurrency=2)
+        active = []
+        peak = []
+
+        async def call():
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.02)
+            active.pop()
+            return make_response()
+
+        await asyncio.gather(*(limiter.execute(call) for _ in range(6)))
+
+        assert max(peak) == 2
+        assert limiter.get_statistics()["max_queue_wait"] >= 0.03
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_waits_for_budget(self):
+        """测试 token 预算不足时等待补充，并按实际用量结算"""
+        bucket = TokenBucket(tokens_per_minute=6000)  # 每秒补充 100
+        await bucket.acquire(6000)
+
+        start = time.monotonic()
+        await bucket.acquire(5)
+        assert time.monotonic() - start >= 0.04
+
+        bucket.settle(reserved=100, actual=10)
+        assert bucket.available >= 90
+
+    @pytest.mark.asyncio
+    async def test_cancel_releases_tokens_and_no_retry(self):
+        """测试请求被取消时归还预留 token，retry=False 时不在限流器内重试"""
+        limiter = ProviderRateLimiter("fake", tokens_per_minute=6000)
+        sent = []
+
+        async def slow():
+            await asyncio.sleep(5)
+
+        task = asyncio.create_task(limiter.execute(slow, 3000, on_sent=lambda: sent.append(1)))
+        await asyncio.sleep(0.01)
+        assert sent == [1]
+        assert limiter.token_bucket.available < 3100
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert limiter.token_bucket.available >= 5999
+        assert limiter.get_statistics()["in_flight"] == 0
+
+        calls = []
+
+        async def unavailable():
+            calls.append(1)
+            raise ModelClientError("503", retryable=True, http_status=503)
+
+        with pytest.raises(ModelClientError):
+            await limiter.execute(unavailable, retry=False)
+        assert len(calls) == 1 and limiter.get_statistics()["retries"] == 0
+
+
+def test_parse_retry_after():
+    """测试解析 Retry-After 头"""
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("invalid") is None
@@ -0,0 +1,186 @@
+"""
+冷任务归档测试
+"""
+import os
+import tarfile
+import time
+
+import pytest
+
+from app.api.responses import FileRangeResponse
+from app.storage.blob_store import BlobStore
+from app.storage.database import Database
+from app.storage.pack_archive import PackArchive
+from app.storage.task_layout import detect_platform
+
+
+def make_archive(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'agenthub.db'}")
+    blob_store = BlobStore(root=tmp_path / "blobs", database=database, min_size=1)
+    return PackArchive(root=tmp_path / "packs", database=database, blob_store=blob_store), database
+
+
+def make_task(root, name, content, age_days=0):
+    task_dir = root / name
+    (task_dir / "files").mkdir(parents=True)
+    (task_dir / "content.txt").write_text(content, encoding="utf-8")
+    (task_dir / "metadata.json").write_text('{"download": {"platform": "manus"}}', encoding="utf-8")
+    (task_dir / "files" / "report.bin").write_bytes(os.urandom(1000))
+    timestamp = time.time() - age_days * 86400
+    for path in [*task_dir.rglob("*"), task_dir]:
+        os.utime(path, (timestamp, timestamp))
+    return task_dir
+
+
+class TestPackArchive:
+    """冷任务归档测试"""
+
+    def test_archive_cold_tasks(self, tmp_path):
+        """只归档超过天数未修改的任务，归档后原目录被删除"""
+        archive, database = make_archive(tmp_path)
+        cold = make_task(tmp_path / "downloads", "task_old", "旧任务内容", age_days=120)
+        hot = make_task(tmp_path / "downloads", "task_new", "新任务内容")
+
+        result = archive.archive_cold_tasks([cold, hot], older_than_days=90)
+
+        assert result["packed"] == 1 and result["files"] == 3
+        assert not cold.exists() and hot.exists()
+        packed = archive.find("old")
+        assert packed.platform == "manus"
+        assert set(packed.members) == {"content.txt", "metadata.json", "files/report.bin"}
+        assert archive.pack_path(packed.pack).name == time.strftime("%Y-%m", time.localtime(packed.modified_at)) + ".tar"
+        database.close()
+
+    def test_read_member_by_offset(self, tmp_path):
+        """按偏移读取同一打包文件中不同任务的文件"""
+        archive, database = make_archive(tmp_path)
+        first = make_task(tmp_path / "downloads", "task_1", "第一个任务" * 100, age_days=100)
+        second = make_task(tmp_path / "downloads", "task_2", "第二个任务", age_days=100)
+        report = (second / "files" / "report.bin").read_bytes()
+
+        archive.pack_task(first)
+        archive.pack_task(second)
+
+        packed = archive.find("2")
+        with archive.open_member(packed, "content.txt") as f:
+            assert f.read().decode("utf-8") == "第二个任务"
+        with archive.open_member(packed, "files/report.bin") as f:
+            assert f.read() == report
+        with archive.open_member(archive.find("1"), "content.txt") as f:
+            assert f.read().decode("utf-8") == "第一个任务" * 100
+        database.close()
+
+    def test_append_at_recorded_offset(self, tmp_path):
+        """追加从记录的包尾写入，打包文件仍是合法 tar；没有记录的旧打包文件扫描一次得到包尾"""
+        archive, database = make_archive(tmp_path)
+        tasks = [make_task(tmp_path / "downloads", f"task_{i}", f"任务{i}", age_days=100) for i in range(3)]
+
+        archive.pack_task(tasks[0])
+        pack_file = archive.pack_path(archive.find("0").pack)
+        database.execute("DELETE FROM packs")
+        archive.pack_task(tasks[1])
+        archive.pack_task(tasks[2])
+
+        end_offset = database.fetchone("SELECT end_offset FROM packs")["end_offset"]
+        assert pack_file.stat().st_size == end_offset + 2 * tarfile.BLOCKSIZE
+        with tarfile.open(pack_file) as tar:
+            names = tar.getnames()
+            assert len(names) == 9
+            assert tar.extractfile(names[-3]).read().decode("utf-8") == "任务2"
+        with archive.open_member(archive.find("0"), "content.txt") as f:
+            assert f.read().decode("utf-8") == "任务0"
+        database.close()
+
+    def test_rehydrate(self, tmp_path):
+        """还原后目录内容与归档前一致，索引被删除"""
+        archive, database = make_archive(tmp_path)
+        task_dir = make_task(tmp_path / "downloads", "task_1", "任务内容", age_days=100)
+        report = (task_dir / "files" / "report.bin").read_bytes()
+        packed = archive.pack_task(task_dir)
+
+        archive.rehydrate(packed)
+
+        assert (task_dir / "content.txt").read_text(encoding="utf-8") == "任务内容"
+        assert (task_dir / "files" / "report.bin").read_bytes() == report
+        assert archive.find("1") is None
+        assert archive.get_statistics()["tasks"] == 0
+        database.close()
+
+    def test_member_names_relative_to_task_root(self, tmp_path):
+        """包内成员名为 <平台>/<任务ID>/<文件>，不包含主机路径"""
+        archive, database = make_archive(tmp_path)
+        packed = archive.pack_task(make_task(tmp_path / "downloads", "task_1", "任务内容", age_days=100), "manus")
+
+        with tarfile.open(archive.pack_path(packed.pack)) as tar:
+            assert sorted(tar.getnames()) == ["manus/1/content.txt", "manus/1/files/report.bin", "manus/1/metadata.json"]
+        database.close()
+
+    def test_compact(self, tmp_path):
+        """引用数据过少的打包文件被重写，偏移更新后仍可读取；无引用的打包文件被删除"""
+        archive, database = make_archive(tmp_path)
+        tasks = [make_task(tmp_path / "downloads", f"task_{i}", f"任务{i}", age_days=100) for i in range(4)]
+        packed = [archive.pack_task(task_dir, "manus") for task_dir in tasks]
+        pack_file = archive.pack_path(packed[0].pack)
+        size = pack_file.stat().st_size
+        for task in packed[:3]:
+            archive.remove(task)
+
+        assert archive.compact(min_live_ratio=0.1) == {"compacted": 0, "removed": 0, "reclaimed_bytes": 0}
+        result = archive.compact(min_live_ratio=0.5)
+
+        assert result["compacted"] == 1 and result["reclaimed_bytes"] > 0
+        assert not pack_file.exists()
+        remaining = archive.find("3")
+        assert remaining.pack != packed[3].pack
+        assert archive.pack_path(remaining.pack).stat().st_size == size - result["reclaimed_bytes"]
+        with archive.open_member(remaining, "content.txt") as f:
+            assert f.read().decode("utf-8") == "任务3"
+        with tarfile.open(archive.pack_path(remaining.pack)) as tar:
+            assert len(tar.getnames()) == 3
+
+        # 之后同月份的任务写入新的打包文件
+        archive.pack_task(make_task(tmp_path / "downloads", "task_5", "任务5", age_days=100), "manus")
+        with archive.open_member(archive.find("5"), "content.txt") as f:
+            assert f.read().decode("utf-8") == "任务5"
+
+        archive.remove(archive.find("3"))
+        archive.remove(archive.find("5"))
+        assert archive.compact()["removed"] == 2
+        assert list((tmp_path / "packs").glob("*.tar")) == []
+        database.close()
+
+    def test_detect_platform_from_directory(self, tmp_path):
+        """元数据中没有平台时按下载目录名推断"""
+        task_dir = tmp_path / "coze_space_history_downloads" / "session_1" / "task_1"
+        task_dir.mkdir(parents=True)
+
+        assert detect_platform(task_dir) == "coze_space"
+
+
+class TestFileRangeResponse:
+    """按偏移返回文件区间测试"""
+
+    @pytest.mark.asyncio
+    async def test_chunked_and_zero_copy(self, tmp_path):
+        """服务器支持 zerocopysend 时交给服务器发送，否则分块读取"""
+        path = tmp_path / "pack.tar"
+        path.write_bytes(b"header" + b"x" * 100000 + b"trailer")
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        response = FileRangeResponse(path, offset=6, size=100000, filename="报告.txt")
+        await response({"type": "http"}, None, send)
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        headers = dict(messages[0]["headers"])
+        assert body == b"x" * 100000
+        assert headers[b"content-length"] == b"100000"
+        assert messages[-1]["more_body"] is False
+
+        messages.clear()
+        scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+        await FileRangeResponse(path, offset=6, size=100000)(scope, None, send)
+        assert messages[1]["type"] == "http.response.zerocopysend"
+        assert (messages[1]["offset"], messages[1]["count"]) == (6, 100000)
@@ -0,0 +1,131 @@
+"""
+页面状态监听器测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.page_status_watcher import PageStatusWatcher
+
+
+class FakePage:
+    """模拟页面，记录注入脚本并允许手动推送 DOM 状态"""
+
+    def __init__(self):
+        self.binding = None
+        self.listeners = {}
+
+    async def expose_binding(self, name, callback):
+        self.binding = callback
+
+    async def evaluate(self, script, arg=None):
+        return None
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+    def remove_listener(self, event, handler):
+        self.listeners.pop(event, None)
+
+    def push(self, watcher, **state):
+        self.binding(None, {"watcherId": watcher.watcher_id, "state": state})
+
+
+class FakeWebSocket:
+    """模拟 WebSocket"""
+
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+    def remove_listener(self, event, handler):
+        self.listeners.pop(event, None)
+
+
+def make_watcher(page):
+    return PageStatusWatcher(page, [".loading"], [".message"], [".error"], settle_time=0.1)
+
+
+class TestPageStatusWatcher:
+    """页面状态监听器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_completed_after_content_settles(self):
+        """测试内容稳定后判定完成"""
+        page = FakePage()
+        watcher = make_watcher(page)
+        await watcher.start()
+
+        async def drive():
+            page.push(watcher, status="running", reason="loading")
+            await asyncio.sleep(0.02)
+            page.push(watcher, status="content", length=120)
+            await asyncio.sleep(0.05)
+            page.push(watcher, status="content", length=300)
+
+        driver = asyncio.create_task(drive())
+        statuses = [event.status async for event in watcher.stream(timeout=2)]
+        await driver
+        await watcher.stop()
+
+        assert statuses == ["running", "completed"]
+        assert page.listeners == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_and_timeout(self):
+        """测试错误状态和超时"""
+        page = FakePage()
+        watcher = make_watcher(page)
+        await watcher.start()
+        page.push(watcher, status="failed", reason="error")
+        statuses = [event.status async for event in watcher.stream(timeout=2)]
+        assert statuses == ["failed"]
+        await watcher.stop()
+
+        idle_watcher = make_watcher(FakePage())
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in idle_watcher.stream(timeout=0.1):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_fallback_poll(self):
+        """测试无事件时的兜底轮询"""
+        watcher = make_watcher(FakePage())
+
+        async def fallback():
+            return "completed"
+
+        statuses = [
+            event.status
+            async for event in watcher.stream(timeout=2, fallback=fallback, fallback_interval=0.05)
+        ]
+        assert statuses == ["completed"]
+
+    @pytest.mark.asyncio
+    async def test_websocket_frames_delay_completion(self):
+        """测试 WebSocket 仍在收到帧时不判定完成"""
+        page = FakePage()
+        watcher = make_watcher(page)
+        await watcher.start()
+        websocket = FakeWebSocket()
+        page.listeners["websocket"](websocket)
+
+        async def drive():
+            page.push(watcher, status="content", length=120)
+            for _ in range(10):
+                await asyncio.sleep(0.03)
+                websocket.listeners["framereceived"]("delta")
+
+        started = time.monotonic()
+        driver = asyncio.create_task(drive())
+        statuses = [event.status async for event in watcher.stream(timeout=2)]
+        elapsed = time.monotonic() - started
+        await driver
+        await watcher.stop()
+
+        assert statuses == ["running", "completed"]
+        assert elapsed >= 0.3
+        assert websocket.listeners == {}
@@ -0,0 +1,152 @@
+"""
+平台能力指标与路由测试
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.platform_capabilities import (
+    CapabilityManager, CapabilityMetrics, CircuitState
+)
+
+
+CONFIG = {"capabilities": {"task_submission": True}}
+
+
+def make_manager(tmp_path=None) -> CapabilityManager:
+    manager = CapabilityManager(tmp_path / "metrics.json" if tmp_path else None)
+    for platform in ("manus", "skywork", "coze_space"):
+        manager.register_platform_capabilities(platform, CONFIG)
+    return manager
+
+
+class TestCapabilityMetrics:
+    """能力指标测试类"""
+
+    def test_percentiles_and_ewma(self):
+        """测试百分位数和 EWMA"""
+        metrics = CapabilityMetrics()
+        for elapsed in range(1, 21):
+            metrics.update(True, float(elapsed))
+        metrics.update(False, 500.0)
+
+        assert metrics.latency_percentile(50) == 10.0
+        assert metrics.latency_percentile(95) == 19.0
+        assert metrics.latency_percentile(99) == 20.0
+        assert metrics.recent_error_rate == pytest.approx(1 / 21)
+        # 失败不影响延迟 EWMA，只影响成功率 EWMA
+        assert 10 < metrics.ewma_latency < 20
+        assert metrics.ewma_success == pytest.approx(0.8)
+
+        for _ in range(CapabilityMetrics.WINDOW_SIZE):
+            metrics.update(True, 1.0)
+        assert len(metrics.recent) == CapabilityMetrics.WINDOW_SIZE
+        assert metrics.recent_error_rate == 0.0
+
+    def test_round_trip(self):
+        """测试序列化与恢复"""
+        metrics = CapabilityMetrics()
+        metrics.update(True, 3.0)
+        metrics.update(False, 1.0)
+
+        restored = CapabilityMetrics.from_dict(metrics.to_dict())
+        assert restored.to_dict() == metrics.to_dict()
+        assert restored.recent_error_rate == 0.5
+
+
+class TestCapabilityRouting:
+    """平台路由测试类"""
+
+    def test_select_fastest_platform(self):
+        """测试选择期望耗时最短的平台，未知平台优先探索"""
+        manager = make_manager()
+        for _ in range(3):
+            manager.record_metrics("manus", "task_submission", True, 60.0)
+            manager.record_metrics("skywork", "task_submission", True, 20.0)
+
+        assert manager.select_platform() == "coze_space"
+        assert manager.select_platform(candidates=["manus", "skywork"]) == "skywork"
+        assert manager.select_platform(exclude=["coze_space", "skywork"]) == "manus"
+
+    def test_circuit_breaker(self):
+        """测试近期错误率过高时熔断，冷却后半开探测"""
+        manager = make_manager()
+        for _ in range(5):
+            manager.record_metrics("skywork", "task_submission", False, 1.0)
+            manager.record_metrics("manus", "task_submission", True, 60.0)
+
+        breaker = manager.circuit_breakers[("skywork", "task_submission")]
+        assert breaker.state == CircuitState.OPEN
+        assert manager.select_platform(candidates=["manus", "skywork"]) == "manus"
+
+        breaker.opened_at -= breaker.cooldown
+        assert manager.select_platform(candidates=["skywork"]) == "skywork"
+        assert breaker.state == CircuitState.HALF_OPEN
+        # 半开状态只放行一次探测
+        assert manager.select_platform(candidates=["skywork"]) is None
+
+        manager.record_metrics("skywork", "task_submission", True, 5.0)
+        assert breaker.state == CircuitState.CLOSED
+        # 关闭后只统计新的执行，熔断前的失败不会让熔断器立即再次打开
+        manager.record_metrics("skywork", "task_submission", False, 1.0)
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_probe_released(self):
+        """测试探测任务未产生结果时释放探测名额，丢失的探测超时后重新放行"""
+        manager = make_manager()
+        for _ in range(5):
+            manager.record_metrics("skywork", "task_submission", False, 1.0)
+        breaker = manager.circuit_breakers[("skywork", "task_submission")]
+        breaker.opened_at -= breaker.cooldown
+
+        assert manager.select_platform(candidates=["skywork"]) == "skywork"
+        manager.release_probe("skywork")
+        assert manager.select_platform(candidates=["skywork"]) == "skywork"
+        assert manager.select_platform(candidates=["skywork"]) is None
+
+        breaker.probe_started_at -= breaker.cooldown
+        assert manager.select_platform(candidates=["skywork"]) == "skywork"
+
+    def test_failed_platform_ranked_last(self):
+        """只有失败记录的平台排在有成功记录的平台之后"""
+        manager = make_manager()
+        manager.record_metrics("manus", "task_submission", False, 1.0)
+        manager.record_metrics("skywork", "task_submission", True, 5.0)
+
+        assert manager.select_platform(candidates=["manus", "skywork"]) == "skywork"
+
+    def test_metrics_persisted(self, tmp_path):
+        """测试指标跨重启保留"""
+        manager = make_manager(tmp_path)
+        manager.record_metrics("manus", "task_submission", True, 12.0)
+        manager.record_metrics("manus", "task_submission", True, 12.0)
+        # 多次记录合并为一次延迟写入
+        assert not (tmp_path / "metrics.json").exists()
+        manager.flush_metrics()
+
+        restarted = make_manager(tmp_path)
+        metrics = restarted.get_platform_capabilities("manus").task_submission.metrics
+        assert metrics.total_attempts == 2
+        assert metrics.ewma_latency == pytest.approx(12.0)
+
+    @pytest.mark.asyncio
+    async def test_metrics_saved_from_event_loop(self, tmp_path):
+        """测试事件循环中延迟写入，写入失败时保留待保存标记"""
+        manager = make_manager(tmp_path)
+        manager.SAVE_DELAY = 0.01
+
+        def fail(data):
+            raise OSError("disk full")
+
+        manager._write_metrics = fail
+        manager.record_metrics("manus", "task_submission", True, 12.0)
+        await asyncio.sleep(0.05)
+        assert manager._dirty
+
+        del manager._write_metrics
+        manager.record_metrics("manus", "task_submission", True, 12.0)
+        await asyncio.sleep(0.05)
+        assert not manager._dirty
+        saved = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+        assert saved["manus"]["task_submission"]["total_attempts"] == 2
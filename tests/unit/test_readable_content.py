@@ -0,0 +1,111 @@
+"""
+页面正文提取测试
+"""
+from contextlib import asynccontextmanager
+
+import pytest
+from playwright.async_api import async_playwright
+
+from app.core.browser_engine import EnhancedBrowserEngine
+from app.core.readable_content import READABLE_CONTENT_SCRIPT, ReadableContent
+
+
+EXTRACTED = {
+    "title": "报告",
+    "url": "https://example.com/task/1",
+    "blocks": [
+        {"type": "heading", "level": 2, "text": "研究结论"},
+        {"type": "paragraph", "text": "第一段内容，包含足够长的正文。"},
+        {"type": "list_item", "text": "要点一"},
+        {"type": "code", "text": "print('hi')", "language": "python"},
+        {"type": "table", "rows": [["指标", "数值"], ["准确率", "95%"]]}
+    ],
+    "content_hash": "1a2b3c4d",
+    "text_length": 60,
+    "truncated": False,
+    "root": "div.answer",
+    "root_score": 42
+}
+
+
+PARAGRAPH = "这是一段足够长的正文内容，包含逗号，顿号、分号；用于让打分逻辑识别出正文所在的容器。"
+
+# 正文被拆成两个并列的回答块，侧边栏是大量长链接
+SPLIT_ANSWER_PAGE = f"""
+<html><head><title>任务报告</title></head><body>
+<nav><a href="/">首页</a><a href="/history">历史</a></nav>
+<div id="layout">
+  <div class="sidebar-list">
+    {"".join(f'<p><a href="/t/{i}">历史任务标题，足够长的链接文字，用于干扰正文容器的打分 {i}</a></p>' for i in range(8))}
+  </div>
+  <div id="thread">
+    <div class="markdown-body"><h2>第一部分</h2>{"".join(f"<p>{PARAGRAPH}A{i}</p>" for i in range(3))}</div>
+    <div class="markdown-body"><h2>第二部分</h2>{"".join(f"<p>{PARAGRAPH}B{i}</p>" for i in range(3))}</div>
+  </div>
+</div>
+<footer>版权所有</footer>
+</body></html>
+"""
+
+
+@asynccontextmanager
+async def open_page(html: str):
+    """在真实浏览器中打开页面，没有可用的 Chromium 时跳过"""
+    async with async_playwright() as playwright:
+        try:
+            browser = await playwright.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"无法启动 Chromium: {e}")
+        try:
+            page = await browser.new_page()
+            await page.set_content(html)
+            yield page
+        finally:
+            await browser.close()
+
+
+class TestReadableContent:
+    """页面正文提取测试"""
+
+    def test_to_markdown(self):
+        """结构化内容块渲染为 Markdown"""
+        readable = ReadableContent.from_dict(EXTRACTED)
+
+        assert readable.to_markdown().split("\n\n") == [
+            "## 研究结论",
+            "第一段内容，包含足够长的正文。",
+            "- 要点一",
+            "```python\nprint('hi')\n```",
+            "| 指标 | 数值 |\n|---|---|\n| 准确率 | 95% |"
+        ]
+        assert readable.content_hash == "1a2b3c4d"
+
+    def test_low_coverage(self):
+        """正文占页面可见文本比例过低时提示调用方回退"""
+        assert not ReadableContent.from_dict(EXTRACTED).low_coverage
+        assert ReadableContent.from_dict({**EXTRACTED, "coverage": 0.1}).low_coverage
+
+    @pytest.mark.asyncio
+    async def test_scoring_merges_sibling_blocks(self):
+        """真实 DOM 上打分：跳过链接密集的侧边栏，合并并列的正文块"""
+        async with open_page(SPLIT_ANSWER_PAGE) as page:
+            data = await page.evaluate(READABLE_CONTENT_SCRIPT, 0)
+
+        readable = ReadableContent.from_dict(data)
+        texts = [block.text for block in readable.blocks]
+        assert readable.root.startswith("div.markdown-body")
+        assert readable.merged_siblings == 1
+        assert texts[0] == "第一部分" and "第二部分" in texts
+        assert sum(1 for text in texts if text.startswith(PARAGRAPH)) == 6
+        assert not any("历史任务标题" in text or "版权所有" in text for text in texts)
+        assert not readable.low_coverage
+
+    @pytest.mark.asyncio
+    async def test_smart_extract_and_empty_page(self):
+        """智能提取返回正文 Markdown，没有正文时提取失败"""
+        async with open_page(SPLIT_ANSWER_PAGE) as page:
+            result = await EnhancedBrowserEngine(page).smart_extract_content()
+            assert result.success and result.result.startswith("## 第一部分")
+
+            await page.set_content("<html><body><div></div></body></html>")
+            assert not (await EnhancedBrowserEngine(page).extract_readable_content()).success
@@ -0,0 +1,166 @@
+"""
+数据保留策略测试
+"""
+import json
+import os
+import time
+
+import pytest
+
+from app.core.duplicate_index import DuplicateIndex
+from app.core.exceptions import ValidationError
+from app.storage.blob_store import BlobStore
+from app.storage.database import Database
+from app.storage.retention import RetentionEngine, RetentionPolicy, UsageIndex, artifact_type
+
+
+def make_task(root, name, task_id=None, page_url="", platform="manus", age_days=0, screenshot_size=2000):
+    task_dir = root / name
+    task_dir.mkdir(parents=True)
+    metadata = {
+        "task": {"id": task_id or name, "title": name},
+        "download": {"platform": platform, "page_url": page_url}
+    }
+    (task_dir / "metadata.json").write_text(json.dumps(metadata), encoding="utf-8")
+    (task_dir / "content.txt").write_text("内容", encoding="utf-8")
+    (task_dir / "screenshot.png").write_bytes(os.urandom(screenshot_size))
+    set_age(task_dir, age_days)
+    return task_dir
+
+
+def set_age(path, age_days):
+    timestamp = time.time() - age_days * 86400
+    for item in [*path.rglob("*"), path] if path.is_dir() else [path]:
+        os.utime(item, (timestamp, timestamp))
+
+
+def make_engine(tmp_path, policies):
+    database = Database(f"sqlite:///{tmp_path / 'agenthub.db'}")
+    blob_store = BlobStore(root=tmp_path / "blobs", database=database, min_size=1)
+    engine = RetentionEngine(
+        policies=[RetentionPolicy.from_dict(policy) for policy in policies],
+        temp_dir=tmp_path / "temp",
+        usage_index=UsageIndex(database),
+        blob_store=blob_store,
+        duplicate_index=DuplicateIndex(database=database)
+    )
+    return engine, database
+
+
+class TestUsageIndex:
+    """磁盘用量索引测试"""
+
+    def test_incremental_refresh(self, tmp_path):
+        """目录未变化时不重新统计，新增文件和删除目录后计数随之更新"""
+        database = Database(f"sqlite:///{tmp_path / 'agenthub.db'}")
+        index = UsageIndex(database)
+        task_dir = make_task(tmp_path / "tasks", "t1")
+
+        assert index.refresh([task_dir])["updated"] == 1
+        assert index.refresh([task_dir])["updated"] == 0
+        assert index.get(task_dir).types["screenshot"] == 2000
+
+        (task_dir / "report.pdf").write_bytes(b"x" * 500)
+        set_age(task_dir, -1)
+        assert index.refresh([task_dir])["updated"] == 1
+        stats = index.get_statistics()
+        assert stats["platforms"]["manus"]["types"]["download"] == 500
+        assert stats["tasks"] == 1 and stats["files"] == 4
+
+        # 原地改写文件（目录修改时间不变）也会重新统计
+        with open(task_dir / "report.pdf", "wb") as f:
+            f.write(b"x" * 800)
+        assert index.refresh([task_dir])["updated"] == 1
+        assert index.get(task_dir).types["download"] == 800
+
+        import shutil
+        shutil.rmtree(task_dir)
+        assert index.refresh([])["removed"] == 1
+        assert index.get_statistics()["tasks"] == 0
+        database.close()
+
+    def test_artifact_type(self):
+        """按文件名区分产物类型，压缩存储的文件按原文件名判断"""
+        assert artifact_type("metadata.json") == "core"
+        assert artifact_type("content.txt.zst") == "core"
+        assert artifact_type("page.html.gz") == "html"
+        assert artifact_type("ai_summary.json") == "summary"
+        assert artifact_type("screenshot.png") == "screenshot"
+        assert artifact_type("chart.png") == "download"
+
+
+class TestRetentionEngine:
+    """保留策略测试"""
+
+    def test_temp_and_superseded_tasks(self, tmp_path):
+        """过期临时文件和被重新下载取代的任务目录被清理，试运行不删除"""
+        engine, database = make_engine(tmp_path, [
+            {"artifact_type": "temp", "max_age_days": 1},
+            {"artifact_type": "task", "keep_latest": 1}
+        ])
+        (tmp_path / "temp").mkdir()
+        old_zip = tmp_path / "temp" / "archive_1.zip"
+        old_zip.write_bytes(b"zip")
+        set_age(old_zip, 2)
+        new_shot = tmp_path / "temp" / "ai_analysis_2.png"
+        new_shot.write_bytes(b"png")
+        old_copy = make_task(tmp_path / "session_1", "task_a", task_id="a", age_days=5)
+        new_copy = make_task(tmp_path / "session_2", "task_a", task_id="a")
+        other = make_task(tmp_path / "session_1", "task_c", age_days=5)
+        task_dirs = [old_copy, new_copy, other]
+
+        planned = engine.apply(dry_run=True, task_dirs=task_dirs)
+        assert {(str(a.candidate.path), a.reason) for a in planned.actions} == {
+            (str(old_zip), "expired"), (str(old_copy), "superseded")
+        }
+        assert old_zip.exists() and old_copy.exists()
+
+        report = engine.apply(task_dirs=task_dirs)
+        assert report.to_dict()["removed"] == 2 and report.freed_bytes == planned.freed_bytes
+        assert not old_zip.exists() and not old_copy.exists()
+        assert new_shot.exists() and new_copy.exists() and other.exists()
+        assert engine.usage_index.get(old_copy) is None
+        database.close()
+
+    def test_generic_url_is_not_identity(self, tmp_path):
+        """没有可靠任务ID、只共用平台通用链接的不同任务不会被当作重复下载删除"""
+        engine, database = make_engine(tmp_path, [{"artifact_type": "task", "keep_latest": 1}])
+        first = make_task(
+            tmp_path / "session_1", "task_1", task_id="coze_space_history_1_100",
+            page_url="https://space.coze.cn/", platform="coze_space", age_days=5
+        )
+        second = make_task(
+            tmp_path / "session_2", "task_2", task_id="coze_space_history_2_200",
+            page_url="https://space.coze.cn/", platform="coze_space"
+        )
+
+        report = engine.apply(task_dirs=[first, second])
+
+        assert report.actions == []
+        assert first.exists() and second.exists()
+        database.close()
+
+    def test_platform_quota_for_screenshots(self, tmp_path):
+        """按平台限制截图总大小时保留较新的截图，元数据和正文不受影响"""
+        engine, database = make_engine(tmp_path, [
+            {"artifact_type": "screenshot", "platform": "manus", "max_bytes": 3000}
+        ])
+        old = make_task(tmp_path / "tasks", "t1", age_days=3)
+        middle = make_task(tmp_path / "tasks", "t2", age_days=2)
+        new = make_task(tmp_path / "tasks", "t3", age_days=1)
+        skywork = make_task(tmp_path / "tasks", "t4", platform="skywork", age_days=3)
+
+        report = engine.apply(task_dirs=[old, middle, new, skywork])
+
+        assert [a.candidate.path for a in report.actions] == [middle / "screenshot.png", old / "screenshot.png"]
+        assert (new / "screenshot.png").exists() and (skywork / "screenshot.png").exists()
+        assert (old / "metadata.json").exists() and (old / "content.txt").exists()
+        assert engine.usage_index.get(old).types.get("screenshot") is None
+        database.close()
+
+    def test_invalid_policy(self):
+        """未知的字段或产物类型报错"""
+        with pytest.raises(ValidationError):
+            RetentionPolicy.from_dict({"artifact_type": "video"})
+        with pytest.raises(ValidationError):
+            RetentionPolicy.from_dict({"max_days": 3})
@@ -0,0 +1,119 @@
+"""
+AI总结批量补全测试
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+import app.core.summary_jobs as summary_jobs
+import app.core.task_summary_generator as task_summary_generator
+from app.core.summary_backfill import SummaryBackfill, summary_state
+from app.core.summary_jobs import SummaryJobManager
+
+
+def make_task(root, name: str, summary_age: float = None):
+    task_dir = root / "session" / name
+    task_dir.mkdir(parents=True)
+    (task_dir / "content.txt").write_text(name, encoding="utf-8")
+    if summary_age is not None:
+        summary_file = task_dir / "ai_summary.json"
+        summary_file.write_text("{}", encoding="utf-8")
+        content_mtime = (task_dir / "content.txt").stat().st_mtime
+        os.utime(summary_file, (content_mtime + summary_age, content_mtime + summary_age))
+    return task_dir
+
+
+class TestSummaryBackfill:
+    """AI总结批量补全测试类"""
+
+    @pytest.mark.asyncio
+    async def test_backfill_missing_and_stale(self, tmp_path, monkeypatch):
+        """测试只处理缺失或过期的总结，失败记录到检查点且不阻塞其他任务"""
+        root = tmp_path / "downloads"
+        missing = make_task(root, "task_missing")
+        stale = make_task(root, "task_stale", summary_age=-60)
+        fresh = make_task(root, "task_fresh", summary_age=60)
+        broken = make_task(root, "task_broken")
+
+        assert summary_state(missing) == "missing"
+        assert summary_state(stale) == "stale"
+        assert summary_state(fresh) is None
+
+        processed = []
+
+        async def fake_stream(task_dir, task_title=""):
+            processed.append(task_dir.name)
+            await asyncio.sleep(0.01)
+            if task_dir.name == "task_broken":
+                yield {"event": "error", "data": {"success": False, "error": "模型不可用", "summary": None}}
+                return
+            (task_dir / "ai_summary.json").write_text("{}", encoding="utf-8")
+            yield {"event": "done", "data": {"success": True, "summary": {}}}
+
+        monkeypatch.setattr(task_summary_generator, "stream_task_summary", fake_stream)
+        manager = SummaryJobManager(max_concurrent=2)
+        monkeypatch.setattr(summary_jobs, "_summary_job_manager", manager)
+        checkpoint = tmp_path / "backfill.json"
+        backfill = SummaryBackfill(checkpoint_file=str(checkpoint), roots=[str(root)])
+
+        # 接口已为该任务提交的作业被补全复用，不会重复生成
+        manager.submit("missing", missing, "任务")
+        await backfill.start(workers=2)
+        progress = await backfill.wait()
+
+        assert sorted(processed) == ["task_broken", "task_missing", "task_stale"]
+        assert len(manager.list_jobs()) == 3
+        assert progress["status"] == "completed"
+        assert (progress["succeeded"], progress["failed"]) == (2, 1)
+        assert summary_state(stale) is None
+
+        saved = json.loads(checkpoint.read_text(encoding="utf-8"))
+        assert saved["attempts"] == {str(broken): 1}
+
+        # 从检查点恢复：失败次数达到上限的任务不再自动重试
+        resumed = SummaryBackfill(checkpoint_file=str(checkpoint), roots=[str(root)], max_attempts=1)
+        assert resumed.get_progress()["succeeded"] == 2
+        assert resumed.pending_tasks() == []
+
+    @pytest.mark.asyncio
+    async def test_pause_and_resume(self, tmp_path, monkeypatch):
+        """测试暂停后不再领取新任务，恢复后继续"""
+        root = tmp_path / "downloads"
+        for index in range(4):
+            make_task(root, f"task_{index}")
+
+        async def fake_stream(task_dir, task_title=""):
+            await asyncio.sleep(0.02)
+            yield {"event": "done", "data": {"success": True, "summary": {}}}
+
+        monkeypatch.setattr(task_summary_generator, "stream_task_summary", fake_stream)
+        monkeypatch.setattr(summary_jobs, "_summary_job_manager", SummaryJobManager(max_concurrent=2))
+        backfill = SummaryBackfill(checkpoint_file=str(tmp_path / "backfill.json"), roots=[str(root)])
+
+        await backfill.start(workers=1)
+        await asyncio.sleep(0.01)
+        assert backfill.pause()["status"] == "paused"
+        await asyncio.sleep(0.06)
+        assert backfill.get_progress()["processed"] == 1
+
+        await backfill.start()
+        progress = await backfill.wait()
+        assert progress["processed"] == 4 and progress["status"] == "completed"
+
+    def test_checkpoint_snapshot_is_copied(self, tmp_path):
+        """测试检查点快照与后续修改隔离，较旧的快照不覆盖较新的"""
+        checkpoint = tmp_path / "backfill.json"
+        backfill = SummaryBackfill(checkpoint_file=str(checkpoint), roots=[str(tmp_path)])
+        backfill._attempts["a"] = 1
+        older = backfill._checkpoint_snapshot()
+        backfill._attempts["b"] = 2
+        backfill.progress.processed = 5
+        newer = backfill._checkpoint_snapshot()
+
+        assert older["attempts"] == {"a": 1} and older["progress"]["processed"] == 0
+        backfill._write_checkpoint(newer)
+        backfill._write_checkpoint(older)
+        saved = json.loads(checkpoint.read_text(encoding="utf-8"))
+        assert saved["attempts"] == {"a": 1, "b": 2} and saved["progress"]["processed"] == 5
@@ -0,0 +1,74 @@
+"""
+AI总结后台作业测试
+"""
+import asyncio
+
+import pytest
+
+import app.core.task_summary_generator as task_summary_generator
+from app.core.summary_jobs import SummaryJobManager, SummaryJobStatus
+
+
+class TestSummaryJobManager:
+    """AI总结作业管理器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_singleflight_and_replay(self, tmp_path, monkeypatch):
+        """测试同一任务的并发请求合并为一个作业，订阅者可回放完整事件"""
+        runs = []
+        release = asyncio.Event()
+
+        async def fake_stream(task_dir, task_title=""):
+            runs.append(task_dir)
+            yield {"event": "file", "data": {"filename": "content.txt"}}
+            await release.wait()
+            yield {"event": "delta", "data": {"text": "总结"}}
+            yield {"event": "done", "data": {"success": True, "summary": {"overall_summary": "总结"}}}
+
+        monkeypatch.setattr(task_summary_generator, "stream_task_summary", fake_stream)
+        manager = SummaryJobManager(max_concurrent=1)
+
+        first = manager.submit("t1", tmp_path, "任务")
+        second = manager.submit("t1", tmp_path, "任务")
+        assert first is second
+
+        await asyncio.sleep(0.01)
+        assert first.status == SummaryJobStatus.RUNNING
+        events = []
+
+        async def consume():
+            async for event in manager.subscribe(first.job_id):
+                events.append(event["event"])
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        release.set()
+        await manager.wait(first.job_id)
+        await consumer
+
+        assert len(runs) == 1
+        assert events == ["file", "delta", "done"]
+        assert manager.get(first.job_id).to_dict()["summary"] == {"overall_summary": "总结"}
+        assert manager.get_active_job("t1") is None
+
+        # 作业结束后的订阅直接回放历史事件，新请求创建新作业
+        replay = [event["event"] async for event in manager.subscribe(first.job_id)]
+        assert replay == ["file", "delta", "done"]
+        assert manager.submit("t1", tmp_path).job_id != first.job_id
+        await manager.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_failure_marks_job_failed(self, tmp_path, monkeypatch):
+        """测试生成异常时作业失败并推送 error 事件"""
+        async def broken_stream(task_dir, task_title=""):
+            raise RuntimeError("磁盘错误")
+            yield
+
+        monkeypatch.setattr(task_summary_generator, "stream_task_summary", broken_stream)
+        manager = SummaryJobManager()
+
+        job = await manager.wait(manager.submit("t2", tmp_path).job_id)
+
+        assert job.status == SummaryJobStatus.FAILED
+        assert job.error == "磁盘错误"
+        assert [event["event"] for event in job.events] == ["error"]
@@ -0,0 +1,143 @@
+"""
+并发任务执行器测试
+"""
+import asyncio
+
+import pytest
+
+from app.core.task_executor import TaskExecutor
+from app.core.task_processor import TaskProcessor, TaskRequest, TaskResult, TaskStatus
+
+
+class FakeProcessor(TaskProcessor):
+    """模拟任务处理器，记录执行顺序和并发数"""
+
+    def __init__(self, delay: float = 0.05):
+        super().__init__()
+        self.delay = delay
+        self.order = []
+        self.running = {}
+        self.peak = {}
+
+    async def process_task(self, request: TaskRequest, task_id=None) -> TaskResult:
+        platform = request.platform
+        self.order.append(request.topic)
+        self.running[platform] = self.running.get(platform, 0) + 1
+        self.peak[platform] = max(self.peak.get(platform, 0), self.running[platform])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running[platform] -= 1
+        return TaskResult(
+            request=request,
+            task_id=f"{platform}_{request.topic}",
+            status=TaskStatus.COMPLETED,
+            platform=platform
+        )
+
+
+class TestTaskExecutor:
+    """任务执行器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_platform_limits(self):
+        """测试平台并发配额"""
+        processor = FakeProcessor()
+        executor = TaskExecutor(processor, max_workers=5, platform_limits={"manus": 2, "skywork": 1})
+        await executor.start()
+
+        ids = [executor.submit(TaskRequest(platform="manus", topic=f"m{i}")) for i in range(4)]
+        ids += [executor.submit(TaskRequest(platform="skywork", topic=f"s{i}")) for i in range(3)]
+        results = await asyncio.gather(*(executor.wait_for(i, timeout=5) for i in ids))
+        await executor.stop()
+
+        assert all(result.success for result in results)
+        assert processor.peak == {"manus": 2, "skywork": 1}
+
+    @pytest.mark.asyncio
+    async def test_global_limit(self):
+        """测试全局并发上限"""
+        processor = FakeProcessor()
+        executor = TaskExecutor(processor, max_workers=1, platform_limits={"manus": 3, "skywork": 3})
+        await executor.start()
+
+        ids = [executor.submit(TaskRequest(platform=p, topic=p)) for p in ("manus", "skywork")]
+        await asyncio.gather(*(executor.wait_for(i, timeout=5) for i in ids))
+        await executor.stop()
+
+        assert max(processor.peak.values()) == 1
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        """测试优先级调度"""
+        processor = FakeProcessor(delay=0.01)
+        executor = TaskExecutor(processor, max_workers=1, platform_limits={"manus": 1})
+        await executor.start()
+
+        executor.submit(TaskRequest(platform="manus", topic="low"), priority=1)
+        executor.submit(TaskRequest(platform="manus", topic="normal"), priority=3)
+        executor.submit(TaskRequest(platform="manus", topic="high"), priority=5)
+        executor.submit(TaskRequest(platform="manus", topic="low2"), priority=1)
+        await executor.stop(wait=True)
+
+        assert processor.order == ["high", "normal", "low", "low2"]
+
+    @pytest.mark.asyncio
+    async def test_cancel(self):
+        """测试取消排队中和执行中的任务"""
+        processor = FakeProcessor(delay=1)
+        executor = TaskExecutor(processor, max_workers=1, platform_limits={"manus": 1})
+        await executor.start()
+
+        running_id = executor.submit(TaskRequest(platform="manus", topic="running"))
+        queued_id = executor.submit(TaskRequest(platform="manus", topic="queued"))
+        await asyncio.sleep(0.05)
+
+        assert executor.cancel(queued_id)
+        assert executor.cancel(running_id)
+
+        running_result = await executor.wait_for(running_id, timeout=5)
+        queued_result = await executor.wait_for(queued_id, timeout=5)
+        await executor.stop()
+
+        assert running_result.status == TaskStatus.CANCELLED
+        assert queued_result.status == TaskStatus.CANCELLED
+        assert processor.order == ["running"]
+
+        stats = executor.get_statistics()
+        assert stats["cancelled"] == 2
+        assert stats["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_statistics_merged(self):
+        """测试处理器统计包含执行器指标"""
+        processor = FakeProcessor(delay=0.01)
+        executor = TaskExecutor(processor, max_workers=2, platform_limits={"manus": 1})
+        await executor.start()
+
+        execution_id = executor.submit(TaskRequest(platform="manus", topic="t"))
+        await executor.wait_for(execution_id, timeout=5)
+        await executor.stop()
+
+        stats = processor.get_processing_statistics()
+        assert stats["queue_depth"] == 0
+        assert stats["throughput_per_minute"] > 0
+
+    @pytest.mark.asyncio
+    async def test_enabled_platforms_and_pruning(self, monkeypatch):
+        """测试只为启用的平台创建工作协程，已结束的执行项只保留最近一部分"""
+        monkeypatch.setattr("app.config.settings.get_platform_configs", lambda: {
+            "manus": {"base_url": "https://manus.im", "enabled": True, "max_concurrent_tasks": 2},
+            "skywork": {"base_url": "https://skywork.ai", "enabled": False}
+        })
+        processor = FakeProcessor(delay=0)
+        executor = TaskExecutor(processor, max_workers=2)
+        executor.max_finished = 2
+        assert executor.platform_limits == {"manus": 2}
+
+        await executor.start()
+        ids = [executor.submit(TaskRequest(platform="manus", topic=f"t{i}")) for i in range(4)]
+        await executor.stop(wait=True)
+
+        assert [execution["execution_id"] for execution in executor.list_executions()] == ids[2:]
+        assert executor.get_statistics()["finished"] == 4
@@ -0,0 +1,152 @@
+"""
+任务目录布局测试
+"""
+import json
+import os
+import time
+
+from app.core.summary_backfill import SummaryBackfill
+from app.storage.blob_store import BlobStore
+from app.storage.database import Database
+from app.storage.pack_archive import PackArchive
+from app.storage.retention import UsageIndex
+from app.storage.task_layout import LayoutMigrator, TaskLayout, normalize_metadata, shard_of, task_id_of
+
+
+def make_legacy_task(root, name, metadata, age_days=0):
+    task_dir = root / name
+    task_dir.mkdir(parents=True)
+    (task_dir / "metadata.json").write_text(json.dumps(metadata, ensure_ascii=False), encoding="utf-8")
+    (task_dir / "content.txt").write_text(f"{name} 的内容", encoding="utf-8")
+    timestamp = time.time() - age_days * 86400
+    for path in [*task_dir.iterdir(), task_dir]:
+        os.utime(path, (timestamp, timestamp))
+    return task_dir
+
+
+def make_migrator(tmp_path):
+    layout = TaskLayout(
+        roots=[tmp_path / "tasks"],
+        legacy_roots=[tmp_path / "manus_history", tmp_path / "multi_platform_downloads"]
+    )
+    database = Database(f"sqlite:///{tmp_path / 'agenthub.db'}")
+    blob_store = BlobStore(root=tmp_path / "blobs", database=database, min_size=1)
+    archive = PackArchive(root=tmp_path / "packs", database=database, blob_store=blob_store)
+    migrator = LayoutMigrator(
+        layout,
+        blob_store=blob_store,
+        pack_archive=archive,
+        usage_index=UsageIndex(database),
+        summary_backfill=SummaryBackfill(checkpoint_file=str(tmp_path / "backfill.json"))
+    )
+    return migrator, database
+
+
+class TestTaskLayout:
+    """任务目录路径计算测试"""
+
+    def test_task_dir_is_deterministic(self, tmp_path):
+        """同一任务总是得到同一路径，分片取任务ID哈希前两位，目录名与旧版下载目录同为 task_<任务ID>"""
+        layout = TaskLayout(roots=[tmp_path / "tasks", tmp_path / "old_tasks"], legacy_roots=[])
+
+        task_dir = layout.task_dir("manus", "abc/123")
+
+        assert task_dir == tmp_path / "tasks" / "manus" / shard_of("abc/123") / "task_abc_123"
+        assert len(shard_of("abc/123")) == 2
+        assert task_id_of(layout.task_dir("manus", "task_7")) == "task_7"
+        assert task_id_of(tmp_path / "session_1" / "task_7") == "7"
+        assert layout.find("abc/123") is None
+
+        other_root_dir = layout.task_dir("skywork", "abc/123", root=tmp_path / "old_tasks")
+        other_root_dir.mkdir(parents=True)
+        assert layout.find("abc/123") == other_root_dir
+        assert list(layout.iter_task_dirs("skywork")) == [("skywork", other_root_dir)]
+
+
+class TestNormalizeMetadata:
+    """元数据 v2 格式转换测试"""
+
+    def test_standard_format(self):
+        """标准化格式保留 task/download 两段并补充平台"""
+        metadata = normalize_metadata(
+            {"task": {"id": "1", "title": "标题"}, "download": {"platform": "manus", "timestamp": "t"}}
+        )
+
+        assert metadata["schema_version"] == 2
+        assert metadata["task"] == {"id": "1", "title": "标题", "platform": "manus"}
+        assert metadata["download"]["timestamp"] == "t"
+
+    def test_flat_formats(self):
+        """旧版扁平格式和平台元数据转换为 task/download，其余字段保留在 legacy 中"""
+        old = normalize_metadata({"id": "2", "title": "旧任务", "url": "u", "status": "完成"}, platform="coze_space")
+        assert old["task"]["title"] == "旧任务" and old["task"]["url"] == "u"
+        assert old["task"]["platform"] == old["download"]["platform"] == "coze_space"
+        assert old["legacy"] == {"status": "完成"}
+
+        downloaded = normalize_metadata({"task_id": "3", "page_url": "p", "page_title": "页面"})
+        assert downloaded["task"]["id"] == "3"
+        assert downloaded["task"]["title"] == "页面"
+        assert downloaded["download"]["page_url"] == "p"
+        assert "legacy" not in downloaded
+
+
+class TestLayoutMigrator:
+    """旧版下载目录迁移测试"""
+
+    def test_migrate(self, tmp_path):
+        """迁移后目录位于新布局、元数据为 v2、blob 引用随目录更新"""
+        migrator, database = make_migrator(tmp_path)
+        source = make_legacy_task(
+            tmp_path / "manus_history" / "session_1", "task_1",
+            {"task": {"id": "1", "title": "任务"}, "download": {"platform": "manus"}}
+        )
+        migrator._get_blob_store().ingest(source / "content.txt")
+
+        report = migrator.migrate(workers=2)
+
+        target = migrator.layout.task_dir("manus", "1")
+        assert report.to_dict()["migrated"] == 1
+        assert not source.exists()
+        assert (target / "content.txt").read_text(encoding="utf-8") == "task_1 的内容"
+        metadata = json.loads((target / "metadata.json").read_text(encoding="utf-8"))
+        assert metadata["schema_version"] == 2 and metadata["task"]["platform"] == "manus"
+        assert migrator._get_blob_store().release(target / "content.txt")
+        database.close()
+
+    def test_conflicts_and_dry_run(self, tmp_path):
+        """同一任务的多个旧目录只迁移最新的一个，其余保留；试运行不移动目录"""
+        migrator, database = make_migrator(tmp_path)
+        metadata = {"task": {"id": "1", "title": "任务"}, "download": {"platform": "manus"}}
+        older = make_legacy_task(tmp_path / "manus_history" / "session_1", "task_1", metadata, age_days=10)
+        newer = make_legacy_task(tmp_path / "multi_platform_downloads" / "session_2", "task_1", metadata)
+
+        planned = migrator.migrate(dry_run=True)
+        assert planned.migrated == [(str(newer), str(migrator.layout.task_dir("manus", "1")))]
+        assert newer.exists()
+
+        report = migrator.migrate()
+        assert report.conflicts == [(str(older), str(migrator.layout.task_dir("manus", "1")))]
+        assert older.exists() and not newer.exists()
+        database.close()
+
+    def test_rename_unprefixed_dirs_and_records(self, tmp_path):
+        """新布局中目录名未带前缀的任务目录改名，用量索引和补全检查点的路径随之更新"""
+        migrator, database = make_migrator(tmp_path)
+        layout = migrator.layout
+        target = layout.task_dir("manus", "1")
+        source = make_legacy_task(
+            target.parent, "1", {"task": {"id": "1", "title": "任务"}, "download": {"platform": "manus"}}
+        )
+        usage_index = migrator._get_usage_index()
+        usage_index.record(source)
+        backfill = migrator._get_summary_backfill()
+        backfill._attempts = {str(source): 2}
+
+        report = migrator.migrate()
+
+        assert report.migrated == [(str(source), str(target))]
+        assert layout.find("1") == target and not source.exists()
+        assert usage_index.get(source) is None and usage_index.get(target).task_id == "1"
+        assert SummaryBackfill(checkpoint_file=str(tmp_path / "backfill.json"))._attempts == {str(target): 2}
+        assert migrator.plan() == ([], [])
+        database.close()
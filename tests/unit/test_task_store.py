@@ -0,0 +1,263 @@
+"""
+任务持久化存储测试
+"""
+import asyncio
+
+import pytest
+
+from app.core.platform_capabilities import CapabilityManager
+from app.core.task_processor import TaskProcessor, TaskRequest, TaskStatus, ProcessingStage
+from app.platforms.base_platform import BasePlatform, TaskResult as PlatformTaskResult
+from app.storage.database import Database
+from app.storage.task_store import TaskStore
+
+
+class SimulatedCrash(BaseException):
+    """模拟进程崩溃（不会被任务错误处理捕获）"""
+
+
+class FakePlatform(BasePlatform):
+    """模拟平台"""
+
+    def __init__(self, crash_on_status: bool = False):
+        super().__init__("manus", {})
+        self.crash_on_status = crash_on_status
+        self.submit_calls = 0
+
+    async def test_connection(self):
+        return True
+
+    async def download_files(self, task_id, download_dir):
+        return []
+
+    async def submit_task(self, topic, title=None, **kwargs):
+        self.submit_calls += 1
+        return "remote_1"
+
+    async def get_task_status(self, task_id):
+        if self.crash_on_status:
+            raise SimulatedCrash()
+        return "completed"
+
+    async def get_task_result(self, task_id):
+        return PlatformTaskResult(
+            platform="manus",
+            task_id=task_id,
+            success=True,
+            result="研究结果" * 50,
+            metadata={"remote": task_id}
+        )
+
+
+def make_processor(store: TaskStore, platform: FakePlatform) -> TaskProcessor:
+    processor = TaskProcessor(task_store=store)
+    processor.capability_manager = CapabilityManager()
+
+    async def get_platform_instance(platform_name):
+        return platform
+
+    processor._get_platform_instance = get_platform_instance
+    return processor
+
+
+class TestTaskStore:
+    """任务存储测试类"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        database = Database(f"sqlite:///{tmp_path / 'tasks.db'}")
+        yield TaskStore(database)
+        database.close()
+
+    def test_save_and_get(self, store):
+        """测试保存和读取任务记录"""
+        store.save_task({
+            "task_id": "t1",
+            "platform": "manus",
+            "status": "created",
+            "current_stage": "initialization",
+            "completed_stages": [],
+            "request": {"platform": "manus", "topic": "x"},
+            "metadata": {"a": 1}
+        })
+        store.save_task({
+            "task_id": "t1",
+            "platform": "manus",
+            "status": "submitted",
+            "current_stage": "task_submission",
+            "completed_stages": ["initialization", "task_submission"],
+            "request": {"platform": "manus", "topic": "x"},
+            "metadata": {"a": 2}
+        })
+
+        record = store.get_task("t1")
+        assert record["status"] == "submitted"
+        assert record["completed_stages"] == ["initialization", "task_submission"]
+        assert record["metadata"] == {"a": 2}
+        assert store.count_by_status() == {"submitted": 1}
+        assert [r["task_id"] for r in store.list_unfinished_tasks()] == ["t1"]
+
+    def test_claim_unfinished_tasks(self, store):
+        """测试只领取租约已过期的任务，同一任务只被一个进程领取"""
+        for task_id in ("t1", "t2"):
+            store.save_task({
+                "task_id": task_id,
+                "platform": "manus",
+                "status": "running",
+                "current_stage": "task_monitoring",
+                "request": {"platform": "manus", "topic": "x"}
+            })
+        assert store.claim_task("t1", "a", ttl=60)
+
+        assert [r["task_id"] for r in store.claim_unfinished_tasks("b", ttl=60)] == ["t2"]
+        assert store.claim_unfinished_tasks("c", ttl=60) == []
+        assert not store.claim_task("t2", "c", ttl=60)
+        assert store.renew_leases("a", ["t1", "t2"], ttl=60) == 1
+
+        store.release_lease("t2", "b")
+        store.database.execute("UPDATE tasks SET lease_expires_at = 0 WHERE task_id = 't1'")
+        assert [r["task_id"] for r in store.claim_unfinished_tasks("c", ttl=60)] == ["t1", "t2"]
+
+    def test_lease_columns_added_to_old_table(self, tmp_path):
+        """测试旧版任务表补充租约列"""
+        database = Database(f"sqlite:///{tmp_path / 'old.db'}")
+        database.executescript(
+            "CREATE TABLE tasks (task_id TEXT PRIMARY KEY, platform TEXT NOT NULL, status TEXT NOT NULL, "
+            "current_stage TEXT, completed_stages TEXT NOT NULL DEFAULT '[]', request TEXT NOT NULL, "
+            "content TEXT NOT NULL DEFAULT '', files TEXT NOT NULL DEFAULT '[]', ai_summary TEXT, "
+            "metadata TEXT NOT NULL DEFAULT '{}', metrics TEXT NOT NULL DEFAULT '{}', "
+            "error_message TEXT NOT NULL DEFAULT '', created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "INSERT INTO tasks (task_id, platform, status, current_stage, request, created_at, updated_at) "
+            "VALUES ('t1', 'manus', 'interrupted', 'task_monitoring', '{}', 0, 0);"
+        )
+        store = TaskStore(database)
+
+        assert [r["task_id"] for r in store.claim_unfinished_tasks("a", ttl=60)] == ["t1"]
+        database.close()
+
+    @pytest.mark.asyncio
+    async def test_running_task_not_recovered_by_other_process(self, store):
+        """测试执行中的任务持有租约，其他进程不会恢复；结束后释放租约"""
+        class HangingPlatform(FakePlatform):
+            async def get_task_status(self, task_id):
+                await asyncio.sleep(10)
+
+        running = make_processor(store, HangingPlatform())
+        running.lease_ttl = 0.3
+        worker = asyncio.create_task(
+            running.process_task(TaskRequest(platform="manus", topic="测试命题", enable_ai_summary=False))
+        )
+        await asyncio.sleep(0.5)
+
+        other = make_processor(store, FakePlatform())
+        assert other.get_resumable_tasks() == []
+        task_id = store.list_unfinished_tasks()[0]["task_id"]
+        assert store.get_task(task_id)["owner"] == running.lease_owner
+
+        worker.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await worker
+        assert running._lease_renewer is None
+        assert store.get_task(task_id)["owner"] is None
+
+    @pytest.mark.asyncio
+    async def test_resume_after_crash(self, store):
+        """测试重启后从最后完成的阶段继续，不重复提交"""
+        request = TaskRequest(platform="manus", topic="测试命题", enable_ai_summary=False)
+
+        crashing_platform = FakePlatform(crash_on_status=True)
+        with pytest.raises(SimulatedCrash):
+            await make_processor(store, crashing_platform).process_task(request)
+        assert crashing_platform.submit_calls == 1
+
+        platform = FakePlatform()
+        processor = make_processor(store, platform)
+        pending = processor.get_resumable_tasks()
+        assert len(pending) == 1
+        assert pending[0].metadata["platform_task_id"] == "remote_1"
+
+        result = await processor.process_task(pending[0].request, task_id=pending[0].task_id)
+
+        assert platform.submit_calls == 0
+        assert result.status == TaskStatus.COMPLETED
+        assert result.current_stage == ProcessingStage.COMPLETION
+        assert processor.get_resumable_tasks() == []
+
+        events = [(t["stage"], t["event"]) for t in store.get_transitions(result.task_id)]
+        assert ("task_submission", "completed") in events
+        assert events.count(("task_submission", "started")) == 1
+
+    def test_completed_cache_is_bounded(self, store):
+        """测试已完成任务缓存有界并可回落到存储"""
+        processor = TaskProcessor(task_store=store)
+        processor.completed_tasks.maxsize = 2
+
+        for index in range(3):
+            result = processor._restore_result({
+                "task_id": f"t{index}",
+                "platform": "manus",
+                "status": "completed",
+                "current_stage": "completion",
+                "completed_stages": ["completion"],
+                "request": {"platform": "manus", "topic": "x"},
+                "content": "",
+                "files": [],
+                "ai_summary": None,
+                "metadata": {},
+                "metrics": {},
+                "error_message": ""
+            })
+            processor.completed_tasks[result.task_id] = result
+            processor._persist_result(result, ["completion"])
+
+        assert list(processor.completed_tasks) == ["t1", "t2"]
+        assert processor.get_task_status("t0")["status"] == "completed"
+
+    @pytest.mark.asyncio
+    async def test_interrupted_on_shutdown_is_resumed(self, store):
+        """测试执行器停止时执行中的任务保存为中断状态，重启后从断点继续"""
+        from app.core.task_executor import TaskExecutor
+
+        class HangingPlatform(FakePlatform):
+            async def get_task_status(self, task_id):
+                await asyncio.sleep(10)
+
+        platform = HangingPlatform()
+        executor = TaskExecutor(make_processor(store, platform), max_workers=1, platform_limits={"manus": 1})
+        await executor.start()
+        executor.submit(TaskRequest(platform="manus", topic="测试命题", enable_ai_summary=False))
+        await asyncio.sleep(0.1)
+        await executor.stop(wait=False)
+
+        assert store.count_by_status() == {"interrupted": 1}
+
+        platform = FakePlatform()
+        executor = TaskExecutor(make_processor(store, platform), max_workers=1, platform_limits={"manus": 1})
+        await executor.start()
+        execution_ids = executor.recover_pending_tasks()
+        result = await executor.wait_for(execution_ids[0], timeout=5)
+        await executor.stop()
+
+        assert platform.submit_calls == 0
+        assert result.status == TaskStatus.COMPLETED and result.error_message == ""
+        assert store.list_unfinished_tasks() == []
+
+    @pytest.mark.asyncio
+    async def test_wait_for_pruned_execution(self, store):
+        """测试执行项被清理后 wait_for 从任务存储取回结果"""
+        from app.core.task_executor import TaskExecutor
+
+        executor = TaskExecutor(make_processor(store, FakePlatform()), max_workers=1, platform_limits={"manus": 1})
+        executor.max_finished = 1
+        await executor.start()
+        ids = [
+            executor.submit(TaskRequest(platform="manus", topic=f"命题{i}", enable_ai_summary=False))
+            for i in range(2)
+        ]
+        await executor.stop(wait=True)
+
+        assert [execution["execution_id"] for execution in executor.list_executions()] == ids[1:]
+        result = await executor.wait_for(ids[0])
+        assert result.status == TaskStatus.COMPLETED and result.request.topic == "命题0"
+        with pytest.raises(KeyError):
+            await executor.wait_for("exec_0_unknown")
@@ -0,0 +1,108 @@
+"""
+长文本分段与分段总结测试
+"""
+import pytest
+
+from app.core.model_cache import ModelResponseCache
+from app.core.model_client import BaseModelClient, ModelClientManager, ModelResponse
+from app.core.text_chunker import estimate_tokens, group_by_budget, split_text, strip_content_header
+
+
+def make_report(sections: int = 6, paragraph: str = "研究表明该方向进展迅速。" * 20) -> str:
+    return "\n\n".join(f"## 第{index}部分\n\n{paragraph}\n\n{paragraph}" for index in range(sections))
+
+
+class EchoClient(BaseModelClient):
+    """返回简短摘要并记录提示词的模拟客户端"""
+
+    def __init__(self):
+        super().__init__({})
+        self.model = "echo"
+        self.prompts = []
+
+    async def chat_completion(self, messages, **kwargs):
+        self.prompts.append(messages[0].content)
+        return ModelResponse(
+            content=f"摘要{len(self.prompts)}",
+            usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            model=self.model,
+            provider="echo"
+        )
+
+
+class TestTextChunker:
+    """文本分段测试类"""
+
+    def test_estimate_tokens_is_cjk_aware(self):
+        """测试中日韩字符按字计数，其余按约 4 字符计数"""
+        assert estimate_tokens("人工智能") == 4
+        assert estimate_tokens("a" * 40) == 10
+
+    def test_strip_content_header(self):
+        """测试去除 content.txt 元信息头部"""
+        text = "任务标题: 测试\n任务URL: https://x\n下载时间: 2025-01-01 10:00:00\n" + "=" * 60 + "\n\n正文内容"
+        assert strip_content_header(text) == "正文内容"
+        assert strip_content_header("# 标题\n\n正文") == "# 标题\n\n正文"
+
+    def test_split_within_budget_and_stable(self):
+        """测试分段不超预算、保持章节边界，修改单个章节只影响所在分段"""
+        report = make_report()
+        chunks = split_text(report, max_tokens=600)
+
+        assert len(chunks) > 1
+        assert all(chunk.tokens <= 600 for chunk in chunks)
+        assert all(chunk.text.startswith("## 第") for chunk in chunks)
+
+        edited = report.replace("## 第4部分\n\n研究", "## 第4部分\n\n最新研究")
+        edited_chunks = split_text(edited, max_tokens=600)
+        changed = {chunk.hash for chunk in edited_chunks} - {chunk.hash for chunk in chunks}
+        assert len(changed) == 1
+
+    def test_oversized_paragraph_split_by_sentence(self):
+        """测试超长段落按句子切分"""
+        chunks = split_text("这是一句话。" * 300, max_tokens=200)
+        assert all(chunk.tokens <= 200 for chunk in chunks)
+        assert "".join(chunk.text.replace("\n\n", "") for chunk in chunks) == "这是一句话。" * 300
+
+    def test_group_by_budget(self):
+        """测试分组每组至少两项"""
+        groups = group_by_budget(["甲" * 100] * 5, max_tokens=150)
+        assert [len(group) for group in groups] == [2, 3]
+
+
+class TestCondenseText:
+    """分段总结测试类"""
+
+    @pytest.mark.asyncio
+    async def test_map_reduce_reuses_unchanged_chunks(self, tmp_path):
+        """测试长文本分段总结并复用未变化分段的缓存"""
+        manager = ModelClientManager()
+        manager.cache = ModelResponseCache(cache_dir=str(tmp_path))
+        client = EchoClient()
+        manager._clients["echo"] = client
+
+        report = make_report()
+        short = await manager.condense_text("短文本", budget_tokens=600, provider="echo")
+        assert short.content == "短文本" and client.prompts == []
+
+        condensed = await manager.condense_text(report, budget_tokens=600, provider="echo")
+        chunk_count = len(split_text(report, 600))
+        assert len(client.prompts) == chunk_count
+        assert condensed.usage["total_tokens"] == 15 * chunk_count
+        assert "第5部分" in client.prompts[-1]
+
+        edited = report.replace("## 第4部分\n\n研究", "## 第4部分\n\n最新研究")
+        await manager.condense_text(edited, budget_tokens=600, provider="echo")
+        assert len(client.prompts) == chunk_count + 1
+
+    @pytest.mark.asyncio
+    async def test_summarize_output_limit_is_not_budget(self, tmp_path):
+        """测试总结的输出上限 max_tokens 不会被当作分段预算"""
+        manager = ModelClientManager()
+        manager.cache = ModelResponseCache(cache_dir=str(tmp_path))
+        client = EchoClient()
+        manager._clients["echo"] = client
+
+        await manager.summarize_text("短文本" * 50, provider="echo", max_tokens=10)
+
+        assert len(client.prompts) == 1 and "短文本" in client.prompts[0]
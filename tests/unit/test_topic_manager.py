@@ -0,0 +1,32 @@
+"""
+命题管理器测试
+"""
+import pytest
+
+from app.core.topic_manager import TopicManager
+from app.storage.database import Database
+
+
+class TestTopicManager:
+    """命题持久化测试"""
+
+    @pytest.mark.asyncio
+    async def test_topics_survive_new_process(self, tmp_path):
+        """命题ID稳定，另一个数据库连接（新进程）可以取到已创建的命题"""
+        url = f"sqlite:///{tmp_path / 'agenthub.db'}"
+        database = Database(url)
+        manager = TopicManager(database)
+        low = await manager.create_topic("低优先级", "调研内容A", platforms=["manus"])
+        high = await manager.create_topic("高优先级", "调研内容B", priority=3)
+        assert (await manager.create_topic("改名", "调研内容A", platforms=["manus"])).id == low.id
+        database.close()
+
+        other_database = Database(url)
+        other = TopicManager(other_database)
+        topic = await other.get_topic(low.id)
+        assert topic.title == "改名" and topic.platforms == ["manus"] and topic.content == "调研内容A"
+        assert [t.id for t in await other.list_topics()] == [high.id, low.id]
+
+        await other.mark_executed(high.id)
+        assert [t.id for t in await other.list_topics(pending_only=True)] == [low.id]
+        other_database.close()